@@ -57,6 +57,8 @@ STG_OPENID_API = 'https://id.stg.fedoraproject.org/api/v1/'
 
 UPDATE_ID_RE = r'FEDORA-(EPEL-)?\d{4,4}'
 UPDATE_TITLE_RE = r'(\.el|\.fc)\d\d?'
+# How many updates the server returns for one request of BodhiClient.get_updates().
+MAX_UPDATE_IDS = 100
 
 
 class BodhiClientException(FedoraClientError):
@@ -262,8 +264,14 @@ class BodhiClient(OpenIdBaseClient):
         :kwarg rows_per_page: Limit the results to a certain number of rows per
                     page (min:1 max: 100 default: 20)
         :kwarg page: Return a specific page of results
+        :kwarg after: Return the page of results after a cursor, taken from the
+            ``next_after`` of a previous response. Unlike ``page``, this is
+            as fast for the last results as for the first ones.
+        :kwarg all_pages: If True, follow the cursors of the server to return
+            every matching update in one response, rather than one page.
 
         """
+        all_pages = kwargs.pop('all_pages', False)
         # bodhi1 compat
         if 'limit' in kwargs:
             kwargs['rows_per_page'] = kwargs['limit']
@@ -294,7 +302,77 @@ class BodhiClient(OpenIdBaseClient):
         # checks for 'if bugs is not None', not 'if not bugs'
         if 'bugs' in kwargs and kwargs['bugs'] == '':
             kwargs['bugs'] = None
-        return self.send_request('updates/', verb='GET', params=kwargs)
+        resp = self.send_request('updates/', verb='GET', params=kwargs)
+        if not all_pages:
+            return resp
+
+        # The first response has the total, the next ones do not need to count the updates again.
+        updates = list(resp['updates'])
+        page = resp
+        params = dict(kwargs, count=False)
+        params.pop('page', None)
+        while page.get('next_after'):
+            page = self.send_request('updates/', verb='GET',
+                                     params=dict(params, after=page['next_after']))
+            updates.extend(page['updates'])
+        resp['updates'] = updates
+        resp['next_after'] = None
+        return resp
+
+    @errorhandled
+    def get_updates(self, ids, fields=None):
+        """ Fetch the updates with the given aliases, titles or build NVRs.
+
+        This needs one request per hundred ids, rather than one per update.
+
+        :arg ids: A list of update aliases, update titles or build NVRs.
+        :kwarg fields: A list of the fields of the updates to return, such as
+            ``alias`` or ``status``. All the fields are returned by default.
+        :returns: A list of the updates, newest first.
+
+        """
+        updates = []
+        for start in range(0, len(ids), MAX_UPDATE_IDS):
+            params = {'ids': ','.join(ids[start:start + MAX_UPDATE_IDS])}
+            if fields:
+                params['fields'] = ','.join(fields)
+            updates.extend(self.send_request('updates/', verb='GET', params=params))
+        return updates
+
+    def export_updates(self, modified_since=None, releases=None):
+        """ Iterate over every update, with its builds, comments and karma.
+
+        The server writes the updates as newline-delimited JSON, which is read
+        as it arrives, so this needs one request however many updates there are.
+
+        :kwarg modified_since: A datetime. Only the updates that changed since
+            then are exported, to bring a previous export up to date.
+        :kwarg releases: A list of release names to export the updates of.
+        :returns: A generator of the exported updates, as dictionaries, sorted
+            by id.
+        :raises BodhiClientException: If the server rejects the request.
+
+        """
+        params = {}
+        if modified_since is not None:
+            params['modified_since'] = modified_since.isoformat()
+        if releases:
+            params['releases'] = ','.join(releases)
+        url = fedora.client.openidproxyclient.absolute_url(self.base_url, 'export/updates')
+        response = self._session.get(url, params=params, stream=True, timeout=self.timeout)
+        try:
+            if not response.ok:
+                try:
+                    problems = '\n'.join(e['description'] for e in response.json()['errors'])
+                except (KeyError, TypeError, ValueError):
+                    problems = 'The export failed with HTTP status {}'.format(
+                        response.status_code)
+                raise BodhiClientException(problems)
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+        finally:
+            response.close()
 
     @errorhandled
     def comment(self, update, comment, karma=0, email=None):
@@ -455,13 +533,16 @@ class BodhiClient(OpenIdBaseClient):
 
     @errorhandled
     def latest_builds(self, package):
-        """ Get the latest builds for a package.
+        """ Get the latest builds for a package, or for several packages at once.
 
-        :arg package: The package name, for example "kernel".
+        :arg package: The package name, for example "kernel", or a list of package names.
 
         Returns a Munch (dict-like) object of the release dist tag to the
-        latest build.
+        latest build. If a list of package names is given, the object maps each
+        package name to such an object instead.
         """
+        if isinstance(package, (list, tuple)):
+            return self.send_request('latest_builds', params={'packages': ','.join(package)})
         return self.send_request('latest_builds', params={'package': package})
 
     def testable(self):
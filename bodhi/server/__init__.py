@@ -21,7 +21,6 @@ from collections import defaultdict
 import logging
 
 from cornice.validators import DEFAULT_FILTERS
-from dogpile.cache import make_region
 from munch import munchify
 from pyramid.authentication import AuthTktAuthenticationPolicy
 from pyramid.authorization import ACLAuthorizationPolicy
@@ -84,16 +83,17 @@ def get_db_session_for_request(request=None):
 
 def get_cacheregion(request):
     """
-    Return a CacheRegion to be used to cache results.
+    Return the default CacheRegion to be used to cache results.
+
+    The region is shared by the whole process, see :mod:`bodhi.server.cache`.
 
     Args:
         request (pyramid.request.Request): The current web request. Unused.
     Returns:
-        dogpile.cache.region.CacheRegion: A configured CacheRegion.
+        bodhi.server.cache.CacheRegion: The default region.
     """
-    region = make_region()
-    region.configure_from_config(bodhi_config, "dogpile.cache.")
-    return region
+    from bodhi.server import cache
+    return cache.get_region()
 
 
 def get_user(request):
@@ -253,6 +253,9 @@ def main(global_config, testing=None, session=None, **settings):
     bugs.set_bugtracker()
     buildsys.setup_buildsystem(bodhi_config)
 
+    from bodhi.server import cache
+    cache.configure(bodhi_config)
+
     # Sessions & Caching
     from pyramid.session import SignedCookieSessionFactory
     session_factory = SignedCookieSessionFactory(bodhi_config['session.secret'])
@@ -292,9 +295,11 @@ def main(global_config, testing=None, session=None, **settings):
     config.add_mako_renderer('.html', settings_prefix='mako.')
     config.add_static_view('static', 'bodhi:server/static')
 
-    from bodhi.server.renderers import rss, jpeg
+    from bodhi.server.renderers import rss, jpeg, json_stream, ndjson
     config.add_renderer('rss', rss)
     config.add_renderer('jpeg', jpeg)
+    config.add_renderer('json_stream', json_stream)
+    config.add_renderer('ndjson', ndjson)
     config.add_renderer('jsonp', JSONP(param_name='callback'))
 
     # i18n
@@ -322,10 +327,12 @@ def main(global_config, testing=None, session=None, **settings):
 
     # Metrics
     config.add_route('metrics', '/metrics')
+    config.add_route('metrics_json', '/metrics/json')
     config.add_route('masher_status', '/masher/')
 
     # Auto-completion search
     config.add_route('search_packages', '/search/packages')
+    config.add_route('search_updates', '/search/updates')
     config.add_route('latest_candidates', '/latest_candidates')
     config.add_route('latest_builds', '/latest_builds')
 
@@ -13,17 +13,32 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 from threading import Lock
+import collections
+import hashlib
+import json
 import logging
+import random
 import time
+import xmlrpclib
 from functools import wraps
 
+from dogpile.cache import make_region
+from dogpile.cache.api import NO_VALUE
 import koji
 
+from bodhi.server.exceptions import KojiUnavailable
 
 log = logging.getLogger('bodhi')
 _buildsystem = None
 # URL of the koji hub
 _koji_hub = None
+# The KojiCache shared by every session of this process, if caching is enabled
+_koji_cache = None
+# The CircuitBreaker and CallStats shared by every Koji session of this process
+_koji_breaker = None
+_koji_call_stats = None
+# How many seconds wait_for_tasks() waits for tasks before considering them failed
+_task_timeout = None
 
 
 def multicall_enabled(func):
@@ -130,6 +145,7 @@ class DevBuildsys(Buildsystem):
         log.debug("tagBuild(%s, %s)" % (tag, build))
         DevBuildsys.__added__.append((tag, build))
 
+    @multicall_enabled
     def untagBuild(self, tag, build, *args, **kw):
         log.debug("untagBuild(%s, %s)" % (tag, build))
         DevBuildsys.__untag__.append((tag, build))
@@ -228,6 +244,7 @@ class DevBuildsys(Buildsystem):
 
         return data
 
+    @multicall_enabled
     def listBuildRPMs(self, id, *args, **kw):
         rpms = [{'arch': 'src',
                  'build_id': 6475,
@@ -260,6 +277,7 @@ class DevBuildsys(Buildsystem):
         rpms += DevBuildsys.__rpms__
         return rpms
 
+    @multicall_enabled
     def listTags(self, build, *args, **kw):
         if 'el5' in build:
             result = [
@@ -311,9 +329,11 @@ class DevBuildsys(Buildsystem):
         log.debug(builds)
         return builds
 
+    @multicall_enabled
     def getLatestBuilds(self, *args, **kw):
         return [self.getBuild()]
 
+    @multicall_enabled
     def getTag(self, taginfo, **kw):
         if isinstance(taginfo, int):
             taginfo = "f%d" % taginfo
@@ -374,6 +394,928 @@ class DevBuildsys(Buildsystem):
             }
 
 
+class MemoryCacheBackend(object):
+    """
+    An in-process, thread-safe LRU backend for the KojiCache.
+
+    Entries are evicted in least recently used order once max_size entries are stored.
+    """
+
+    def __init__(self, max_size=10000):
+        """
+        Initialize the backend.
+
+        Args:
+            max_size (int): The maximum number of entries to keep.
+        """
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """
+        Return the value stored under key, or NO_VALUE if there is none.
+
+        Args:
+            key (basestring): The key to look up.
+        Returns:
+            object: The stored value, or dogpile.cache.api.NO_VALUE.
+        """
+        with self._lock:
+            value = self._entries.pop(key, NO_VALUE)
+            if value is not NO_VALUE:
+                # Re-insert the entry to mark it as the most recently used one.
+                self._entries[key] = value
+            return value
+
+    def set(self, key, value):
+        """
+        Store value under key, evicting the least recently used entries if needed.
+
+        Args:
+            key (basestring): The key to store the value under.
+            value (object): The value to store.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+class DogpileCacheBackend(object):
+    """
+    A KojiCache backend that stores entries in a dogpile.cache region.
+
+    This allows the cache to be shared between processes (and hosts), for example with memcached.
+    """
+
+    def __init__(self, region):
+        """
+        Initialize the backend.
+
+        Args:
+            region (dogpile.cache.region.CacheRegion): A configured region to store entries in.
+        """
+        self.region = region
+
+    def get(self, key):
+        """
+        Return the value stored under key, or NO_VALUE if there is none.
+
+        Args:
+            key (basestring): The key to look up.
+        Returns:
+            object: The stored value, or dogpile.cache.api.NO_VALUE.
+        """
+        return self.region.get(key, ignore_expiration=True)
+
+    def set(self, key, value):
+        """
+        Store value under key.
+
+        Args:
+            key (basestring): The key to store the value under.
+            value (object): The value to store.
+        """
+        self.region.set(key, value)
+
+    def clear(self):
+        """Invalidate every entry."""
+        self.region.invalidate()
+
+
+class KojiCache(object):
+    """
+    Cache the results of Koji calls across sessions and requests.
+
+    Calls whose results never change (such as getBuild() for a completed build) are cached until
+    they are evicted from the backend. Calls whose results depend on what is tagged where are
+    cached for tag_ttl seconds, and are invalidated early when Bodhi tags or untags builds itself,
+    or when invalidate() is called (e.g., by the KojiCacheHandler when Koji announces tag changes).
+
+    Invalidation works by bumping a generation number for the affected tag or build. The
+    generation is part of the keys of the tag-dependent entries, so outdated entries simply stop
+    being found.
+    """
+
+    # These calls return the same thing for the same arguments forever. The value is a function
+    # that decides whether a particular result is final and can be cached.
+    IMMUTABLE_METHODS = {
+        'getBuild': lambda result: bool(result) and (
+            result.get('state') == koji.BUILD_STATES['COMPLETE']),
+        'listBuildRPMs': lambda result: bool(result),
+        'getRPMHeaders': lambda result: bool(result),
+    }
+    # These calls depend on tagging. The value is the kind of argument their first positional
+    # argument is, which is also the kind of generation that invalidates them.
+    TAG_METHODS = {
+        'getLatestBuilds': 'tag',
+        'getTag': 'tag',
+        'listTagged': 'tag',
+        'listTags': 'build',
+    }
+    # These calls change tagging, so their tags and builds are invalidated when they are called.
+    # The value lists the positions of their tag arguments and of their build argument.
+    TAG_ACTIONS = {
+        'moveBuild': ((0, 1), 2),
+        'tagBuild': ((0,), 1),
+        'untagBuild': ((0,), 1),
+    }
+
+    def __init__(self, backend, tag_ttl=300):
+        """
+        Initialize the cache.
+
+        Args:
+            backend (MemoryCacheBackend or DogpileCacheBackend): Where to store the entries.
+            tag_ttl (int): How many seconds to cache the results of tag-dependent calls for.
+        """
+        self.backend = backend
+        self.tag_ttl = tag_ttl
+        self._stats = collections.defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self._stats_lock = Lock()
+
+    @staticmethod
+    def _key(*parts):
+        """
+        Return a string key that represents the given parts.
+
+        The parts are serialized as JSON, so that equal arguments share a key whether they are
+        passed as str or unicode, as tuples or lists, or as dicts in any order.
+
+        Args:
+            parts (tuple): The things that identify an entry.
+        Returns:
+            str: A key suitable for any backend.
+        """
+        serialized = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=repr)
+        return 'bodhi.koji:%s' % hashlib.sha1(serialized).hexdigest()
+
+    def _generation(self, kind, value):
+        """
+        Return the current generation for the given tag or build.
+
+        Args:
+            kind (basestring): "tag" or "build".
+            value (object): The tag or build, as it was passed to Koji.
+        Returns:
+            float: The generation, or 0 if it was never invalidated.
+        """
+        generation = self.backend.get(self._key('generation', kind, value))
+        if generation is NO_VALUE:
+            return 0
+        return generation
+
+    def _record(self, method, hit):
+        """Count a hit or a miss for the given method."""
+        with self._stats_lock:
+            self._stats[method]['hits' if hit else 'misses'] += 1
+
+    def call(self, method, func, *args, **kwargs):
+        """
+        Return the result of func(*args, **kwargs), from the cache if possible.
+
+        Args:
+            method (basestring): The name of the Koji method func is bound to.
+            func (callable): The bound Koji method.
+            args (tuple): Positional arguments for func.
+            kwargs (dict): Keyword arguments for func.
+        Returns:
+            object: Whatever func returns.
+        """
+        if method in self.TAG_METHODS:
+            subject = args[0] if args else None
+            generation = self._generation(self.TAG_METHODS[method], subject)
+            key = self._key(method, args, sorted(kwargs.items()), generation)
+        else:
+            key = self._key(method, args, sorted(kwargs.items()))
+
+        entry = self.backend.get(key)
+        if entry is not NO_VALUE:
+            expires, result = entry
+            if expires is None or expires > time.time():
+                self._record(method, True)
+                return result
+
+        self._record(method, False)
+        result = func(*args, **kwargs)
+
+        if method in self.TAG_METHODS:
+            self.backend.set(key, (time.time() + self.tag_ttl, result))
+        elif self.IMMUTABLE_METHODS[method](result):
+            self.backend.set(key, (None, result))
+        return result
+
+    def invalidate(self, tags=(), builds=()):
+        """
+        Invalidate the tag-dependent entries about the given tags and builds.
+
+        Args:
+            tags (iterable): Tag names (or ids) whose entries should be dropped.
+            builds (iterable): Build NVRs (or ids) whose entries should be dropped.
+        """
+        generation = time.time()
+        for kind, values in (('tag', tags), ('build', builds)):
+            for value in values:
+                self.backend.set(self._key('generation', kind, value), generation)
+
+    def clear(self):
+        """Drop every entry from the cache."""
+        self.backend.clear()
+
+    def stats(self):
+        """
+        Return the hit and miss counters of this process.
+
+        Returns:
+            dict: Maps each method name to a dictionary with "hits", "misses" and "hit_rate" keys.
+        """
+        with self._stats_lock:
+            stats = dict((method, dict(counts)) for method, counts in self._stats.items())
+        for counts in stats.values():
+            total = counts['hits'] + counts['misses']
+            counts['hit_rate'] = float(counts['hits']) / total if total else 0.0
+        return stats
+
+
+class CachedSession(object):
+    """
+    Wrap a Koji session so that its calls go through a KojiCache.
+
+    Any attribute that isn't a cached or tagging call is passed through to the wrapped session,
+    including multicall handling. While multicall is enabled, calls are never answered from the
+    cache since Koji returns their results later, from multiCall().
+    """
+
+    def __init__(self, session, cache):
+        """
+        Initialize the wrapper.
+
+        Args:
+            session (koji.ClientSession or Buildsystem): The session to wrap.
+            cache (KojiCache): The cache to use.
+        """
+        self.__dict__['_session'] = session
+        self.__dict__['_cache'] = cache
+        self.__dict__['_pending_invalidations'] = []
+
+    def __getattr__(self, name):
+        """
+        Return the named attribute of the wrapped session, routing Koji calls through the cache.
+
+        Args:
+            name (basestring): The name of the attribute.
+        Returns:
+            object: The attribute.
+        """
+        attr = getattr(self._session, name)
+        cache = self._cache
+
+        if name in KojiCache.IMMUTABLE_METHODS or name in KojiCache.TAG_METHODS:
+            def cached(*args, **kwargs):
+                if getattr(self._session, 'multicall', False):
+                    return attr(*args, **kwargs)
+                return cache.call(name, attr, *args, **kwargs)
+            return cached
+
+        if name in KojiCache.TAG_ACTIONS:
+            tag_positions, build_position = KojiCache.TAG_ACTIONS[name]
+
+            def tagging(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                tags = [args[i] for i in tag_positions if i < len(args)]
+                builds = [args[build_position]] if build_position < len(args) else []
+                if getattr(self._session, 'multicall', False):
+                    self._pending_invalidations.append((tags, builds))
+                else:
+                    cache.invalidate(tags, builds)
+                return result
+            return tagging
+
+        if name == 'multiCall':
+            def multiCall(*args, **kwargs):
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    for tags, builds in self._pending_invalidations:
+                        cache.invalidate(tags, builds)
+                    del self._pending_invalidations[:]
+            return multiCall
+
+        return attr
+
+    def __setattr__(self, name, value):
+        """Set attributes (such as multicall) on the wrapped session."""
+        setattr(self._session, name, value)
+
+
+def make_koji_cache(settings):
+    """
+    Create a KojiCache as described by the given settings.
+
+    Args:
+        settings (dict): The Bodhi settings. koji_cache.backend selects the backend. "memory" (the
+            default) keeps up to koji_cache.max_size entries in each process, "dogpile" uses the
+            dogpile.cache region configured by the koji_cache.dogpile.* settings, and "none"
+            disables the cache.
+    Returns:
+        KojiCache or None: The cache, or None if caching is disabled.
+    """
+    backend = settings.get('koji_cache.backend', 'memory')
+    if backend == 'none':
+        return None
+    elif backend == 'memory':
+        backend = MemoryCacheBackend(int(settings.get('koji_cache.max_size', 10000)))
+    elif backend == 'dogpile':
+        region = make_region()
+        region.configure_from_config(settings, 'koji_cache.dogpile.')
+        backend = DogpileCacheBackend(region)
+    else:
+        raise ValueError('Koji cache backend %s not known' % backend)
+    return KojiCache(backend, int(settings.get('koji_cache.tag_ttl', 300)))
+
+
+def get_koji_cache():
+    """
+    Return the process-wide KojiCache.
+
+    Returns:
+        KojiCache or None: The cache, or None if caching is not in use.
+    """
+    return _koji_cache
+
+
+def invalidate_cache(tags=(), builds=()):
+    """
+    Invalidate the cached Koji results about the given tags and builds, if caching is in use.
+
+    Args:
+        tags (iterable): Tag names (or ids) whose entries should be dropped.
+        builds (iterable): Build NVRs (or ids) whose entries should be dropped.
+    """
+    if _koji_cache is not None:
+        _koji_cache.invalidate(tags, builds)
+
+
+class RetryPolicy(object):
+    """
+    Decide how often, and after how long, failed Koji calls are retried.
+
+    Delays grow exponentially from base_delay up to max_delay, with "full jitter": each delay is
+    drawn uniformly between zero and its exponential bound, so that many workers retrying at once
+    don't hammer a recovering hub in lockstep. No retry is attempted once the deadline, counted
+    from the first attempt, would be exceeded.
+    """
+
+    def __init__(self, tries=4, base_delay=0.5, max_delay=8.0, deadline=30.0, random=random.random):
+        """
+        Initialize the policy.
+
+        Args:
+            tries (int): The maximum number of attempts, including the first one.
+            base_delay (float): The bound of the first delay, in seconds.
+            max_delay (float): The largest bound of any delay, in seconds.
+            deadline (float): The maximum number of seconds spent on a call, retries included.
+            random (callable): A function returning a float in [0, 1), used for the jitter.
+        """
+        self.tries = tries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._random = random
+
+    def delay(self, attempt):
+        """
+        Return how long to sleep after the given failed attempt.
+
+        Args:
+            attempt (int): The number of the attempt that failed, starting at 1.
+        Returns:
+            float: The number of seconds to sleep before the next attempt.
+        """
+        return self._random() * min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+
+
+class CircuitBreaker(object):
+    """
+    Stop calling Koji for a while after too many consecutive failures.
+
+    The breaker starts "closed", letting calls through. After threshold consecutive transport
+    failures it "opens", and calls fail immediately with a KojiUnavailable error for reset_timeout
+    seconds. It is then "half-open": the next call is let through, and closes the breaker if it
+    succeeds or opens it again if it fails.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold=5, reset_timeout=60.0):
+        """
+        Initialize the breaker.
+
+        Args:
+            threshold (int): How many consecutive failures open the breaker.
+            reset_timeout (float): How many seconds the breaker stays open.
+        """
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = Lock()
+
+    @property
+    def state(self):
+        """
+        Return the current state of the breaker.
+
+        Returns:
+            basestring: One of CLOSED, OPEN or HALF_OPEN.
+        """
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.time() - self._opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def check(self):
+        """
+        Raise if the breaker is open.
+
+        Raises:
+            KojiUnavailable: If calls to Koji are currently refused.
+        """
+        with self._lock:
+            if self._state() == self.OPEN:
+                raise KojiUnavailable(
+                    'Koji is unavailable (%d consecutive calls failed). Please try again in %d '
+                    'seconds.' % (self._failures,
+                                  self.reset_timeout - (time.time() - self._opened_at)))
+
+    def record_success(self):
+        """Close the breaker."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        """Count a failure, opening the breaker if there were too many."""
+        with self._lock:
+            self._failures += 1
+            state = self._state()
+            if state == self.HALF_OPEN or (state == self.CLOSED and
+                                           self._failures >= self.threshold):
+                log.error('Koji circuit breaker opened after %d consecutive failures',
+                          self._failures)
+                self._opened_at = time.time()
+
+
+class CallStats(object):
+    """Count the calls made to Koji, their errors, retries and latency, per method."""
+
+    def __init__(self):
+        """Initialize the counters."""
+        self._lock = Lock()
+        self._stats = collections.defaultdict(
+            lambda: {'calls': 0, 'errors': 0, 'retries': 0, 'total_time': 0.0, 'max_time': 0.0})
+
+    def record(self, method, elapsed, error=False, retry=False):
+        """
+        Record one attempt of a call.
+
+        Args:
+            method (basestring): The name of the Koji method.
+            elapsed (float): How many seconds the attempt took.
+            error (bool): Whether the attempt failed.
+            retry (bool): Whether the attempt was a retry of a failed one.
+        """
+        with self._lock:
+            counts = self._stats[method]
+            counts['calls'] += 1
+            counts['errors'] += int(error)
+            counts['retries'] += int(retry)
+            counts['total_time'] += elapsed
+            counts['max_time'] = max(counts['max_time'], elapsed)
+
+    def snapshot(self):
+        """
+        Return a copy of the counters.
+
+        Returns:
+            dict: Maps each method name to a dictionary with "calls", "errors", "retries",
+                "total_time", "max_time" and "mean_time" keys. Times are in seconds.
+        """
+        with self._lock:
+            stats = dict((method, dict(counts)) for method, counts in self._stats.items())
+        for counts in stats.values():
+            counts['mean_time'] = counts['total_time'] / counts['calls']
+        return stats
+
+
+class ResilientSession(object):
+    """
+    Wrap a Koji session to retry failed calls, trip a circuit breaker and record call stats.
+
+    Only transport errors (see RETRIABLE_ERRORS) are retried or counted against the breaker; faults
+    raised by the hub mean it is up and are raised right away. Calls that change Koji's state are
+    never retried, since a call that timed out may have been applied. A multicall is retried only if
+    every call it queued is a read, in which case the queued calls are replayed.
+
+    koji.ClientSession also retries failed calls itself, for up to several minutes. Its call numbers
+    make that safe for the calls that change Koji's state, so those keep its retries, but they are
+    turned off while the wrapper retries reads, which would otherwise outlast the policy's deadline.
+    """
+    # Koji methods starting with these prefixes don't change anything and are safe to retry.
+    SAFE_PREFIXES = ('get', 'list', 'query', 'check', 'has', 'search', 'taskFinished')
+    RETRIABLE_ERRORS = (IOError, xmlrpclib.ProtocolError, koji.RetryError, koji.ServerOffline)
+    # The koji.ClientSession options that turn off its own retries.
+    NO_KOJI_RETRIES = {'max_retries': 0, 'offline_retry': False, 'anon_retry': False}
+
+    def __init__(self, session, policy, breaker, stats):
+        """
+        Initialize the wrapper.
+
+        Args:
+            session (koji.ClientSession or Buildsystem): The session to wrap.
+            policy (RetryPolicy): How to retry failed calls.
+            breaker (CircuitBreaker): The breaker shared by the sessions of this process.
+            stats (CallStats): The counters shared by the sessions of this process.
+        """
+        self.__dict__['_session'] = session
+        self.__dict__['_policy'] = policy
+        self.__dict__['_breaker'] = breaker
+        self.__dict__['_stats'] = stats
+        self.__dict__['_queued'] = []
+
+    def __getattr__(self, name):
+        """
+        Return the named attribute of the wrapped session, wrapping Koji calls.
+
+        Args:
+            name (basestring): The name of the attribute.
+        Returns:
+            object: The attribute.
+        """
+        attr = getattr(self._session, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        if name == 'multiCall':
+            def multiCall(*args, **kwargs):
+                queued = self._queued[:]
+                del self._queued[:]
+                safe = all(self._is_safe(method) for method, a, kw in queued)
+
+                def replay():
+                    self._session.multicall = True
+                    for method, a, kw in queued:
+                        getattr(self._session, method)(*a, **kw)
+                    return getattr(self._session, 'multiCall')(*args, **kwargs)
+
+                return self._call(name, attr, args, kwargs, safe, replay)
+            return multiCall
+
+        def call(*args, **kwargs):
+            if getattr(self._session, 'multicall', False):
+                self._queued.append((name, args, kwargs))
+                return attr(*args, **kwargs)
+            return self._call(name, attr, args, kwargs, self._is_safe(name))
+        return call
+
+    def __setattr__(self, name, value):
+        """Set attributes (such as multicall) on the wrapped session."""
+        if name == 'multicall':
+            del self._queued[:]
+        setattr(self._session, name, value)
+
+    def _is_safe(self, method):
+        return method.startswith(self.SAFE_PREFIXES)
+
+    def _attempt(self, retriable, func, *args, **kwargs):
+        """
+        Make a single attempt at a call, without koji's own retries if the wrapper retries it.
+
+        Args:
+            retriable (bool): Whether the wrapper may retry the call.
+            func (callable): The function making the call.
+            args (tuple): The positional arguments of func.
+            kwargs (dict): The keyword arguments of func.
+        Returns:
+            object: What func returned.
+        """
+        opts = getattr(self._session, 'opts', None)
+        if not retriable or not isinstance(opts, dict):
+            return func(*args, **kwargs)
+
+        saved = dict((key, opts[key]) for key in self.NO_KOJI_RETRIES if key in opts)
+        opts.update(self.NO_KOJI_RETRIES)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            for key in self.NO_KOJI_RETRIES:
+                opts.pop(key, None)
+            opts.update(saved)
+
+    def _call(self, name, func, args, kwargs, retriable, retry_func=None):
+        """
+        Call func, retrying transport errors as the policy allows if retriable is True.
+
+        Args:
+            name (basestring): The name of the Koji method, for stats and logs.
+            func (callable): The first attempt.
+            args (tuple): The positional arguments of the first attempt.
+            kwargs (dict): The keyword arguments of the first attempt.
+            retriable (bool): Whether the call may be retried.
+            retry_func (callable or None): A function taking no arguments to call for retries,
+                instead of calling func again.
+        Returns:
+            object: What the call returned.
+        Raises:
+            KojiUnavailable: If the circuit breaker is open.
+            Exception: The last error, if the call failed for good.
+        """
+        start = time.time()
+        attempt = 0
+        while True:
+            self._breaker.check()
+            attempt += 1
+            attempt_start = time.time()
+            try:
+                if attempt > 1 and retry_func is not None:
+                    result = self._attempt(retriable, retry_func)
+                else:
+                    result = self._attempt(retriable, func, *args, **kwargs)
+            except self.RETRIABLE_ERRORS as e:
+                self._stats.record(name, time.time() - attempt_start, error=True,
+                                   retry=attempt > 1)
+                self._breaker.record_failure()
+                delay = self._policy.delay(attempt)
+                if (not retriable or attempt >= self._policy.tries or
+                        time.time() + delay - start > self._policy.deadline):
+                    log.warning('Koji call %s failed for good after %d attempt(s): %r',
+                                name, attempt, e)
+                    raise
+                log.warning('Koji call %s failed (attempt %d), retrying in %.2f seconds: %r',
+                            name, attempt, delay, e)
+                time.sleep(delay)
+            except Exception:
+                # The hub answered, with a fault.
+                self._stats.record(name, time.time() - attempt_start, error=True,
+                                   retry=attempt > 1)
+                self._breaker.record_success()
+                raise
+            else:
+                self._stats.record(name, time.time() - attempt_start, retry=attempt > 1)
+                self._breaker.record_success()
+                return result
+
+
+def make_resilient_session_factory(settings):
+    """
+    Return a function wrapping sessions in a ResilientSession configured by the given settings.
+
+    The breaker and stats are shared by every session of this process.
+
+    Args:
+        settings (dict): The Bodhi settings. The koji_retry.* settings configure the RetryPolicy,
+            and the koji_breaker.* settings the CircuitBreaker.
+    Returns:
+        callable: A function taking a session and returning it wrapped.
+    """
+    global _koji_breaker, _koji_call_stats
+    policy = RetryPolicy(
+        tries=int(settings.get('koji_retry.tries', 4)),
+        base_delay=float(settings.get('koji_retry.base_delay', 0.5)),
+        max_delay=float(settings.get('koji_retry.max_delay', 8.0)),
+        deadline=float(settings.get('koji_retry.deadline', 30.0)))
+    _koji_breaker = CircuitBreaker(
+        threshold=int(settings.get('koji_breaker.threshold', 5)),
+        reset_timeout=float(settings.get('koji_breaker.reset_timeout', 60.0)))
+    _koji_call_stats = CallStats()
+
+    def wrap(session):
+        return ResilientSession(session, policy, _koji_breaker, _koji_call_stats)
+    return wrap
+
+
+def get_call_stats():
+    """
+    Return the per-method latency and error counters of the Koji calls made by this process.
+
+    Returns:
+        dict: See CallStats.snapshot(). The dictionary is empty if the stats are not collected.
+    """
+    if _koji_call_stats is None:
+        return {}
+    return _koji_call_stats.snapshot()
+
+
+class MulticallFuture(object):
+    """
+    The eventual result of a Koji call queued in a MulticallBatch.
+
+    Asking a future for its result sends the batch's pending calls to Koji if that hasn't
+    happened yet.
+    """
+
+    def __init__(self, batch, method):
+        """
+        Initialize the future.
+
+        Args:
+            batch (MulticallBatch): The batch that will send the call.
+            method (basestring): The name of the Koji method that was called.
+        """
+        self.method = method
+        self._batch = batch
+        self._done = False
+        self._result = None
+        self._exception = None
+
+    def done(self):
+        """
+        Return whether the call has been sent to Koji.
+
+        Returns:
+            bool: True if the result (or exception) of the call is known.
+        """
+        return self._done
+
+    def exception(self):
+        """
+        Return the exception Koji raised for this call, sending the batch if needed.
+
+        Returns:
+            Exception or None: The exception, or None if the call succeeded.
+        """
+        if not self._done:
+            self._batch.flush()
+        return self._exception
+
+    def result(self):
+        """
+        Return the result of this call, sending the batch if needed.
+
+        Returns:
+            object: Whatever the Koji method returned.
+        Raises:
+            Exception: The exception Koji raised for this call, if any.
+        """
+        if self.exception() is not None:
+            raise self._exception
+        return self._result
+
+    def _set_result(self, result):
+        self._result = result
+        self._done = True
+
+    def _set_exception(self, exception):
+        self._exception = exception
+        self._done = True
+
+
+class MulticallBatch(object):
+    """
+    Queue Koji calls and send them in multicalls, returning a MulticallFuture for each one.
+
+    Any Koji method can be called on the batch, and is queued instead of being sent::
+
+        batch = MulticallBatch(koji)
+        builds = [batch.getBuild(nvr) for nvr in nvrs]
+        for build in builds:
+            print(build.result()['completion_ts'])
+
+    Queued calls are sent when flush() is called, when the batch is used as a context manager and
+    the block exits, when flush_threshold calls are pending, or when the result of one of the
+    futures is needed. They are sent in multicalls of at most chunk_size calls each. A fault in one
+    call is raised by that call's future only.
+    """
+
+    def __init__(self, session=None, chunk_size=100, flush_threshold=None):
+        """
+        Initialize the batch.
+
+        Args:
+            session (koji.ClientSession or Buildsystem or None): The session to send calls with.
+                Defaults to a new session from get_session().
+            chunk_size (int): The maximum number of calls sent in a single multicall.
+            flush_threshold (int or None): If given, pending calls are sent as soon as this many
+                are queued.
+        """
+        self.session = session if session is not None else get_session()
+        self.chunk_size = chunk_size
+        self.flush_threshold = flush_threshold
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def __getattr__(self, name):
+        """
+        Return a function that queues a call to the named Koji method.
+
+        Args:
+            name (basestring): The name of the Koji method.
+        Returns:
+            callable: A function that takes the method's arguments and returns a MulticallFuture.
+        """
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def enqueue(*args, **kwargs):
+            future = MulticallFuture(self, name)
+            self._pending.append((future, args, kwargs))
+            if self.flush_threshold and len(self._pending) >= self.flush_threshold:
+                self.flush()
+            return future
+        return enqueue
+
+    def __len__(self):
+        """Return the number of calls that are queued but not sent yet."""
+        return len(self._pending)
+
+    def __nonzero__(self):
+        """Return True, as a batch can be passed where a session is expected, even if empty."""
+        return True
+
+    def flush(self):
+        """
+        Send every pending call to Koji, in chunks of at most chunk_size calls.
+
+        Returns:
+            list: The MulticallFutures of the calls that were sent, in the order they were queued.
+        Raises:
+            Exception: If sending a multicall fails as a whole. The exception is also set on the
+                futures of the calls that could not be sent.
+        """
+        sent = [future for future, args, kwargs in self._pending]
+        while self._pending:
+            chunk = self._pending[:self.chunk_size]
+            del self._pending[:self.chunk_size]
+            try:
+                self._send(chunk)
+            except Exception as e:
+                for future, args, kwargs in chunk + self._pending:
+                    if not future.done():
+                        future._set_exception(e)
+                del self._pending[:]
+                raise
+        return sent
+
+    def _send(self, chunk):
+        """
+        Send the given calls in a single multicall and resolve their futures.
+
+        Args:
+            chunk (list): A list of (future, args, kwargs) tuples.
+        """
+        self.session.multicall = True
+        try:
+            for future, args, kwargs in chunk:
+                getattr(self.session, future.method)(*args, **kwargs)
+        except Exception:
+            self.session.multicall = False
+            raise
+        results = self.session.multiCall() or []
+
+        for i, (future, args, kwargs) in enumerate(chunk):
+            if i >= len(results):
+                future._set_exception(koji.GenericError(
+                    'Koji returned no result for %s%r' % (future.method, args)))
+            elif isinstance(results[i], dict):
+                future._set_exception(self._fault(results[i]))
+            else:
+                future._set_result(results[i][0])
+
+    @staticmethod
+    def _fault(fault):
+        """
+        Convert a fault returned in a multicall into the exception Koji would have raised.
+
+        Args:
+            fault (dict): The fault, usually with faultCode and faultString keys.
+        Returns:
+            Exception: The corresponding exception.
+        """
+        if 'faultCode' in fault:
+            return koji.convertFault(
+                xmlrpclib.Fault(fault['faultCode'], fault.get('faultString', '')))
+        return koji.GenericError(repr(fault))
+
+
 def koji_login(config):
     """ Login to Koji and return the session """
 
@@ -417,41 +1359,69 @@ def get_session():
 
 
 def teardown_buildsystem():
-    global _buildsystem
+    global _buildsystem, _koji_cache, _koji_breaker, _koji_call_stats, _task_timeout
     _buildsystem = None
+    _koji_cache = None
+    _koji_breaker = None
+    _koji_call_stats = None
+    _task_timeout = None
     DevBuildsys.clear()
 
 
 def setup_buildsystem(settings):
-    global _buildsystem, _koji_hub, _buildsystem_login_lock
+    global _buildsystem, _koji_hub, _buildsystem_login_lock, _koji_cache, _task_timeout
     if _buildsystem:
         return
 
     _buildsystem_login_lock = Lock()
     _koji_hub = settings.get('koji_hub')
+    _task_timeout = settings.get('koji_task_timeout')
     buildsys = settings.get('buildsystem')
 
     if buildsys == 'koji':
         log.debug('Using Koji Buildsystem')
 
+        _koji_cache = make_koji_cache(settings)
+        make_resilient = make_resilient_session_factory(settings)
+
         def get_koji_login():
-            """Call koji_login with settings and return the result."""
-            return koji_login(config=settings)
+            """Call koji_login with settings and return the result, wrapped in the cache."""
+            session = make_resilient(koji_login(config=settings))
+            if _koji_cache is not None:
+                session = CachedSession(session, _koji_cache)
+            return session
 
         _buildsystem = get_koji_login
     elif buildsys in ('dev', 'dummy', None):
         log.debug('Using DevBuildsys')
         _buildsystem = DevBuildsys
+    elif buildsys == 'simulator':
+        log.debug('Using the Koji simulator')
+        from bodhi.server.kojisim import make_simulator
+        _buildsystem = make_simulator(settings)
     else:
         raise ValueError('Buildsys %s not known' % buildsys)
 
 
-def wait_for_tasks(tasks, session=None, sleep=300):
+def wait_for_tasks(tasks, session=None, sleep=300, timeout=None):
     """
-    Wait for a list of koji tasks to complete.  Return the first task number
-    to fail, otherwise zero.
+    Wait for a list of koji tasks to complete.  Return the tasks that failed.
+
+    Args:
+        tasks (list): The ids of the tasks to wait for. Falsy ids are skipped.
+        session (koji.ClientSession or None): The session to use. Defaults to a new session from
+            get_session().
+        sleep (float): How many seconds to sleep between checks.
+        timeout (float or None): How many seconds to wait for all the tasks to finish. Tasks that
+            haven't finished by then are considered failed. Defaults to the koji_task_timeout
+            setting, or to waiting forever if it is not set.
+    Returns:
+        list: The ids of the tasks that failed or didn't finish in time.
     """
     log.debug("Waiting for %d tasks to complete: %s" % (len(tasks), tasks))
+    if timeout is None:
+        timeout = _task_timeout
+    deadline = time.time() + timeout if timeout is not None else None
     failed_tasks = []
     if not session:
         session = get_session()
@@ -460,10 +1430,17 @@ def wait_for_tasks(tasks, session=None, sleep=300):
             log.debug("Skipping task: %s" % task)
             continue
         while not session.taskFinished(task):
+            if deadline is not None and time.time() + sleep > deadline:
+                break
             time.sleep(sleep)
-        task_info = session.getTaskInfo(task)
-        if task_info['state'] != koji.TASK_STATES['CLOSED']:
+        else:
+            task_info = session.getTaskInfo(task)
+            if task_info['state'] == koji.TASK_STATES['CLOSED']:
+                continue
             log.error("Koji task %d failed" % task)
             failed_tasks.append(task)
+            continue
+        log.error("Koji task %d did not finish within %d seconds" % (task, timeout))
+        failed_tasks.append(task)
     log.debug("Tasks completed successfully!")
     return failed_tasks
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Process-wide cache regions.
+
+A single dogpile.cache region is configured from the ``dogpile.cache.*`` settings and shared by
+the whole process. It is divided into named regions (see :data:`REGIONS`), each with its own
+expiration time, that can be invalidated independently. Invalidation bumps a generation number
+stored in the backend, so it is seen by every process sharing the backend (with memcached or dbm
+for example).
+
+Models declare which regions their changes invalidate with a ``__cache_regions__`` class attribute.
+Regions that only depend on some of their attributes are declared with a
+``__cache_attribute_regions__`` class attribute instead, mapping region names to those attributes.
+Those regions are invalidated when a database transaction changing such objects is committed.
+"""
+from functools import wraps
+from threading import Lock
+import collections
+import itertools
+import logging
+
+from dogpile.cache import make_region
+from dogpile.cache.api import NO_VALUE
+from dogpile.cache.util import function_key_generator
+from sqlalchemy import event, inspect
+
+from bodhi.server import Session
+from bodhi.server.config import config
+
+
+log = logging.getLogger(__name__)
+
+#: The names of the cache regions, and what they hold.
+REGIONS = collections.OrderedDict([
+    ('default', 'Anything that has no region of its own, such as avatar URLs.'),
+    ('home', 'The data shown on the front page.'),
+    ('candidates', 'The latest builds of packages in Koji, by tag.'),
+    ('releases', 'Data derived from the releases.'),
+    ('critpath', 'The critical path components of each collection.'),
+    ('stats', 'Counts of updates by release, status and type.'),
+    ('activity', 'The top testers, counted from the activity of users.'),
+    ('fragments', 'Parts of the update pages, by version of the update.'),
+])
+
+_regions = {}
+_regions_lock = Lock()
+
+
+class CacheRegion(object):
+    """
+    A named part of the process-wide dogpile.cache region, with its own expiration time.
+
+    Attributes:
+        name (basestring): The name of the region.
+        region (dogpile.cache.region.CacheRegion): The shared region entries are stored in.
+        expiration_time (int): How many seconds entries stay valid.
+    """
+
+    def __init__(self, name, region, expiration_time):
+        """
+        Initialize the region.
+
+        Args:
+            name (basestring): The name of the region, used to namespace its keys.
+            region (dogpile.cache.region.CacheRegion): The shared region to store entries in.
+            expiration_time (int): How many seconds entries stay valid.
+        """
+        self.name = name
+        self.region = region
+        self.expiration_time = expiration_time
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self._stats_lock = Lock()
+
+    @property
+    def _generation_key(self):
+        return 'bodhi.cache:%s:generation' % self.name
+
+    def _generation(self):
+        """Return the current generation of the region, shared with other processes."""
+        generation = self.region.get(self._generation_key, ignore_expiration=True)
+        return 0 if generation is NO_VALUE else generation
+
+    def _key(self, key, generation):
+        return '%s:%d:%s' % (self.name, generation, key)
+
+    def _count(self, hits, misses):
+        with self._stats_lock:
+            self._stats['hits'] += hits
+            self._stats['misses'] += misses
+
+    def get_or_create(self, key, creator):
+        """
+        Return the cached value of key, calling creator() to compute it if needed.
+
+        Args:
+            key (basestring): The key of the value, within this region.
+            creator (callable): A function taking no arguments that computes the value.
+        Returns:
+            object: The value.
+        """
+        created = []
+
+        def create():
+            created.append(True)
+            return creator()
+
+        value = self.region.get_or_create(self._key(key, self._generation()), create,
+                                          expiration_time=self.expiration_time)
+        self._count(int(not created), int(bool(created)))
+        return value
+
+    def get_or_create_multi(self, keys, creator):
+        """
+        Return the cached values of the given keys, computing the missing ones with one call.
+
+        Args:
+            keys (list): The keys of the values, within this region.
+            creator (callable): A function taking the missing keys as positional arguments and
+                returning a list of their values, in the same order.
+        Returns:
+            list: The values, in the same order as keys.
+        """
+        generation = self._generation()
+        mangled = [self._key(key, generation) for key in keys]
+        created = []
+
+        def create(*missing):
+            created.extend(missing)
+            return creator(*[keys[mangled.index(key)] for key in missing])
+
+        values = self.region.get_or_create_multi(mangled, create,
+                                                 expiration_time=self.expiration_time)
+        self._count(len(keys) - len(created), len(created))
+        return values
+
+    def cache_on_arguments(self, namespace=None):
+        """
+        Return a decorator caching the results of a function in this region, by arguments.
+
+        Args:
+            namespace (basestring or None): Distinguishes functions with the same name in the same
+                module.
+        Returns:
+            callable: The decorator.
+        """
+        def decorator(func):
+            generate_key = function_key_generator(namespace, func)
+
+            @wraps(func)
+            def decorated(*args):
+                return self.get_or_create(generate_key(*args), lambda: func(*args))
+            return decorated
+        return decorator
+
+    def invalidate(self):
+        """Make every entry of this region stale, in every process sharing the backend."""
+        self.region.set(self._generation_key, self._generation() + 1)
+        with self._stats_lock:
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        """
+        Return the hit, miss and invalidation counters of this region in this process.
+
+        Returns:
+            dict: A dictionary with "hits", "misses", "invalidations" and "hit_rate" keys.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = float(stats['hits']) / total if total else 0.0
+        return stats
+
+
+def configure(settings):
+    """
+    (Re)create the cache regions from the given settings.
+
+    Args:
+        settings (dict): The Bodhi settings. The shared region is configured with the
+            dogpile.cache.* settings, and the expiration time of each named region is
+            dogpile.cache.<name>.expiration_time, defaulting to dogpile.cache.expiration_time.
+    """
+    region = make_region()
+    region.configure_from_config(settings, 'dogpile.cache.')
+    default_expiration = int(settings.get('dogpile.cache.expiration_time') or 0)
+    regions = {}
+    for name in REGIONS:
+        expiration_time = settings.get('dogpile.cache.%s.expiration_time' % name)
+        if expiration_time is None:
+            expiration_time = default_expiration
+        regions[name] = CacheRegion(name, region, int(expiration_time))
+    with _regions_lock:
+        _regions.clear()
+        _regions.update(regions)
+
+
+def get_region(name='default'):
+    """
+    Return the named cache region, configuring the regions from Bodhi's config if needed.
+
+    Args:
+        name (basestring): One of the names in REGIONS.
+    Returns:
+        CacheRegion: The region.
+    Raises:
+        KeyError: If there is no region with that name.
+    """
+    if not _regions:
+        # dogpile.cache iterates over the settings, which does not load Bodhi's config, so copy it.
+        configure(config.copy())
+    return _regions[name]
+
+
+def cache_on_arguments(name, namespace=None):
+    """
+    Return a decorator caching the results of a function by arguments, in the named region.
+
+    Unlike CacheRegion.cache_on_arguments(), the region is only looked up when the function is
+    called, so this can decorate module level functions before Bodhi is configured.
+
+    Args:
+        name (basestring): The name of the region.
+        namespace (basestring or None): Distinguishes functions with the same name in the same
+            module.
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(func):
+        generate_key = function_key_generator(namespace, func)
+
+        @wraps(func)
+        def decorated(*args):
+            return get_region(name).get_or_create(generate_key(*args), lambda: func(*args))
+        return decorated
+    return decorator
+
+
+def invalidate(*names):
+    """
+    Invalidate the named cache regions, or all of them if no name is given.
+
+    Args:
+        names (list): The names of the regions to invalidate.
+    """
+    for name in names or REGIONS:
+        log.debug('Invalidating the %s cache region', name)
+        get_region(name).invalidate()
+
+
+def stats():
+    """
+    Return the counters of every cache region in this process.
+
+    Returns:
+        dict: Maps region names to the result of their CacheRegion.stats().
+    """
+    return dict((name, get_region(name).stats()) for name in REGIONS)
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_invalidations(session, flush_context):
+    """
+    Remember which cache regions the objects flushed by session invalidate.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that was flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+    """
+    regions = session.info.setdefault('cache_invalidations', set())
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        regions.update(getattr(obj, '__cache_regions__', ()))
+    for obj in itertools.chain(session.new, session.deleted):
+        regions.update(getattr(obj, '__cache_attribute_regions__', {}))
+    for obj in session.dirty:
+        for region, attributes in getattr(obj, '__cache_attribute_regions__', {}).items():
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in attributes):
+                regions.add(region)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_after_commit(session):
+    """
+    Invalidate the cache regions collected by collect_invalidations() once they are committed.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that was committed.
+    """
+    regions = session.info.pop('cache_invalidations', None)
+    if regions:
+        invalidate(*sorted(regions))
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_invalidations(session):
+    """
+    Forget the invalidations collected in a transaction that was rolled back.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that was rolled back.
+    """
+    session.info.pop('cache_invalidations', None)
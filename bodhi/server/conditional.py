@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Conditional GET support for the read-only web services.
+
+Before loading what they return, the services query a cheap version of it, such as the
+``version`` column of an update or the release registry version. :func:`check` derives an ETag
+from that version and answers with a 304 Not Modified response if the client already has it.
+
+HTML pages are left out: they embed per-session data, such as CSRF tokens and captchas, that
+would go stale in a cached copy.
+"""
+import hashlib
+
+from pyramid.httpexceptions import HTTPNotModified
+
+from bodhi.server.config import config
+
+
+#: The headers a 304 response repeats from the response it stands for.
+NOT_MODIFIED_HEADERS = ('Cache-Control', 'ETag', 'Vary')
+
+
+def wants_html(request):
+    """
+    Return whether the request asks for an HTML page rather than JSON or a feed.
+
+    Args:
+        request (pyramid.request): The current request.
+    Returns:
+        bool: True if text/html is the preferred media type of the request.
+    """
+    return request.accept.best_match(('application/json', 'text/html')) == 'text/html'
+
+
+def etag(request, version):
+    """
+    Return the ETag of a version of what a request asks for.
+
+    Besides the version, the response depends on the Accept header, which selects how it is
+    rendered, and on the user, since it may say whether they can edit what they see.
+
+    Args:
+        request (pyramid.request): The current request.
+        version (object): Anything whose repr() changes when the response would change.
+    Returns:
+        basestring: The ETag, without quotes.
+    """
+    parts = (request.headers.get('Accept', ''), request.unauthenticated_userid, version)
+    return hashlib.sha1(repr(parts)).hexdigest()
+
+
+def check(request, version):
+    """
+    Set the ETag and caching headers of the response, unless the client already has this version.
+
+    Args:
+        request (pyramid.request): The current request.
+        version (object): Anything whose repr() changes when the response would change.
+    Raises:
+        pyramid.httpexceptions.HTTPNotModified: If the request has a matching If-None-Match header.
+    """
+    response = request.response
+    response.etag = etag(request, version)
+    # Responses that depend on the user must not be shared with other users by front-end caches.
+    visibility = 'private' if request.unauthenticated_userid else 'public'
+    response.headers['Cache-Control'] = '%s, max-age=%d' % (
+        visibility, config.get('http_cache.max_age'))
+    response.vary = ('Accept', 'Cookie')
+
+    if response.etag in request.if_none_match:
+        raise HTTPNotModified(headers=[(name, value) for name, value in response.headerlist
+                                       if name in NOT_MODIFIED_HEADERS])
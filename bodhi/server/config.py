@@ -359,9 +359,21 @@ class BodhiConfig(dict):
         'dogpile.cache.backend': {
             'value': 'dogpile.cache.dbm',
             'validator': unicode},
+        'dogpile.cache.candidates.expiration_time': {
+            'value': None,
+            'validator': _validate_none_or(int)},
+        'dogpile.cache.critpath.expiration_time': {
+            'value': None,
+            'validator': _validate_none_or(int)},
         'dogpile.cache.expiration_time': {
             'value': '100',
             'validator': unicode},
+        'dogpile.cache.home.expiration_time': {
+            'value': None,
+            'validator': _validate_none_or(int)},
+        'dogpile.cache.releases.expiration_time': {
+            'value': None,
+            'validator': _validate_none_or(int)},
         'exclude_mail': {
             'value': ['autoqa', 'taskotron'],
             'validator': _generate_list_validator()},
@@ -380,6 +392,9 @@ class BodhiConfig(dict):
         'fmn_url': {
             'value': 'https://apps.fedoraproject.org/notifications/',
             'validator': unicode},
+        'http_cache.max_age': {
+            'value': 0,
+            'validator': int},
         'important_groups': {
             'value': ['proventesters', 'provenpackager,' 'releng', 'security_respons', 'packager',
                       'bodhiadmin'],
@@ -393,6 +408,60 @@ class BodhiConfig(dict):
         'koji_hub': {
             'value': 'https://koji.stg.fedoraproject.org/kojihub',
             'validator': str},
+        'koji_breaker.reset_timeout': {
+            'value': 60.0,
+            'validator': float},
+        'koji_breaker.threshold': {
+            'value': 5,
+            'validator': int},
+        'koji_cache.backend': {
+            'value': 'memory',
+            'validator': unicode},
+        'koji_cache.max_size': {
+            'value': 10000,
+            'validator': int},
+        'koji_cache.tag_ttl': {
+            'value': 300,
+            'validator': int},
+        'koji_retry.base_delay': {
+            'value': 0.5,
+            'validator': float},
+        'koji_retry.deadline': {
+            'value': 30.0,
+            'validator': float},
+        'koji_retry.max_delay': {
+            'value': 8.0,
+            'validator': float},
+        'koji_retry.tries': {
+            'value': 4,
+            'validator': int},
+        'koji_simulator.builds_per_package': {
+            'value': 3,
+            'validator': int},
+        'koji_simulator.dump': {
+            'value': None,
+            'validator': _validate_none_or(_validate_path)},
+        'koji_simulator.failure_rate': {
+            'value': 0.0,
+            'validator': float},
+        'koji_simulator.latency': {
+            'value': 0.0,
+            'validator': float},
+        'koji_simulator.packages': {
+            'value': 100,
+            'validator': int},
+        'koji_simulator.tags': {
+            'value': [],
+            'validator': _generate_list_validator()},
+        'koji_simulator.task_duration': {
+            'value': 0.0,
+            'validator': float},
+        'koji_simulator.task_failure_rate': {
+            'value': 0.0,
+            'validator': float},
+        'koji_task_timeout': {
+            'value': 14400,
+            'validator': _validate_none_or(int)},
         'krb_ccache': {
             'value': None,
             'validator': _validate_none_or(str)},
@@ -414,6 +483,9 @@ class BodhiConfig(dict):
         'mandatory_packager_groups': {
             'value': ['packager'],
             'validator': _generate_list_validator()},
+        'markdown_cache.max_size': {
+            'value': 4096,
+            'validator': _validate_none_or(int)},
         'mash_dir': {
             'value': None,
             'validator': _validate_none_or(_validate_path)},
@@ -456,9 +528,21 @@ class BodhiConfig(dict):
         'openid_template': {
             'value': '{username}.id.fedoraproject.org',
             'validator': unicode},
+        'pagure_cache.max_size': {
+            'value': 1024,
+            'validator': _validate_none_or(int)},
+        'pagure_cache.ttl': {
+            'value': 300,
+            'validator': _validate_none_or(int)},
         'pagure_url': {
             'value': 'https://src.fedoraproject.org/pagure/',
             'validator': _validate_tls_url},
+        'pdc_cache.max_size': {
+            'value': 128,
+            'validator': _validate_none_or(int)},
+        'pdc_cache.ttl': {
+            'value': 3600,
+            'validator': _validate_none_or(int)},
         'pdc_url': {
             'value': 'https://pdc.fedoraproject.org/',
             'validator': _validate_tls_url},
@@ -489,6 +573,9 @@ class BodhiConfig(dict):
         'query_wiki_test_cases': {
             'value': False,
             'validator': _validate_bool},
+        'release_registry.check_interval': {
+            'value': 5.0,
+            'validator': float},
         'release_team_address': {
             'value': 'bodhiadmin-members@fedoraproject.org',
             'validator': unicode},
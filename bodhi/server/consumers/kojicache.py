@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+The "Koji cache handler".
+
+This module invalidates the cached results of tag-dependent Koji calls when Koji announces that a
+build was tagged or untagged. With the default in-process cache backend this keeps the masher's
+view of Koji fresh. When the cache is shared through a dogpile backend, every process sharing it
+benefits. The "candidates" cache region, which holds the latest builds shown by the web UI and API,
+is invalidated as well.
+"""
+
+import logging
+import pprint
+
+import fedmsg.consumers
+
+from bodhi.server import buildsys, cache
+from bodhi.server.config import config
+
+
+log = logging.getLogger('bodhi')
+
+
+class KojiCacheHandler(fedmsg.consumers.FedmsgConsumer):
+    """
+    The Bodhi Koji cache handler.
+
+    A fedmsg listener waiting for messages from koji about builds being tagged or untagged.
+    """
+
+    config_key = 'koji_cache_handler'
+
+    def __init__(self, hub, *args, **kwargs):
+        """
+        Initialize the KojiCacheHandler, configuring its topics and the buildsystem.
+
+        Args:
+            hub (moksha.hub.hub.CentralMokshaHub): The hub this handler is consuming messages from.
+                It is used to look up the hub config.
+        """
+        buildsys.setup_buildsystem(config)
+
+        prefix = hub.config.get('topic_prefix')
+        env = hub.config.get('environment')
+        self.topic = [
+            prefix + '.' + env + '.buildsys.tag',
+            prefix + '.' + env + '.buildsys.untag',
+        ]
+
+        super(KojiCacheHandler, self).__init__(hub, *args, **kwargs)
+        log.info('Bodhi Koji cache handler listening on:\n'
+                 '%s' % pprint.pformat(self.topic))
+
+    def consume(self, message):
+        """
+        Invalidate the cached Koji results about the tag and build in the given message.
+
+        The messages look like the ones described in
+        :meth:`bodhi.server.consumers.signed.SignedHandler.consume`.
+
+        Args:
+            message (dict): The incoming fedmsg.
+        """
+        msg = message['body']['msg']
+        build_nvr = '%(name)s-%(version)s-%(release)s' % msg
+
+        log.debug('Invalidating cached Koji results for %s and %s', msg['tag'], build_nvr)
+        tags = [t for t in (msg['tag'], msg.get('tag_id')) if t is not None]
+        builds = [b for b in (build_nvr, msg.get('build_id')) if b is not None]
+        buildsys.invalidate_cache(tags=tags, builds=builds)
+        cache.invalidate('candidates')
@@ -45,6 +45,7 @@ import jinja2
 from bodhi.server import bugs, log, buildsys, notifications, mail
 from bodhi.server.config import config
 from bodhi.server.exceptions import BodhiException
+from bodhi.server.facts import UpdateFacts
 from bodhi.server.metadata import UpdateInfoMetadata
 from bodhi.server.models import (Update, UpdateRequest, UpdateType, Release,
                                  UpdateStatus, ReleaseState, Base, ContentType)
@@ -228,7 +229,8 @@ class Masher(fedmsg.consumers.FedmsgConsumer):
         """
         work = {}
         for title in update_titles:
-            update = session.query(Update).filter_by(title=title).one()
+            update = session.query(Update).options(*Update.loader_options('masher')).filter_by(
+                title=title).one()
             if not update.request:
                 self.log.info('%s request was revoked', update.title)
                 continue
@@ -380,6 +382,7 @@ class MasherThread(threading.Thread):
         self.add_tags_sync = []
         self.move_tags_sync = []
         self.testing_digest = {}
+        self.facts = UpdateFacts()
         self.path = None
         self.state = {
             'updates': updates,
@@ -516,7 +519,8 @@ class MasherThread(threading.Thread):
         self.log.debug('Loading updates')
         updates = []
         for title in self.state['updates']:
-            update = self.db.query(Update).filter_by(title=title).one()
+            update = self.db.query(Update).options(*Update.loader_options('masher')).filter_by(
+                title=title).one()
             updates.append(update)
         if not updates:
             raise Exception('Unable to load updates: %r' %
@@ -664,6 +668,7 @@ class MasherThread(threading.Thread):
             # Let's clean up the pungi configs we wrote
             shutil.rmtree(self._pungi_conf_dir)
 
+        self.facts.log_stats(self.log)
         self.log.info('Thread(%s) finished.  Success: %r' % (self.id, success))
         notifications.publish(
             topic="mashtask.complete",
@@ -764,18 +769,18 @@ class MasherThread(threading.Thread):
     def remove_pending_tags(self):
         """Remove all pending tags from the updates."""
         self.log.debug("Removing pending tags from builds")
-        koji = buildsys.get_session()
-        koji.multicall = True
+        batch = buildsys.MulticallBatch()
         for update in self.updates:
             if update.request is UpdateRequest.stable:
                 update.remove_tag(update.release.pending_stable_tag,
-                                  koji=koji)
+                                  koji=batch)
             elif update.request is UpdateRequest.testing:
                 update.remove_tag(update.release.pending_testing_tag,
-                                  koji=koji)
-        result = koji.multiCall()
-        self.log.debug('remove_pending_tags koji.multiCall result = %r',
-                       result)
+                                  koji=batch)
+        for future in batch.flush():
+            if future.exception() is not None:
+                self.log.debug('remove_pending_tags: %s failed: %r', future.method,
+                               future.exception())
 
     def copy_additional_pungi_files(self, pungi_conf_dir, template_env):
         """
@@ -941,7 +946,7 @@ class MasherThread(threading.Thread):
         if prefix not in self.testing_digest:
             self.testing_digest[prefix] = {}
         for i, subbody in enumerate(mail.get_template(
-                update, use_template='maillist_template')):
+                update, use_template='maillist_template', facts=self.facts)):
             self.testing_digest[prefix][update.builds[i].nvr] = subbody[1]
 
     def generate_testing_digest(self):
@@ -962,7 +967,7 @@ class MasherThread(threading.Thread):
         """
         self.log.info('Generating updateinfo for %s' % self.release.name)
         uinfo = UpdateInfoMetadata(self.release, self.request,
-                                   self.db, self.mash_dir)
+                                   self.db, self.mash_dir, facts=self.facts)
         self.log.info('Updateinfo generation for %s complete' % self.release.name)
         return uinfo
 
@@ -1130,7 +1135,7 @@ class MasherThread(threading.Thread):
         self.log.info('Sending stable update announcements')
         for update in self.updates:
             if update.status is UpdateStatus.stable:
-                update.send_update_notice()
+                update.send_update_notice(facts=self.facts)
 
     @checkpoint
     def send_testing_digest(self):
@@ -1195,7 +1200,7 @@ class MasherThread(threading.Thread):
             iterable: An iterable of security Update objects from the given release.
         """
         release = self.db.query(Release).filter_by(long_name=release).one()
-        updates = self.db.query(Update).filter(
+        updates = self.db.query(Update).options(*Update.loader_options('masher')).filter(
             Update.type == UpdateType.security,
             Update.status == UpdateStatus.testing,
             Update.release == release,
@@ -1218,7 +1223,7 @@ class MasherThread(threading.Thread):
             list: The list of unapproved critical path updates for the given release.
         """
         release = self.db.query(Release).filter_by(long_name=release).one()
-        updates = self.db.query(Update).filter_by(
+        updates = self.db.query(Update).options(*Update.loader_options('masher')).filter_by(
             critpath=True,
             status=UpdateStatus.testing,
             request=None,
@@ -27,3 +27,8 @@ class RepodataException(Exception):
 
 class LockedUpdateException(Exception):
     pass
+
+
+class KojiUnavailable(BodhiException):
+    """Raised instead of calling Koji while it is considered to be down."""
+    status_code = 503
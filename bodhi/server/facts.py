@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Per-push memoization of the data needed to describe updates.
+
+During a push, the updateinfo generator, the testing digest and the stable announcements all need
+to know the same things about each update: the RPMs in its builds, their headers, the previously
+released NVR and the bugs and CVEs it references. An UpdateFacts instance resolves each of these
+only once and shares the result between its consumers.
+"""
+import collections
+import threading
+
+from bodhi.server import buildsys, log
+from bodhi.server.util import get_rpm_header
+
+
+class UpdateFacts(object):
+    """
+    Resolve and remember facts about the updates in a push.
+
+    Instances are meant to live as long as a single push (one MasherThread) so that they never
+    serve stale data across pushes. They are safe to share between threads.
+
+    Attributes:
+        stats (dict): A mapping of fact names to dictionaries with "hits" and "misses" counters.
+            Every miss is a call that went out to Koji (or the database), and every hit is one that
+            was deduplicated.
+    """
+
+    def __init__(self, koji=None):
+        """
+        Initialize the cache.
+
+        Args:
+            koji (koji.ClientSession or None): The Koji session to use. If None, a session is
+                acquired from bodhi.server.buildsys.get_session() the first time one is needed.
+        """
+        self._koji = koji
+        self._facts = {}
+        self._lock = threading.Lock()
+        self.stats = collections.defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    @property
+    def koji(self):
+        """
+        Return the Koji session used by this cache, creating it if needed.
+
+        Returns:
+            koji.ClientSession: The session facts are fetched with.
+        """
+        if self._koji is None:
+            self._koji = buildsys.get_session()
+        return self._koji
+
+    def _get(self, fact, key, compute):
+        """
+        Return the cached value of the given fact for key, calling compute() on a cache miss.
+
+        Args:
+            fact (basestring): The name of the fact, used for namespacing and in stats.
+            key (hashable): Identifies the fact within its namespace.
+            compute (callable): A function taking no arguments that computes the value.
+        Returns:
+            object: The value of the fact.
+        """
+        with self._lock:
+            if (fact, key) in self._facts:
+                self.stats[fact]['hits'] += 1
+                return self._facts[(fact, key)]
+        value = compute()
+        with self._lock:
+            self._facts[(fact, key)] = value
+            self.stats[fact]['misses'] += 1
+        return value
+
+    def build_info(self, nvr):
+        """
+        Return Koji's information about the given build.
+
+        Args:
+            nvr (basestring): The build's NVR.
+        Returns:
+            dict: The result of koji.getBuild(nvr).
+        """
+        return self._get('build_info', nvr, lambda: self.koji.getBuild(nvr))
+
+    def rpms(self, nvr, build_id=None, koji=None):
+        """
+        Return the list of RPMs that make up the given build.
+
+        Args:
+            nvr (basestring): The build's NVR.
+            build_id (int or None): The Koji build id, if the caller already knows it. If None,
+                it is looked up with build_info().
+            koji (koji.ClientSession or None): A session to use instead of self.koji.
+        Returns:
+            list: A list of dictionaries describing the build's subpackages.
+        """
+        koji = koji or self.koji
+
+        def compute():
+            buildid = build_id
+            if buildid is None:
+                buildid = self._get('build_info', nvr, lambda: koji.getBuild(nvr))['id']
+            return koji.listBuildRPMs(buildid)
+
+        return self._get('rpms', nvr, compute)
+
+    def rpm_header(self, nvr):
+        """
+        Return the RPM header of the given build's source RPM.
+
+        Args:
+            nvr (basestring): The build's NVR.
+        Returns:
+            dict: The header, as returned by bodhi.server.util.get_rpm_header().
+        """
+        return self._get('rpm_header', nvr, lambda: get_rpm_header(nvr))
+
+    def latest(self, build):
+        """
+        Return the NVR of the newest build released before the given one.
+
+        Args:
+            build (bodhi.server.models.RpmBuild): The build to find a predecessor for.
+        Returns:
+            basestring or None: The result of build.get_latest().
+        """
+        return self._get('latest', build.nvr, build.get_latest)
+
+    def changelog(self, build, timelimit=0):
+        """
+        Return the changelog of the given build since timelimit.
+
+        Args:
+            build (bodhi.server.models.RpmBuild): The build whose changelog is wanted.
+            timelimit (int): Only include entries newer than this timestamp.
+        Returns:
+            str: The result of build.get_changelog(timelimit).
+        """
+        return self._get('changelog', (build.nvr, timelimit),
+                         lambda: build.get_changelog(timelimit))
+
+    def references(self, update):
+        """
+        Return the bugs and CVEs referenced by the given update.
+
+        Args:
+            update (bodhi.server.models.Update): The update whose references are wanted.
+        Returns:
+            dict: A dictionary with a "bugs" key, listing dictionaries with the bug_id, url, title
+                and parent of each bug, and a "cves" key, listing dictionaries with the cve_id and
+                url of each CVE.
+        """
+        def compute():
+            return {
+                'bugs': [{'bug_id': bug.bug_id, 'url': bug.url, 'title': bug.title,
+                          'parent': bug.parent} for bug in update.bugs],
+                'cves': [{'cve_id': cve.cve_id, 'url': cve.url} for cve in update.cves]}
+
+        return self._get('references', update.title, compute)
+
+    def log_stats(self, logger=log):
+        """
+        Log how many lookups each kind of fact needed, and how many were deduplicated.
+
+        Args:
+            logger (logging.Logger): The logger to write the counters to.
+        """
+        for fact, counts in sorted(self.stats.items()):
+            logger.info('Update facts: %s: %d fetched, %d deduplicated', fact, counts['misses'],
+                        counts['hits'])
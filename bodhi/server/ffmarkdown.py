@@ -15,6 +15,9 @@
 
 """ Fedora-flavored Markdown
 
+The HTML rendered with these patterns is cached by bodhi.server.util.markup(), so bump
+bodhi.server.util.MARKDOWN_VERSION when changing them.
+
 Author: Ralph Bean <rbean@redhat.com>
 """
 
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Cached fragments of the update pages.
+
+The parts of the pages that only depend on an update, such as its builds, bugs and comments, or its
+row in lists of updates, are defs of ``fragments.html`` that templates render with :func:`render`.
+They are cached in the "fragments" cache region under the version of the update, which
+``_bump_update_versions()`` increments whenever the update, its builds, comments or bugs change. A
+changed update is thus rendered again without invalidating anything.
+
+The web services that change updates also :func:`warm` the cache once their change is committed,
+so that the next visitor of the update does not have to wait for it to be rendered.
+"""
+import logging
+
+from pyramid.renderers import render as render_template
+
+from bodhi.server import cache, util
+from bodhi.server.models import Update
+
+
+log = logging.getLogger(__name__)
+
+#: The fragments of the update page that warm() renders, with the arguments the page passes them.
+UPDATE_FRAGMENTS = (
+    ('update_builds', {'can_edit': False}),
+    ('update_bugs', {}),
+    ('update_comments', {}),
+)
+
+# Fragments rendered by other versions of Bodhi, with other templates, are not reused.
+_VERSION = util.version()
+
+
+def key(request, update, name, **kwargs):
+    """
+    Return the key a fragment of an update is cached under.
+
+    Besides the version of the update, the fragments depend on the URL Bodhi is served at, which
+    their links start with.
+
+    Args:
+        request (pyramid.request): The current request.
+        update (bodhi.server.models.Update): The update the fragment shows.
+        name (basestring): The name of the def of fragments.html that renders the fragment.
+        kwargs (dict): The other arguments of the def.
+    Returns:
+        basestring: The key, within the "fragments" cache region.
+    """
+    arguments = ','.join('%s=%r' % item for item in sorted(kwargs.items()))
+    return '%s:%s:%d:%d:%s:%s' % (_VERSION, name, update.id, update.version,
+                                  request.application_url, arguments)
+
+
+def render_fragment(request, update, name, **kwargs):
+    """
+    Return the HTML of a fragment of an update, rendering it if it is not cached.
+
+    Updates that are not saved yet, and their serializations, have no version to cache their
+    fragments under, so those are always rendered.
+
+    Args:
+        request (pyramid.request): The current request.
+        update (bodhi.server.models.Update or dict): The update the fragment shows.
+        name (basestring): The name of the def of fragments.html that renders the fragment.
+        kwargs (dict): The other arguments of the def.
+    Returns:
+        unicode: The HTML of the fragment.
+    """
+    def creator():
+        return render_template('fragments#%s.html' % name, dict(kwargs, update=update),
+                               request=request)
+
+    if not isinstance(update, Update) or update.id is None or update.version is None:
+        return creator()
+    return cache.get_region('fragments').get_or_create(
+        key(request, update, name, **kwargs), creator)
+
+
+def render(context, update, name, **kwargs):
+    """
+    Return the HTML of a fragment of an update, for templates.
+
+    Args:
+        context (mako.runtime.Context): The current template rendering context.
+        update (bodhi.server.models.Update or dict): The update the fragment shows.
+        name (basestring): The name of the def of fragments.html that renders the fragment.
+        kwargs (dict): The other arguments of the def.
+    Returns:
+        unicode: The HTML of the fragment.
+    """
+    return render_fragment(context['request'], update, name, **kwargs)
+
+
+def warm(request, update):
+    """
+    Render the fragments of the update page once the change the request makes to update is saved.
+
+    The fragments are rendered after the request's transaction is committed, as they are cached
+    under the version the update has then. Nothing is rendered if the request fails.
+
+    Args:
+        request (pyramid.request): The request changing the update.
+        update (bodhi.server.models.Update): The update being changed.
+    """
+    update_id = update.id
+    # Make sure the callback of the database session, which commits it, is registered first.
+    db = request.db
+
+    def callback(request):
+        if request.exception is not None or request.errors:
+            return
+        try:
+            update = db.query(Update).options(*Update.loader_options('detail')).get(update_id)
+            if update is not None:
+                for name, kwargs in UPDATE_FRAGMENTS:
+                    render_fragment(request, update, name, **kwargs)
+        except Exception:
+            log.exception('Unable to warm the cached fragments of update %s', update_id)
+        finally:
+            # Nothing was written, so just give the connection back to the pool.
+            db.rollback()
+
+    request.add_finished_callback(callback)
@@ -0,0 +1,545 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+A stateful Koji simulator, for load testing Bodhi without a real Koji.
+
+Unlike :class:`bodhi.server.buildsys.DevBuildsys`, which returns canned data, the simulator keeps
+an in-memory graph of tags, builds and RPMs that tagging calls really modify. It can be seeded from
+a generator or from a JSON dump, and can add latency and random failures to every call. Enable it
+by setting ``buildsystem = simulator`` and the ``koji_simulator.*`` settings.
+"""
+from functools import wraps
+from threading import RLock
+import collections
+import itertools
+import json
+import random
+import time
+
+import koji
+
+from bodhi.server.buildsys import Buildsystem
+
+
+ARCHES = ('x86_64', 'i686', 'aarch64', 'armv7hl', 'ppc64le', 's390x')
+
+
+class SimulatorState(object):
+    """
+    The tags, builds, RPMs and tasks known to a simulated Koji.
+
+    A single state is shared by every session created for a simulated Koji, so that tagging done
+    through one session is seen by the others. All access is serialized with a lock.
+    """
+
+    def __init__(self, seed=0):
+        """
+        Initialize an empty state.
+
+        Args:
+            seed (int): A seed for the random number generator used for failure injection.
+        """
+        self.lock = RLock()
+        self.random = random.Random(seed)
+        self.tags = {}
+        self.builds = {}
+        self.builds_by_id = {}
+        self.rpms = {}
+        # Maps package names to their ids.
+        self.packages = {}
+        # Maps tag names to OrderedDicts of build ids to tag events, most recently tagged last.
+        self.tagged = {}
+        self.tasks = {}
+        self._ids = itertools.count(1)
+        self._events = itertools.count(1)
+
+    def add_tag(self, name, arches=' '.join(ARCHES)):
+        """
+        Add a tag to the state, if it isn't there yet.
+
+        Args:
+            name (basestring): The name of the tag.
+            arches (basestring): The space separated arches of the tag.
+        Returns:
+            dict: The tag, formatted like koji.getTag()'s result.
+        """
+        if name not in self.tags:
+            self.tags[name] = {'id': next(self._ids), 'name': name, 'arches': arches,
+                               'locked': False, 'perm': None, 'perm_id': None,
+                               'maven_support': False, 'maven_include_all': False}
+            self.tagged[name] = collections.OrderedDict()
+        return self.tags[name]
+
+    def add_build(self, nvr, tags=(), arches=ARCHES, subpackages=1):
+        """
+        Add a completed build of the given NVR, with its RPMs, and tag it.
+
+        Args:
+            nvr (basestring): The NVR of the build.
+            tags (iterable): The names of the tags to tag the build into.
+            arches (iterable): The arches the build has binary RPMs for.
+            subpackages (int): How many binary RPMs the build has per arch.
+        Returns:
+            dict: The build, formatted like koji.getBuild()'s result.
+        """
+        name, version, release = nvr.rsplit('-', 2)
+        build_id = next(self._ids)
+        now = time.time()
+        build = {
+            'id': build_id, 'build_id': build_id, 'nvr': nvr, 'name': name,
+            'package_name': name, 'package_id': self._package_id(name), 'version': version,
+            'release': release, 'epoch': None, 'state': koji.BUILD_STATES['COMPLETE'],
+            'owner_name': 'simulator', 'task_id': None, 'creation_ts': now,
+            'completion_ts': now, 'extra': None, 'volume_id': 0, 'volume_name': 'DEFAULT'}
+        self.builds[nvr] = build
+        self.builds_by_id[build_id] = build
+
+        rpms = [self._rpm(build, name, 'src')]
+        for arch in arches:
+            for i in range(subpackages):
+                rpms.append(self._rpm(build, i and '%s-sub%d' % (name, i) or name, arch))
+        self.rpms[build_id] = rpms
+
+        for tag in tags:
+            self.tag(tag, build)
+        return build
+
+    def _package_id(self, name):
+        if name not in self.packages:
+            self.packages[name] = next(self._ids)
+        return self.packages[name]
+
+    def _rpm(self, build, name, arch):
+        return {'id': next(self._ids), 'build_id': build['id'], 'name': name, 'arch': arch,
+                'version': build['version'], 'release': build['release'], 'epoch': None,
+                'nvr': '%s-%s-%s' % (name, build['version'], build['release']),
+                'size': 1048576, 'buildtime': int(build['completion_ts']),
+                'payloadhash': '0' * 32, 'buildroot_id': 1}
+
+    def get_build(self, build):
+        """
+        Return the build with the given NVR or id.
+
+        Args:
+            build (basestring or int): The NVR or id of the build.
+        Returns:
+            dict or None: The build, or None if there is no such build.
+        """
+        if isinstance(build, (int, long)):
+            return self.builds_by_id.get(build)
+        return self.builds.get(build)
+
+    def get_tag(self, tag):
+        """
+        Return the tag with the given name or id.
+
+        Args:
+            tag (basestring or int): The name or id of the tag.
+        Returns:
+            dict or None: The tag, or None if there is no such tag.
+        """
+        if isinstance(tag, (int, long)):
+            for t in self.tags.values():
+                if t['id'] == tag:
+                    return t
+            return None
+        return self.tags.get(tag)
+
+    def tag(self, tag, build):
+        """
+        Tag the given build into the given tag, creating the tag if needed.
+
+        Args:
+            tag (basestring): The name of the tag.
+            build (dict): The build to tag.
+        """
+        self.add_tag(tag)
+        self.untag(tag, build)
+        self.tagged[tag][build['id']] = next(self._events)
+
+    def untag(self, tag, build):
+        """
+        Untag the given build from the given tag.
+
+        Args:
+            tag (basestring): The name of the tag.
+            build (dict): The build to untag.
+        Returns:
+            bool: Whether the build was tagged.
+        """
+        return self.tagged.get(tag, {}).pop(build['id'], None) is not None
+
+    def add_task(self, method, request, duration, fail=False):
+        """
+        Record a new task that will be finished after the given duration.
+
+        Args:
+            method (basestring): The Koji method that created the task.
+            request (list): The arguments of the method.
+            duration (float): How many seconds the task should take.
+            fail (bool): Whether the task should end up failing.
+        Returns:
+            int: The id of the task.
+        """
+        task_id = next(self._ids)
+        self.tasks[task_id] = {'id': task_id, 'method': method, 'request': request,
+                               'finish': time.time() + duration, 'fail': fail}
+        return task_id
+
+    @classmethod
+    def generate(cls, tags, packages=100, builds_per_package=3, arches=ARCHES, subpackages=1,
+                 seed=0):
+        """
+        Generate a state with the given number of packages and builds.
+
+        The builds of each package get increasing versions, and each build is tagged into one of
+        the given tags, chosen at random.
+
+        Args:
+            tags (list): The names of the tags to create.
+            packages (int): The number of packages to create.
+            builds_per_package (int): The number of builds to create for each package.
+            arches (iterable): The arches every build has binary RPMs for.
+            subpackages (int): The number of binary RPMs per arch for each build.
+            seed (int): The seed of the random number generator.
+        Returns:
+            SimulatorState: The generated state.
+        """
+        state = cls(seed)
+        for tag in tags:
+            state.add_tag(tag)
+        for p in range(packages):
+            for b in range(builds_per_package):
+                tag = tags and [state.random.choice(tags)] or []
+                state.add_build('package%d-1.%d-1' % (p, b), tag, arches, subpackages)
+        return state
+
+    @classmethod
+    def load(cls, data, seed=0):
+        """
+        Create a state from a dump.
+
+        Args:
+            data (dict): A dictionary with a "tags" key listing tag names and a "builds" key
+                listing dictionaries with "nvr", "tags" and optionally "arches" keys.
+            seed (int): The seed of the random number generator.
+        Returns:
+            SimulatorState: The loaded state.
+        """
+        state = cls(seed)
+        for tag in data.get('tags', []):
+            state.add_tag(tag)
+        for build in data.get('builds', []):
+            state.add_build(build['nvr'], build.get('tags', []), build.get('arches', ARCHES))
+        return state
+
+    def dump(self):
+        """
+        Return the tags and builds of this state in the format accepted by load().
+
+        Returns:
+            dict: The tags and builds of the state.
+        """
+        tags_by_build = {}
+        for tag, tagged in self.tagged.items():
+            for build_id in tagged:
+                tags_by_build.setdefault(build_id, []).append(tag)
+        builds = []
+        for build in sorted(self.builds.values(), key=lambda b: b['id']):
+            arches = sorted(set(r['arch'] for r in self.rpms[build['id']] if r['arch'] != 'src'))
+            builds.append({'nvr': build['nvr'], 'tags': sorted(tags_by_build.get(build['id'], [])),
+                           'arches': arches})
+        return {'tags': sorted(self.tags), 'builds': builds}
+
+
+def simulated(func):
+    """
+    Decorate a SimulatedBuildsys method to add latency, failure injection and multicall support.
+
+    Args:
+        func (callable): The method to decorate.
+    Returns:
+        callable: The decorated method.
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self.multicall:
+            self._queue.append((func, args, kwargs))
+            return None
+        self._delay()
+        self._maybe_fail(func.__name__)
+        with self.state.lock:
+            return func(self, *args, **kwargs)
+    return wrapper
+
+
+class SimulatedBuildsys(Buildsystem):
+    """
+    A Koji session that operates on a shared SimulatorState.
+
+    Attributes:
+        latency (float): How many seconds each call (or multicall) takes.
+        failure_rate (float): The probability (between 0 and 1) that a call raises a
+            koji.GenericError.
+        task_duration (float): How many seconds tasks created by tagBuild() and moveBuild() take
+            to finish.
+        task_failure_rate (float): The probability (between 0 and 1) that a task fails.
+    """
+
+    def __init__(self, state, latency=0, failure_rate=0, task_duration=0, task_failure_rate=0):
+        """
+        Initialize the session.
+
+        Args:
+            state (SimulatorState): The state to operate on.
+            latency (float): See the class attributes.
+            failure_rate (float): See the class attributes.
+            task_duration (float): See the class attributes.
+            task_failure_rate (float): See the class attributes.
+        """
+        self.state = state
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.task_duration = task_duration
+        self.task_failure_rate = task_failure_rate
+        self._multicall = False
+        self._queue = []
+
+    @property
+    def multicall(self):
+        return self._multicall
+
+    @multicall.setter
+    def multicall(self, value):
+        self._multicall = value
+        self._queue = []
+
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _maybe_fail(self, method):
+        with self.state.lock:
+            fail = self.failure_rate and self.state.random.random() < self.failure_rate
+        if fail:
+            raise koji.GenericError('Simulated failure of %s' % method)
+
+    def multiCall(self, strict=False):
+        """
+        Run the queued calls, and return their results like koji.ClientSession.multiCall().
+
+        Args:
+            strict (bool): If True, raise the first fault instead of returning it.
+        Returns:
+            list: One [result] list or fault dictionary per queued call.
+        """
+        queue = self._queue
+        self.multicall = False
+        self._delay()
+        results = []
+        for func, args, kwargs in queue:
+            try:
+                self._maybe_fail(func.__name__)
+                with self.state.lock:
+                    results.append([func(self, *args, **kwargs)])
+            except koji.GenericError as e:
+                if strict:
+                    raise
+                results.append({'faultCode': e.faultCode, 'faultString': str(e)})
+        return results
+
+    def ssl_login(self, *args, **kw):
+        return True
+
+    def krb_login(self, *args, **kw):
+        return True
+
+    def _build_or_fail(self, build):
+        info = self.state.get_build(build)
+        if info is None:
+            raise koji.GenericError('No such build: %r' % (build,))
+        return info
+
+    def _tag_or_fail(self, tag):
+        info = self.state.get_tag(tag)
+        if info is None:
+            raise koji.GenericError('No such tag: %r' % (tag,))
+        return info
+
+    def _tagged(self, tag, latest=False, package=None):
+        """Return the builds tagged into tag, most recently tagged first."""
+        tag = self._tag_or_fail(tag)
+        builds = []
+        seen = set()
+        for build_id, event in reversed(self.state.tagged[tag['name']].items()):
+            build = dict(self.state.builds_by_id[build_id], tag_name=tag['name'],
+                         tag_id=tag['id'], create_event=event)
+            if package and build['package_name'] != package:
+                continue
+            if latest:
+                if build['package_name'] in seen:
+                    continue
+                seen.add(build['package_name'])
+            builds.append(build)
+        return builds
+
+    @simulated
+    def getBuild(self, buildInfo, strict=False):
+        build = self.state.get_build(buildInfo)
+        if build is None and strict:
+            raise koji.GenericError('No such build: %r' % (buildInfo,))
+        return build and dict(build)
+
+    @simulated
+    def getLatestBuilds(self, tag, event=None, package=None, type=None):
+        return self._tagged(tag, latest=True, package=package)
+
+    @simulated
+    def getRPMHeaders(self, rpmID=None, taskID=None, filepath=None, headers=None):
+        nvr = rpmID.rsplit('.', 1)[0] if rpmID else None
+        build = self.state.get_build(nvr)
+        if build is None:
+            return {}
+        stamp = int(build['completion_ts'])
+        return {
+            'name': build['name'], 'version': build['version'], 'release': build['release'],
+            'summary': 'The %s package' % build['name'],
+            'description': 'A package generated by the Koji simulator.',
+            'url': 'https://example.com/%s' % build['name'],
+            'changelogname': ['Simulator <simulator@example.com> - %s-%s' % (
+                build['version'], build['release'])],
+            'changelogtime': [stamp], 'changelogtext': ['- Simulated build']}
+
+    @simulated
+    def getTag(self, taginfo, strict=False, event=None):
+        tag = self.state.get_tag(taginfo)
+        if tag is None and strict:
+            raise koji.GenericError('No such tag: %r' % (taginfo,))
+        return tag and dict(tag)
+
+    @simulated
+    def getTaskInfo(self, task_id, request=False):
+        task = self.state.tasks.get(task_id)
+        if task is None:
+            return None
+        if time.time() < task['finish']:
+            state = koji.TASK_STATES['OPEN']
+        elif task['fail']:
+            state = koji.TASK_STATES['FAILED']
+        else:
+            state = koji.TASK_STATES['CLOSED']
+        info = {'id': task_id, 'method': task['method'], 'state': state}
+        if request:
+            info['request'] = task['request']
+        return info
+
+    @simulated
+    def getTaskRequest(self, task_id):
+        return self.state.tasks[task_id]['request']
+
+    @simulated
+    def listBuildRPMs(self, buildID, withOwner=None, topdir=None):
+        return [dict(rpm) for rpm in self.state.rpms.get(self._build_or_fail(buildID)['id'], [])]
+
+    @simulated
+    def listPackages(self, tagID=None, userID=None, pkgID=None, prefix=None, inherited=False,
+                     with_dups=False, event=None):
+        packages = {}
+        for build in self.state.builds.values():
+            if prefix and not build['package_name'].startswith(prefix):
+                continue
+            packages[build['package_id']] = build['package_name']
+        return [{'package_id': i, 'package_name': n} for i, n in sorted(packages.items())]
+
+    @simulated
+    def listTagged(self, tag, event=None, inherit=False, prefix=None, latest=False, package=None,
+                   owner=None, type=None):
+        return self._tagged(tag, latest=latest, package=package)
+
+    @simulated
+    def listTags(self, build=None, package=None, perms=True):
+        build = self._build_or_fail(build)
+        return [dict(self.state.tags[tag]) for tag, tagged in sorted(self.state.tagged.items())
+                if build['id'] in tagged]
+
+    @simulated
+    def moveBuild(self, tag1, tag2, build, force=False):
+        info = self._build_or_fail(build)
+        self._tag_or_fail(tag1)
+        self.state.untag(tag1, info)
+        self.state.tag(tag2, info)
+        return self._task('tagBuild', [tag2, info['id'], force, tag1])
+
+    @simulated
+    def tagBuild(self, tag, build, force=False, fromtag=None):
+        info = self._build_or_fail(build)
+        self.state.tag(tag, info)
+        return self._task('tagBuild', [tag, info['id'], force, fromtag])
+
+    @simulated
+    def taskFinished(self, task_id):
+        task = self.state.tasks.get(task_id)
+        return task is None or time.time() >= task['finish']
+
+    @simulated
+    def untagBuild(self, tag, build, strict=True, force=False):
+        info = self._build_or_fail(build)
+        if not self.state.untag(tag, info) and strict:
+            raise koji.GenericError('%s is not tagged into %s' % (info['nvr'], tag))
+
+    def _task(self, method, request):
+        fail = self.task_failure_rate and self.state.random.random() < self.task_failure_rate
+        return self.state.add_task(method, request, self.task_duration, bool(fail))
+
+
+def make_simulator(settings):
+    """
+    Return a factory of SimulatedBuildsys sessions sharing a state described by settings.
+
+    Args:
+        settings (dict): The Bodhi settings. koji_simulator.dump names a JSON file to load the
+            state from. If it is not set, a state is generated with koji_simulator.packages
+            packages of koji_simulator.builds_per_package builds each, tagged into the
+            koji_simulator.tags tags. koji_simulator.latency, koji_simulator.failure_rate,
+            koji_simulator.task_duration and koji_simulator.task_failure_rate configure the
+            sessions.
+    Returns:
+        callable: A function that takes no arguments and returns a new SimulatedBuildsys.
+    """
+    dump = settings.get('koji_simulator.dump')
+    if dump:
+        with open(dump) as dump_file:
+            state = SimulatorState.load(json.load(dump_file))
+    else:
+        tags = settings.get('koji_simulator.tags', [])
+        if isinstance(tags, basestring):
+            tags = tags.split()
+        state = SimulatorState.generate(
+            tags, packages=int(settings.get('koji_simulator.packages', 100)),
+            builds_per_package=int(settings.get('koji_simulator.builds_per_package', 3)))
+
+    def session():
+        return SimulatedBuildsys(
+            state, latency=float(settings.get('koji_simulator.latency', 0)),
+            failure_rate=float(settings.get('koji_simulator.failure_rate', 0)),
+            task_duration=float(settings.get('koji_simulator.task_duration', 0)),
+            task_failure_rate=float(settings.get('koji_simulator.task_failure_rate', 0)))
+
+    session.state = state
+    return session
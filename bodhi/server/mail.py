@@ -26,7 +26,7 @@ from kitchen.text.converters import to_unicode, to_bytes
 
 from bodhi.server import log
 from bodhi.server.config import config
-from bodhi.server.util import get_rpm_header
+from bodhi.server.facts import UpdateFacts
 
 
 #
@@ -338,7 +338,7 @@ maillist_template = u"""\
 """
 
 
-def get_template(update, use_template='fedora_errata_template'):
+def get_template(update, use_template='fedora_errata_template', facts=None):
     """
     Build the update notice for a given update.
 
@@ -346,6 +346,9 @@ def get_template(update, use_template='fedora_errata_template'):
         update (bodhi.server.models.Update): The update to generate a template about.
         use_template (basestring): The name of the variable in bodhi.server.mail that references the
             template to generate this notice with.
+        facts (bodhi.server.facts.UpdateFacts or None): A cache of Koji and bug data to reuse. The
+            masher passes the one it shares with the updateinfo generator. If None, a new one is
+            used for this update only.
     Returns:
         list: A list of templates for the given update.
     """
@@ -353,9 +356,11 @@ def get_template(update, use_template='fedora_errata_template'):
     use_template = globals()[use_template]
     line = unicode('-' * 80) + '\n'
     templates = []
+    if facts is None:
+        facts = UpdateFacts()
 
     for build in update.builds:
-        h = get_rpm_header(build.nvr)
+        h = facts.rpm_header(build.nvr)
         info = {}
         info['date'] = str(update.date_pushed)
         info['name'] = h['name']
@@ -385,35 +390,36 @@ def get_template(update, use_template='fedora_errata_template'):
         # Add this updates referenced Bugzillas and CVEs
         i = 1
         info['references'] = ""
-        if len(update.bugs) or len(update.cves):
+        references = facts.references(update)
+        if len(references['bugs']) or len(references['cves']):
             info['references'] = u"References:\n\n"
-            parent = True in [bug.parent for bug in update.bugs]
-            for bug in update.bugs:
+            parent = True in [bug['parent'] for bug in references['bugs']]
+            for bug in references['bugs']:
                 # Don't show any tracker bugs for security updates
                 if update.type is UpdateType.security:
                     # If there is a parent bug, don't show trackers
-                    if parent and not bug.parent:
-                        log.debug("Skipping tracker bug %s" % bug)
+                    if parent and not bug['parent']:
+                        log.debug("Skipping tracker bug %s" % bug['bug_id'])
                         continue
-                title = (bug.title != 'Unable to fetch title' and
-                         bug.title != 'Invalid bug number') and \
-                    ' - %s' % bug.title or ''
+                title = (bug['title'] != 'Unable to fetch title' and
+                         bug['title'] != 'Invalid bug number') and \
+                    ' - %s' % bug['title'] or ''
                 info['references'] += u"  [ %d ] Bug #%d%s\n        %s\n" % \
-                                      (i, bug.bug_id, title, bug.url)
+                                      (i, bug['bug_id'], title, bug['url'])
                 i += 1
-            for cve in update.cves:
+            for cve in references['cves']:
                 info['references'] += u"  [ %d ] %s\n        %s\n" % \
-                                      (i, cve.cve_id, cve.url)
+                                      (i, cve['cve_id'], cve['url'])
                 i += 1
             info['references'] += line
 
         # Find the most recent update for this package, other than this one
-        lastpkg = build.get_latest()
+        lastpkg = facts.latest(build)
 
         # Grab the RPM header of the previous update, and generate a ChangeLog
         info['changelog'] = u""
         if lastpkg:
-            oldh = get_rpm_header(lastpkg)
+            oldh = facts.rpm_header(lastpkg)
             oldtime = oldh['changelogtime']
             text = oldh['changelogtext']
             del oldh
@@ -422,7 +428,7 @@ def get_template(update, use_template='fedora_errata_template'):
             elif len(text) != 1:
                 oldtime = oldtime[0]
             info['changelog'] = u"ChangeLog:\n\n%s%s" % \
-                (to_unicode(build.get_changelog(oldtime)), line)
+                (to_unicode(facts.changelog(build, oldtime)), line)
 
         try:
             templates.append((info['subject'], use_template % info))
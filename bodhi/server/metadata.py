@@ -16,12 +16,14 @@ import os
 import shelve
 import shutil
 import tempfile
+from multiprocessing.pool import ThreadPool
 
 from kitchen.text.converters import to_bytes
 import createrepo_c as cr
 
 from bodhi.server.buildsys import get_session
 from bodhi.server.config import config
+from bodhi.server.facts import UpdateFacts
 from bodhi.server.models import Build, UpdateStatus, UpdateRequest, UpdateSuggestion
 
 
@@ -33,7 +35,12 @@ def modifyrepo(comp_type, compose_path, filetype, extension, source):
     """
     Inject a file into the repodata for each architecture with the help of createrepo_c.
 
+    The source file is compressed and checksummed only once. The resulting artifact is then copied
+    into every architecture's repodata and recorded in its repomd.xml concurrently, since the
+    record (checksums, sizes and location) is identical for every architecture.
+
     Args:
+        comp_type (int): The createrepo_c compression type to use (e.g. cr.XZ).
         compose_path (basestring): The path to the compose where the metadata will be inserted.
         filetype (basestring): What type of metadata will be inserted by createrepo_c.
             This does allow any string to be inserted (custom types). There are some
@@ -43,29 +50,75 @@ def modifyrepo(comp_type, compose_path, filetype, extension, source):
             copied to the repodata folder.
     """
     repo_path = os.path.join(compose_path, 'compose', 'Everything')
+    repodatas = []
     for arch in os.listdir(repo_path):
         if arch == 'source':
-            repodata = os.path.join(repo_path, arch, 'tree', 'repodata')
+            repodatas.append(os.path.join(repo_path, arch, 'tree', 'repodata'))
         else:
-            repodata = os.path.join(repo_path, arch, 'os', 'repodata')
-        log.info('Inserting %s.%s into %s', filetype, extension, repodata)
-        target_fname = os.path.join(repodata, '%s.%s' % (filetype, extension))
-        shutil.copyfile(source, target_fname)
-        repomd_xml = os.path.join(repodata, 'repomd.xml')
-        repomd = cr.Repomd(repomd_xml)
-        # create a new record for our repomd.xml
-        rec = cr.RepomdRecord(filetype, target_fname)
-        # compress our metadata file with the comp_type
-        rec_comp = rec.compress_and_fill(cr.SHA256, comp_type)
-        # add hash to the compresed metadata file
-        rec_comp.rename_file()
-        # set type of metadata
-        rec_comp.type = filetype
-        # insert metadata about our metadata in repomd.xml
-        repomd.set_record(rec_comp)
-        with open(repomd_xml, 'w') as repomd_file:
-            repomd_file.write(repomd.xml_dump())
-        os.unlink(target_fname)
+            repodatas.append(os.path.join(repo_path, arch, 'os', 'repodata'))
+    if not repodatas:
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bodhi-modifyrepo-')
+    try:
+        record = _compress_metadata(comp_type, workdir, filetype, extension, source)
+
+        pool = ThreadPool(len(repodatas))
+        try:
+            # map() re-raises the first exception encountered by any of the workers.
+            pool.map(lambda repodata: _insert_record(record, repodata), repodatas)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        shutil.rmtree(workdir)
+
+
+def _compress_metadata(comp_type, workdir, filetype, extension, source):
+    """
+    Compress and checksum the given metadata file once, so it can be injected into many repos.
+
+    Args:
+        comp_type (int): The createrepo_c compression type to use (e.g. cr.XZ).
+        workdir (basestring): A scratch directory where the compressed file will be written.
+        filetype (basestring): What type of metadata is being compressed (e.g. updateinfo).
+        extension (basestring): The file extension (xml, sqlite).
+        source (basestring): The path to the uncompressed metadata.
+    Returns:
+        createrepo_c.RepomdRecord: A filled record describing the compressed file. Its
+            location_real attribute points to the compressed file inside workdir.
+    """
+    target_fname = os.path.join(workdir, '%s.%s' % (filetype, extension))
+    shutil.copyfile(source, target_fname)
+    # create a new record for our repomd.xml
+    rec = cr.RepomdRecord(filetype, target_fname)
+    # compress our metadata file with the comp_type
+    rec_comp = rec.compress_and_fill(cr.SHA256, comp_type)
+    # add hash to the compresed metadata file
+    rec_comp.rename_file()
+    # set type of metadata
+    rec_comp.type = filetype
+    os.unlink(target_fname)
+    return rec_comp
+
+
+def _insert_record(record, repodata):
+    """
+    Copy the compressed metadata described by record into repodata and add it to its repomd.xml.
+
+    Args:
+        record (createrepo_c.RepomdRecord): A record returned by _compress_metadata().
+        repodata (basestring): The path to the repodata folder that should receive the metadata.
+    """
+    log.info('Inserting %s into %s', record.type, repodata)
+    shutil.copyfile(record.location_real,
+                    os.path.join(repodata, os.path.basename(record.location_real)))
+    repomd_xml = os.path.join(repodata, 'repomd.xml')
+    repomd = cr.Repomd(repomd_xml)
+    # insert metadata about our metadata in repomd.xml
+    repomd.set_record(record)
+    with open(repomd_xml, 'w') as repomd_file:
+        repomd_file.write(repomd.xml_dump())
 
 
 class UpdateInfoMetadata(object):
@@ -76,8 +129,21 @@ class UpdateInfoMetadata(object):
     which is included in the `createrepo_c` package.
 
     """
-    def __init__(self, release, request, db, mashdir, close_shelf=True):
+    def __init__(self, release, request, db, mashdir, close_shelf=True, facts=None):
+        """
+        Generate the updateinfo for the given release and request.
+
+        Args:
+            release (bodhi.server.models.Release): The release being pushed.
+            request (bodhi.server.models.UpdateRequest): The request being pushed.
+            db (sqlalchemy.orm.session.Session): A database session.
+            mashdir (basestring): The directory where the RPM list shelf is stored.
+            close_shelf (bool): Whether to close the shelf once the updateinfo is generated.
+            facts (bodhi.server.facts.UpdateFacts or None): A cache of Koji and bug data shared
+                with the other consumers of the push. If None, a private one is used.
+        """
         self.request = request
+        self.facts = facts if facts is not None else UpdateFacts()
         if request is UpdateRequest.stable:
             self.tag = release.stable_tag
         else:
@@ -142,12 +208,11 @@ class UpdateInfoMetadata(object):
         if str(nvr) in self.shelf:
             return self.shelf[str(nvr)]
 
+        buildid = None
         if nvr in self.builds:
             buildid = self.builds[nvr]['id']
-        else:
-            buildid = koji.getBuild(nvr)['id']
 
-        rpms = koji.listBuildRPMs(buildid)
+        rpms = self.facts.rpms(nvr, build_id=buildid, koji=koji)
         self.shelf[str(nvr)] = rpms
         return rpms
 
@@ -212,21 +277,23 @@ class UpdateInfoMetadata(object):
 
         rec.append_collection(col)
 
+        references = self.facts.references(update)
+
         # Create references for each bug
-        for bug in update.bugs:
+        for bug in references['bugs']:
             ref = cr.UpdateReference()
             ref.type = 'bugzilla'
-            ref.id = to_bytes(bug.bug_id)
-            ref.href = to_bytes(bug.url)
-            ref.title = to_bytes(bug.title)
+            ref.id = to_bytes(bug['bug_id'])
+            ref.href = to_bytes(bug['url'])
+            ref.title = to_bytes(bug['title'])
             rec.append_reference(ref)
 
         # Create references for each CVE
-        for cve in update.cves:
+        for cve in references['cves']:
             ref = cr.UpdateReference()
             ref.type = 'cve'
-            ref.id = to_bytes(cve.cve_id)
-            ref.href = to_bytes(cve.url)
+            ref.id = to_bytes(cve['cve_id'])
+            ref.href = to_bytes(cve['url'])
             rec.append_reference(ref)
 
         self.uinfo.append(rec)
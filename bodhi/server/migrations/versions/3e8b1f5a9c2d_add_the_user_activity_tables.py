@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add the user_activity and user_update_counts tables.
+
+Revision ID: 3e8b1f5a9c2d
+Revises: 7d2b4e6f1a3c
+Create Date: 2017-09-06 14:41:52.270315
+"""
+from alembic import op
+from sqlalchemy.dialects import postgresql
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8b1f5a9c2d'
+down_revision = '7d2b4e6f1a3c'
+
+
+def upgrade():
+    """Add the user_activity and user_update_counts tables, and fill them from the database."""
+    op.create_table(
+        'user_activity',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('comments', sa.Integer(), nullable=False),
+        sa.Column('karma_positive', sa.Integer(), nullable=False),
+        sa.Column('karma_negative', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'date'))
+    op.create_index(op.f('ix_user_activity_date'), 'user_activity', ['date'], unique=False)
+
+    # This type was created with the updates table.
+    update_status = postgresql.ENUM('pending', 'testing', 'stable', 'unpushed', 'obsolete',
+                                    'processing', name='ck_update_status', create_type=False)
+    op.create_table(
+        'user_update_counts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', update_status, nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'status'))
+
+    op.execute(
+        'INSERT INTO user_activity (user_id, date, comments, karma_positive, karma_negative) '
+        'SELECT user_id, CAST(timestamp AS DATE), COUNT(*), '
+        'SUM(CASE WHEN karma > 0 THEN karma ELSE 0 END), '
+        'SUM(CASE WHEN karma < 0 THEN karma ELSE 0 END) '
+        'FROM comments WHERE user_id IS NOT NULL AND timestamp IS NOT NULL '
+        'GROUP BY user_id, CAST(timestamp AS DATE)')
+    op.execute(
+        'INSERT INTO user_update_counts (user_id, status, count) '
+        'SELECT user_id, status, COUNT(*) FROM updates '
+        'WHERE user_id IS NOT NULL AND status IS NOT NULL '
+        'GROUP BY user_id, status')
+
+
+def downgrade():
+    """Drop the user_activity and user_update_counts tables."""
+    op.drop_table('user_update_counts')
+    op.drop_index(op.f('ix_user_activity_date'), table_name='user_activity')
+    op.drop_table('user_activity')
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add karma aggregates to updates.
+
+Revision ID: 4df1fcd59050
+Revises: e3f4a1c2b5d6
+Create Date: 2017-08-23 10:41:12.532904
+"""
+import itertools
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4df1fcd59050'
+down_revision = 'e3f4a1c2b5d6'
+
+
+def _aggregate(comments):
+    """
+    Calculate the karma aggregates of an update the way Update._compute_karma() does.
+
+    Args:
+        comments (list): The (karma, anonymous, text, timestamp, user name) of the comments of the
+            update, in chronological order.
+    Returns:
+        tuple: A 4-tuple of (positive karma, negative karma, votes by user, date of the last reset).
+    """
+    positive = negative = 0
+    votes = {}
+    reset = None
+    for karma, anonymous, text, timestamp, user in reversed(comments):
+        if user == u'bodhi' and text and ('New build' in text or 'Removed build' in text):
+            reset = timestamp
+            break
+        if karma and not anonymous and user not in votes:
+            votes[user] = karma
+            if karma > 0:
+                positive += karma
+            else:
+                negative += karma
+    return positive, negative, votes, reset
+
+
+def upgrade():
+    """Add the karma aggregate columns to the updates table, and calculate them from comments."""
+    op.add_column('updates', sa.Column('karma_positive', sa.Integer(), server_default='0',
+                                       nullable=False))
+    op.add_column('updates', sa.Column('karma_negative', sa.Integer(), server_default='0',
+                                       nullable=False))
+    op.add_column('updates', sa.Column('karma_votes', sa.UnicodeText(), server_default='{}',
+                                       nullable=False))
+    op.add_column('updates', sa.Column('date_karma_reset', sa.DateTime(), nullable=True))
+
+    connection = op.get_bind()
+    comments = connection.execute(sa.text(
+        'SELECT comments.update_id, comments.karma, comments.anonymous, comments.text, '
+        'comments.timestamp, users.name FROM comments JOIN users ON comments.user_id = users.id '
+        'WHERE comments.update_id IS NOT NULL '
+        'ORDER BY comments.update_id, comments.timestamp, comments.id'))
+    set_aggregates = sa.text(
+        'UPDATE updates SET karma_positive = :positive, karma_negative = :negative, '
+        'karma_votes = :votes, date_karma_reset = :reset WHERE id = :id')
+    for update_id, rows in itertools.groupby(comments, key=lambda row: row[0]):
+        positive, negative, votes, reset = _aggregate([row[1:] for row in rows])
+        if positive or negative or reset:
+            connection.execute(set_aggregates, id=update_id, positive=positive, negative=negative,
+                               votes=unicode(json.dumps(votes, sort_keys=True)), reset=reset)
+
+
+def downgrade():
+    """Drop the karma aggregate columns."""
+    op.drop_column('updates', 'date_karma_reset')
+    op.drop_column('updates', 'karma_votes')
+    op.drop_column('updates', 'karma_negative')
+    op.drop_column('updates', 'karma_positive')
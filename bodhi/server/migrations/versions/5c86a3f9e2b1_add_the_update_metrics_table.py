@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add the update_metrics table.
+
+Revision ID: 5c86a3f9e2b1
+Revises: a2f3e9c1d7b4
+Create Date: 2017-08-30 15:27:03.118230
+"""
+import collections
+
+from alembic import op
+from sqlalchemy.dialects import postgresql
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c86a3f9e2b1'
+down_revision = 'a2f3e9c1d7b4'
+
+# The statuses whose history can be recovered from the updates, by the column of their date.
+DATED_STATUSES = collections.OrderedDict([
+    ('pending', 'date_submitted'),
+    ('testing', 'date_testing'),
+    ('stable', 'date_stable'),
+])
+
+
+def upgrade():
+    """
+    Add the update_metrics table, and fill it from the dates of the updates.
+
+    Updates only record when they were submitted, and last went to testing and stable, so the other
+    statuses are only counted from now on.
+    """
+    # These types were created with the updates table.
+    update_type = postgresql.ENUM('bugfix', 'security', 'newpackage', 'enhancement',
+                                  name='ck_update_type', create_type=False)
+    update_status = postgresql.ENUM('pending', 'testing', 'stable', 'unpushed', 'obsolete',
+                                    'processing', name='ck_update_status', create_type=False)
+    table = op.create_table(
+        'update_metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('release_id', sa.Integer(), nullable=False),
+        sa.Column('type', update_type, nullable=False),
+        sa.Column('status', update_status, nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['release_id'], ['releases.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('release_id', 'type', 'status', 'date'))
+    op.create_index(op.f('ix_update_metrics_date'), 'update_metrics', ['date'], unique=False)
+
+    connection = op.get_bind()
+    counts = collections.Counter()
+    for status, column in DATED_STATUSES.items():
+        for release_id, type_, date in connection.execute(sa.text(
+                'SELECT release_id, type, %s FROM updates '
+                'WHERE release_id IS NOT NULL AND %s IS NOT NULL' % (column, column))):
+            counts[(release_id, type_, status, date.date())] += 1
+    op.bulk_insert(table, [
+        {'release_id': release_id, 'type': type_, 'status': status, 'date': date, 'count': count}
+        for (release_id, type_, status, date), count in sorted(counts.items())])
+
+
+def downgrade():
+    """Drop the update_metrics table."""
+    op.drop_index(op.f('ix_update_metrics_date'), table_name='update_metrics')
+    op.drop_table('update_metrics')
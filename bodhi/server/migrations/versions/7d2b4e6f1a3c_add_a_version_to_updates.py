@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add a version to updates.
+
+Revision ID: 7d2b4e6f1a3c
+Revises: 5c86a3f9e2b1
+Create Date: 2017-09-04 10:12:45.503921
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2b4e6f1a3c'
+down_revision = '5c86a3f9e2b1'
+
+
+def upgrade():
+    """Add the version column, starting every existing update at 1."""
+    op.add_column('updates', sa.Column('version', sa.Integer(), server_default='1',
+                                       nullable=False))
+    op.alter_column('updates', 'version', server_default=None)
+
+
+def downgrade():
+    """Drop the version column."""
+    op.drop_column('updates', 'version')
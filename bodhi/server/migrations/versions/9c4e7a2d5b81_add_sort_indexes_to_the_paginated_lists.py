@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add indexes on the sort keys of the paginated lists.
+
+Revision ID: 9c4e7a2d5b81
+Revises: 3e8b1f5a9c2d
+Create Date: 2017-09-08 10:23:17.614093
+"""
+import collections
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e7a2d5b81'
+down_revision = '3e8b1f5a9c2d'
+
+# The indexes of the (date, id) keys bodhi.server.util.paginate() sorts and seeks on, by name.
+SORT_INDEXES = collections.OrderedDict([
+    ('ix_updates_date_submitted_id', ('updates', 'date_submitted')),
+    ('ix_comments_timestamp_id', ('comments', 'timestamp')),
+    ('ix_buildroot_overrides_submission_date_id', ('buildroot_overrides', 'submission_date')),
+])
+
+
+def upgrade():
+    """
+    Add the indexes.
+
+    The lists sort NULL dates before every other date. That is where SQLite puts them, but
+    PostgreSQL needs to be told, in the index as in the queries.
+    """
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for name, (table, column) in SORT_INDEXES.items():
+        if postgresql:
+            op.execute('CREATE INDEX %s ON %s (%s NULLS FIRST, id)' % (name, table, column))
+        else:
+            op.create_index(name, table, [column, 'id'])
+
+
+def downgrade():
+    """Drop the indexes."""
+    for name, (table, column) in reversed(SORT_INDEXES.items()):
+        op.drop_index(name, table_name=table)
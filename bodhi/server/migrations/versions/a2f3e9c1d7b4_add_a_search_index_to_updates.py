@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add a search index to updates.
+
+Revision ID: a2f3e9c1d7b4
+Revises: 4df1fcd59050
+Create Date: 2017-08-28 09:12:45.301877
+"""
+import collections
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2f3e9c1d7b4'
+down_revision = '4df1fcd59050'
+
+# The trigram indexes of the columns searched for substrings, by name.
+TRIGRAM_INDEXES = collections.OrderedDict([
+    ('ix_updates_search_text_trgm', ('updates', 'search_text')),
+    ('ix_packages_name_trgm', ('packages', 'name')),
+    ('ix_users_name_trgm', ('users', 'name')),
+    ('ix_builds_nvr_trgm', ('builds', 'nvr')),
+])
+
+
+def _document(title, alias, notes, packages, bugs):
+    """
+    Return the search text of an update, as the Update model builds it.
+
+    Args:
+        title (unicode): The title of the update.
+        alias (unicode): The alias of the update.
+        notes (unicode): The notes of the update.
+        packages (list): The names of the packages of the builds of the update.
+        bugs (list): The titles of the bugs of the update.
+    Returns:
+        unicode: The search text of the update.
+    """
+    return u'\n'.join(part for part in [title, alias, notes] + packages + bugs if part)
+
+
+def upgrade():
+    """
+    Add the search_text column to the updates table and fill it.
+
+    On PostgreSQL, also index it for full text search, and add trigram indexes to the columns
+    searched for substrings, which ILIKE '%term%' queries can use.
+    """
+    op.add_column('updates', sa.Column('search_text', sa.UnicodeText(), server_default='',
+                                       nullable=False))
+
+    connection = op.get_bind()
+    packages = collections.defaultdict(list)
+    for update_id, name in connection.execute(sa.text(
+            'SELECT builds.update_id, packages.name FROM builds '
+            'JOIN packages ON builds.package_id = packages.id '
+            'WHERE builds.update_id IS NOT NULL ORDER BY builds.update_id, builds.nvr')):
+        packages[update_id].append(name)
+    bugs = collections.defaultdict(list)
+    for update_id, title in connection.execute(sa.text(
+            'SELECT update_bug_table.update_id, bugs.title FROM update_bug_table '
+            'JOIN bugs ON update_bug_table.bug_id = bugs.id '
+            'ORDER BY update_bug_table.update_id, bugs.id')):
+        bugs[update_id].append(title)
+    set_document = sa.text('UPDATE updates SET search_text = :document WHERE id = :id')
+    for update_id, title, alias, notes in connection.execute(sa.text(
+            'SELECT id, title, alias, notes FROM updates')):
+        document = _document(title, alias, notes, packages[update_id], bugs[update_id])
+        if document:
+            connection.execute(set_document, id=update_id, document=document)
+
+    if connection.dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute("CREATE INDEX ix_updates_search_text_fts ON updates "
+               "USING gin (to_tsvector('english', search_text))")
+    for name, (table, column) in TRIGRAM_INDEXES.items():
+        op.execute('CREATE INDEX %s ON %s USING gin (%s gin_trgm_ops)' % (name, table, column))
+
+
+def downgrade():
+    """Drop the search indexes and the search_text column."""
+    if op.get_bind().dialect.name == 'postgresql':
+        for name in reversed(TRIGRAM_INDEXES):
+            op.execute('DROP INDEX %s' % name)
+        op.execute('DROP INDEX ix_updates_search_text_fts')
+    op.drop_column('updates', 'search_text')
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Add a change date to updates.
+
+Revision ID: b5d1e8f3a6c4
+Revises: 9c4e7a2d5b81
+Create Date: 2017-09-11 15:37:02.841596
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d1e8f3a6c4'
+down_revision = '9c4e7a2d5b81'
+
+
+def upgrade():
+    """
+    Add the date_changed column to the updates table.
+
+    The changes made before it existed are unknown, so every update starts as changed now, and the
+    next export of the updates changed since an earlier date includes all of them.
+    """
+    op.add_column('updates', sa.Column('date_changed', sa.DateTime(), nullable=True))
+    op.get_bind().execute(sa.text('UPDATE updates SET date_changed = :now'),
+                          now=datetime.utcnow())
+    op.alter_column('updates', 'date_changed', existing_type=sa.DateTime(), nullable=False)
+    op.create_index(op.f('ix_updates_date_changed'), 'updates', ['date_changed'], unique=False)
+
+
+def downgrade():
+    """Drop the date_changed column."""
+    op.drop_index(op.f('ix_updates_date_changed'), table_name='updates')
+    op.drop_column('updates', 'date_changed')
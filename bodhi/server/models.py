@@ -17,11 +17,13 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from datetime import datetime
 from textwrap import wrap
+from threading import Lock
 import copy
 import hashlib
+import itertools
 import json
 import os
 import re
@@ -32,8 +34,11 @@ import uuid
 from pkgdb2client import PkgDB
 from simplemediawiki import MediaWiki
 from six.moves.urllib.parse import quote
-from sqlalchemy import (and_, Boolean, Column, DateTime, ForeignKey, Integer, or_, Table, Unicode,
-                        UnicodeText, UniqueConstraint)
+from sqlalchemy import (and_, Boolean, Column, Date, DateTime, event, ForeignKey, Integer, or_,
+                        Table, Unicode, UnicodeText, UniqueConstraint)
+from sqlalchemy import func, orm
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import class_mapper, relationship, backref, validates
 from sqlalchemy.orm.exc import NoResultFound
@@ -158,6 +163,192 @@ class DeclEnumType(SchemaType, TypeDecorator):
             t.impl.drop(bind=bind, checkfirst=checkfirst)
 
 
+class JSONSerializer(object):
+    """
+    Serialize instances of one model class to JSON-compatible dictionaries.
+
+    BodhiBase._to_json() used to reflect on the mapper of every object it serialized. Instead, a
+    serializer is compiled once for each model class and chain of classes the object was reached
+    through, with the explicit list of fields it produces. Use :meth:`get` to obtain one.
+
+    Relationships are expanded recursively, except those leading back to a class the object was
+    reached through, whose objects are represented by their id. A model can also limit how deep
+    its relationships are expanded with a ``__json_max_depth__`` class attribute, past which
+    related objects are represented by their id as well.
+
+    A serializer can also be restricted to some fields of the serialized objects, which saves
+    expanding the relationships that are not wanted.
+
+    Attributes:
+        model (type): The model class this serializer handles.
+        seen (tuple): The classes the serialized objects were reached through.
+        depth (int or None): How many more levels of relationships may be expanded, or None for no
+            limit.
+        columns (list): The names of the column attributes to include.
+        extras (list): The names of the extra attributes or methods to include.
+        relationships (list): The names of the relationships to include.
+        converted (list): The names of the fields whose values may need to be converted from
+            datetimes or EnumSymbols.
+        fields (frozenset or None): The names of the fields to restrict the serialized objects to,
+            or None for all of them.
+    """
+
+    # Column types whose values never need converting.
+    _plain_types = (Boolean, Integer, Unicode, UnicodeText)
+
+    _serializers = {}
+
+    # Serializers restricted to the fields clients ask for, least recently used first. Clients may
+    # ask for any subset of the fields, so only the most recent ones are kept.
+    _field_serializers = OrderedDict()
+    _field_serializers_lock = Lock()
+
+    #: How many serializers restricted to fields are kept.
+    max_field_serializers = 128
+
+    def __init__(self, model, seen, depth, fields=None):
+        """
+        Compile the serializer.
+
+        Args:
+            model (type): The model class to serialize.
+            seen (tuple): The classes the serialized objects are reached through.
+            depth (int or None): How many more levels of relationships may be expanded, or None.
+            fields (frozenset or None): The fields to restrict the serialized objects to, or None.
+        """
+        self.model = model
+        self.seen = seen
+        self.depth = depth
+        self.fields = fields
+        exclude = getattr(model, '__exclude_columns__', [])
+        self.columns = []
+        self.extras = list(getattr(model, '__include_extras__', []))
+        self.relationships = []
+        self.converted = list(self.extras)
+        for prop in class_mapper(model).iterate_properties:
+            if prop.key in exclude:
+                continue
+            if type(prop) is RelationshipProperty:
+                if getattr(model, prop.key).property.mapper.class_ not in seen:
+                    self.relationships.append(prop.key)
+            elif not prop.key.startswith('_'):
+                self.columns.append(prop.key)
+                column_types = [c.type for c in getattr(prop, 'columns', [])]
+                if not column_types or not all(isinstance(t, self._plain_types)
+                                               for t in column_types):
+                    self.converted.append(prop.key)
+        if fields is not None:
+            self.columns, self.extras, self.relationships, self.converted = [
+                [name for name in names if name in fields]
+                for names in (self.columns, self.extras, self.relationships, self.converted)]
+        self.anonymity_map = getattr(model, '__anonymity_map__', {}).items()
+        self._child_seen = seen + (model,)
+        self._child_depth = None if depth is None else depth - 1
+
+    @classmethod
+    def get(cls, model, seen=None, depth=None, fields=None):
+        """
+        Return the serializer for a model class, compiling it if needed.
+
+        Only the ``max_field_serializers`` most recently used serializers restricted to fields are
+        kept, so that clients asking for many different fields cannot grow the cache without bound.
+
+        Args:
+            model (type): The model class to serialize.
+            seen (iterable or None): The classes the serialized objects are reached through.
+            depth (int or None): How many more levels of relationships may be expanded. Defaults to
+                the ``__json_max_depth__`` of the model.
+            fields (iterable or None): The fields to restrict the serialized objects to, or None
+                for all of them. Unknown fields are ignored.
+        Returns:
+            JSONSerializer: The serializer.
+        """
+        seen = tuple(seen or ())
+        if depth is None and not seen:
+            depth = getattr(model, '__json_max_depth__', None)
+        if fields is not None:
+            fields = frozenset(fields)
+        key = (model, seen, depth, fields)
+        if fields is None:
+            serializer = cls._serializers.get(key)
+            if serializer is None:
+                serializer = cls._serializers[key] = cls(model, seen, depth, fields)
+            return serializer
+
+        with cls._field_serializers_lock:
+            serializer = cls._field_serializers.pop(key, None)
+        if serializer is None:
+            serializer = cls(model, seen, depth, fields)
+        with cls._field_serializers_lock:
+            cls._field_serializers[key] = serializer
+            while len(cls._field_serializers) > cls.max_field_serializers:
+                cls._field_serializers.popitem(last=False)
+        return serializer
+
+    def serialize(self, obj, request=None, anonymize=False):
+        """
+        Serialize an object.
+
+        Args:
+            obj (BodhiBase): An instance of the model of this serializer.
+            request (pyramid.request.Request or None): Passed to the extra methods.
+            anonymize (bool): Whether to apply the ``__anonymity_map__`` of the model.
+        Returns:
+            dict: The serialized object.
+        """
+        d = dict((attr, getattr(obj, attr)) for attr in self.columns)
+
+        for name in self.extras:
+            attribute = getattr(obj, name)
+            if callable(attribute):
+                attribute = attribute(request)
+            d[name] = attribute
+
+        for attr in self.relationships:
+            d[attr] = self.expand(getattr(obj, attr), request)
+
+        for key in self.converted:
+            value = d[key]
+            if isinstance(value, datetime):
+                d[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+            elif isinstance(value, EnumSymbol):
+                d[key] = unicode(value)
+
+        # If explicitly asked to, we will overwrite some fields if the
+        # corresponding condition of each evaluates to True.
+        # This is primarily for anonymous Comments.  We want to serialize
+        # authenticated FAS usernames in the 'author' field, but we want to
+        # scrub out anonymous users' email addresses.
+        if anonymize:
+            for key1, key2 in self.anonymity_map:
+                if getattr(obj, key2):
+                    d[key1] = 'anonymous'
+
+        return d
+
+    def expand(self, relation, request=None):
+        """
+        Serialize the value of a relationship of an object of this serializer's model.
+
+        Args:
+            relation (object): A related object, a list of them or None.
+            request (pyramid.request.Request or None): Passed to the extra methods.
+        Returns:
+            object: The serialized related object, its id if it must not be expanded, or a list
+                of those.
+        """
+        if hasattr(relation, 'all'):
+            relation = relation.all()
+        if hasattr(relation, '__iter__'):
+            return [self.expand(item, request) for item in relation]
+        if not relation:
+            return None
+        if type(relation) in self.seen or self._child_depth is not None and self._child_depth < 0:
+            return relation.id
+        return JSONSerializer.get(
+            type(relation), self._child_seen, self._child_depth).serialize(relation, request)
+
+
 class BodhiBase(object):
     """
     Base class for the SQLAlchemy model base class.
@@ -166,6 +357,12 @@ class BodhiBase(object):
         __exclude_columns__ (tuple): A list of columns to exclude from JSON
         __include_extras__ (tuple): A list of methods or attrs to include in JSON
         __get_by__ (tuple): A list of columns that :meth:`.get` will query.
+        __loader_profiles__ (dict): Maps the names of the kinds of queries made against the model
+            to how they load its relationships. See :meth:`.loader_options`.
+        __json_computed__ (dict): Maps the names of the fields that :meth:`.__json__` adds to the
+            serialized model to the relationships they are computed from.
+        __json_max_depth__ (int or None): How many levels of relationships :meth:`.__json__`
+            expands, past which related objects are represented by their ids. None for no limit.
         id (int): An integer id that serves as the default primary key.
         query (sqlalchemy.orm.query.Query): a class property which produces a
             Query object against the class and the current Session when called.
@@ -173,84 +370,107 @@ class BodhiBase(object):
     __exclude_columns__ = ('id',)
     __include_extras__ = tuple()
     __get_by__ = ()
+    __loader_profiles__ = {}
+    __json_computed__ = {}
+    __json_max_depth__ = None
+
+    # The loader options used for each loading strategy of __loader_profiles__. selectinload() is
+    # new in SQLAlchemy 1.2, so older versions load "selectin" relationships with a subquery.
+    _loaders = {'joined': 'joinedload', 'none': 'lazyload',
+                'selectin': 'selectinload' if hasattr(orm, 'selectinload') else 'subqueryload'}
 
     id = Column(Integer, primary_key=True)
 
     query = Session.query_property()
 
     @classmethod
-    def get(cls, id, db):
-        return db.query(cls).filter(or_(
+    def get(cls, id, db, profile=None):
+        query = db.query(cls)
+        if profile is not None:
+            query = query.options(*cls.loader_options(profile))
+        return query.filter(or_(
             getattr(cls, col) == id for col in cls.__get_by__
         )).first()
 
+    @classmethod
+    def loader_options(cls, profile, fields=None):
+        """
+        Return the query options that load the relationships of the model for a kind of query.
+
+        The profile is looked up in the ``__loader_profiles__`` of the model, which maps
+        relationship names to a loading strategy: "joined" loads them in the same query with a
+        JOIN, "selectin" loads them for all the returned objects with one more query, and "none"
+        does not load them until they are accessed. Relationships of related objects are named with
+        dotted paths, such as "comments.user". Relationships that the profile does not name keep
+        the strategy they were declared with.
+
+        If the objects will only be serialized with some fields (see :meth:`.__json__`), the
+        relationships that those fields are not made from are not loaded.
+
+        Args:
+            profile (basestring): The name of the profile, such as "list" or "detail".
+            fields (iterable or None): The fields the objects will be serialized with, or None.
+        Returns:
+            list: Options to pass to :meth:`sqlalchemy.orm.query.Query.options`.
+        Raises:
+            KeyError: If the model has no such profile.
+        """
+        paths = cls.__loader_profiles__[profile]
+        if fields is not None:
+            needed = set(fields)
+            for field in fields:
+                needed.update(cls.__json_computed__.get(field, ()))
+            paths = dict((path, strategy) for path, strategy in paths.items()
+                         if path.split('.')[0] in needed)
+            paths.update((name, 'none') for name in class_mapper(cls).relationships.keys()
+                         if name not in needed)
+        options = []
+        for path, strategy in sorted(paths.items()):
+            model = cls
+            option = None
+            names = path.split('.')
+            for i, name in enumerate(names):
+                attribute = getattr(model, name)
+                loader = cls._loaders[strategy] if i == len(names) - 1 else 'defaultload'
+                option = getattr(orm if option is None else option, loader)(attribute)
+                model = attribute.property.mapper.class_
+            options.append(option)
+        return options
+
     def __getitem__(self, key):
         return getattr(self, key)
 
     def __repr__(self):
         return '<{0} {1}>'.format(self.__class__.__name__, self.__json__())
 
-    def __json__(self, request=None, anonymize=False):
+    def __json__(self, request=None, anonymize=False, fields=None):
+        if fields is not None:
+            return JSONSerializer.get(type(self), fields=fields).serialize(self, request, anonymize)
         return self._to_json(self, request=request, anonymize=anonymize)
 
+    @classmethod
+    def json_fields(cls):
+        """
+        Return the names of the fields of the serialized model, which :meth:`.__json__` accepts.
+
+        Returns:
+            set: The names of the fields.
+        """
+        serializer = JSONSerializer.get(cls)
+        return set(serializer.columns + serializer.extras + serializer.relationships +
+                   list(cls.__json_computed__))
+
     @classmethod
     def _to_json(cls, obj, seen=None, request=None, anonymize=False):
-        if not seen:
-            seen = []
         if not obj:
             return
 
-        exclude = getattr(obj, '__exclude_columns__', [])
-        properties = list(class_mapper(type(obj)).iterate_properties)
-        rels = [p.key for p in properties if type(p) is RelationshipProperty]
-        attrs = [p.key for p in properties if p.key not in rels]
-        d = dict([(attr, getattr(obj, attr)) for attr in attrs
-                  if attr not in exclude and not attr.startswith('_')])
-
-        extras = getattr(obj, '__include_extras__', [])
-        for name in extras:
-            attribute = getattr(obj, name)
-            if callable(attribute):
-                attribute = attribute(request)
-            d[name] = attribute
-
-        for attr in rels:
-            if attr in exclude:
-                continue
-            target = getattr(type(obj), attr).property.mapper.class_
-            if target in seen:
-                continue
-            d[attr] = cls._expand(obj, getattr(obj, attr), seen, request)
-
-        for key, value in d.iteritems():
-            if isinstance(value, datetime):
-                d[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-            if isinstance(value, EnumSymbol):
-                d[key] = unicode(value)
-
-        # If explicitly asked to, we will overwrite some fields if the
-        # corresponding condition of each evaluates to True.
-        # This is primarily for anonymous Comments.  We want to serialize
-        # authenticated FAS usernames in the 'author' field, but we want to
-        # scrub out anonymous users' email addresses.
-        if anonymize:
-            for key1, key2 in getattr(obj, '__anonymity_map__', {}).items():
-                if getattr(obj, key2):
-                    d[key1] = 'anonymous'
-
-        return d
+        return JSONSerializer.get(type(obj), seen).serialize(obj, request, anonymize)
 
     @classmethod
     def _expand(cls, obj, relation, seen, req):
         """ Return the to_json or id of a sqlalchemy relationship. """
-        if hasattr(relation, 'all'):
-            relation = relation.all()
-        if hasattr(relation, '__iter__'):
-            return [cls._expand(obj, item, seen, req) for item in relation]
-        if type(relation) not in seen:
-            return cls._to_json(relation, seen + [type(obj)], req)
-        else:
-            return relation.id
+        return JSONSerializer.get(type(obj), seen).expand(relation, req)
 
     @classmethod
     def grid_columns(cls):
@@ -458,10 +678,180 @@ user_package_table = Table(
     Column('package_id', Integer, ForeignKey('packages.id')))
 
 
+class ReleaseRegistryVersion(Base):
+    """
+    A counter that is incremented every time a release is created, edited or deleted.
+
+    The table holds a single row. Every process compares the counter to the version of its
+    :class:`ReleaseRegistry` snapshot to know when the snapshot is out of date.
+
+    Attributes:
+        version (int): The current version of the releases.
+    """
+    __tablename__ = 'release_registry_version'
+
+    version = Column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls, session):
+        """
+        Return the current version of the releases.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+        Returns:
+            int: The version, 0 if the releases were never changed.
+        """
+        return session.query(cls.version).filter_by(id=1).scalar() or 0
+
+    @classmethod
+    def bump(cls, session):
+        """
+        Increment the version of the releases, in the current transaction of session.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+        """
+        updated = session.query(cls).filter_by(id=1).update(
+            {'version': cls.version + 1}, synchronize_session=False)
+        if not updated:
+            session.add(cls(id=1, version=1))
+
+
+class ReleaseSnapshot(object):
+    """
+    An immutable view of every release, indexed for lookups that do not touch the database.
+
+    Attributes:
+        version (int): The :class:`ReleaseRegistryVersion` the snapshot was taken at.
+        releases (list): The serialized releases, ordered by name, descending.
+        by_state (collections.defaultdict): Maps release state values to lists of serialized
+            releases, as returned by :meth:`Release.all_releases`.
+        by_name (dict): Maps release names to serialized releases.
+        by_dist_tag (dict): Maps dist tags to serialized releases.
+        ids (dict): Maps release names to their primary keys.
+        tag_types (dict): Maps tag types (candidate, testing, ...) to lists of tags.
+        tag_releases (dict): Maps tags to the name of the release they belong to.
+    """
+    TAG_TYPES = ('candidate', 'testing', 'stable', 'override', 'pending_testing', 'pending_stable')
+
+    def __init__(self, version, releases):
+        """
+        Index the given releases.
+
+        Args:
+            version (int): The version the releases were loaded at.
+            releases (list): :class:`Release` objects, ordered by name, descending.
+        """
+        self.version = version
+        self.releases = []
+        self.by_state = defaultdict(list)
+        self.by_name = {}
+        self.by_dist_tag = {}
+        self.ids = {}
+        tag_types = dict((key, []) for key in self.TAG_TYPES)
+        self.tag_releases = {}
+        for release in releases:
+            data = release.__json__()
+            self.releases.append(data)
+            self.by_state[release.state.value].append(data)
+            self.by_name[release.name] = data
+            self.by_dist_tag.setdefault(release.dist_tag, data)
+            self.ids[release.name] = release.id
+            for key in tag_types:
+                tag = getattr(release, '%s_tag' % key)
+                tag_types[key].append(tag)
+                self.tag_releases[tag] = release.name
+        self.tag_types = tag_types
+
+
+class ReleaseRegistry(object):
+    """
+    A per-process cache of a :class:`ReleaseSnapshot`, refreshed when the releases change.
+
+    Changes made through this process invalidate the snapshot once they are committed. Until then,
+    the session that made them gets a snapshot of its own, kept in its ``info``, so that no other
+    session sees releases that may be rolled back. Changes made by other processes are noticed by
+    comparing the snapshot version to the :class:`ReleaseRegistryVersion` counter, at most once
+    every ``release_registry.check_interval`` seconds.
+    """
+    # The key of Session.info set when a session changed releases that it did not commit yet, to
+    # the snapshot of its own releases, or to None until it is loaded.
+    CHANGED = 'release_registry_changed'
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._snapshot = None
+        self._checked = 0
+        self._lock = Lock()
+
+    def clear(self):
+        """Forget the current snapshot, so that the next lookup loads the releases again."""
+        with self._lock:
+            self._snapshot = None
+
+    def snapshot(self, session):
+        """
+        Return an up to date snapshot of the releases.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session, only used if the
+                snapshot needs to be checked or refreshed.
+        Returns:
+            ReleaseSnapshot: The snapshot.
+        """
+        if self.CHANGED in session.info:
+            snapshot = session.info[self.CHANGED]
+            if snapshot is None:
+                snapshot = session.info[self.CHANGED] = self._load(
+                    session, ReleaseRegistryVersion.current(session))
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            now = time.time()
+            if snapshot is not None and \
+                    now - self._checked < config.get('release_registry.check_interval'):
+                return snapshot
+            version = ReleaseRegistryVersion.current(session)
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._snapshot = self._load(session, version)
+            self._checked = now
+            return snapshot
+
+    def _load(self, session, version):
+        log.debug('Loading version %d of the releases' % version)
+        releases = session.query(Release).order_by(Release.name.desc()).all()
+        return ReleaseSnapshot(version, releases)
+
+    def get(self, session, name=None, tag=None, dist_tag=None):
+        """
+        Return the serialized release with the given name, tag or dist tag.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+            name (basestring): The name of the release.
+            tag (basestring): One of the Koji tags of the release.
+            dist_tag (basestring): The dist tag of the release.
+        Returns:
+            dict or None: The serialized release, or None if there is no such release.
+        """
+        snapshot = self.snapshot(session)
+        if tag is not None:
+            name = snapshot.tag_releases.get(tag)
+        if dist_tag is not None:
+            return snapshot.by_dist_tag.get(dist_tag)
+        return snapshot.by_name.get(name)
+
+
 class Release(Base):
     __tablename__ = 'releases'
     __exclude_columns__ = ('id', 'builds')
     __get_by__ = ('name', 'long_name', 'dist_tag')
+    __cache_regions__ = ('home', 'releases', 'candidates', 'stats')
+
+    #: A cache of every release, shared by the whole process.
+    registry = ReleaseRegistry()
 
     name = Column(Unicode(10), unique=True, nullable=False)
     long_name = Column(Unicode(25), unique=True, nullable=False)
@@ -507,40 +897,95 @@ class Release(Base):
 
     @classmethod
     def all_releases(cls, session):
-        if cls._all_releases:
-            return cls._all_releases
-        releases = defaultdict(list)
-        for release in session.query(cls).order_by(cls.name.desc()).all():
-            releases[release.state.value].append(release.__json__())
-        cls._all_releases = releases
-        return cls._all_releases
-    _all_releases = None
+        """
+        Return the serialized releases, grouped by state.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+        Returns:
+            collections.defaultdict: Maps release state values to lists of serialized releases,
+                ordered by name, descending.
+        """
+        return cls.registry.snapshot(session).by_state
 
     @classmethod
     def get_tags(cls, session):
-        if cls._tag_cache:
-            return cls._tag_cache
-        data = {'candidate': [], 'testing': [], 'stable': [], 'override': [],
-                'pending_testing': [], 'pending_stable': []}
-        tags = {}  # tag -> release lookup
-        for release in session.query(cls).all():
-            for key in data:
-                tag = getattr(release, '%s_tag' % key)
-                data[key].append(tag)
-                tags[tag] = release.name
-        cls._tag_cache = (data, tags)
-        return cls._tag_cache
-    _tag_cache = None
+        """
+        Return the Koji tags of every release.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+        Returns:
+            tuple: A 2-tuple of a dictionary mapping tag types (candidate, testing, ...) to lists of
+                tags, and a dictionary mapping tags to release names.
+        """
+        snapshot = cls.registry.snapshot(session)
+        return snapshot.tag_types, snapshot.tag_releases
 
     @classmethod
     def from_tags(cls, tags, session):
-        tag_types, tag_rels = cls.get_tags(session)
+        """
+        Return the release the first of the given tags belongs to.
+
+        Args:
+            tags (list): Koji tags.
+            session (sqlalchemy.orm.session.Session): A database session.
+        Returns:
+            Release or None: The release, or None if it was not found.
+        Raises:
+            KeyError: If a tag does not belong to any release.
+        """
+        snapshot = cls.registry.snapshot(session)
         for tag in tags:
-            release = session.query(cls).filter_by(name=tag_rels[tag]).first()
+            release = session.query(cls).get(snapshot.ids[snapshot.tag_releases[tag]])
             if release:
                 return release
 
 
+@event.listens_for(Session, 'before_flush')
+def _bump_release_registry_version(session, flush_context, instances):
+    """
+    Increment the release registry version when a flush creates, edits or deletes a release.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session being flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+        instances (list or None): Unused.
+    """
+    # Adding builds to a release changes its builds collection, which is not part of the registry.
+    dirty = (obj for obj in session.dirty
+             if isinstance(obj, Release) and session.is_modified(obj, include_collections=False))
+    for obj in itertools.chain(session.new, session.deleted, dirty):
+        if isinstance(obj, Release):
+            ReleaseRegistryVersion.bump(session)
+            session.info[ReleaseRegistry.CHANGED] = None
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_release_registry(session):
+    """
+    Forget the release registry snapshot once a change to the releases is committed.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that was committed.
+    """
+    if ReleaseRegistry.CHANGED in session.info:
+        del session.info[ReleaseRegistry.CHANGED]
+        Release.registry.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_release_registry_changes(session):
+    """
+    Forget that a session changed releases, once its changes are rolled back.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session that was rolled back.
+    """
+    session.info.pop(ReleaseRegistry.CHANGED, None)
+
+
 class TestCase(Base):
     """Test cases from the wiki"""
     __tablename__ = 'testcases'
@@ -812,6 +1257,9 @@ class Build(Base):
     __mapper_args__ = {
         'polymorphic_on': type,
         'polymorphic_identity': ContentType.base,
+        # The columns of every kind of build are in this table, so load them all at once rather
+        # than with one query per build the first time a column of a subclass is used.
+        'with_polymorphic': '*',
     }
 
     def get_url(self):
@@ -1070,11 +1518,72 @@ class Update(Base):
             Greenwave integration was not enabled when the update was created.
         greenwave_summary_string (unicode): A short summary of the outcome from Greenwave
             (e.g. 2 of 32 required tests failed).
+        karma_positive (int): The sum of the positive karma votes since the last karma reset.
+        karma_negative (int): The sum of the negative karma votes since the last karma reset.
+        karma_votes (unicode): A JSON object mapping user names to their latest karma vote since
+            the last karma reset.
+        date_karma_reset (DateTime): The date the karma was last reset, because builds were added
+            to or removed from the update, or ``None``.
+        search_text (unicode): The text searches match the update against: its title, alias and
+            notes, and the names of its packages and the titles of its bugs. It is maintained by
+            _update_search_text() and indexed for full text search on PostgreSQL.
+        version (int): A counter incremented by _bump_update_versions() every time the update, or
+            its builds, comments or bugs, change. The web services derive their ETags from it.
+        date_changed (DateTime): When the version was last incremented, which exports of the
+            updates changed since a date filter on.
     """
     __tablename__ = 'updates'
-    __exclude_columns__ = ('id', 'user_id', 'release_id', 'cves')
+    __exclude_columns__ = ('id', 'user_id', 'release_id', 'cves', 'karma_positive',
+                           'karma_negative', 'karma_votes', 'date_karma_reset', 'search_text',
+                           'version', 'date_changed')
     __include_extras__ = ('meets_testing_requirements', 'url',)
+    __json_computed__ = {'content_type': ('builds',), 'karma': (), 'submitter': ('user',),
+                         'test_cases': ('builds',), 'updateid': ()}
     __get_by__ = ('title', 'alias')
+    # The cache regions invalidated when updates change (see bodhi.server.cache).
+    __cache_regions__ = ('home',)
+    # The cache regions invalidated when updates are created or deleted, or when these attributes
+    # change.
+    __cache_attribute_regions__ = {'stats': ('release', 'status', 'type')}
+    # How each kind of query loads the relationships of updates (see BodhiBase.loader_options()).
+    # Collections are never joined when several updates are loaded, since joining more than one of
+    # them multiplies the number of rows returned. The updates of their builds and comments are
+    # already loaded, so they are not joined again.
+    __loader_profiles__ = {
+        # Pages of updates, which are serialized with everything they relate to.
+        'list': {
+            'bugs': 'selectin', 'bugs.feedback': 'selectin', 'builds': 'selectin',
+            'builds.package.test_cases': 'selectin', 'builds.update': 'none',
+            'comments': 'selectin', 'comments.bug_feedback': 'selectin',
+            'comments.testcase_feedback': 'selectin', 'comments.update': 'none',
+            'comments.user': 'joined', 'comments.user.groups': 'selectin', 'release': 'joined',
+            'user': 'joined', 'user.groups': 'selectin'},
+        # A single update, shown with everything it relates to.
+        'detail': {
+            'bugs': 'selectin', 'bugs.feedback': 'selectin', 'builds': 'joined',
+            'builds.package.test_cases': 'selectin', 'builds.update': 'none',
+            'comments': 'selectin', 'comments.bug_feedback': 'selectin',
+            'comments.testcase_feedback': 'selectin', 'comments.update': 'none',
+            'comments.user': 'joined', 'comments.user.groups': 'selectin', 'release': 'joined',
+            'user': 'joined', 'user.groups': 'selectin'},
+        # Updates being pushed, whose builds and bugs are needed but not their comments.
+        'masher': {
+            'bugs': 'selectin', 'builds': 'selectin', 'builds.update': 'none', 'comments': 'none',
+            'release': 'joined', 'user': 'joined'},
+        # Feeds and summaries, which only show the updates themselves and their builds.
+        'feed': {
+            'bugs': 'none', 'builds': 'selectin', 'builds.update': 'none', 'comments': 'none',
+            'release': 'joined', 'user': 'joined'},
+        # Checks of the karma of every update, which only need their comments and who wrote them.
+        'karma': {
+            'bugs': 'none', 'builds': 'none', 'comments': 'selectin', 'comments.update': 'none',
+            'comments.user': 'joined', 'release': 'none'},
+        # Exports of updates, with their builds and comments (see bodhi.server.export).
+        'export': {
+            'bugs': 'none', 'builds': 'selectin', 'builds.update': 'none',
+            'comments': 'selectin', 'comments.update': 'none', 'comments.user': 'joined',
+            'release': 'joined', 'user': 'joined'},
+    }
 
     title = Column(UnicodeText, unique=True, default=None, index=True)
 
@@ -1139,6 +1648,22 @@ class Update(Base):
     test_gating_status = Column(TestGatingStatus.db_type(), default=None, nullable=True)
     greenwave_summary_string = Column(Unicode(255))
 
+    # Karma aggregates, maintained as comments are added (see _record_karma())
+    karma_positive = Column(Integer, default=0, nullable=False)
+    karma_negative = Column(Integer, default=0, nullable=False)
+    karma_votes = Column(UnicodeText, default=u'{}', nullable=False)
+    date_karma_reset = Column(DateTime)
+
+    # What searches match, maintained by _update_search_text()
+    search_text = Column(UnicodeText, default=u'', nullable=False)
+    version = Column(Integer, default=1, nullable=False)
+    date_changed = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    # The attributes the search text is made of.
+    _search_attributes = ('title', 'alias', 'notes', 'builds', 'bugs')
+    # The text search configuration of the full text search index (see the a2f3e9c1d7b4 migration).
+    _search_config = 'english'
+
     # WARNING: consumers/masher.py assumes that this validation is performed!
     @validates('builds')
     def validate_builds(self, key, build):
@@ -1158,6 +1683,44 @@ class Update(Base):
             raise ValueError(u'An update must contain builds of the same type.')
         return build
 
+    def _search_document(self):
+        """
+        Return the text searches should match this update against.
+
+        Returns:
+            unicode: The title, alias and notes of the update, the names of the packages of its
+                builds and the titles of its bugs, one per line.
+        """
+        parts = [self.title, self.alias, self.notes]
+        parts.extend(build.package.name for build in self.builds if build.package)
+        parts.extend(bug.title for bug in self.bugs)
+        return u'\n'.join(part for part in parts if part)
+
+    @classmethod
+    def search(cls, query, term):
+        """
+        Filter a query of updates down to the ones whose search text matches the given term.
+
+        On PostgreSQL, updates match if their search text contains the words of the term, which is
+        found with its full text search index, or the term itself, which is found with its trigram
+        index. They can then be ranked by how well they match. Other databases fall back to a case
+        insensitive substring match, and can't rank the results.
+
+        Args:
+            query (sqlalchemy.orm.query.Query): The query of updates to filter.
+            term (basestring): What to search for.
+        Returns:
+            tuple: A 2-tuple of the filtered query, and an expression of the rank of each update to
+                sort the results by in descending order, or None if the database can't rank them.
+        """
+        substring = cls.search_text.ilike(u'%%%s%%' % term)
+        if query.session.get_bind().dialect.name != 'postgresql':
+            return query.filter(substring), None
+        document = func.to_tsvector(cls._search_config, cls.search_text)
+        words = func.plainto_tsquery(cls._search_config, term)
+        query = query.filter(or_(document.op('@@')(words), substring))
+        return query, func.ts_rank(document, words)
+
     @property
     def mandatory_days_in_testing(self):
         """
@@ -1175,7 +1738,7 @@ class Update(Base):
     @property
     def karma(self):
         """
-        Calculate and return the karma for the Update.
+        Return the karma for the Update.
 
         :return: The Update's current karma.
         :rtype:  int
@@ -1186,26 +1749,120 @@ class Update(Base):
     @property
     def _composite_karma(self):
         """
-        Calculate and return a 2-tuple of the sum of the positive karma comments, and the sum of the
-        negative karma comments. The total karma is simply the sum of the two elements of this
-        2-tuple.
+        Return a 2-tuple of the sum of the positive karma comments, and the sum of the negative
+        karma comments. The total karma is simply the sum of the two elements of this 2-tuple.
+
+        The sums are maintained by _record_karma() as comments are added, so this does not need to
+        look at the comments.
 
         :return: a 2-tuple of (positive_karma, negative_karma)
         :rtype:  tuple
         """
+        return self.karma_positive or 0, self.karma_negative or 0
+
+    @property
+    def karma_by_user(self):
+        """
+        Return the latest karma vote of each user since the last karma reset.
+
+        :return: a dictionary mapping user names to karma
+        :rtype:  dict
+        """
+        return json.loads(self.karma_votes or u'{}')
+
+    def _compute_karma(self):
+        """
+        Calculate the karma aggregates from the comments.
+
+        This is what _record_karma() maintains incrementally. It walks every comment, so it is only
+        used to check or repair the stored aggregates.
+
+        :return: a 4-tuple of (positive_karma, negative_karma, karma_by_user, date_karma_reset)
+        :rtype:  tuple
+        """
         positive_karma = 0
         negative_karma = 0
-        users_counted = set()
-        for comment in self.comments_since_karma_reset:
-            if comment.karma and not comment.anonymous and comment.user.name not in users_counted:
+        votes = {}
+        date_karma_reset = None
+        # Like comments_since_karma_reset, but keeping the comment that reset the karma.
+        for comment in reversed(self.comments):
+            if comment.is_karma_reset:
+                date_karma_reset = comment.timestamp
+                break
+            if comment.karma and not comment.anonymous and comment.user.name not in votes:
                 # Make sure we only count the last comment this user made
-                users_counted.add(comment.user.name)
+                votes[comment.user.name] = comment.karma
                 if comment.karma > 0:
                     positive_karma += comment.karma
                 else:
                     negative_karma += comment.karma
 
-        return positive_karma, negative_karma
+        return positive_karma, negative_karma, votes, date_karma_reset
+
+    def _record_karma(self, comment):
+        """
+        Update the karma aggregates with a comment that was just added to this update.
+
+        :param comment: the new comment
+        :type  comment: Comment
+        """
+        if comment.is_karma_reset:
+            # Date the comment now rather than when it is flushed, so the reset date matches it.
+            if comment.timestamp is None:
+                comment.timestamp = datetime.utcnow()
+            self.reset_karma(comment.timestamp)
+            return
+        if not comment.karma or comment.anonymous or comment.user is None:
+            return
+
+        positive_karma, negative_karma = self._composite_karma
+        votes = self.karma_by_user
+        # Only the last vote of each user counts, so take back their previous one.
+        previous_karma = votes.get(comment.user.name, 0)
+        if previous_karma > 0:
+            positive_karma -= previous_karma
+        else:
+            negative_karma -= previous_karma
+        if comment.karma > 0:
+            positive_karma += comment.karma
+        else:
+            negative_karma += comment.karma
+        votes[comment.user.name] = comment.karma
+
+        self.karma_positive = positive_karma
+        self.karma_negative = negative_karma
+        self.karma_votes = unicode(json.dumps(votes, sort_keys=True))
+
+    def reset_karma(self, date=None):
+        """
+        Forget every karma vote, as happens whenever a build is added or removed from the update.
+
+        :param date: when the karma was reset, defaults to now
+        :type  date: datetime.datetime
+        """
+        self.karma_positive = 0
+        self.karma_negative = 0
+        self.karma_votes = u'{}'
+        self.date_karma_reset = date or datetime.utcnow()
+
+    def check_karma_aggregates(self, fix=False):
+        """
+        Compare the stored karma aggregates to the ones calculated from the comments.
+
+        :param fix: whether to replace the stored aggregates when they are wrong
+        :type  fix: bool
+        :return: whether the stored aggregates were consistent with the comments
+        :rtype:  bool
+        """
+        positive_karma, negative_karma, votes, date_karma_reset = self._compute_karma()
+        consistent = (self._composite_karma == (positive_karma, negative_karma) and
+                      self.karma_by_user == votes and self.date_karma_reset == date_karma_reset)
+        if not consistent and fix:
+            self.karma_positive = positive_karma
+            self.karma_negative = negative_karma
+            self.karma_votes = unicode(json.dumps(votes, sort_keys=True))
+            self.date_karma_reset = date_karma_reset
+        return consistent
 
     @property
     def comments_since_karma_reset(self):
@@ -1219,8 +1876,7 @@ class Update(Base):
         # the most recent comments from any given user and only the comments
         # since the most recent karma reset event.
         for comment in reversed(self.comments):
-            if (comment.user.name == u'bodhi' and
-                    ('New build' in comment.text or 'Removed build' in comment.text)):
+            if comment.is_karma_reset:
                 # We only want to consider comments since the most recent karma
                 # reset, which happens whenever a build is added or removed
                 # from an Update. Since we are traversing the comments in
@@ -1827,8 +2483,8 @@ class Update(Base):
             log.warn("Not removing builds of %s from empty tag" % self.title)
             return []  # An empty iterator in place of koji multicall
 
-        return_multicall = not koji
-        if not koji:
+        return_multicall = koji is None
+        if koji is None:
             koji = buildsys.get_session()
             koji.multicall = True
         for build in self.builds:
@@ -1888,7 +2544,14 @@ class Update(Base):
         elif self.status is UpdateStatus.obsolete:
             self.comment(db, u'This update has been obsoleted.', author=u'bodhi')
 
-    def send_update_notice(self):
+    def send_update_notice(self, facts=None):
+        """
+        Send e-mail notices about this update to the appropriate mailing list.
+
+        Args:
+            facts (bodhi.server.facts.UpdateFacts or None): A cache of Koji and bug data to reuse
+                while building the notice. See bodhi.server.mail.get_template().
+        """
         log.debug("Sending update notice for %s" % self.title)
         mailinglist = None
         sender = config.get('bodhi_email')
@@ -1911,7 +2574,7 @@ class Update(Base):
             templatetype = '%s_errata_template' % release_name
 
         if mailinglist:
-            for subject, body in mail.get_template(self, templatetype):
+            for subject, body in mail.get_template(self, templatetype, facts=facts):
                 mail.send_mail(sender, mailinglist, subject, body)
                 notifications.publish(
                     topic='errata.publish',
@@ -2298,22 +2961,17 @@ class Update(Base):
 
             # query results for each build
             # retrieve timestamp for each build so that queries can be optimized
-            koji = buildsys.get_session()
-            koji.multicall = True
-            for build in self.builds:
-                koji.getBuild(build.nvr)
-            buildinfos = koji.multiCall()
+            batch = buildsys.MulticallBatch()
+            buildinfos = [batch.getBuild(build.nvr) for build in self.builds]
 
-            for index, build in enumerate(self.builds):
-                multicall_response = buildinfos[index]
-                if (not isinstance(multicall_response, list) or
-                        not isinstance(multicall_response[0], dict)):
+            for build, buildinfo in zip(self.builds, buildinfos):
+                if buildinfo.exception() is not None or not isinstance(buildinfo.result(), dict):
                     msg = ("Error retrieving data from Koji for %r: %r" %
-                           (build.nvr, multicall_response))
+                           (build.nvr, buildinfo.exception() or buildinfo.result()))
                     log.error(msg)
                     raise TypeError(msg)
 
-                buildinfo = multicall_response[0]
+                buildinfo = buildinfo.result()
                 ts = datetime.utcfromtimestamp(buildinfo['completion_ts']).isoformat()
 
                 query = dict(type='koji_build', item=build.nvr, since=ts,
@@ -2579,36 +3237,349 @@ class Update(Base):
                 'Unable to determine requested tag for %s.' % self.title)
         return tag
 
-    def __json__(self, request=None, anonymize=False):
+    def __json__(self, request=None, anonymize=False, fields=None):
         result = super(Update, self).__json__(
-            request=request, anonymize=anonymize)
+            request=request, anonymize=anonymize, fields=fields)
+
+        def wanted(field):
+            return fields is None or field in fields
+
         # Duplicate alias as updateid for backwards compat with bodhi1
-        result['updateid'] = result['alias']
+        if wanted('updateid'):
+            result['updateid'] = self.alias
         # Also, put the update submitter's name in the same place we put
         # it for bodhi1 to make fedmsg.meta compat much more simple.
-        result['submitter'] = result['user']['name']
+        if wanted('submitter'):
+            result['submitter'] = self.user.name
         # Include the karma total in the results
-        result['karma'] = self.karma
+        if wanted('karma'):
+            result['karma'] = self.karma
         # Also, the Update content_type (derived from the builds content_types)
-        result['content_type'] = self.content_type.value if self.content_type else None
+        if wanted('content_type'):
+            result['content_type'] = self.content_type.value if self.content_type else None
 
         # For https://github.com/fedora-infra/bodhi/issues/270, throw the JSON
         # of the test cases in our output as well but take extra care to
         # short-circuit some of the insane recursion for
         # https://github.com/fedora-infra/bodhi/issues/343
-        seen = [Package, TestCaseKarma]
-        result['test_cases'] = [
-            test._to_json(
-                obj=test,
-                seen=seen,
-                request=request,
-                anonymize=anonymize)
-            for test in self.full_test_cases
-        ]
+        if wanted('test_cases'):
+            seen = [Package, TestCaseKarma]
+            result['test_cases'] = [
+                test._to_json(
+                    obj=test,
+                    seen=seen,
+                    request=request,
+                    anonymize=anonymize)
+                for test in self.full_test_cases
+            ]
 
         return result
 
 
+@event.listens_for(Session, 'before_flush')
+def _update_search_text(session, flush_context, instances):
+    """
+    Recalculate the search text of the updates a flush changes the searchable text of.
+
+    That is the new updates, the ones whose title, alias, notes, builds or bugs changed, and the
+    updates of bugs whose title changed.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session being flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+        instances (list or None): Unused.
+    """
+    def changed(obj, attributes):
+        state = sqlalchemy.inspect(obj)
+        return any(state.attrs[name].history.has_changes() for name in attributes)
+
+    updates = set()
+    for obj in session.new:
+        if isinstance(obj, Update):
+            updates.add(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Update) and changed(obj, Update._search_attributes):
+            updates.add(obj)
+        elif isinstance(obj, Bug) and changed(obj, ('title',)):
+            updates.update(obj.updates)
+    for update in updates:
+        if update in session.deleted:
+            continue
+        document = update._search_document()
+        if update.search_text != document:
+            update.search_text = document
+
+
+def _increment_counters(session, model, keys, increments):
+    """
+    Add to the counters of the row of a counter table that has the given keys.
+
+    On PostgreSQL, the row is created or updated with one INSERT ... ON CONFLICT DO UPDATE, so that
+    concurrent transactions creating the same row add to it instead of failing on its uniqueness
+    constraint. Elsewhere, the row is only updated: SQLite lets one transaction write at a time, so
+    the caller can add the row if there was none.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): A database session.
+        model (type): The model of the counter table. It must have a uniqueness constraint on the
+            keys.
+        keys (dict): The values of the columns that identify the row, by name.
+        increments (dict): What to add to the counter columns, by name.
+    Returns:
+        bool: Whether the row was written. If not, the caller must add it to the session.
+    """
+    if session.get_bind().dialect.name != 'postgresql':
+        return bool(session.query(model).filter_by(**keys).update(
+            dict((name, getattr(model, name) + value) for name, value in increments.items()),
+            synchronize_session=False))
+    table = model.__table__
+    insert = postgresql.insert(table).values(**dict(keys, **increments))
+    insert = insert.on_conflict_do_update(
+        index_elements=sorted(keys),
+        set_=dict((name, table.c[name] + insert.excluded[name]) for name in increments))
+    session.execute(insert)
+    return True
+
+
+class UpdateMetric(Base):
+    """
+    The number of updates of a release and type that entered a status on a given day.
+
+    The rows are maintained by _record_update_metrics() as updates are created and change status, so
+    the history of the releases can be graphed without going through their updates.
+
+    Attributes:
+        release (Release): The release of the updates.
+        type (EnumSymbol): The type of the updates, one of the values of :class:`UpdateType`.
+        status (EnumSymbol): The status the updates entered, one of the values of
+            :class:`UpdateStatus`.
+        date (date): The day the updates entered the status, in UTC.
+        count (int): How many updates entered the status that day.
+    """
+    __tablename__ = 'update_metrics'
+    __table_args__ = (UniqueConstraint('release_id', 'type', 'status', 'date'),)
+    __exclude_columns__ = ('id', 'release_id')
+    __cache_regions__ = ('stats',)
+
+    release_id = Column(Integer, ForeignKey('releases.id'), nullable=False)
+    release = relationship('Release', lazy='joined')
+    type = Column(UpdateType.db_type(), nullable=False)
+    status = Column(UpdateStatus.db_type(), nullable=False)
+    date = Column(Date, nullable=False, index=True)
+    count = Column(Integer, default=0, nullable=False)
+
+    @classmethod
+    def increment(cls, session, release, update_type, status, date, count=1):
+        """
+        Add to the number of updates of a release and type that entered a status on a day.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+            release (Release): The release of the updates.
+            update_type (EnumSymbol): The type of the updates.
+            status (EnumSymbol): The status the updates entered.
+            date (date): The day they entered it.
+            count (int): How many updates entered it.
+        """
+        # Nothing can count a release that is not saved yet, so its row can simply be added.
+        if release.id is not None and _increment_counters(
+                session, cls, {'release_id': release.id, 'type': update_type, 'status': status,
+                               'date': date},
+                {'count': count}):
+            return
+        session.add(cls(release=release, type=update_type, status=status, date=date, count=count))
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_update_metrics(session, flush_context, instances):
+    """
+    Count the updates a flush creates or changes the status of in the :class:`UpdateMetric` table.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session being flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+        instances (list or None): Unused.
+    """
+    counts = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Update) and obj.release is not None:
+            # The default status is only set when the update is inserted.
+            status = obj.status or UpdateStatus.pending
+            counts[(obj.release, obj.type, status)] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Update) and obj.release is not None and obj.status is not None and \
+                sqlalchemy.inspect(obj).attrs.status.history.added:
+            counts[(obj.release, obj.type, obj.status)] += 1
+    if not counts:
+        return
+    today = datetime.utcnow().date()
+    for (release, update_type, status), count in counts.items():
+        UpdateMetric.increment(session, release, update_type, status, today, count)
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_update_versions(session, flush_context, instances):
+    """
+    Increment the version of the updates whose fields, builds, comments or bugs a flush changes.
+
+    Their date_changed is set to the current time as well.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session being flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+        instances (list or None): Unused.
+    """
+    updates = set()
+    for obj in itertools.chain(session.new, session.deleted):
+        if isinstance(obj, (Build, Comment)) and obj.update is not None:
+            updates.add(obj.update)
+    for obj in session.dirty:
+        if not session.is_modified(obj):
+            continue
+        if isinstance(obj, Update):
+            updates.add(obj)
+        elif isinstance(obj, (Build, Comment)) and obj.update is not None:
+            updates.add(obj.update)
+        elif isinstance(obj, Bug):
+            updates.update(obj.updates)
+    for update in updates:
+        # New updates start at the default version, and deleted ones have no version to bump.
+        if update in session.new or update in session.deleted:
+            continue
+        # Incrementing in SQL does not lose the changes of concurrent transactions.
+        update.version = Update.version + 1
+        update.date_changed = datetime.utcnow()
+
+
+class UserActivity(Base):
+    """
+    The comments a user wrote on a given day, and the karma they gave with them.
+
+    The rows are maintained by _record_user_activity() as comments are added, so the activity of
+    users, and the top testers of the last days, can be read without going through their comments.
+
+    Attributes:
+        user (User): The user.
+        date (date): The day, in UTC.
+        comments (int): How many comments the user wrote that day.
+        karma_positive (int): The sum of the positive karma of those comments.
+        karma_negative (int): The sum of the negative karma of those comments.
+    """
+    __tablename__ = 'user_activity'
+    __table_args__ = (UniqueConstraint('user_id', 'date'),)
+    __exclude_columns__ = ('id', 'user_id', 'user')
+    __cache_regions__ = ('activity',)
+
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user = relationship('User')
+    date = Column(Date, nullable=False, index=True)
+    comments = Column(Integer, default=0, nullable=False)
+    karma_positive = Column(Integer, default=0, nullable=False)
+    karma_negative = Column(Integer, default=0, nullable=False)
+
+    @classmethod
+    def increment(cls, session, user, date, comments, karma_positive=0, karma_negative=0):
+        """
+        Add to the comments a user wrote on a day, and to the karma they gave with them.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+            user (User): The user.
+            date (date): The day they wrote the comments.
+            comments (int): How many comments they wrote.
+            karma_positive (int): The sum of the positive karma of the comments.
+            karma_negative (int): The sum of the negative karma of the comments.
+        """
+        # Nothing can count a user that is not saved yet, so their row can simply be added.
+        if user.id is not None and _increment_counters(
+                session, cls, {'user_id': user.id, 'date': date},
+                {'comments': comments, 'karma_positive': karma_positive,
+                 'karma_negative': karma_negative}):
+            return
+        session.add(cls(user=user, date=date, comments=comments,
+                        karma_positive=karma_positive, karma_negative=karma_negative))
+
+
+class UserUpdateCount(Base):
+    """
+    The number of updates a user submitted that have a given status.
+
+    The rows are maintained by _record_user_activity() as updates are created, change status and
+    are deleted.
+
+    Attributes:
+        user (User): The user who submitted the updates.
+        status (EnumSymbol): The status of the updates, one of the values of :class:`UpdateStatus`.
+        count (int): How many of the user's updates have that status.
+    """
+    __tablename__ = 'user_update_counts'
+    __table_args__ = (UniqueConstraint('user_id', 'status'),)
+    __exclude_columns__ = ('id', 'user_id', 'user')
+
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user = relationship('User')
+    status = Column(UpdateStatus.db_type(), nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+    @classmethod
+    def increment(cls, session, user, status, count):
+        """
+        Add to the number of updates a user submitted that have a status.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): A database session.
+            user (User): The user who submitted the updates.
+            status (EnumSymbol): The status of the updates.
+            count (int): How many updates to add, which is negative if they left the status.
+        """
+        # Nothing can count a user that is not saved yet, so their row can simply be added.
+        if user.id is not None and _increment_counters(
+                session, cls, {'user_id': user.id, 'status': status}, {'count': count}):
+            return
+        session.add(cls(user=user, status=status, count=count))
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_user_activity(session, flush_context, instances):
+    """
+    Count the comments and updates of users that a flush creates, changes or deletes.
+
+    New comments are counted in the :class:`UserActivity` table, and the statuses of updates in the
+    :class:`UserUpdateCount` table.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session being flushed.
+        flush_context (sqlalchemy.orm.session.UOWTransaction): Unused.
+        instances (list or None): Unused.
+    """
+    activity = defaultdict(lambda: [0, 0, 0])
+    statuses = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Comment) and obj.user is not None:
+            counts = activity[(obj.user, (obj.timestamp or datetime.utcnow()).date())]
+            counts[0] += 1
+            counts[1] += max(obj.karma or 0, 0)
+            counts[2] += min(obj.karma or 0, 0)
+        elif isinstance(obj, Update) and obj.user is not None:
+            # The default status is only set when the update is inserted.
+            statuses[(obj.user, obj.status or UpdateStatus.pending)] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Update) and obj.user is not None:
+            history = sqlalchemy.inspect(obj).attrs.status.history
+            if history.added and history.deleted and history.deleted[0] is not None:
+                statuses[(obj.user, history.deleted[0])] -= 1
+                statuses[(obj.user, history.added[0])] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Update) and obj.user is not None:
+            history = sqlalchemy.inspect(obj).attrs.status.history
+            statuses[(obj.user, (history.deleted or history.unchanged)[0])] -= 1
+    for (user, date), (comments, karma_positive, karma_negative) in activity.items():
+        UserActivity.increment(session, user, date, comments, karma_positive, karma_negative)
+    for (user, status), count in statuses.items():
+        if count:
+            UserUpdateCount.increment(session, user, status, count)
+
+
 # Used for many-to-many relationships between karma and a bug
 class BugKarma(Base):
     __tablename__ = 'comment_bug_assoc'
@@ -2639,6 +3610,9 @@ class Comment(Base):
     __tablename__ = 'comments'
     __exclude_columns__ = tuple()
     __get_by__ = ('id',)
+    # The user activity that new comments count is upserted without flushing UserActivity objects,
+    # so comments invalidate the top testers themselves (see bodhi.server.cache).
+    __cache_regions__ = ('home', 'activity')
     # If 'anonymous' is true, then scrub the 'author' field in __json__(...)
     __anonymity_map__ = {'user': u'anonymous'}
 
@@ -2655,6 +3629,19 @@ class Comment(Base):
         url = '/updates/' + self.update.title + '#comment-' + str(self.id)
         return url
 
+    @property
+    def is_karma_reset(self):
+        """
+        Return whether this comment resets the karma of its update.
+
+        Bodhi comments on updates when builds are added or removed, which resets their karma.
+
+        Returns:
+            bool: True if this is such a comment.
+        """
+        return (self.user is not None and self.user.name == u'bodhi' and bool(self.text) and
+                ('New build' in self.text or 'Removed build' in self.text))
+
     @property
     def unique_testcase_feedback(self):
         """This will filter out duplicates for testcases. It will return the
@@ -2701,6 +3688,19 @@ class Comment(Base):
                                               self.timestamp, karma, self.text)
 
 
+@event.listens_for(Update.comments, 'append')
+def _record_comment_karma(update, comment, initiator):
+    """
+    Maintain the karma aggregates of an update when a comment is added to it.
+
+    Args:
+        update (Update): The update being commented.
+        comment (Comment): The new comment.
+        initiator (sqlalchemy.orm.attributes.Event): Unused.
+    """
+    update._record_karma(comment)
+
+
 class CVE(Base):
     __tablename__ = 'cves'
     __exclude_columns__ = ('id', 'updates', 'bugs')
@@ -2821,6 +3821,10 @@ class User(Base):
                            'buildroot_overrides')
     __include_extras__ = ('avatar', 'openid')
     __get_by__ = ('name',)
+    __loader_profiles__ = {
+        # Lists of users, which are serialized with their groups but not their overrides.
+        'list': {'buildroot_overrides': 'none', 'groups': 'selectin'},
+    }
 
     name = Column(Unicode(64), unique=True, nullable=False)
     email = Column(UnicodeText, unique=True)
@@ -1,10 +1,131 @@
 import io
+import itertools
+import json
 import operator
 
+from lxml import etree
 from pytz import utc
 from pyramid.exceptions import HTTPNotFound
+from feedgen.entry import FeedEntry
 from feedgen.feed import FeedGenerator
 
+from bodhi.server.util import QueryStream
+
+
+# How many bytes of a streamed response body are written at once, at least.
+BUFFER_SIZE = 64 * 1024
+
+
+def _buffer(chunks, size=BUFFER_SIZE):
+    """
+    Join the small chunks of a response body, so that it is written in fewer, larger pieces.
+
+    Args:
+        chunks (iterable): The chunks of the body, as str.
+        size (int): How many bytes to join before yielding them.
+    Returns:
+        generator: The joined chunks.
+    """
+    buffered = []
+    length = 0
+    for chunk in chunks:
+        buffered.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffered)
+            buffered = []
+            length = 0
+    if buffered:
+        yield ''.join(buffered)
+
+
+def _iterencode(value, encoder):
+    """
+    Encode a value as JSON in chunks, loading the QueryStreams it contains as they are encoded.
+
+    Args:
+        value (object): The value to encode.
+        encoder (json.JSONEncoder): Encodes everything but dictionaries and QueryStreams.
+    Returns:
+        generator: The chunks of JSON.
+    """
+    if isinstance(value, dict):
+        yield '{'
+        for i, (key, item) in enumerate(value.items()):
+            yield '%s%s: ' % (', ' if i else '', encoder.encode(key))
+            for chunk in _iterencode(item, encoder):
+                yield chunk
+        yield '}'
+    elif isinstance(value, QueryStream):
+        yield '['
+        for i, item in enumerate(value):
+            if i:
+                yield ', '
+            yield encoder.encode(item)
+        yield ']'
+    else:
+        yield encoder.encode(value)
+
+
+def _encoder(system, content_type):
+    """
+    Set the content type of the response, unless the view did, and return a JSON encoder for it.
+
+    Args:
+        system (dict): The system values of the renderer.
+        content_type (basestring): The content type to set.
+    Returns:
+        json.JSONEncoder: An encoder that serializes objects with their __json__() method.
+    """
+    request = system.get('request')
+    if request is not None:
+        response = request.response
+        if response.content_type == response.default_content_type:
+            response.content_type = content_type
+
+    def default(obj):
+        if hasattr(obj, '__json__'):
+            return obj.__json__(request)
+        raise TypeError('%r is not JSON serializable' % (obj,))
+
+    return json.JSONEncoder(default=default)
+
+
+def json_stream(info):
+    """
+    Return a renderer that writes JSON while it encodes it, rather than all at once.
+
+    It encodes the same JSON as Pyramid's json renderer, but the lists of results that views return
+    as a :class:`bodhi.server.util.QueryStream` are loaded in batches as they are written, so large
+    pages need a bounded amount of memory.
+
+    Args:
+        info (pyramid.interfaces.IRendererInfo): Unused.
+    Returns:
+        callable: The renderer.
+    """
+    def render(value, system):
+        return _buffer(_iterencode(value, _encoder(system, 'application/json')))
+    return render
+
+
+def ndjson(info):
+    """
+    Return a renderer that writes an iterable as newline-delimited JSON, one item per line.
+
+    The items are encoded as they are iterated over, so a :class:`bodhi.server.util.QueryStream`
+    of any length is written with a bounded amount of memory.
+
+    Args:
+        info (pyramid.interfaces.IRendererInfo): Unused.
+    Returns:
+        callable: The renderer.
+    """
+    def render(value, system):
+        encoder = _encoder(system, 'application/x-ndjson')
+        return _buffer(encoder.encode(item) + '\n' for item in value)
+    return render
+
 
 def rss(info):
     def render(data, system):
@@ -63,15 +184,20 @@ def rss(info):
             },
         }
 
-        for value in data[key]:
-            feed_item = feed.add_item()
-            for name, getter in getters[key].items():
-                # Because we have to use methods to fill feed entry attributes,
-                # it's done by getting methods by name and calling them
-                # on the same line
-                getattr(feed_item, name)(getter(value))
+        def items():
+            for value in data[key]:
+                feed_item = FeedEntry()
+                for name, getter in getters[key].items():
+                    # Because we have to use methods to fill feed entry attributes,
+                    # it's done by getting methods by name and calling them
+                    # on the same line
+                    getattr(feed_item, name)(getter(value))
+                yield etree.tostring(feed_item.rss_entry(), encoding='UTF-8', xml_declaration=False)
 
-        return feed.rss_str()
+        # Only the channel is built as a whole. Its items are serialized one at a time, in the order
+        # of the data, while the response is written.
+        head, tail = feed.rss_str().rsplit('</channel>', 1)
+        return _buffer(itertools.chain([head], items(), ['</channel>' + tail]))
 
     return render
 
@@ -25,6 +25,7 @@ from bodhi.server import util
 from bodhi.server.models import (
     ContentType,
     ReleaseState,
+    Update,
     UpdateRequest,
     UpdateSeverity,
     UpdateStatus,
@@ -72,6 +73,21 @@ class CVE(colander.String):
         return value
 
 
+class Cursor(colander.String):
+    """A String schema to validate a pagination cursor, as made by util.encode_cursor()."""
+
+    def deserialize(self, node, cstruct):
+        """Decode the sort keys out of a given API cursor parameter."""
+        value = super(Cursor, self).deserialize(node, cstruct)
+        if value is colander.null:
+            return value
+
+        try:
+            return util.decode_cursor(value)
+        except ValueError:
+            raise colander.Invalid(node, '"%s" is not a valid cursor' % value)
+
+
 class CVEs(colander.SequenceSchema):
     """A SequenceSchema to validate a list of CVE objects."""
 
@@ -108,6 +124,34 @@ class Updates(colander.SequenceSchema):
     update = colander.SchemaNode(colander.String())
 
 
+class UpdateIds(colander.SequenceSchema):
+    """A SequenceSchema to validate a list of update aliases, titles or build NVRs."""
+
+    #: How many updates can be fetched at once.
+    max_ids = 100
+
+    update = colander.SchemaNode(colander.String())
+
+    def validator(self, node, value):
+        """Ensure that there are not too many ids."""
+        if value is not None and len(value) > self.max_ids:
+            raise colander.Invalid(node, 'At most %d ids can be given' % self.max_ids)
+
+
+class UpdateFields(colander.SequenceSchema):
+    """A SequenceSchema to validate a list of fields of serialized Update objects."""
+
+    field = colander.SchemaNode(colander.String())
+
+    def validator(self, node, value):
+        """Ensure that the fields are fields of serialized Update objects."""
+        if value is None:
+            return
+        unknown = sorted(set(value) - Update.json_fields())
+        if unknown:
+            raise colander.Invalid(node, 'Unknown fields: %s' % ', '.join(unknown))
+
+
 class BugFeedback(colander.MappingSchema):
     """A schema for BugFeedback to be provided via API parameters."""
 
@@ -274,6 +318,29 @@ class PaginatedSchema(colander.MappingSchema):
     )
 
 
+class CursorPaginatedSchema(PaginatedSchema):
+    """
+    A mixin class used by schemas to provide pagination by cursor, as well as by page number.
+
+    Each page of results has a "next_after" cursor, which can be passed as "after" to get the next
+    page. Unlike page numbers, cursors keep the same cost however deep they go, and results added
+    in the meantime do not shift the next page.
+    """
+
+    after = colander.SchemaNode(
+        Cursor(),
+        location="querystring",
+        missing=None,
+    )
+
+    # Counting all the results is skipped by default when paginating by cursor.
+    count = colander.SchemaNode(
+        colander.Boolean(true_choices=('true', '1')),
+        location="querystring",
+        missing=None,
+    )
+
+
 class SearchableSchema(colander.MappingSchema):
     """A mixin class used by schemas to provide search support for API endpoints."""
 
@@ -455,7 +522,7 @@ class ListUserSchema(PaginatedSchema, SearchableSchema):
     )
 
 
-class ListUpdateSchema(PaginatedSchema, SearchableSchema, Cosmetics):
+class ListUpdateSchema(CursorPaginatedSchema, SearchableSchema, Cosmetics):
     """An API schema for bodhi.server.services.updates.query_updates()."""
 
     alias = Builds(
@@ -504,6 +571,20 @@ class ListUpdateSchema(PaginatedSchema, SearchableSchema, Cosmetics):
         preparer=[util.splitter],
     )
 
+    fields = UpdateFields(
+        colander.Sequence(accept_scalar=True),
+        location="querystring",
+        missing=None,
+        preparer=[util.splitter],
+    )
+
+    ids = UpdateIds(
+        colander.Sequence(accept_scalar=True),
+        location="querystring",
+        missing=None,
+        preparer=[util.splitter],
+    )
+
     locked = colander.SchemaNode(
         colander.Boolean(true_choices=('true', '1')),
         location="querystring",
@@ -640,7 +721,7 @@ class ListPackageSchema(PaginatedSchema, SearchableSchema):
     )
 
 
-class ListBuildSchema(PaginatedSchema):
+class ListBuildSchema(CursorPaginatedSchema):
     """An API schema for bodhi.server.services.builds.query_builds()."""
 
     nvr = colander.SchemaNode(
@@ -671,6 +752,23 @@ class ListBuildSchema(PaginatedSchema):
     )
 
 
+class ExportUpdatesSchema(colander.MappingSchema):
+    """An API schema for bodhi.server.services.export.export_updates()."""
+
+    modified_since = colander.SchemaNode(
+        colander.DateTime(),
+        location="querystring",
+        missing=None,
+    )
+
+    releases = Releases(
+        colander.Sequence(accept_scalar=True),
+        location="querystring",
+        missing=None,
+        preparer=[util.splitter],
+    )
+
+
 class UpdateRequestSchema(CSRFProtectedSchema, colander.MappingSchema):
     """An API schema for bodhi.server.services.updates.set_request()."""
 
@@ -680,7 +778,7 @@ class UpdateRequestSchema(CSRFProtectedSchema, colander.MappingSchema):
     )
 
 
-class ListCommentSchema(PaginatedSchema, SearchableSchema):
+class ListCommentSchema(CursorPaginatedSchema, SearchableSchema):
     """An API schema for bodhi.server.services.comments.query_comments()."""
 
     updates = Updates(
@@ -728,7 +826,7 @@ class ListCommentSchema(PaginatedSchema, SearchableSchema):
     )
 
 
-class ListOverrideSchema(PaginatedSchema, SearchableSchema, Cosmetics):
+class ListOverrideSchema(CursorPaginatedSchema, SearchableSchema, Cosmetics):
     """An API schema for bodhi.server.services.overrides.query_overrides()."""
 
     builds = Builds(
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Check that the karma aggregates stored on updates match their comments.
+
+The aggregates are maintained as comments are added, so they can only drift if comments are edited
+or deleted behind Bodhi's back.
+"""
+import sys
+
+import click
+
+from bodhi.server import config, initialize_db, models, Session
+
+
+@click.command()
+@click.version_option(message='%(version)s')
+@click.option('--fix', is_flag=True, help='Replace the aggregates that are wrong.')
+def check(fix):
+    """Check that the karma aggregates stored on updates match their comments."""
+    initialize_db(config.config)
+    session = Session()
+
+    inconsistent = 0
+    query = session.query(models.Update).options(*models.Update.loader_options('karma'))
+    for update in query.order_by(models.Update.id):
+        stored = update._composite_karma
+        stored_reset = update.date_karma_reset
+        if not update.check_karma_aggregates(fix=fix):
+            inconsistent += 1
+            expected = update._compute_karma()
+            if stored != expected[:2] or stored_reset == expected[3]:
+                click.echo('%s: stored karma %+d/%+d does not match its comments (%+d/%+d)' % (
+                    update.title, stored[0], stored[1], expected[0], expected[1]))
+            if stored_reset != expected[3]:
+                click.echo('%s: stored karma reset date %s does not match its comments (%s)' % (
+                    update.title, stored_reset, expected[3]))
+    session.commit()
+
+    if inconsistent and not fix:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    check()
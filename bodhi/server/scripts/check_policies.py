@@ -37,7 +37,8 @@ def check():
     initialize_db(config.config)
     session = Session()
 
-    updates = models.Update.query.filter(models.Update.pushed == false())\
+    updates = models.Update.query.options(*models.Update.loader_options('feed'))\
+        .filter(models.Update.pushed == false())\
         .filter(models.Update.status.in_(
                 [models.UpdateStatus.pending, models.UpdateStatus.testing]))
     for update in updates:
@@ -34,7 +34,8 @@ def dequeue_stable():
     db = Session()
 
     try:
-        batched = db.query(models.Update).filter_by(request=models.UpdateRequest.batched).all()
+        batched = db.query(models.Update).options(*models.Update.loader_options('masher'))\
+            .filter_by(request=models.UpdateRequest.batched).all()
         for update in batched:
             update.set_request(db, models.UpdateRequest.stable, u'bodhi')
         db.commit()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Export every update with its builds, comments and karma, as newline-delimited JSON.
+
+This writes the same lines as the /export/updates web service, straight from the database.
+"""
+from datetime import datetime
+import json
+
+import click
+
+from bodhi.server import config, export as exporter, initialize_db, models, Session
+
+
+#: The formats --modified-since accepts.
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S')
+
+
+def _parse_date(ctx, param, value):
+    """
+    Parse the --modified-since option, as a click callback.
+
+    Args:
+        ctx (click.Context): Unused.
+        param (click.Option): Unused.
+        value (basestring or None): The value of the option.
+    Returns:
+        datetime.datetime or None: The date, or None if the option was not given.
+    Raises:
+        click.BadParameter: If the value is not in one of the DATE_FORMATS.
+    """
+    if value is None:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise click.BadParameter('Dates must look like 2017-10-03 or 2017-10-03T12:30:00')
+
+
+@click.command()
+@click.version_option(message='%(version)s')
+@click.option('--modified-since', callback=_parse_date,
+              help='Only export the updates that changed since this date, in UTC.')
+@click.option('--release', 'releases', multiple=True,
+              help='Only export the updates of this release. Can be given several times.')
+@click.option('--output', type=click.File('w'), default='-',
+              help='The file to write the updates to. Defaults to the standard output.')
+def export(modified_since, releases, output):
+    """Export every update with its builds, comments and karma, as newline-delimited JSON."""
+    initialize_db(config.config)
+    session = Session()
+
+    try:
+        if releases:
+            found = session.query(models.Release).filter(models.Release.name.in_(releases)).all()
+            unknown = set(releases) - set(release.name for release in found)
+            if unknown:
+                raise click.BadParameter('Unknown releases: %s' % ', '.join(sorted(unknown)),
+                                         param_hint='--release')
+            releases = found
+        else:
+            releases = None
+
+        for update in exporter.updates(session, modified_since=modified_since,
+                                       releases=releases):
+            output.write(json.dumps(update) + '\n')
+    finally:
+        # Nothing was written to the database.
+        session.rollback()
+        Session.remove()
+
+
+if __name__ == '__main__':
+    export()
@@ -72,7 +72,7 @@ def main(argv=sys.argv):
         for release in db.query(Release).filter_by(
                 state=ReleaseState.pending).all():
             log.info(release.name)
-            for update in db.query(Update).filter_by(
+            for update in db.query(Update).options(*Update.loader_options('masher')).filter_by(
                     release=release, status=UpdateStatus.stable).all():
                 assert update.date_stable, update.title
                 if now - update.date_stable > one_day:
@@ -17,11 +17,9 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Define service endpoint for retrieving Builds."""
-import math
 
 from cornice import Service
 from pyramid.exceptions import HTTPNotFound
-from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
 from bodhi.server.models import Update, Build, Package, Release
@@ -29,6 +27,7 @@ from bodhi.server.validators import validate_updates, validate_packages, validat
 import bodhi.server.schemas
 import bodhi.server.security
 import bodhi.server.services.errors
+import bodhi.server.util
 
 
 build = Service(name='build', path='/builds/{nvr}', description='Koji builds',
@@ -73,6 +72,8 @@ def query_builds(request):
         packages: A space or comma separated list of packages to search for builds by.
         releases: A space or comma separated list of release ids to limit builds by.
         page: Which page of search results are desired.
+        after: A cursor to the page of results that are desired, instead of a page number.
+        count: Whether to count the builds. By default they are counted unless "after" is given.
         rows_per_pags: How many results per page are desired.
 
     Args:
@@ -81,10 +82,12 @@ def query_builds(request):
     Returns:
         dict: A dictionary with the following key value mappings:
             builds: An iterable of builds that match the search criteria.
-            page: The current page.
-            pages: The total number of pages.
+            page: The current page, or None if the page was requested by cursor.
+            pages: The total number of pages, or None if the builds were not counted.
             rows_per_page: The number of rows per page.
-            total: The number of builds that match the search criteria.
+            total: The number of builds that match the search criteria, or None if they were not
+                counted.
+            next_after: The cursor to pass as "after" to get the next page, or None.
     """
     db = request.db
     data = request.validated
@@ -112,22 +115,14 @@ def query_builds(request):
         query = query.join(Build.release)
         query = query.filter(or_(*[Release.id == r.id for r in releases]))
 
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(Build.nvr))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    # Builds have no date, so they are listed in the order they were added.
+    page = bodhi.server.util.paginate(request, query, [Build.id], Build.nvr, descending=False)
 
     return dict(
-        builds=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        builds=page['items'],
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        next_after=page['next_after'],
     )
@@ -18,14 +18,11 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Define the service endpoints that handle Comments."""
 
-import math
-
 from cornice import Service
 from pyramid.httpexceptions import HTTPBadRequest
-from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
-from bodhi.server import log
+from bodhi.server import conditional, fragments, log
 from bodhi.server.models import Comment, Build, Update
 from bodhi.server.validators import (
     validate_packages,
@@ -43,6 +40,7 @@ import bodhi.server.captcha
 import bodhi.server.schemas
 import bodhi.server.security
 import bodhi.server.services.errors
+import bodhi.server.util
 
 
 comment = Service(
@@ -97,7 +95,8 @@ validators = (
     error_handler=bodhi.server.services.errors.html_handler, validators=validators)
 @comments.get(
     schema=bodhi.server.schemas.ListCommentSchema, accept=('application/json', 'text/json'),
-    renderer='json', error_handler=bodhi.server.services.errors.json_handler, validators=validators)
+    renderer='json_stream', error_handler=bodhi.server.services.errors.json_handler,
+    validators=validators)
 @comments.get(
     schema=bodhi.server.schemas.ListCommentSchema, accept=('application/javascript'),
     renderer='jsonp', error_handler=bodhi.server.services.errors.jsonp_handler,
@@ -114,10 +113,12 @@ def query_comments(request):
     Return:
         dict: A dictionary with the following key-value pairs:
             comments: An iterable with the current page of matched comments.
-            page: The current page number.
-            pages: The total number of pages.
+            page: The current page number, or None if the page was requested by cursor.
+            pages: The total number of pages, or None if the comments were not counted.
             rows_per_page: The number of rows per page.
-            total: The number of items matching the search terms.
+            total: The number of items matching the search terms, or None if they were not
+                counted.
+            next_after: The cursor to pass as "after" to get the next page, or None.
             chrome: A boolean indicating whether to paginate or not.
     """
     db = request.db
@@ -163,26 +164,18 @@ def query_comments(request):
     if user is not None:
         query = query.filter(Comment.user == user)
 
-    query = query.order_by(Comment.timestamp.desc())
-
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(Comment.id))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    # Web pages are rendered by templates, while the other renderers write the comments as they
+    # are loaded.
+    page = bodhi.server.util.paginate(request, query, [Comment.timestamp, Comment.id], Comment.id,
+                                      stream=not conditional.wants_html(request))
 
     return dict(
-        comments=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        comments=page['items'],
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        next_after=page['next_after'],
         chrome=data.get('chrome'),
     )
 
@@ -230,4 +223,5 @@ def new_comment(request):
         request.errors.add('body', 'comment', 'Unable to create comment')
         return
 
+    fragments.warm(request, update)
     return dict(comment=comment, caveats=caveats)
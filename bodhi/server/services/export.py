@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""Define the service endpoint that exports Updates in bulk."""
+
+from cornice import Service
+
+from bodhi.server import export
+from bodhi.server.validators import validate_releases
+import bodhi.server.schemas
+import bodhi.server.security
+import bodhi.server.services.errors
+
+
+updates = Service(name='export_updates', path='/export/updates',
+                  description='Bulk export of updates',
+                  cors_origins=bodhi.server.security.cors_origins_ro)
+
+
+@updates.get(schema=bodhi.server.schemas.ExportUpdatesSchema, renderer='ndjson',
+             error_handler=bodhi.server.services.errors.json_handler,
+             validators=(validate_releases,))
+def export_updates(request):
+    """
+    Export every update with its builds, comments and karma, as newline-delimited JSON.
+
+    The following criteria can be provided via query string parameters to limit the export:
+        modified_since: Only export the updates that changed since this date and time, to update
+            a previous export.
+        releases: A space or comma separated list of releases to export the updates of.
+
+    The updates are written one per line, sorted by id, as they are loaded from the database.
+
+    Args:
+        request (pyramid.request): The current request, containing the criteria documented above.
+    Returns:
+        bodhi.server.util.QueryStream: The exported updates (see bodhi.server.export.serialize()).
+    """
+    data = request.validated
+    return export.updates(request.db, request, modified_since=data.get('modified_since'),
+                          releases=data.get('releases'))
@@ -18,18 +18,16 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Define API endpoints for managing and searching buildroot overrides."""
 
-import math
-
 from cornice import Service
 from pyramid.exceptions import HTTPNotFound
 
-from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
 from bodhi.server import log
 from bodhi.server.models import Build, BuildrootOverride, Package, Release, User
 import bodhi.server.schemas
 import bodhi.server.services.errors
+import bodhi.server.util
 from bodhi.server.validators import (
     validate_override_builds,
     validate_expiration_date,
@@ -133,10 +131,14 @@ def query_overrides(request):
     Returns:
         dict: A dictionary with the following keys:
             overrides: An iterable containing the matched overrides.
-            page: The current page number in the results.
-            pages: The number of pages of results that match the query.
+            page: The current page number in the results, or None if the page was requested by
+                cursor.
+            pages: The number of pages of results that match the query, or None if the overrides
+                were not counted.
             rows_per_page: The number of rows on the page.
-            total: The total number of overrides that match the criteria.
+            total: The total number of overrides that match the criteria, or None if they were not
+                counted.
+            next_after: The cursor to pass as "after" to get the next page, or None.
             chrome: The caller supplied chrome.
             display_user: The current username.
     """
@@ -182,26 +184,17 @@ def query_overrides(request):
     if submitter is not None:
         query = query.filter(BuildrootOverride.submitter == submitter)
 
-    query = query.order_by(BuildrootOverride.submission_date.desc())
-
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(BuildrootOverride.id))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    page = bodhi.server.util.paginate(
+        request, query, [BuildrootOverride.submission_date, BuildrootOverride.id],
+        BuildrootOverride.id)
 
     return dict(
-        overrides=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        overrides=page['items'],
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        next_after=page['next_after'],
         chrome=data.get('chrome'),
         display_user=data.get('display_user'),
     )
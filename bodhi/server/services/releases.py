@@ -25,7 +25,7 @@ from pyramid.exceptions import HTTPNotFound
 from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
-from bodhi.server import log
+from bodhi.server import conditional, log
 from bodhi.server.models import (
     Update,
     UpdateStatus,
@@ -42,6 +42,7 @@ from bodhi.server.validators import (
     validate_packages,
     validate_release,
 )
+from bodhi.server.stats import count_updates
 import bodhi.server.schemas
 import bodhi.server.security
 import bodhi.server.services.errors
@@ -74,8 +75,8 @@ def get_release_html(request):
     if not release:
         request.errors.add('body', 'name', 'No such release')
         request.errors.status = HTTPNotFound.code
-    updates = request.db.query(Update).filter(Update.release == release).order_by(
-        Update.date_submitted.desc())
+    updates = request.db.query(Update).options(*Update.loader_options('feed')).filter(
+        Update.release == release).order_by(Update.date_submitted.desc())
 
     updates_count = request.db.query(Update.date_submitted, Update.type).filter(
         Update.release == release).order_by(Update.date_submitted.desc())
@@ -94,56 +95,31 @@ def get_release_html(request):
         else:
             date_commits[update.type.description][yearmonth] = 0
 
-    base_count_query = request.db.query(Update)\
-        .filter(Update.release == release)
-
-    num_updates_pending = base_count_query\
-        .filter(Update.status == UpdateStatus.pending).count()
-    num_updates_testing = base_count_query\
-        .filter(Update.status == UpdateStatus.testing).count()
-    num_updates_stable = base_count_query\
-        .filter(Update.status == UpdateStatus.stable).count()
-    num_updates_unpushed = base_count_query\
-        .filter(Update.status == UpdateStatus.unpushed).count()
-    num_updates_obsolete = base_count_query\
-        .filter(Update.status == UpdateStatus.obsolete).count()
-
-    num_updates_security = base_count_query\
-        .filter(Update.type == UpdateType.security).count()
-    num_updates_bugfix = base_count_query\
-        .filter(Update.type == UpdateType.bugfix).count()
-    num_updates_enhancement = base_count_query\
-        .filter(Update.type == UpdateType.enhancement).count()
-    num_updates_newpackage = base_count_query\
-        .filter(Update.type == UpdateType.newpackage).count()
-
-    num_active_overrides = request.db.query(
-        BuildrootOverride
-    ).filter(
-        BuildrootOverride.expired_date.is_(None)
-    ).join(
-        BuildrootOverride.build
-    ).join(
-        Build.release
-    ).filter(
-        Build.release == release
-    ).count()
-
-    num_expired_overrides = request.db.query(
-        BuildrootOverride
-    ).filter(
-        BuildrootOverride.expired_date.isnot(None)
-    ).join(
-        BuildrootOverride.build
-    ).join(
-        Build.release
-    ).filter(
-        Build.release == release
-    ).count()
+    # The counts of every release are fetched with a single query, and cached.
+    name = release.name if release else None
+    num_updates_pending = count_updates(request.db, name, UpdateStatus.pending)
+    num_updates_testing = count_updates(request.db, name, UpdateStatus.testing)
+    num_updates_stable = count_updates(request.db, name, UpdateStatus.stable)
+    num_updates_unpushed = count_updates(request.db, name, UpdateStatus.unpushed)
+    num_updates_obsolete = count_updates(request.db, name, UpdateStatus.obsolete)
+
+    num_updates_security = count_updates(request.db, name, update_type=UpdateType.security)
+    num_updates_bugfix = count_updates(request.db, name, update_type=UpdateType.bugfix)
+    num_updates_enhancement = count_updates(request.db, name, update_type=UpdateType.enhancement)
+    num_updates_newpackage = count_updates(request.db, name, update_type=UpdateType.newpackage)
+
+    # Count the active and expired overrides of the release together.
+    active = BuildrootOverride.expired_date.is_(None)
+    override_counts = dict(request.db.query(active, func.count(BuildrootOverride.id))
+                           .join(BuildrootOverride.build)
+                           .filter(Build.release == release)
+                           .group_by(active))
+    num_active_overrides = override_counts.get(True, 0)
+    num_expired_overrides = override_counts.get(False, 0)
 
     return dict(release=release,
                 latest_updates=updates.limit(25).all(),
-                count=updates.count(),
+                count=count_updates(request.db, name),
                 date_commits=date_commits,
                 dates=sorted(dates),
 
@@ -176,6 +152,8 @@ def get_release_json(request):
     Returns:
         bodhi.server.models.Release: The matched Release.
     """
+    # Any change to any release bumps the version of the release registry.
+    conditional.check(request, Release.registry.snapshot(request.db).version)
     id = request.matchdict.get('name')
     release = Release.get(id, request.db)
     if not release:
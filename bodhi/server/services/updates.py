@@ -19,13 +19,12 @@
 """Defines service endpoints pertaining to Updates."""
 
 import copy
-import math
 
 from cornice import Service
-from sqlalchemy import func, distinct
+from sqlalchemy import BigInteger, cast, distinct, func
 from sqlalchemy.sql import or_
 
-from bodhi.server import log
+from bodhi.server import conditional, fragments, log
 from bodhi.server.exceptions import BodhiException, LockedUpdateException
 from bodhi.server.models import (
     Update,
@@ -36,6 +35,7 @@ from bodhi.server.models import (
     ReleaseState,
     Build,
     Package,
+    Release,
 )
 import bodhi.server.schemas
 import bodhi.server.security
@@ -52,6 +52,7 @@ from bodhi.server.validators import (
     validate_release,
     validate_username,
     validate_update_id,
+    validate_update_not_modified,
     validate_requirements,
     validate_bugs,
     validate_request,
@@ -59,7 +60,7 @@ from bodhi.server.validators import (
 
 
 update = Service(name='update', path='/updates/{id}',
-                 validators=(validate_update_id,),
+                 validators=(validate_update_not_modified, validate_update_id),
                  description='Update submission service',
                  acl=bodhi.server.security.packagers_allowed_acl,
                  cors_origins=bodhi.server.security.cors_origins_ro)
@@ -185,6 +186,8 @@ def set_request(request):
     except Exception as e:
         log.exception("Unhandled exception in set_request")
         request.errors.add('body', 'request', str(e))
+    else:
+        fragments.warm(request, update)
 
     return dict(update=update)
 
@@ -205,14 +208,6 @@ validators = (
              accept=('application/atom+xml',),
              error_handler=bodhi.server.services.errors.html_handler,
              validators=validators)
-@updates.get(schema=bodhi.server.schemas.ListUpdateSchema,
-             accept=('application/json', 'text/json'), renderer='json',
-             error_handler=bodhi.server.services.errors.json_handler,
-             validators=validators)
-@updates.get(schema=bodhi.server.schemas.ListUpdateSchema,
-             accept=('application/javascript'), renderer='jsonp',
-             error_handler=bodhi.server.services.errors.jsonp_handler,
-             validators=validators)
 @updates.get(schema=bodhi.server.schemas.ListUpdateSchema,
              accept=('text/html'), renderer='updates.html',
              error_handler=bodhi.server.services.errors.html_handler,
@@ -221,21 +216,34 @@ def query_updates(request):
     """
     Search updates by given criteria.
 
+    Updates can also be fetched by their aliases, titles or the NVRs of their builds, with the
+    "ids" parameter. As there are at most 100 of those, all the matching updates are then returned
+    at once rather than in pages.
+
     Args:
         request (pyramid.request): The current request.
     Returns:
         dict: A dictionary with at least the following key mappings:
             updates: An iterable of the updates that match the query.
-            page: The current page.
-            pages: The total number of pages.
+            page: The current page, or None if the page was requested by cursor or ids.
+            pages: The total number of pages, or None if the updates were not counted.
             rows_per_page: How many results on on the page.
-            total: The total number of updates matching the query.
+            total: The total number of updates matching the query, or None if they were not
+                counted.
+            next_after: The cursor to pass as "after" to get the next page, or None.
             package: The package corresponding to the first update found in the search.
     """
     db = request.db
     data = request.validated
+    # Feeds only show the updates themselves, while the other renderers show what they relate to.
+    profile = 'feed' if request.matched_route.name == 'updates_rss' else 'list'
     query = db.query(Update)
 
+    ids = data.get('ids')
+    if ids is not None:
+        query = query.filter(or_(Update.alias.in_(ids), Update.title.in_(ids),
+                                 Update.builds.any(Build.nvr.in_(ids))))
+
     approved_since = data.get('approved_since')
     if approved_since is not None:
         query = query.filter(Update.date_approved >= approved_since)
@@ -266,8 +274,8 @@ def query_updates(request):
 
     search = data.get('search')
     if search is not None:
-        query = query.filter(or_(Update.title.ilike('%%%s%%' % search),
-                                 Update.alias.ilike('%%%s%%' % search)))
+        # Pages are sorted by date, so the rank of the results is not used here.
+        query = Update.search(query, search)[0]
 
     locked = data.get('locked')
     if locked is not None:
@@ -361,26 +369,40 @@ def query_updates(request):
     if alias is not None:
         query = query.filter(or_(*[Update.alias == a for a in alias]))
 
-    query = query.order_by(Update.date_submitted.desc())
-
-    # We can't use ``query.count()`` here because it is naive with respect to
-    # all the joins that we're doing above.
-    count_query = query.with_labels().statement\
-        .with_only_columns([func.count(distinct(Update.id))])\
-        .order_by(None)
-    total = db.execute(count_query).scalar()
-
-    page = data.get('page')
-    rows_per_page = data.get('rows_per_page')
-    pages = int(math.ceil(total / float(rows_per_page)))
-    query = query.offset(rows_per_page * (page - 1)).limit(rows_per_page)
+    total = None
+    # Web pages are rendered by templates, while the other renderers write the updates as they
+    # are loaded.
+    stream = not conditional.wants_html(request)
+    # Computing the ETag scans all the matching updates, like counting them, so pages that are not
+    # counted, such as the pages after a cursor, are not given one.
+    if stream and bodhi.server.util.counts_results(request):
+        # Any change to the matching updates changes the sum of their versions. The sums of their
+        # ids, and of their ids weighted by their versions, change when one update stops matching
+        # while another with the same version starts to, so this tells whether the result changed.
+        aggregates = query.with_entities(
+            func.count(distinct(Update.id)), func.sum(Update.version), func.sum(Update.id),
+            func.sum(cast(Update.id, BigInteger) * Update.version), func.max(Update.id)).one()
+        total = aggregates[0]
+        # Updates embed their release, so the result also changes with the releases.
+        conditional.check(request, tuple(aggregates) + (Release.registry.snapshot(db).version,))
+
+    query = query.options(*Update.loader_options(profile, data.get('fields')))
+    if ids is not None:
+        items = query.order_by(Update.date_submitted.desc(), Update.id.desc()).all()
+        page = dict(items=items, page=None, pages=None, rows_per_page=len(items),
+                    total=len(items), next_after=None)
+    else:
+        page = bodhi.server.util.paginate(
+            request, query, [Update.date_submitted, Update.id], Update.id, total=total,
+            stream=stream)
 
     return dict(
-        updates=query.all(),
-        page=page,
-        pages=pages,
-        rows_per_page=rows_per_page,
-        total=total,
+        updates=page['items'],
+        page=page['page'],
+        pages=page['pages'],
+        rows_per_page=page['rows_per_page'],
+        total=page['total'],
+        next_after=page['next_after'],
         chrome=data.get('chrome'),
         display_user=data.get('display_user', False),
         display_request=data.get('display_request', True),
@@ -388,6 +410,42 @@ def query_updates(request):
     )
 
 
+@updates.get(schema=bodhi.server.schemas.ListUpdateSchema,
+             accept=('application/json', 'text/json'), renderer='json_stream',
+             error_handler=bodhi.server.services.errors.json_handler,
+             validators=validators)
+@updates.get(schema=bodhi.server.schemas.ListUpdateSchema,
+             accept=('application/javascript'), renderer='jsonp',
+             error_handler=bodhi.server.services.errors.jsonp_handler,
+             validators=validators)
+def query_updates_json(request):
+    """
+    Search updates by given criteria, or fetch them by id, for API clients.
+
+    This is query_updates(), except that the updates can be restricted to some of their fields with
+    the "fields" parameter, which also saves loading the relationships the other fields are made
+    of. Updates fetched by "ids" are returned as a list, without the rest of the page.
+
+    Args:
+        request (pyramid.request): The current request.
+    Returns:
+        dict or list: The result of query_updates(), or its list of updates if "ids" were given.
+    """
+    result = query_updates(request)
+    fields = request.validated.get('fields')
+    if fields is not None:
+        def serialize(update):
+            return update.__json__(request, fields=fields)
+
+        if isinstance(result['updates'], bodhi.server.util.QueryStream):
+            result['updates'] = result['updates'].map(serialize)
+        else:
+            result['updates'] = [serialize(update) for update in result['updates']]
+    if request.validated.get('ids') is not None:
+        return result['updates']
+    return result
+
+
 @updates.post(schema=bodhi.server.schemas.SaveUpdateSchema,
               permission='create', renderer='json',
               error_handler=bodhi.server.services.errors.json_handler,
@@ -529,6 +587,7 @@ def new_update(request):
                 'name': 'update',
                 'description': 'Problem obsoleting older updates: %s' % str(e),
             })
+        fragments.warm(request, update)
 
     if not isinstance(result, dict):
         result = result.__json__()
@@ -24,6 +24,8 @@ from pyramid.exceptions import HTTPNotFound
 from sqlalchemy import func, distinct
 from sqlalchemy.sql import or_
 
+from bodhi.server import stats
+from bodhi.server.config import config
 from bodhi.server.models import Group, Package, Update, User
 from bodhi.server.validators import validate_updates, validate_packages, validate_groups
 import bodhi.server.schemas
@@ -59,9 +61,11 @@ def get_user(request):
     Args:
         request (pyramid.request): The current request.
     Returns:
-        dict: A dictionary with two keys. "user" maps to a dictionary representation of the User
+        dict: A dictionary with three keys. "user" maps to a dictionary representation of the User
             object. "urls" maps to various URLs that describe various other objects related to the
-            user.
+            user. "stats" maps to the number of comments, karma and updates of the user, with the
+            daily number of comments of the last top_testers_timeframe days (see
+            bodhi.server.stats.user_activity()).
     """
     id = request.matchdict.get('name')
     user = User.get(id, request.db)
@@ -71,6 +75,7 @@ def get_user(request):
         request.errors.status = HTTPNotFound.code
         return
 
+    activity = stats.user_activity(request.db, user, config.get('top_testers_timeframe'))
     user = user.__json__(request)
 
     # Throw some extra information in there
@@ -86,7 +91,7 @@ def get_user(request):
         'recent_overrides_rss': rurl('overrides_rss') + '?user=%s' % id,
     }
 
-    return dict(user=user, urls=urls)
+    return dict(user=user, urls=urls, stats=activity)
 
 
 validators = (
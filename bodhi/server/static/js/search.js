@@ -16,8 +16,12 @@ $(document).ready(function() {
         queryTokenizer: Bloodhound.tokenizers.whitespace,
         remote: {
             wildcard: '%QUERY',
-            url: 'updates/?search=%QUERY',
-            transform: function(response) { return response.updates; },
+            url: 'search/updates?term=%QUERY',
+            transform: function(response) {
+                return $.map(response, function(result) {
+                    return {alias: result.id, title: result.label};
+                });
+            },
         }
     });
     var users = new Bloodhound({
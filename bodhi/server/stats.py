@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+Counts of updates by release, status and type, and of the activity of users.
+
+The updates are all counted by a single GROUP BY query, whose result is cached in the "stats" cache
+region (see bodhi.server.cache). That region is invalidated when updates are created or deleted, or
+when their release, status or type changes.
+
+The activity of users is read from the counters that are maintained as comments and updates are
+added (see bodhi.server.models.UserActivity and bodhi.server.models.UserUpdateCount), so it does
+not depend on how many comments the users wrote. The top testers are cached in the "activity" cache
+region, which new comments invalidate.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from bodhi.server import cache
+from bodhi.server.models import Release, Update, User, UserActivity, UserUpdateCount
+
+
+def _count_updates(db):
+    """
+    Count the updates of every release, by status and type.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): The database session to use.
+    Returns:
+        dict: See update_counts().
+    """
+    query = db.query(Release.name, Update.status, Update.type, func.count(Update.id))\
+        .join(Update.release)\
+        .group_by(Release.name, Update.status, Update.type)
+    counts = {}
+    for release, status, update_type, count in query:
+        counts.setdefault(release, {}).setdefault(status.value, {})[update_type.value] = count
+    return counts
+
+
+def update_counts(db):
+    """
+    Return the number of updates of every release, by status and type.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): The database session to use if they are not cached.
+    Returns:
+        dict: Maps release names to dictionaries mapping the values of UpdateStatus to
+            dictionaries mapping the values of UpdateType to numbers of updates. Statuses and types
+            without updates are left out.
+    """
+    return cache.get_region('stats').get_or_create('update_counts', lambda: _count_updates(db))
+
+
+def count_updates(db, release, status=None, update_type=None):
+    """
+    Return the number of updates of a release, with the given status and type.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): The database session to use if the counts are not
+            cached.
+        release (basestring): The name of the release.
+        status (bodhi.server.models.UpdateStatus or None): Only count the updates with this status,
+            or updates with any status if None.
+        update_type (bodhi.server.models.UpdateType or None): Only count the updates of this type,
+            or updates of any type if None.
+    Returns:
+        int: The number of updates.
+    """
+    total = 0
+    for status_value, types in update_counts(db).get(release, {}).items():
+        if status is not None and status_value != status.value:
+            continue
+        for type_value, count in types.items():
+            if update_type is None or type_value == update_type.value:
+                total += count
+    return total
+
+
+def _window_start(days):
+    """Return the first day of a window of the given number of days, ending now."""
+    return (datetime.utcnow() - timedelta(days=days)).date()
+
+
+def _top_testers(db, since, blacklist, limit):
+    """
+    Find the users who wrote the most comments since a day.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): The database session to use.
+        since (datetime.date): The first day to count the comments of.
+        blacklist (list): The names of the users to leave out.
+        limit (int): How many users to return.
+    Returns:
+        list: See top_testers().
+    """
+    count = func.sum(UserActivity.comments)
+    query = db.query(User.name, count)\
+        .join(UserActivity, UserActivity.user_id == User.id)\
+        .filter(UserActivity.date >= since)
+    if blacklist:
+        query = query.filter(~User.name.in_(blacklist))
+    query = query.group_by(User.name).order_by(count.desc(), User.name).limit(limit)
+    return [(name, int(comments)) for name, comments in query]
+
+
+def top_testers(db, days, blacklist=(), limit=5):
+    """
+    Return the users who wrote the most comments in the last days.
+
+    Comments are counted by day, so the window starts at the beginning of the day that was the
+    given number of days ago.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): The database session to use if they are not cached.
+        days (int): How many days to count the comments of.
+        blacklist (iterable): The names of the users to leave out.
+        limit (int): How many users to return.
+    Returns:
+        list: (name, number of comments) tuples, the most active users first.
+    """
+    since = _window_start(days)
+    blacklist = sorted(blacklist)
+    key = 'top_testers:%s:%d:%s' % (since.isoformat(), limit, ','.join(blacklist))
+    return cache.get_region('activity').get_or_create(
+        key, lambda: _top_testers(db, since, blacklist, limit))
+
+
+def user_activity(db, user, days):
+    """
+    Return the number of comments, karma and updates of a user.
+
+    Args:
+        db (sqlalchemy.orm.session.Session): The database session to use.
+        user (bodhi.server.models.User): The user.
+        days (int): How many days to return the daily number of comments of.
+    Returns:
+        dict: A dictionary with the following keys:
+            comments: The number of comments the user wrote.
+            karma_positive: The sum of the positive karma the user gave.
+            karma_negative: The sum of the negative karma the user gave.
+            days: The days argument.
+            comments_per_day: Maps the days of the last "days" days on which the user wrote
+                comments, formatted as YYYY-MM-DD, to how many they wrote.
+            updates: Maps the values of UpdateStatus to the number of updates the user submitted
+                that have them. Statuses without updates are left out.
+    """
+    comments, karma_positive, karma_negative = db.query(
+        func.sum(UserActivity.comments), func.sum(UserActivity.karma_positive),
+        func.sum(UserActivity.karma_negative)).filter(UserActivity.user_id == user.id).one()
+    daily = db.query(UserActivity.date, UserActivity.comments)\
+        .filter(UserActivity.user_id == user.id, UserActivity.date >= _window_start(days))
+    updates = db.query(UserUpdateCount.status, UserUpdateCount.count)\
+        .filter(UserUpdateCount.user_id == user.id, UserUpdateCount.count != 0)
+    return {
+        'comments': int(comments or 0),
+        'karma_positive': int(karma_positive or 0),
+        'karma_negative': int(karma_negative or 0),
+        'days': days,
+        'comments_per_day': dict((date.strftime('%Y-%m-%d'), count) for date, count in daily),
+        'updates': dict((status.value, count) for status, count in updates),
+    }
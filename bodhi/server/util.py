@@ -20,19 +20,26 @@
 
 from collections import defaultdict
 from contextlib import contextmanager
+from datetime import datetime
+import base64
 import collections
+import copy
 import functools
 import hashlib
 import json
+import math
 import os
 import pkg_resources
 import socket
 import subprocess
 import tempfile
+import threading
+import time
 import urllib
 
 from kitchen.iterutils import iterate
 from pyramid.i18n import TranslationStringFactory
+from pyramid.threadlocal import get_current_request
 import arrow
 import bleach
 import colander
@@ -41,8 +48,9 @@ import librepo
 import markdown
 import requests
 import rpm
+import sqlalchemy as sa
 
-from bodhi.server import log, buildsys, Session
+from bodhi.server import log, buildsys, cache, Session
 from bodhi.server.config import config
 from bodhi.server.exceptions import RepodataException
 
@@ -57,35 +65,26 @@ def header(x):
     return u"%s\n     %s\n%s\n" % ('=' * 80, x, '=' * 80)
 
 
-def get_rpm_header(nvr, tries=0):
+def get_rpm_header(nvr):
     """
     Get the rpm header for a given build.
 
+    Transient Koji errors are retried by the session, see bodhi.server.buildsys.ResilientSession.
+
     Args:
         nvr (basestring): The name-version-release string of the build you want headers for.
-        tries (int): The number of attempts that have been made to retrieve the nvr so far. Defaults
-            to 0.
     Returns:
         dict: A dictionary mapping RPM header names to their values, as returned by the Koji client.
+    Raises:
+        ValueError: If Koji has no headers for the build.
     """
-    tries += 1
     headers = [
         'name', 'summary', 'version', 'release', 'url', 'description',
         'changelogtime', 'changelogname', 'changelogtext',
     ]
     rpmID = nvr + '.src'
     koji_session = buildsys.get_session()
-    try:
-        result = koji_session.getRPMHeaders(rpmID=rpmID, headers=headers)
-    except Exception as e:
-        msg = "Failed %i times to get rpm header data from koji for %s:  %s"
-        log.warning(msg % (tries, nvr, str(e)))
-        if tries < 3:
-            # Try again...
-            return get_rpm_header(nvr, tries=tries)
-        else:
-            # Give up for good and re-raise the failure...
-            raise
+    result = koji_session.getRPMHeaders(rpmID=rpmID, headers=headers)
 
     if result:
         return result
@@ -174,49 +173,154 @@ def link(href, text):
 
 
 class memoized(object):
-    """Decorator that permanently caches a function's return value each time it is called.
+    """Decorator that caches a function's return value each time it is called.
 
     If the function is called later with the same arguments, the cached value is returned (not
-    reevaluated).
+    reevaluated). It can be used bare, caching every value forever, or with arguments::
+
+        @memoized(max_size=1024, ttl=lambda: config.get('pdc_cache.ttl'))
+        def lookup(url):
+            ...
+
+    The cache is safe to use from several threads. While a value is being computed, other callers
+    asking for the same arguments wait for it instead of computing it again. Values can be dropped
+    with invalidate(), and stats() tells how well the cache works.
 
-    http://wiki.python.org/moin/PythonDecoratorLibrary#Memoize
+    Values are cached by their arguments, unless a key function derives a smaller key from them,
+    such as a hash of a long text.
 
     Attributes:
         func (callable): The wrapped function.
-        cache (dict): The cache, mapping arguments to the cached response.
+        max_size (int or callable or None): How many values to keep. The least recently used
+            values are evicted first. If None, the cache is unbounded.
+        ttl (float or callable or None): How many seconds values stay valid. If None, they never
+            expire. Both max_size and ttl can be functions taking no arguments, for instance to
+            read them from the config when they are needed.
+        key (callable or None): A function taking the arguments and returning the key to cache their
+            value under. If None, the arguments are the key.
     """
 
-    def __init__(self, func):
+    def __init__(self, func=None, max_size=None, ttl=None, key=None):
         """
         Initialize the memoized object.
 
         Args:
-            func: The function the memoized object is wrapping.
+            func (callable or None): The function the memoized object is wrapping. If None, the
+                object must be called with the function to wrap, as a decorator.
+            max_size (int or callable or None): See the class attributes.
+            ttl (float or callable or None): See the class attributes.
+            key (callable or None): See the class attributes.
         """
         self.func = func
-        self.cache = {}
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key = key
+        self._cache = collections.OrderedDict()
+        self._in_flight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'waits': 0}
+        if func is not None:
+            functools.update_wrapper(self, func)
+
+    @staticmethod
+    def _setting(value):
+        return value() if callable(value) else value
 
     def __call__(self, *args):
         """
         If the args are cached, return the cached value. If not, call the wrapped function.
 
         If the wrapped function is called, it's response is only cached if the args are hashable.
+        If no function is wrapped yet, wrap the given function and return self.
 
         Args:
             args (list): The list of arguments passed to the wrapped function.
         Returns:
             object: The reponse from the wrapped function, or the cached response, if available.
         """
-        if not isinstance(args, collections.Hashable):
+        if self.func is None:
+            self.func = args[0]
+            functools.update_wrapper(self, self.func)
+            return self
+
+        key = self.key(*args) if self.key is not None else args
+        try:
+            hash(key)
+        except TypeError:
             # uncacheable. a list, for instance.
             # better to not cache than blow up.
             return self.func(*args)
-        if args in self.cache:
-            return self.cache[args]
-        else:
+
+        while True:
+            with self._lock:
+                if key in self._cache:
+                    expires, value = self._cache.pop(key)
+                    if expires is None or expires > time.time():
+                        self._cache[key] = (expires, value)
+                        self._stats['hits'] += 1
+                        return value
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = self._in_flight[key] = threading.Event()
+                    generation = self._generation
+                    break
+                self._stats['waits'] += 1
+            # Someone else is computing the value, wait for it and look again.
+            in_flight.wait()
+
+        try:
             value = self.func(*args)
-            self.cache[args] = value
-            return value
+        except Exception:
+            with self._lock:
+                del self._in_flight[key]
+                in_flight.set()
+            raise
+        # Store the value before waking up the waiters, so that they find it.
+        with self._lock:
+            self._stats['misses'] += 1
+            if generation == self._generation:
+                self._store(key, value)
+            del self._in_flight[key]
+            in_flight.set()
+        return value
+
+    def _store(self, key, value):
+        """Store value under key, evicting the oldest values if needed. The lock must be held."""
+        ttl = self._setting(self.ttl)
+        self._cache[key] = (time.time() + ttl if ttl is not None else None, value)
+        max_size = self._setting(self.max_size)
+        while max_size is not None and len(self._cache) > max_size:
+            self._cache.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def invalidate(self, *args):
+        """
+        Drop the cached value for the given arguments, or every cached value if none are given.
+
+        Values being computed while the cache is invalidated are not stored.
+
+        Args:
+            args (list): The arguments whose value should be dropped.
+        """
+        with self._lock:
+            if args:
+                self._cache.pop(self.key(*args) if self.key is not None else args, None)
+            else:
+                self._cache.clear()
+            self._generation += 1
+
+    def stats(self):
+        """
+        Return the counters of this cache.
+
+        Returns:
+            dict: A dictionary with "hits", "misses", "evictions", "waits" (calls that waited for
+                another caller to compute their value) and "size" keys.
+        """
+        with self._lock:
+            stats = dict(self._stats, size=len(self._cache))
+        return stats
 
     def __repr__(self):
         """
@@ -240,11 +344,13 @@ class memoized(object):
         return functools.partial(self.__call__, obj)
 
 
-@memoized
+@cache.cache_on_arguments('critpath')
 def get_critpath_components(collection='master', component_type='rpm'):
     """
     Return a list of critical path packages for a given collection.
 
+    The results are cached in the "critpath" cache region.
+
     Args:
     collection (basestring): The collection/branch to search. Defaults to 'master'.
     component_type (basestring): The component type to search for. This only affects PDC queries.
@@ -431,20 +537,24 @@ def hostname(context=None):
     return socket.gethostname()
 
 
-def markup(context, text):
+#: The version of the way markdown is rendered by util.markup() and bodhi.server.ffmarkdown. Bump it
+#: when changing either, so that the cached renderings are not reused.
+MARKDOWN_VERSION = 1
+
+
+def _bleach_attributes(bleach_version):
     """
-    Return HTML from a markdown string.
+    Return the attributes bleach should allow in the HTML rendered from markdown.
 
     Args:
-        context (mako.runtime.Context): Unused.
-        text (basestring): Markdown text to be converted to HTML.
+        bleach_version (basestring): The version of bleach that is installed.
     Returns:
-        basestring: HTML representation of the markdown text.
+        list or dict: The whitelisted attributes, in the format expected by that version.
     """
     # determine the major component of the bleach version installed.
     # this is similar to the approach that Pagure uses to determine the bleach version
     # https://pagure.io/pagure/pull-request/2269#request_diff
-    bleach_major_v = int(bleach.__version__.split('.')[0])
+    bleach_major_v = int(bleach_version.split('.')[0])
 
     # the only difference in the bleach API that we use between v1 and v2 is
     # the formatting of the attributes parameter. Bleach 1 only allowed you
@@ -452,26 +562,54 @@ def markup(context, text):
     # Bleach 2 requires you to specify the list of attributes whitelisted for
     # specific tags.
     if bleach_major_v >= 2:
-        markdown_attrs = {
+        return {
             "img": ["src", "alt", "title"],
             "a": ["href", "alt", "title"],
             "div": ["class"],
         }
     else:
-        markdown_attrs = [
+        return [
             "src", "href", "alt", "title", "class"
         ]
 
-    markdown_tags = [
-        "h1", "h2", "h3", "h4", "h5", "h6",
-        "b", "i", "strong", "em", "tt",
-        "p", "br",
-        "span", "div", "blockquote", "code", "hr", "pre",
-        "ul", "ol", "li", "dd", "dt",
-        "img",
-        "a",
-    ]
 
+#: The attributes and tags allowed in the HTML rendered from markdown.
+MARKDOWN_ATTRIBUTES = _bleach_attributes(bleach.__version__)
+MARKDOWN_TAGS = [
+    "h1", "h2", "h3", "h4", "h5", "h6",
+    "b", "i", "strong", "em", "tt",
+    "p", "br",
+    "span", "div", "blockquote", "code", "hr", "pre",
+    "ul", "ol", "li", "dd", "dt",
+    "img",
+    "a",
+]
+
+#: Everything the rendering of markdown depends on, besides the text and the URL Bodhi is served at.
+_MARKDOWN_CONFIG = (MARKDOWN_VERSION, markdown.version, bleach.__version__)
+
+
+def _markdown_key(text, application_url, markdown_config):
+    """Return the key the HTML rendered from text is cached under, with a hash of the text."""
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return (hashlib.sha1(text).digest(), application_url, markdown_config)
+
+
+@memoized(max_size=lambda: config.get('markdown_cache.max_size'), key=_markdown_key)
+def _render_markdown(text, application_url, markdown_config):
+    """
+    Return sanitized HTML from a markdown string.
+
+    Args:
+        text (basestring): Markdown text to be converted to HTML.
+        application_url (basestring or None): The URL Bodhi is served at, which the links to the
+            mentioned users start with.
+        markdown_config (tuple): The versions of the markdown rendering, which are only part of
+            the cache key.
+    Returns:
+        basestring: HTML representation of the markdown text.
+    """
     markdown_text = markdown.markdown(text, extensions=['markdown.extensions.fenced_code'])
 
     # previously, we linkified text in ffmarkdown.py, but this was causing issues like #1721
@@ -481,7 +619,26 @@ def markup(context, text):
     # previously, we used the Safe Mode in python-markdown to strip all HTML
     # tags. Safe Mode is deprecated, so we now use Bleach to sanitize all HTML
     # tags after running it through the markdown parser
-    return bleach.clean(markdown_text, tags=markdown_tags, attributes=markdown_attrs)
+    return bleach.clean(markdown_text, tags=MARKDOWN_TAGS, attributes=MARKDOWN_ATTRIBUTES)
+
+
+def markup(context, text):
+    """
+    Return HTML from a markdown string.
+
+    The HTML is cached by a hash of the text, so that update notes and comments are only rendered
+    again once they change, or once the way markdown is rendered does (see MARKDOWN_VERSION).
+
+    Args:
+        context (mako.runtime.Context): Unused.
+        text (basestring): Markdown text to be converted to HTML.
+    Returns:
+        basestring: HTML representation of the markdown text.
+    """
+    request = get_current_request()
+    # The links to mentioned users are made with the current request, see ffmarkdown.user_url().
+    application_url = request.application_url if request is not None else None
+    return _render_markdown(text, application_url, _MARKDOWN_CONFIG)
 
 
 def status2html(context, status):
@@ -848,10 +1005,357 @@ def page_url(context, page):
     """
     request = context.get('request')
     params = dict(request.params)
+    params.pop('after', None)
     params['page'] = page
     return request.path_url + "?" + urllib.urlencode(params)
 
 
+def after_url(context, after):
+    """
+    Return a version of the request URL showing the results after the given cursor.
+
+    Args:
+        context (mako.runtime.Context): The current template context, used to get the current path
+            URL.
+        after (basestring): A cursor, as returned by :func:`encode_cursor`.
+    Returns:
+        basestring: The current path appended with a GET query for the results after the cursor.
+    """
+    request = context.get('request')
+    params = dict(request.params)
+    params.pop('page', None)
+    params['after'] = after
+    return request.path_url + "?" + urllib.urlencode(params)
+
+
+# The format of the dates in cursors, which keeps the microseconds so no row is skipped or repeated.
+CURSOR_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+# How many results a QueryStream loads with each query.
+STREAM_BATCH_SIZE = 100
+
+
+def encode_cursor(values):
+    """
+    Return an opaque cursor pointing after a row with the given sort keys.
+
+    Args:
+        values (list): The values of the columns the results are sorted by, in the row the next
+            results come after. They must be integers, datetimes or None.
+    Returns:
+        str: The cursor, which can be used in URLs as is.
+    """
+    values = [v.strftime(CURSOR_DATE_FORMAT) if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values)).rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return the sort keys encoded in a cursor made by :func:`encode_cursor`.
+
+    Args:
+        cursor (basestring): The cursor to decode.
+    Returns:
+        list: The integers, datetimes and Nones the cursor was made from.
+    Raises:
+        ValueError: If the cursor is not one made by encode_cursor().
+    """
+    try:
+        cursor = str(cursor)
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor: %r' % cursor)
+    if not isinstance(values, list) or not values:
+        raise ValueError('Invalid cursor: %r' % cursor)
+
+    decoded = []
+    for value in values:
+        if value is None:
+            decoded.append(None)
+        elif isinstance(value, basestring):
+            decoded.append(datetime.strptime(value, CURSOR_DATE_FORMAT))
+        elif isinstance(value, (int, long)) and not isinstance(value, bool):
+            decoded.append(value)
+        else:
+            raise ValueError('Invalid cursor: %r' % cursor)
+    return decoded
+
+
+def _nullable(key):
+    """Return whether the given sort key is a column that may be NULL."""
+    return getattr(key.expression, 'nullable', False)
+
+
+def _order_by(keys, descending, dialect):
+    """
+    Return the ORDER BY clauses that sort rows by the given keys.
+
+    NULL values sort before every other value, as they do by default on SQLite. PostgreSQL sorts
+    them as the biggest values by default, so the clauses place them explicitly there, in the
+    order of the indexes of the sorted lists.
+
+    Args:
+        keys (list): The columns to sort by, in order.
+        descending (bool): Whether to sort in descending order.
+        dialect (basestring): The name of the dialect of the database, such as "postgresql".
+    Returns:
+        list: The clauses.
+    """
+    clauses = []
+    for key in keys:
+        clause = key.desc() if descending else key.asc()
+        if dialect == 'postgresql' and _nullable(key):
+            clause = clause.nullslast() if descending else clause.nullsfirst()
+        clauses.append(clause)
+    return clauses
+
+
+def _seek(keys, values, descending):
+    """
+    Return a criterion selecting the rows that come after the given sort keys.
+
+    NULL values come before every other value, as sorted by :func:`_order_by`.
+
+    Args:
+        keys (list): The columns the rows are sorted by, in order. The last one must be unique.
+        values (list): The values of the keys in the row to seek past.
+        descending (bool): Whether the rows are sorted in descending order.
+    Returns:
+        sqlalchemy.sql.elements.BooleanClauseList: The criterion.
+    """
+    def after(key, value):
+        if value is None:
+            # Nothing is smaller than NULL, and everything else is bigger.
+            return sa.false() if descending else key.isnot(None)
+        if not descending:
+            return key > value
+        if _nullable(key):
+            return sa.or_(key < value, key.is_(None))
+        return key < value
+
+    def equal(key, value):
+        return key.is_(None) if value is None else key == value
+
+    seek = []
+    for i, key in enumerate(keys):
+        seek.append(sa.and_(after(key, values[i]),
+                            *[equal(k, v) for k, v in zip(keys[:i], values[:i])]))
+    return sa.or_(*seek)
+
+
+class QueryStream(object):
+    """
+    The results of a query, loaded in batches while they are iterated over rather than all at once.
+
+    Renderers that write their output as they produce it, such as the ``json_stream`` and ``rss``
+    renderers, can then serialize large pages with a bounded amount of memory. Each batch is a
+    query of its own, that seeks past the last result of the previous batch on the sort keys. Unlike
+    a database cursor, this works with the relationships that queries load eagerly.
+
+    The response is written after the request has closed its database session, in which case the
+    batches are loaded in a new transaction of that session, which is rolled back afterwards.
+
+    Attributes:
+        query (sqlalchemy.orm.query.Query): The sorted query for the first batch.
+        keys (list): The columns the results are sorted by. The last one must be unique.
+        descending (bool): Whether the results are sorted in descending order.
+        limit (int or None): How many results to load in total, or None for all of them.
+        batch_size (int): How many results to load with each query.
+    """
+
+    def __init__(self, request, query, keys, descending, limit, batch_size=None):
+        """
+        Initialize the stream.
+
+        Args:
+            request (pyramid.request or None): The current request, or None outside of requests.
+            query (sqlalchemy.orm.query.Query): The sorted query for the first batch. It may have
+                an OFFSET, which the next batches do not use.
+            keys (list): The columns the results are sorted by. The last one must be unique.
+            descending (bool): Whether the results are sorted in descending order.
+            limit (int or None): How many results to load in total, or None for all of them.
+            batch_size (int or None): How many results to load with each query. Defaults to
+                STREAM_BATCH_SIZE.
+        """
+        self.query = query
+        self.keys = keys
+        self.descending = descending
+        self.limit = limit
+        self.batch_size = batch_size or STREAM_BATCH_SIZE
+        self._transforms = []
+        # Shared with the streams made by map().
+        self._request_state = {'finished': False}
+        if request is not None:
+            request.add_finished_callback(self._finish)
+
+    def _finish(self, request):
+        self._request_state['finished'] = True
+
+    def map(self, function):
+        """
+        Return a stream of the results of this one, transformed by a function.
+
+        Args:
+            function (callable): Takes a result and returns what the new stream yields instead.
+        Returns:
+            QueryStream: The new stream.
+        """
+        stream = copy.copy(self)
+        stream._transforms = self._transforms + [function]
+        return stream
+
+    def _batches(self):
+        """Yield the results in lists of at most batch_size, until limit results were loaded."""
+        query = self.query
+        remaining = self.limit
+        while remaining is None or remaining > 0:
+            size = self.batch_size if remaining is None else min(self.batch_size, remaining)
+            batch = query.limit(size).all()
+            if batch:
+                yield batch
+            if len(batch) < size:
+                return
+            if remaining is not None:
+                remaining -= size
+            values = [getattr(batch[-1], key.key) for key in self.keys]
+            query = self.query.offset(None).filter(_seek(self.keys, values, self.descending))
+
+    def __iter__(self):
+        """
+        Yield the results, transformed by the functions given to map(), loading them in batches.
+
+        If the request is finished, the transaction the batches were loaded in is rolled back when
+        the iteration ends.
+
+        Yields:
+            object: The results.
+        """
+        try:
+            for batch in self._batches():
+                for result in batch:
+                    for function in self._transforms:
+                        result = function(result)
+                    yield result
+        finally:
+            if self._request_state['finished']:
+                # Nothing was written, so just give the connection back to the pool.
+                self.query.session.rollback()
+
+    def __json__(self, request):
+        """Return the results as a list, for renderers that do not stream them."""
+        return list(self)
+
+
+def counts_results(request):
+    """
+    Return whether :func:`paginate` counts the results of the request.
+
+    Args:
+        request (pyramid.request): The current request.
+    Returns:
+        bool: True if the request has a true "count", or neither "count" nor "after".
+    """
+    count = request.validated.get('count')
+    if count is None:
+        return request.validated.get('after') is None
+    return count
+
+
+def paginate(request, query, keys, count_column, descending=True, total=None, stream=False):
+    """
+    Return a page of the results of a query, selected either by page number or by cursor.
+
+    Results are sorted by the given keys, on which NULL values come before any other value. If the
+    request has an "after" cursor, the page holds the results that come after it, which the
+    database finds with an index on the keys however far the cursor is. Otherwise the page is
+    selected by its number, with an OFFSET. Either way, a cursor to the next page is returned.
+
+    Counting the results scans all of them, so they are only counted if the request has a true
+    "count", or if it has neither "count" nor a cursor.
+
+    If the cursor was made for other sort keys, an error is added to the request and the page is
+    empty.
+
+    If stream is True, the results of the page are not loaded yet: they are returned as a
+    :class:`QueryStream`, which loads them in batches while the response is written. The stream is
+    not a consistent snapshot with the "total" and "next_after" computed here: its batches are
+    loaded with queries of their own, once the request's transaction is committed, in another
+    transaction. Results changed in between may be missing, repeated or out of date.
+
+    Args:
+        request (pyramid.request): The current request. Its validated parameters have "page",
+            "rows_per_page", "after" and "count" keys (see
+            bodhi.server.schemas.CursorPaginatedSchema).
+        query (sqlalchemy.orm.query.Query): The query to paginate, without ORDER BY.
+        keys (list): The columns to sort by, in order. The last one must be unique.
+        count_column (sqlalchemy.orm.attributes.InstrumentedAttribute): The column whose distinct
+            values are counted.
+        descending (bool): Whether the results are sorted in descending order.
+        total (int or None): The number of results, if the caller already counted them.
+        stream (bool): Whether to return the results as a QueryStream rather than a list.
+    Returns:
+        dict: A dictionary with the following keys:
+            items: The results in the page, as a list or a QueryStream.
+            page: The page number, or None if the page was selected by cursor.
+            pages: The total number of pages, or None if the results were not counted.
+            rows_per_page: The number of results per page.
+            total: The number of results, or None if they were not counted.
+            next_after: The cursor to the next page, or None if this is the last one.
+    """
+    data = request.validated
+    rows_per_page = data.get('rows_per_page')
+    after = data.get('after')
+    count = counts_results(request)
+    result = dict(items=[], page=None, pages=None, rows_per_page=rows_per_page, total=None,
+                  next_after=None)
+
+    query = query.order_by(*_order_by(keys, descending, query.session.get_bind().dialect.name))
+    if after is not None:
+        types = [datetime if isinstance(key.type, sa.DateTime) else (int, long) for key in keys]
+        if len(after) != len(keys) or not all(
+                isinstance(v, t) or (v is None and _nullable(k))
+                for v, t, k in zip(after, types, keys)):
+            request.errors.add('querystring', 'after', 'Invalid cursor')
+            request.errors.status = 400
+            return result
+        offset = 0
+        paged_query = query.filter(_seek(keys, after, descending))
+    else:
+        result['page'] = data.get('page')
+        offset = rows_per_page * (result['page'] - 1)
+        paged_query = query.offset(offset)
+
+    if count and total is not None:
+        result['total'] = total
+    elif count:
+        # We can't use ``query.count()`` here because it is naive with respect to the joins the
+        # query may have.
+        count_query = query.with_labels().statement\
+            .with_only_columns([sa.func.count(sa.distinct(count_column))])\
+            .order_by(None)
+        result['total'] = request.db.execute(count_query).scalar()
+    if count:
+        result['pages'] = int(math.ceil(result['total'] / float(rows_per_page)))
+
+    if stream:
+        # Only fetch the sort keys of the last result of the page, and of the one after it if
+        # there is a next page.
+        boundary = paged_query.with_entities(*keys).offset(offset + rows_per_page - 1)\
+            .limit(2).all()
+        if len(boundary) > 1:
+            result['next_after'] = encode_cursor(list(boundary[0]))
+        result['items'] = QueryStream(request, paged_query, keys, descending, rows_per_page)
+        return result
+
+    # Fetch one more result to know whether there is a next page.
+    items = paged_query.limit(rows_per_page + 1).all()
+    if len(items) > rows_per_page:
+        items = items[:rows_per_page]
+        result['next_after'] = encode_cursor([getattr(items[-1], key.key) for key in keys])
+    result['items'] = items
+    return result
+
+
 def bug_link(context, bug, short=False):
     """
     Form a URL to a given bugzilla bug.
@@ -1220,10 +1724,14 @@ def call_api(api_url, service_name, error_key=None, method='GET', data=None):
         raise RuntimeError(error_msg)
 
 
+@memoized(max_size=lambda: config.get('pagure_cache.max_size'),
+          ttl=lambda: config.get('pagure_cache.ttl'))
 def pagure_api_get(pagure_api_url):
     """
     Perform a GET request against Pagure.
 
+    Responses, such as package ACLs, are cached for pagure_cache.ttl seconds.
+
     Args:
         pagure_api_url (basestring): The URL to GET, including query parameters.
     Returns:
@@ -1234,10 +1742,14 @@ def pagure_api_get(pagure_api_url):
     return call_api(pagure_api_url, service_name='Pagure', error_key='error')
 
 
+@memoized(max_size=lambda: config.get('pdc_cache.max_size'),
+          ttl=lambda: config.get('pdc_cache.ttl'))
 def pdc_api_get(pdc_api_url):
     """
     Perform a GET request against PDC.
 
+    Responses, such as the critical path components, are cached for pdc_cache.ttl seconds.
+
     Args:
         pdc_api_url (basestring): The URL to GET, including query parameters.
     Returns:
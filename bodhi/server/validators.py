@@ -23,6 +23,7 @@ import pyramid.threadlocal
 import rpm
 
 from . import captcha
+from . import conditional
 from . import log
 from .models import (
     Build,
@@ -679,7 +680,7 @@ def validate_ignore_user(request):
 
 def validate_update_id(request):
     """Ensure that a given update id exists"""
-    update = Update.get(request.matchdict['id'], request.db)
+    update = Update.get(request.matchdict['id'], request.db, profile='detail')
     if update:
         request.validated['update'] = update
     else:
@@ -693,6 +694,23 @@ def validate_update_id(request):
         request.errors.status = HTTPNotFound.code
 
 
+def validate_update_not_modified(request):
+    """
+    Answer with a 304 if the client already has the current version of the requested update.
+
+    This runs before validate_update_id(), so that the update is not loaded in that case.
+    """
+    if request.method != 'GET' or conditional.wants_html(request):
+        return
+    id = request.matchdict['id']
+    update = request.db.query(Update.id, Update.version).filter(
+        or_(Update.title == id, Update.alias == id)).first()
+    if update is not None:
+        # Updates embed their release, so their ETag changes with the releases too.
+        conditional.check(
+            request, (tuple(update), Release.registry.snapshot(request.db).version))
+
+
 def _conditionally_get_update(request):
     update = request.validated['update']
 
@@ -18,52 +18,41 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """A collection of views that don't fit in any other common category."""
 
-import datetime
-
 from pyramid.settings import asbool
 from pyramid.view import view_config, notfound_view_config
 from pyramid.exceptions import HTTPForbidden, HTTPBadRequest
 from pyramid.httpexceptions import HTTPFound
 import cornice.errors
-import sqlalchemy as sa
 
-from bodhi.server import log, models
+from bodhi.server import buildsys, cache, log, models, stats
 from bodhi.server.config import config
 import bodhi.server.util
 
 
 def get_top_testers(request):
     """
-    Return a query of the 5 users that have submitted the most comments in the last 7 days.
+    Return the 5 users that have submitted the most comments in the last 7 days.
+
+    The comments are counted from the daily activity of users, and the result is cached until a
+    comment is added (see bodhi.server.stats.top_testers()).
 
     Args:
         request (pyramid.request): The current web request.
     Returns:
-        sqlalchemy.orm.query.Query: A SQLAlchemy query that contains the
-                                  5 users that have submitted the most comments
-                                  in the last 7 days, and their total number of
-                                  comments in bodhi.
+        list: (User, number of comments) tuples, for the 5 users that have submitted the most
+            comments in the last 7 days.
     """
     db = request.db
-    blacklist = config.get('stats_blacklist')
+    blacklist = [unicode(user) for user in config.get('stats_blacklist')]
     days = config.get('top_testers_timeframe')
-    start_time = datetime.datetime.utcnow() - datetime.timedelta(days=days)
-
-    query = db.query(
-        models.User,
-        sa.func.count(models.User.comments).label(u'count_1')
-    ).join(models.Comment)
-    query = query\
-        .order_by(sa.text(u'count_1 desc'))\
-        .filter(models.Comment.timestamp > start_time)
-
-    for user in blacklist:
-        query = query.filter(models.User.name != unicode(user))
 
-    return query\
-        .group_by(models.User)\
-        .limit(5)\
-        .all()
+    top_testers = stats.top_testers(db, days, blacklist)
+    if not top_testers:
+        return []
+    users = db.query(models.User).options(*models.User.loader_options('list'))\
+        .filter(models.User.name.in_([name for name, count in top_testers]))
+    users = dict((user.name, user) for user in users)
+    return [(users[name], count) for name, count in top_testers if name in users]
 
 
 def get_latest_updates(request, critpath, security):
@@ -81,7 +70,7 @@ def get_latest_updates(request, critpath, security):
                                   5 most recent updates that are in Testing status
     """
     db = request.db
-    query = db.query(models.Update)
+    query = db.query(models.Update).options(*models.Update.loader_options('list'))
 
     if critpath:
         query = query.filter(
@@ -97,9 +86,9 @@ def get_latest_updates(request, critpath, security):
     return query.limit(5).all()
 
 
-def _get_status_counts(basequery, status):
+def _get_status_counts(db, release, status):
     """
-    Return a dictionary with the counts of objects found in the basequery.
+    Return a dictionary with the counts of the updates of a release with the given status.
 
     The return data is specified by total count, newpackage count, bugfix count, enhancement count,
     and security count. The dictionary keys will be named with the
@@ -113,25 +102,19 @@ def _get_status_counts(basequery, status):
         stable_security_total
 
     Args:
-        basequery (sqlalchemy.orm.query.Query):
-            The basequery of updates we want to count and further filter on.
-        status (bodhi.server.models.UpdateStatus):
-            The update status we want to filter by in basequery
+        db (sqlalchemy.orm.session.Session): The database session to use.
+        release (basestring): The name of the release whose updates we want to count.
+        status (bodhi.server.models.UpdateStatus): The update status we want to count.
     Return:
         dict: A dictionary describing the counts of the updates, as described above.
     """
-    basequery = basequery.filter(models.Update.status == status)
-    return {
-        '{}_updates_total'.format(status.description): basequery.count(),
-        '{}_newpackage_total'.format(status.description):
-            basequery.filter(models.Update.type == models.UpdateType.newpackage).count(),
-        '{}_bugfix_total'.format(status.description):
-            basequery.filter(models.Update.type == models.UpdateType.bugfix).count(),
-        '{}_enhancement_total'.format(status.description):
-            basequery.filter(models.Update.type == models.UpdateType.enhancement).count(),
-        '{}_security_total'.format(status.description):
-            basequery.filter(models.Update.type == models.UpdateType.security).count(),
-    }
+    total = stats.count_updates(db, release, status)
+    counts = {'{}_updates_total'.format(status.description): total}
+    for update_type in (models.UpdateType.newpackage, models.UpdateType.bugfix,
+                        models.UpdateType.enhancement, models.UpdateType.security):
+        counts['{}_{}_total'.format(status.description, update_type.description)] = \
+            stats.count_updates(db, release, status, update_type)
+    return counts
 
 
 def get_update_counts(request, releaseid):
@@ -158,18 +141,19 @@ def get_update_counts(request, releaseid):
         stable_enhancement_total
         stable_security_total
 
+    The counts of every release are fetched with a single query, and cached (see
+    bodhi.server.stats).
+
     Args:
         request (pyramid.util.Request): The current request
-        releaseid (basestring): The id of the Release object you would like the counts performed on
+        releaseid (basestring): The name of the Release you would like the counts performed on
     Returns:
         dict: A dictionary expressing the counts, as described above.
     """
-    release = models.Release.get(releaseid, request.db)
-    basequery = request.db.query(models.Update).filter(models.Update.release == release)
     counts = {}
-    counts.update(_get_status_counts(basequery, models.UpdateStatus.pending))
-    counts.update(_get_status_counts(basequery, models.UpdateStatus.testing))
-    counts.update(_get_status_counts(basequery, models.UpdateStatus.stable))
+    for status in (models.UpdateStatus.pending, models.UpdateStatus.testing,
+                   models.UpdateStatus.stable):
+        counts.update(_get_status_counts(request.db, releaseid, status))
 
     return counts
 
@@ -201,7 +185,7 @@ def home(request):
     """
     r = request
 
-    @request.cache.cache_on_arguments()
+    @cache.cache_on_arguments('home')
     def work():
         top_testers = get_top_testers(request)
         critpath_updates = get_latest_updates(request, True, False)
@@ -264,10 +248,11 @@ def latest_candidates(request):
     koji = request.koji
     db = request.db
 
-    @request.cache.cache_on_arguments()
+    @cache.cache_on_arguments('candidates')
     def work(pkg, testing):
         result = []
-        koji.multicall = True
+        batch = buildsys.MulticallBatch(koji)
+        taglists = []
 
         releases = db.query(models.Release) \
                      .filter(
@@ -277,18 +262,18 @@ def latest_candidates(request):
 
         kwargs = dict(package=pkg, latest=True)
         for release in releases:
-            koji.listTagged(release.candidate_tag, **kwargs)
+            taglists.append(batch.listTagged(release.candidate_tag, **kwargs))
             if testing:
-                koji.listTagged(release.testing_tag, **kwargs)
-                koji.listTagged(release.pending_testing_tag, **kwargs)
-                koji.listTagged(release.pending_signing_tag, **kwargs)
+                taglists.append(batch.listTagged(release.testing_tag, **kwargs))
+                taglists.append(batch.listTagged(release.pending_testing_tag, **kwargs))
+                taglists.append(batch.listTagged(release.pending_signing_tag, **kwargs))
 
-        response = koji.multiCall() or []  # Protect against None
+        batch.flush()
 
-        for taglist in response:
-            if isinstance(taglist, dict):
+        for taglist in taglists:
+            if taglist.exception() is not None:
                 continue
-            for build in taglist[0]:
+            for build in taglist.result():
                 item = {
                     'nvr': build['nvr'],
                     'id': build['id'],
@@ -312,28 +297,75 @@ def latest_candidates(request):
     return result
 
 
+def _get_latest_builds(koji, tags, packages):
+    """
+    Return the latest build of each of the given packages in each of the given tags.
+
+    All the getLatestBuilds() calls are sent to Koji in one chunked multicall.
+
+    Args:
+        koji (koji.ClientSession or bodhi.server.buildsys.Buildsystem): The Koji session to use.
+        tags (list): The names of the tags to look into.
+        packages (list): The names of the packages to look for.
+    Returns:
+        list: One dictionary per package, in the same order as packages, mapping tags to the NVR of
+            the package's latest build in that tag. Tags Koji failed to look into are left out.
+    """
+    batch = buildsys.MulticallBatch(koji)
+    futures = [[(tag, batch.getLatestBuilds(tag, package=package)) for tag in tags]
+               for package in packages]
+    batch.flush()
+
+    result = []
+    for package_futures in futures:
+        builds = {}
+        for tag, future in package_futures:
+            # Things like EPEL don't have pending tags
+            if future.exception() is not None:
+                continue
+            for build in future.result():
+                builds[tag] = build['nvr']
+        result.append(builds)
+    return result
+
+
 @view_config(route_name='latest_builds', renderer='json')
 def latest_builds(request):
     """
-    Return a list of the latest builds for a given package.
+    Return a list of the latest builds for the given packages.
+
+    The results are cached per package in the "candidates" cache region, and the packages that
+    aren't cached are looked up in a single Koji multicall.
 
     Args:
         request (pyramid.util.Request): The current request. The request's "package" parameter is
-            used to pass the package name being queried.
+            used to pass the name of a single package being queried, and its "packages" parameter
+            to pass a comma or space separated list of package names.
     Returns:
-        dict: A dictionary of the release dist tag to the latest build.
+        dict: If "packages" is given, a dictionary mapping each package name to a dictionary of the
+            release tags to the latest build. Otherwise, a dictionary of the release tags to the
+            latest build of "package".
     """
-    builds = {}
-    koji = request.koji
-    package = request.params.get('package')
-    for tag_type, tags in models.Release.get_tags(request.db)[0].iteritems():
-        for tag in tags:
-            try:
-                for build in koji.getLatestBuilds(tag, package=package):
-                    builds[tag] = build['nvr']
-            except Exception:  # Things like EPEL don't have pending tags
-                pass
-    return builds
+    packages = bodhi.server.util.splitter(request.params.get('packages'))
+    single = not packages
+    if single:
+        packages = [request.params.get('package')]
+
+    tags = [tag for tag_list in models.Release.get_tags(request.db)[0].values()
+            for tag in tag_list]
+    keys = ['latest_builds:%s' % (package or '') for package in packages]
+
+    try:
+        builds = cache.get_region('candidates').get_or_create_multi(
+            keys, lambda *missing: _get_latest_builds(
+                request.koji, tags, [packages[keys.index(key)] for key in missing]))
+    except Exception:
+        log.exception('Unable to query Koji for the latest builds of %r' % packages)
+        builds = [{} for package in packages]
+
+    if single:
+        return builds[0]
+    return dict(zip(packages, builds))
 
 
 @view_config(route_name='masher_status', renderer='masher.html')
@@ -16,19 +16,29 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
-"""Define the view that presents release metrics in the web UI."""
+"""Define the views that present release metrics in the web UI and the API."""
 
+import datetime
 import json
 
+from pyramid.httpexceptions import HTTPBadRequest
 from pyramid.view import view_config
+from sqlalchemy import func
 
+from bodhi.server import cache, stats
 import bodhi.server.models as m
 
 
+#: The number of months of history shown by the metrics page.
+HISTORY_MONTHS = 12
+
+
 def compute_ticks_and_data(db, releases, update_types):
     """
     Return the data and ticks to make the stats graph.
 
+    The numbers of stable updates come from bodhi.server.stats, which counts them all at once.
+
     Args:
         db (sqlalchemy.orm.session.Session): The database Session.
         releases (list): A list of release objects we are interested in generating metrics on.
@@ -38,42 +48,70 @@ def compute_ticks_and_data(db, releases, update_types):
         tuple: A 2-tuple of data that can be graphed by the UI javascript.
     """
     data, ticks = [], []
+    counts = stats.update_counts(db)
 
-    releases = sorted(releases, cmp=lambda x, y:
-                      cmp(int(x.version_int), int(y.version_int)))
+    releases = sorted(releases, key=lambda release: release.version_int)
 
     for i, release in enumerate(releases):
         ticks.append([i, release.name])
 
     for update_type, label in update_types.items():
         d = []
-        update_type = m.UpdateType.from_string(update_type)
         for i, release in enumerate(releases):
-            num = db.query(m.Update).filter_by(
-                release=release,
-                type=update_type,
-                status=m.UpdateStatus.stable
-            ).count()
+            num = counts.get(release.name, {}).get(m.UpdateStatus.stable.value, {}).get(
+                update_type, 0)
             d.append([i, num])
         data.append(dict(data=d, label=label))
 
     return (data, ticks)
 
 
-@view_config(route_name='metrics', renderer='metrics.html')
-def metrics(request):
+def compute_history(db, update_types, months):
     """
-    Return a response with metric data to be graphed.
+    Return the data and ticks to graph the number of updates pushed to stable each month.
+
+    The numbers come from the :class:`bodhi.server.models.UpdateMetric` table.
 
     Args:
-        request (pyramid.util.Request): The current Request.
+        db (sqlalchemy.orm.session.Session): The database Session.
+        update_types (dict): A dictionary mapping the possible types of updates to human readable
+            string defining them.
+        months (int): How many months to graph, including the current one.
     Returns:
-        dict: A dictionary with keys 'data', 'ticks', 'eldata', and 'elticket'. The 'el' prefixed
-            keys are for enterprise Linux. These data are used to render the graphs by the template
-            JavaScript.
+        tuple: A 2-tuple of data that can be graphed by the UI javascript.
+    """
+    today = datetime.datetime.utcnow().date()
+    # Number the months from year 0, to go back in time with a subtraction.
+    current = today.year * 12 + today.month - 1
+    first = current - months + 1
+    labels = ['%d/%02d' % (month // 12, month % 12 + 1) for month in range(first, current + 1)]
+    since = datetime.date(first // 12, first % 12 + 1, 1)
+
+    counts = {}
+    query = db.query(m.UpdateMetric.date, m.UpdateMetric.type, func.sum(m.UpdateMetric.count))\
+        .filter(m.UpdateMetric.status == m.UpdateStatus.stable)\
+        .filter(m.UpdateMetric.date >= since)\
+        .group_by(m.UpdateMetric.date, m.UpdateMetric.type)
+    for date, update_type, count in query:
+        key = (update_type.value, '%d/%02d' % (date.year, date.month))
+        counts[key] = counts.get(key, 0) + count
+
+    ticks = [[i, label] for i, label in enumerate(labels)]
+    data = [dict(data=[[i, counts.get((update_type, label), 0)] for i, label in enumerate(labels)],
+                 label=type_label)
+            for update_type, type_label in update_types.items()]
+    return (data, ticks)
+
+
+def _get_metrics(db):
     """
-    db = request.db
+    Return the data graphed by the metrics page.
 
+    Args:
+        db (sqlalchemy.orm.session.Session): The database Session.
+    Returns:
+        dict: See metrics().
+    """
     update_types = {
         'bugfix': 'Bug fixes',
         'enhancement': 'Enhancements',
@@ -87,7 +125,72 @@ def metrics(request):
     releases = db.query(m.Release).filter(m.Release.name.like(u'E%')).all()
     eldata, elticks = compute_ticks_and_data(db, releases, update_types)
 
+    historydata, historyticks = compute_history(db, update_types, HISTORY_MONTHS)
+
     return {
         'data': json.dumps(data), 'ticks': json.dumps(ticks),
         'eldata': json.dumps(eldata), 'elticks': json.dumps(elticks),
+        'historydata': json.dumps(historydata), 'historyticks': json.dumps(historyticks),
     }
+
+
+@view_config(route_name='metrics', renderer='metrics.html')
+def metrics(request):
+    """
+    Return a response with metric data to be graphed.
+
+    The data is cached in the "stats" cache region, which is invalidated when the counts change.
+
+    Args:
+        request (pyramid.util.Request): The current Request.
+    Returns:
+        dict: A dictionary with keys 'data', 'ticks', 'eldata', 'elticks', 'historydata' and
+            'historyticks'. The 'el' prefixed keys are for enterprise Linux, and the 'history'
+            prefixed ones for the updates pushed to stable in each of the last HISTORY_MONTHS
+            months. These data are used to render the graphs by the template JavaScript.
+    """
+    return cache.get_region('stats').get_or_create('metrics', lambda: _get_metrics(request.db))
+
+
+@view_config(route_name='metrics_json', renderer='json')
+def metrics_json(request):
+    """
+    Return the counts of updates by release, status and type, now and over time.
+
+    The "releases" query parameter, which can be repeated, restricts the metrics to the given
+    releases. The "since" query parameter, a YYYY-MM-DD date, restricts the history to the days
+    since then.
+
+    Args:
+        request (pyramid.util.Request): The current Request.
+    Returns:
+        dict: A dictionary with two keys. 'counts' maps release names to dictionaries mapping
+            statuses to dictionaries mapping types to the current numbers of updates. 'history' is a
+            list of dictionaries with 'release', 'type', 'status', 'date' and 'count' keys, giving
+            how many updates of a release and type entered a status each day, ordered by date.
+    Raises:
+        HTTPBadRequest: If the "since" parameter is not a date.
+    """
+    releases = request.GET.getall('releases')
+    query = request.db.query(m.Release.name, m.UpdateMetric.type, m.UpdateMetric.status,
+                             m.UpdateMetric.date, m.UpdateMetric.count)\
+        .join(m.UpdateMetric.release)\
+        .order_by(m.UpdateMetric.date, m.Release.name, m.UpdateMetric.type,
+                  m.UpdateMetric.status)
+    if releases:
+        query = query.filter(m.Release.name.in_(releases))
+    since = request.GET.get('since')
+    if since:
+        try:
+            since = datetime.datetime.strptime(since, '%Y-%m-%d').date()
+        except ValueError:
+            raise HTTPBadRequest('"since" must be a date formatted as YYYY-MM-DD')
+        query = query.filter(m.UpdateMetric.date >= since)
+
+    counts = stats.update_counts(request.db)
+    if releases:
+        counts = dict((name, c) for name, c in counts.items() if name in releases)
+    history = [{'release': name, 'type': update_type.value, 'status': status.value,
+                'date': date.isoformat(), 'count': count}
+               for name, update_type, status, date, count in query]
+    return {'counts': counts, 'history': history}
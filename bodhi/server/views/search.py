@@ -15,11 +15,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
-"""Contains a view that allows API users to search packages."""
+"""Contains views that allow API users to search packages and updates."""
 
 from pyramid.view import view_config
 
 from bodhi.server import log, buildsys
+from bodhi.server.models import Update
+
+
+#: The maximum number of results returned by search_updates().
+MAX_RESULTS = 20
 
 
 def get_all_packages():
@@ -52,3 +57,27 @@ def search_packages(request):
     packages = get_all_packages()
     return [{'id': p, 'label': p, 'value': p} for p in packages
             if request.GET['term'] in p]
+
+
+@view_config(route_name='search_updates', renderer='json',
+             request_method='GET')
+def search_updates(request):
+    """
+    Search for updates that match the given term GET query parameter.
+
+    The term is matched against the title, alias and notes of updates, the names of their packages
+    and the titles of their bugs (see bodhi.server.models.Update.search()). The best matches come
+    first if the database can rank them, and the most recent ones otherwise.
+
+    Args:
+        request (pyramid.request): The current web request.
+    Returns:
+        list: A list of at most MAX_RESULTS dictionaries with keys 'id', 'label', and 'value',
+            holding the alias, title, and alias of the matching updates.
+    """
+    query, rank = Update.search(request.db.query(Update.alias, Update.title), request.GET['term'])
+    order = [Update.date_submitted.desc(), Update.id.desc()]
+    if rank is not None:
+        order.insert(0, rank.desc())
+    return [{'id': alias, 'label': title, 'value': alias}
+            for alias, title in query.order_by(*order).limit(MAX_RESULTS)]
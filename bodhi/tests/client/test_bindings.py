@@ -372,6 +372,20 @@ class TestBodhiClient_latest_builds(unittest.TestCase):
         self.assertEqual(latest_builds, 'bodhi-2.4.0-1.fc25')
         client.send_request.assert_called_once_with('latest_builds', params={'package': 'bodhi'})
 
+    def test_latest_builds_packages(self):
+        """
+        Test latest_builds() with a list of packages.
+        """
+        client = bindings.BodhiClient()
+        client.send_request = mock.MagicMock(
+            return_value={'bodhi': {'f25-updates': 'bodhi-2.4.0-1.fc25'}})
+
+        latest_builds = client.latest_builds(['bodhi', 'python-fedora'])
+
+        self.assertEqual(latest_builds, {'bodhi': {'f25-updates': 'bodhi-2.4.0-1.fc25'}})
+        client.send_request.assert_called_once_with(
+            'latest_builds', params={'packages': 'bodhi,python-fedora'})
+
 
 class TestBodhiClient_list_overrides(unittest.TestCase):
     """
@@ -551,6 +565,45 @@ class TestBodhiClient_query(unittest.TestCase):
         client.send_request.assert_called_once_with(
             'updates/', verb='GET', params={'builds': 'bodhi-2.4.0-1.fc26', 'bugs': None})
 
+    def test_with_all_pages(self):
+        """
+        Assert that all_pages follows the cursors until the last page.
+        """
+        client = bindings.BodhiClient()
+        client.send_request = mock.MagicMock(side_effect=[
+            {'updates': ['u1', 'u2'], 'total': 5, 'page': 1, 'next_after': 'c1'},
+            {'updates': ['u3', 'u4'], 'total': None, 'page': None, 'next_after': 'c2'},
+            {'updates': ['u5'], 'total': None, 'page': None, 'next_after': None}])
+
+        result = client.query(releases=['F27'], rows_per_page=2, page=1, all_pages=True)
+
+        self.assertEqual(
+            result, {'updates': ['u1', 'u2', 'u3', 'u4', 'u5'], 'total': 5, 'page': 1,
+                     'next_after': None})
+        self.assertEqual(
+            client.send_request.mock_calls,
+            [mock.call('updates/', verb='GET',
+                       params={'releases': ['F27'], 'rows_per_page': 2, 'page': 1}),
+             mock.call('updates/', verb='GET',
+                       params={'releases': ['F27'], 'rows_per_page': 2, 'count': False,
+                               'after': 'c1'}),
+             mock.call('updates/', verb='GET',
+                       params={'releases': ['F27'], 'rows_per_page': 2, 'count': False,
+                               'after': 'c2'})])
+
+    def test_with_all_pages_old_server(self):
+        """
+        Assert that all_pages returns the first page from servers that do not return cursors.
+        """
+        client = bindings.BodhiClient()
+        client.send_request = mock.MagicMock(return_value={'updates': ['u1'], 'total': 1})
+
+        result = client.query(releases=['F27'], all_pages=True)
+
+        self.assertEqual(result, {'updates': ['u1'], 'total': 1, 'next_after': None})
+        client.send_request.assert_called_once_with(
+            'updates/', verb='GET', params={'releases': ['F27']})
+
     def test_with_limit(self):
         """
         Assert that the limit kwargs gets translated to rows_per_page correctly.
@@ -1268,6 +1321,100 @@ class TestBodhiClient_candidates(unittest.TestCase):
         client.send_request.assert_called_once_with('releases/', params={}, verb='GET')
 
 
+class TestBodhiClient_get_updates(unittest.TestCase):
+    """
+    Test the BodhiClient.get_updates() method.
+    """
+    @mock.patch('bodhi.client.bindings.BodhiClient._load_cookies', mock.MagicMock())
+    def test_get_updates(self):
+        """Assert that the ids and fields are sent in one request."""
+        client = bindings.BodhiClient()
+        client.send_request = mock.MagicMock(
+            return_value=[{'alias': 'FEDORA-2017-a3bbe1a8f2', 'status': 'testing'}])
+
+        updates = client.get_updates(['FEDORA-2017-a3bbe1a8f2', 'bodhi-2.0-1.fc17'],
+                                     fields=['alias', 'status'])
+
+        self.assertEqual(updates, [{'alias': 'FEDORA-2017-a3bbe1a8f2', 'status': 'testing'}])
+        client.send_request.assert_called_once_with(
+            'updates/', verb='GET',
+            params={'ids': 'FEDORA-2017-a3bbe1a8f2,bodhi-2.0-1.fc17', 'fields': 'alias,status'})
+
+    @mock.patch('bodhi.client.bindings.BodhiClient._load_cookies', mock.MagicMock())
+    def test_get_updates_batches(self):
+        """Assert that the ids are sent by batches of MAX_UPDATE_IDS."""
+        client = bindings.BodhiClient()
+        client.send_request = mock.MagicMock(side_effect=[[{'alias': 'a'}], [{'alias': 'b'}]])
+        ids = ['update-%d' % i for i in range(bindings.MAX_UPDATE_IDS + 1)]
+
+        updates = client.get_updates(ids)
+
+        self.assertEqual(updates, [{'alias': 'a'}, {'alias': 'b'}])
+        self.assertEqual(
+            client.send_request.mock_calls,
+            [mock.call('updates/', verb='GET',
+                       params={'ids': ','.join(ids[:bindings.MAX_UPDATE_IDS])}),
+             mock.call('updates/', verb='GET', params={'ids': ids[-1]})])
+
+
+class TestBodhiClient_export_updates(unittest.TestCase):
+    """
+    Test the BodhiClient.export_updates() method.
+    """
+    @mock.patch('bodhi.client.bindings.BodhiClient._load_cookies', mock.MagicMock())
+    def test_export_updates(self):
+        """Assert that the lines of the response are parsed as they are read."""
+        client = bindings.BodhiClient(base_url='http://example.com/bodhi/')
+        client._session = mock.MagicMock()
+        response = client._session.get.return_value
+        response.ok = True
+        response.iter_lines.return_value = iter(['{"alias": "a"}', '', '{"alias": "b"}'])
+
+        updates = client.export_updates(modified_since=datetime(2017, 10, 3, 12, 30),
+                                        releases=['F26', 'F27'])
+
+        self.assertEqual(list(updates), [{'alias': 'a'}, {'alias': 'b'}])
+        client._session.get.assert_called_once_with(
+            'http://example.com/bodhi/export/updates',
+            params={'modified_since': '2017-10-03T12:30:00', 'releases': 'F26,F27'},
+            stream=True, timeout=client.timeout)
+        response.close.assert_called_once_with()
+
+    @mock.patch('bodhi.client.bindings.BodhiClient._load_cookies', mock.MagicMock())
+    def test_export_updates_error(self):
+        """Assert that the errors of the server are raised."""
+        client = bindings.BodhiClient()
+        client._session = mock.MagicMock()
+        response = client._session.get.return_value
+        response.ok = False
+        response.json.return_value = {
+            'errors': [{'description': 'Invalid releases specified: F99'}]}
+
+        with self.assertRaises(bindings.BodhiClientException) as exc:
+            list(client.export_updates(releases=['F99']))
+
+        self.assertEqual(str(exc.exception), 'Invalid releases specified: F99')
+        client._session.get.assert_called_once_with(
+            bindings.BASE_URL + 'export/updates', params={'releases': 'F99'}, stream=True,
+            timeout=client.timeout)
+        response.close.assert_called_once_with()
+
+    @mock.patch('bodhi.client.bindings.BodhiClient._load_cookies', mock.MagicMock())
+    def test_export_updates_error_not_json(self):
+        """Assert that errors the server did not describe are raised with their status."""
+        client = bindings.BodhiClient()
+        client._session = mock.MagicMock()
+        response = client._session.get.return_value
+        response.ok = False
+        response.status_code = 502
+        response.json.side_effect = ValueError('No JSON object could be decoded')
+
+        with self.assertRaises(bindings.BodhiClientException) as exc:
+            list(client.export_updates())
+
+        self.assertEqual(str(exc.exception), 'The export failed with HTTP status 502')
+
+
 class TestBodhiClient_get_releases(unittest.TestCase):
     """
     Test the BodhiClient.get_releases() method.
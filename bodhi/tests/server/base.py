@@ -23,7 +23,7 @@ from webtest import TestApp
 from sqlalchemy import event
 import mock
 
-from bodhi.server import bugs, buildsys, models, initialize_db, Session, config, main
+from bodhi.server import bugs, buildsys, models, initialize_db, Session, config, main, util
 from bodhi.tests.server import create_update, populate
 
 
@@ -133,8 +133,10 @@ class BaseTestCase(unittest.TestCase):
 
     def setUp(self):
         # Ensure "cached" objects are cleared before each test.
-        models.Release._all_releases = None
-        models.Release._tag_cache = None
+        models.Release.registry.clear()
+        util.pagure_api_get.invalidate()
+        util.pdc_api_get.invalidate()
+        util._render_markdown.invalidate()
 
         if engine is None:
             self.engine = _configure_test_db()
@@ -229,6 +231,26 @@ class BaseTestCase(unittest.TestCase):
         """
         return create_update(self.db, build_nvrs, release_name)
 
+    @contextmanager
+    def count_queries(self):
+        """
+        Count the SQL statements executed within the context.
+
+        Yields:
+            list: The statements executed so far. It keeps growing until the context exits.
+        """
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if not statement.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO')):
+                statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', before_cursor_execute)
+
 
 class TransactionalSessionMaker(object):
     """
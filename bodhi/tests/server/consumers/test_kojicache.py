@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test suite contains tests for the bodhi.server.consumers.kojicache module."""
+from __future__ import absolute_import, unicode_literals
+
+import unittest
+
+import mock
+
+from bodhi.server.consumers import kojicache
+
+
+class TestKojiCacheHandler(unittest.TestCase):
+    """This test class contains tests for the KojiCacheHandler class."""
+    @mock.patch('bodhi.server.consumers.kojicache.buildsys.setup_buildsystem')
+    def setUp(self, setup_buildsystem):
+        hub = mock.MagicMock()
+        hub.config = {'environment': 'environment', 'topic_prefix': 'topic_prefix'}
+        self.handler = kojicache.KojiCacheHandler(hub)
+
+        setup_buildsystem.assert_called_once_with(kojicache.config)
+
+    def test___init__(self):
+        """Assert that the handler listens for tag and untag messages."""
+        self.assertEqual(
+            self.handler.topic,
+            ['topic_prefix.environment.buildsys.tag', 'topic_prefix.environment.buildsys.untag'])
+
+    @mock.patch('bodhi.server.consumers.kojicache.cache.invalidate')
+    @mock.patch('bodhi.server.consumers.kojicache.buildsys.invalidate_cache')
+    def test_consume(self, invalidate_cache, invalidate_region):
+        """Assert that the tag and the build in the message are invalidated."""
+        message = {
+            'body': {
+                'topic': 'org.fedoraproject.prod.buildsys.untag',
+                'msg': {
+                    'build_id': 442562, 'name': 'colord', 'tag_id': 214,
+                    'tag': 'f26-updates-testing', 'version': '1.3.4', 'release': '1.fc26'}}}
+
+        self.handler.consume(message)
+
+        invalidate_cache.assert_called_once_with(
+            tags=['f26-updates-testing', 214], builds=['colord-1.3.4-1.fc26', 442562])
+        invalidate_region.assert_called_once_with('candidates')
+
+    @mock.patch('bodhi.server.consumers.kojicache.cache.invalidate')
+    @mock.patch('bodhi.server.consumers.kojicache.buildsys.invalidate_cache')
+    def test_consume_without_ids(self, invalidate_cache, invalidate_region):
+        """Assert that missing ids are not invalidated."""
+        message = {
+            'body': {
+                'msg': {'name': 'colord', 'tag': 'f26-updates', 'version': '1.3.4',
+                        'release': '1.fc26'}}}
+
+        self.handler.consume(message)
+
+        invalidate_cache.assert_called_once_with(
+            tags=['f26-updates'], builds=['colord-1.3.4-1.fc26'])
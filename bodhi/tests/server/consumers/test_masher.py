@@ -159,8 +159,7 @@ class TestMasher(unittest.TestCase):
         self.masher = Masher(FakeHub(), db_factory=self.db_factory, mash_dir=self.tempdir)
 
         # Reset "cached" objects before each test.
-        Release._all_releases = None
-        Release._tag_cache = None
+        Release.registry.clear()
 
     def tearDown(self):
         shutil.rmtree(self.tempdir)
@@ -723,7 +722,7 @@ References:
             db.add(update)
 
             # Wipe out the tag cache so it picks up our new release
-            Release._tag_cache = None
+            Release.registry.clear()
 
         self.msg['body']['msg']['updates'] += [u'bodhi-2.0-1.fc18']
 
@@ -809,7 +808,7 @@ References:
             db.add(update)
 
             # Wipe out the tag cache so it picks up our new release
-            Release._tag_cache = None
+            Release.registry.clear()
 
         self.msg['body']['msg']['updates'] += [u'bodhi-2.0-1.fc18']
 
@@ -887,7 +886,7 @@ References:
             db.add(update)
 
             # Wipe out the tag cache so it picks up our new release
-            Release._tag_cache = None
+            Release.registry.clear()
 
         self.msg['body']['msg']['updates'] += [u'bodhi-2.0-1.fc18']
 
@@ -1083,7 +1082,7 @@ References:
             db.add(update)
 
             # Wipe out the tag cache so it picks up our new release
-            Release._tag_cache = None
+            Release.registry.clear()
 
         self.msg['body']['msg']['updates'] = [u'testmodule-master-2']
 
@@ -1598,7 +1597,7 @@ References:
             update.type = UpdateType.enhancement
             db.add(update)
             # Wipe out the tag cache so it picks up our new releases
-            Release._tag_cache = None
+            Release.registry.clear()
         self.msg['body']['msg']['updates'] += [u'bodhi-2.0-1.fc18', u'bodhi-2.0-1.fc27']
 
     @mock.patch(**mock_taskotron_results)
@@ -1813,6 +1812,29 @@ class TestMasherThread_eject_from_mash(MasherThreadBaseTestCase):
         self.assertEqual(t.state['updates'], [])
 
 
+class TestMasherThread_remove_pending_tags(MasherThreadBaseTestCase):
+    """This test class contains tests for the MasherThread.remove_pending_tags() method."""
+    @mock.patch.object(buildsys.DevBuildsys, 'multiCall', autospec=True,
+                       side_effect=buildsys.DevBuildsys.multiCall)
+    def test_single_multicall(self, multiCall):
+        """Assert that the pending tags of all the updates are removed in a single multicall."""
+        up = self.db.query(Update).one()
+        up.request = UpdateRequest.testing
+        t = MasherThread(u'F17', u'testing', [u'bodhi-2.0-1.fc17'],
+                         'bowlofeggs', log, self.Session, self.tempdir)
+        t.log = mock.MagicMock()
+        t.updates = set([up])
+
+        with mock.patch('bodhi.server.buildsys.get_session',
+                        side_effect=buildsys.get_session) as get_session:
+            t.remove_pending_tags()
+
+        self.assertEqual(get_session.call_count, 1)
+        self.assertEqual(multiCall.call_count, 1)
+        self.assertEqual(buildsys.DevBuildsys.__untag__,
+                         [(u'f17-updates-testing-pending', u'bodhi-2.0-1.fc17')])
+
+
 class TestMasherThread_wait_for_sync(MasherThreadBaseTestCase):
     """This test class contains tests for the MasherThread.wait_for_sync() method."""
     @mock.patch.dict(
@@ -54,6 +54,19 @@ class TestBuildsService(base.BaseTestCase):
 
         self.assertNotEquals(build1, build2)
 
+    def test_list_builds_after(self):
+        """Following the cursor should list the builds in the order they were added."""
+        self.db.add(RpmBuild(nvr=u'bodhi-3.0-1.fc21'))
+        self.db.flush()
+
+        body = self.app.get('/builds/', {"rows_per_page": 1}).json_body
+        self.assertEquals([b['nvr'] for b in body['builds']], [u'bodhi-2.0-1.fc17'])
+
+        body = self.app.get('/builds/', {"rows_per_page": 1, "after": body['next_after']}).json_body
+        self.assertEquals([b['nvr'] for b in body['builds']], [u'bodhi-3.0-1.fc21'])
+        self.assertEquals(body['next_after'], None)
+        self.assertEquals(body['total'], None)
+
     def test_list_builds_by_package(self):
         res = self.app.get('/builds/', {"packages": "bodhi"})
         body = res.json_body
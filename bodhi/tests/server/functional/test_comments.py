@@ -342,6 +342,20 @@ class TestCommentsService(base.BaseTestCase):
 
         self.assertNotEquals(comment1, comment2)
 
+    def test_list_comments_after(self):
+        """Following the cursor should give the same comments as the page numbers."""
+        body = self.app.get('/comments/', {"rows_per_page": 1}).json_body
+        comment1 = body['comments'][0]
+
+        body = self.app.get('/comments/', {"rows_per_page": 1, "after": body['next_after']})\
+            .json_body
+
+        self.assertEquals(len(body['comments']), 1)
+        self.assertNotEquals(body['comments'][0], comment1)
+        self.assertEquals(
+            body['comments'],
+            self.app.get('/comments/', {"rows_per_page": 1, "page": 2}).json_body['comments'])
+
     def test_list_comments_by_since(self):
         tomorrow = datetime.utcnow() + timedelta(days=1)
         fmt = "%Y-%m-%d %H:%M:%S"
@@ -19,10 +19,12 @@ import mock
 from pyramid.testing import DummyRequest
 from webtest import TestApp
 
-from bodhi.server import main, util
+from bodhi.server import buildsys, cache, main, util
+from bodhi.server.config import config
 from bodhi.server.models import (
     Group, User, Update, Release, ReleaseState, UpdateStatus, UpdateType)
 from bodhi.server.security import remember_me
+from bodhi.server.views import generic
 from bodhi.tests.server import base
 
 
@@ -108,6 +110,49 @@ class TestGenericViews(base.BaseTestCase):
         self.assertIn('Log out', res)
         self.assertIn('Fedora Update System', res)
 
+    def test_home_queries(self):
+        """The number of queries made by the home page should not depend on what it lists."""
+        def create_updates(first, last):
+            for i in range(first, last):
+                update = self.create_update([u'homequeries{}-1.0-1.fc17'.format(i)])
+                update.status = UpdateStatus.testing
+                update.critpath = bool(i % 2)
+                update.type = UpdateType.bugfix if i % 2 else UpdateType.security
+                update.comment(self.db, u'Comment {}'.format(i), author=u'tester{}'.format(i))
+            self.db.commit()
+
+        create_updates(0, 2)
+        Release.registry.clear()
+        with self.count_queries() as statements:
+            self.app.get('/', status=200)
+        queries = len(statements)
+        create_updates(2, 10)
+        # Make the releases be loaded again, as they were by the first request.
+        Release.registry.clear()
+
+        with self.count_queries() as statements:
+            self.app.get('/', status=200)
+
+        self.assertEqual(len(statements), queries)
+
+    @mock.patch.dict(config, {'stats_blacklist': ['bodhi', 'anonymous']})
+    def test_home_top_testers(self):
+        """The top testers should be counted from the user activity, without anonymous users."""
+        update = self.db.query(Update).one()
+        update.comment(self.db, u'Works.', author=u'tester', karma=1)
+        update.comment(self.db, u'Works too.', author=u'tester')
+        self.db.commit()
+        cache.invalidate()
+
+        request = DummyRequest()
+        request.db = self.db
+
+        top_testers = generic.get_top_testers(request)
+
+        self.assertEqual([(user.name, count) for user, count in top_testers],
+                         [(u'tester', 2), (u'guest', 1)])
+        self.assertIn('tester', self.app.get('/', status=200))
+
     def test_markdown(self):
         res = self.app.get('/markdown', {'text': 'wat'}, status=200)
         self.assertEquals(
@@ -117,6 +162,18 @@ class TestGenericViews(base.BaseTestCase):
             '</div>'
         )
 
+    def test_markdown_cached(self):
+        """The previews should reuse the HTML rendered for update notes and comments."""
+        update = self.db.query(Update).one()
+        self.app.get('/updates/%s' % update.title, headers={'Accept': 'text/html'}, status=200)
+        misses = util._render_markdown.stats()['misses']
+
+        res = self.app.get('/markdown', {'text': update.notes}, status=200)
+
+        self.assertEqual(util._render_markdown.stats()['misses'], misses)
+        self.assertEqual(res.json_body['html'],
+                         '<div class="markdown"><p>Useful details!</p></div>')
+
     def test_markdown_with_html_blocked_tag(self):
         res = self.app.get('/markdown', {'text': '<script>bold</script>'}, status=200)
         self.assertEquals(
@@ -359,6 +416,30 @@ class TestGenericViews(base.BaseTestCase):
         self.assertNotIn('f17-updates-testing-pending', body)
         self.assertNotIn('f17-override', body)
 
+    def test_latest_builds_packages(self):
+        """Several packages should be looked up in a single multicall."""
+        with mock.patch('bodhi.server.buildsys.DevBuildsys.multiCall',
+                        autospec=True, side_effect=buildsys.DevBuildsys.multiCall) as multiCall:
+            res = self.app.get('/latest_builds', {'packages': 'TurboGears,bodhi'})
+
+        body = res.json_body
+        self.assertEqual(sorted(body.keys()), ['TurboGears', 'bodhi'])
+        self.assertEqual(body['TurboGears']['f17-updates'], 'TurboGears-1.0.2.2-2.fc17')
+        self.assertIn('f17-updates-testing', body['bodhi'])
+        self.assertEqual(multiCall.call_count, 1)
+
+    def test_latest_builds_cached(self):
+        """Packages that are cached should not be looked up again."""
+        region = cache.get_region('candidates')
+        region.invalidate()
+        with mock.patch.object(region, 'expiration_time', 3600):
+            self.app.get('/latest_builds', {'package': 'TurboGears'})
+            with mock.patch('bodhi.server.buildsys.DevBuildsys.getLatestBuilds') as latest:
+                res = self.app.get('/latest_builds', {'packages': 'TurboGears'})
+
+        self.assertEqual(res.json_body['TurboGears']['f17-updates'], 'TurboGears-1.0.2.2-2.fc17')
+        self.assertEqual(latest.call_count, 0)
+
     def test_candidate(self):
         res = self.app.get('/latest_candidates')
         body = res.json_body
@@ -538,7 +619,7 @@ class TestFrontpageView(base.BaseTestCase):
                            [UpdateType.newpackage, 4]]]]
         _add_updates(addedupdates2, user2, pendingrelease, "fc18")
         self.db.flush()
-        Release._tag_cache = None
+        Release.registry.clear()
 
     def test_home_counts(self):
         """Test the frontpage update counts"""
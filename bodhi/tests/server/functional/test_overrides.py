@@ -19,7 +19,7 @@ import mock
 from webtest import TestApp
 
 from bodhi.server.models import RpmBuild, RpmPackage, Release, User
-from bodhi.server import main
+from bodhi.server import main, util
 from bodhi.tests.server import base
 
 
@@ -47,6 +47,17 @@ class TestOverridesService(base.BaseTestCase):
         self.assertEquals(override['submitter']['name'], 'guest')
         self.assertEquals(override['notes'], 'blah blah blah')
 
+    def test_list_overrides_after(self):
+        """The last page should have no cursor to a next page."""
+        body = self.app.get('/overrides/').json_body
+        self.assertEquals(body['next_after'], None)
+
+        after = util.encode_cursor([datetime(2100, 1, 1), 0])
+        body = self.app.get('/overrides/', {'after': after}).json_body
+
+        self.assertEquals(len(body['overrides']), 1)
+        self.assertEquals(body['overrides'][0]['build']['nvr'], "bodhi-2.0-1.fc17")
+
     def test_list_overrides_rss(self):
         res = self.app.get('/rss/overrides/',
                            headers=dict(accept='application/atom+xml'))
@@ -59,6 +59,25 @@ class TestUsersService(base.BaseTestCase):
         self.assertIn('libravatar.org', res)
         self.assertIn('&copy;', res)
 
+    def test_get_single_user_stats(self):
+        """The profile should hold the activity of the user, counted ahead of time."""
+        res = self.app.get('/users/guest')
+
+        stats = res.json_body['stats']
+        self.assertEqual(stats['comments'], 1)
+        self.assertEqual(stats['karma_positive'], 1)
+        self.assertEqual(stats['karma_negative'], 0)
+        self.assertEqual(stats['days'], config.get('top_testers_timeframe'))
+        self.assertEqual(sum(stats['comments_per_day'].values()), 1)
+        self.assertEqual(stats['updates'], {'pending': 1})
+
+    def test_get_single_user_page_stats(self):
+        """The profile page should show the activity of the user."""
+        res = self.app.get('/users/guest', headers=dict(accept='text/html'))
+
+        self.assertIn('id="activity"', res)
+        self.assertIn('Karma given: +1/0.', res)
+
     def test_get_single_user_jsonp(self):
         res = self.app.get('/users/guest',
                            {'callback': 'callback'},
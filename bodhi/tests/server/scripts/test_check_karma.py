@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This module contains tests for the bodhi.server.scripts.check_karma module."""
+
+from datetime import datetime
+
+from click import testing
+
+from bodhi.server import models
+from bodhi.server.scripts import check_karma
+from bodhi.tests.server.base import BaseTestCase
+
+
+class TestCheck(BaseTestCase):
+    """This class contains tests for the check() function."""
+
+    def test_consistent(self):
+        """Assert that nothing is reported when the aggregates match the comments."""
+        runner = testing.CliRunner()
+
+        result = runner.invoke(check_karma.check, [])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, '')
+
+    def test_inconsistent(self):
+        """Assert that inconsistent aggregates are reported, and the exit code is not 0."""
+        runner = testing.CliRunner()
+        update = self.db.query(models.Update).one()
+        update.karma_positive = 3
+        self.db.commit()
+
+        result = runner.invoke(check_karma.check, [])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(
+            result.output,
+            'bodhi-2.0-1.fc17: stored karma +3/+0 does not match its comments (+1/+0)\n')
+        update = self.db.query(models.Update).one()
+        self.assertEqual(update.karma_positive, 3)
+
+    def test_fix(self):
+        """Assert that --fix replaces inconsistent aggregates."""
+        runner = testing.CliRunner()
+        update = self.db.query(models.Update).one()
+        update.karma_positive = 3
+        self.db.commit()
+
+        result = runner.invoke(check_karma.check, ['--fix'])
+
+        self.assertEqual(result.exit_code, 0)
+        update = self.db.query(models.Update).one()
+        self.assertEqual(update._composite_karma, (1, 0))
+
+    def test_karma_reset_date(self):
+        """Assert that a wrong karma reset date is reported, and replaced with --fix."""
+        runner = testing.CliRunner()
+        update = self.db.query(models.Update).one()
+        update.date_karma_reset = datetime(2017, 1, 1)
+        self.db.commit()
+
+        result = runner.invoke(check_karma.check, [])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(
+            result.output,
+            'bodhi-2.0-1.fc17: stored karma reset date 2017-01-01 00:00:00 does not match its '
+            'comments (None)\n')
+
+        result = runner.invoke(check_karma.check, ['--fix'])
+
+        self.assertEqual(result.exit_code, 0)
+        update = self.db.query(models.Update).one()
+        self.assertIsNone(update.date_karma_reset)
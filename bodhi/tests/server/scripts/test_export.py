@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This module contains tests for the bodhi.server.scripts.export module."""
+import json
+import os
+import shutil
+import tempfile
+
+from click import testing
+
+from bodhi.server.scripts import export
+from bodhi.tests.server.base import BaseTestCase
+
+
+class TestExport(BaseTestCase):
+    """This class contains tests for the export() function."""
+
+    def test_export(self):
+        """Assert that the updates are written to the standard output, one per line."""
+        runner = testing.CliRunner()
+
+        result = runner.invoke(export.export, [])
+
+        self.assertEqual(result.exit_code, 0)
+        lines = result.output.splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['title'], u'bodhi-2.0-1.fc17')
+
+    def test_modified_since(self):
+        """Assert that only the updates that changed since --modified-since are written."""
+        runner = testing.CliRunner()
+
+        result = runner.invoke(export.export, ['--modified-since', '2100-01-01'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, '')
+
+    def test_modified_since_time(self):
+        """Assert that --modified-since accepts a time."""
+        runner = testing.CliRunner()
+
+        result = runner.invoke(export.export, ['--modified-since', '1984-11-01T12:30:00'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(json.loads(result.output)['title'], u'bodhi-2.0-1.fc17')
+
+    def test_modified_since_invalid(self):
+        """Assert that invalid dates are rejected."""
+        runner = testing.CliRunner()
+
+        result = runner.invoke(export.export, ['--modified-since', 'yesterday'])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn('Dates must look like 2017-10-03', result.output)
+
+    def test_release(self):
+        """Assert that only the updates of the given releases are written."""
+        runner = testing.CliRunner()
+
+        result = runner.invoke(export.export, ['--release', 'F17'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(json.loads(result.output)['release'], u'F17')
+
+    def test_unknown_release(self):
+        """Assert that unknown releases are rejected."""
+        runner = testing.CliRunner()
+
+        result = runner.invoke(export.export, ['--release', 'F17', '--release', 'F99'])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn('Unknown releases: F99', result.output)
+
+    def test_output(self):
+        """Assert that the updates are written to the --output file."""
+        runner = testing.CliRunner()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'updates.ndjson')
+
+        result = runner.invoke(export.export, ['--output', path])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, '')
+        with open(path) as output:
+            self.assertEqual(json.loads(output.read())['title'], u'bodhi-2.0-1.fc17')
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This module contains tests for the bodhi.server.services.export module."""
+import json
+
+import mock
+
+from bodhi.server.models import Update
+from bodhi.tests.server import base
+
+
+class TestExportUpdates(base.BaseTestCase):
+    """This class contains tests for the export_updates() view."""
+
+    def test_export(self):
+        """Updates should be written as newline-delimited JSON."""
+        update = self.create_update([u'export-1.0-1.fc17'])
+        self.db.commit()
+
+        res = self.app.get('/export/updates')
+
+        self.assertEqual(res.content_type, 'application/x-ndjson')
+        self.assertTrue(res.body.endswith('\n'))
+        lines = [json.loads(line) for line in res.body.splitlines()]
+        self.assertEqual([u['title'] for u in lines], [u'bodhi-2.0-1.fc17', update.title])
+        self.assertEqual(lines[1]['builds'],
+                         [{'nvr': u'export-1.0-1.fc17', 'type': u'rpm', 'signed': False}])
+        self.assertEqual(lines[0]['karma'], 1)
+
+    def test_modified_since(self):
+        """Only the updates that changed since modified_since should be written."""
+        res = self.app.get('/export/updates', {'modified_since': '2100-01-01T00:00:00'})
+
+        self.assertEqual(res.body, '')
+
+    def test_releases(self):
+        """Only the updates of the given releases should be written."""
+        res = self.app.get('/export/updates', {'releases': 'F17'})
+
+        self.assertEqual([json.loads(line)['release'] for line in res.body.splitlines()],
+                         [u'F17'])
+
+    def test_unknown_release(self):
+        """Unknown releases should be rejected with a JSON error."""
+        res = self.app.get('/export/updates', {'releases': 'F99'}, status=400)
+
+        self.assertEqual(res.json['errors'][0]['description'],
+                         'Invalid releases specified: F99')
+
+    @mock.patch('bodhi.server.util.STREAM_BATCH_SIZE', 2)
+    def test_batches(self):
+        """The updates should be loaded in batches while they are written."""
+        for i in range(4):
+            self.create_update([u'export{}-1.0-1.fc17'.format(i)])
+        self.db.commit()
+        titles = [u.title for u in self.db.query(Update).order_by(Update.id)]
+
+        with self.count_queries() as statements:
+            res = self.app.get('/export/updates')
+
+        self.assertEqual([json.loads(line)['title'] for line in res.body.splitlines()], titles)
+        # There are 5 updates, so the third batch is the last one.
+        batches = [s for s in statements if s.startswith('SELECT anon_1.updates_id')]
+        self.assertEqual(len(batches), 3)
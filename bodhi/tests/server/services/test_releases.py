@@ -11,10 +11,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+import re
+
 import webtest
 
 from bodhi import server
-from bodhi.server.models import Release, ReleaseState, Update
+from bodhi.server.models import Release, ReleaseState, Update, UpdateStatus, UpdateType
 from bodhi.tests.server import base
 
 
@@ -70,6 +72,18 @@ class TestReleasesService(base.BaseTestCase):
         res = self.app.get('/releases/Fedora%2022')
         self.assertEquals(res.json_body['name'], 'F22')
 
+    def test_get_single_release_not_modified(self):
+        """A 304 should be returned until a release changes."""
+        etag = self.app.get('/releases/F22').etag
+
+        self.app.get('/releases/F22', headers={'If-None-Match': '"%s"' % etag}, status=304)
+
+        Release.query.filter_by(name=u'F17').one().state = ReleaseState.archived
+        self.db.commit()
+        res = self.app.get('/releases/F22', headers={'If-None-Match': '"%s"' % etag})
+        self.assertNotEqual(res.etag, etag)
+        self.assertEqual(res.json_body['name'], 'F22')
+
     def test_list_releases(self):
         res = self.app.get('/releases/')
         body = res.json_body
@@ -223,6 +237,27 @@ class TestReleasesService(base.BaseTestCase):
         self.assertEquals(res.content_type, 'text/html')
         self.assertIn('f17-updates-testing', res)
 
+    def test_get_single_release_html_counts(self):
+        """The release page should show the counts of updates and overrides of the release."""
+        update = Update.query.one()
+        update.status = UpdateStatus.testing
+        update.type = UpdateType.security
+        self.create_update([u'bodhi-2.0.1-1.fc17'])
+        self.db.commit()
+
+        res = self.app.get('/releases/f17', headers={'Accept': 'text/html'})
+
+        def count(label):
+            return int(re.search(r'>%s</td>\s*<td>\s*(\d+)' % label, res.text).group(1))
+
+        self.assertEqual(count('Pending'), 1)
+        self.assertEqual(count('Testing'), 1)
+        self.assertEqual(count('Stable'), 0)
+        self.assertEqual(count('Security'), 1)
+        self.assertEqual(count('Bugfix'), 1)
+        self.assertEqual(count('Active'), 2)
+        self.assertEqual(count('Expired'), 0)
+
     def test_get_non_existent_release_html(self):
         self.app.get('/releases/x', headers={'Accept': 'text/html'}, status=404)
 
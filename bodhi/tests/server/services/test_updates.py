@@ -24,7 +24,7 @@ from mock import ANY
 from webtest import TestApp
 import mock
 
-from bodhi.server import main
+from bodhi.server import main, util
 from bodhi.server.config import config
 from bodhi.server.models import (
     BuildrootOverride, Group, RpmPackage, ModulePackage, Release,
@@ -1136,6 +1136,13 @@ class TestUpdatesService(base.BaseTestCase):
         up = body['updates'][0]
         self.assertEquals(up['title'], u'bodhi-2.0-1.fc17')
 
+        # test a search for words of the notes
+        res = self.app.get('/updates/', {'search': 'useful DETAILS'})
+        body = res.json_body
+        self.assertEquals(len(body['updates']), 1)
+        up = body['updates'][0]
+        self.assertEquals(up['title'], u'bodhi-2.0-1.fc17')
+
     @mock.patch(**mock_valid_requirements)
     def test_list_updates_pagination(self, *args):
 
@@ -1157,6 +1164,96 @@ class TestUpdatesService(base.BaseTestCase):
 
         self.assertNotEquals(update1, update2)
 
+    @mock.patch(**mock_valid_requirements)
+    def test_list_updates_after(self, *args):
+        """Following the cursors should list every update once, newest first."""
+        self.app.post_json('/updates/', self.get_update('bodhi-2.0.0-2.fc17'))
+        self.app.post_json('/updates/', self.get_update('bodhi-2.0.0-3.fc17'))
+
+        res = self.app.get('/updates/', {"rows_per_page": 2})
+        body = res.json_body
+        self.assertEquals([u['title'] for u in body['updates']],
+                          [u'bodhi-2.0.0-3.fc17', u'bodhi-2.0.0-2.fc17'])
+        self.assertEquals(body['total'], 3)
+        self.assertEquals(body['page'], 1)
+
+        res = self.app.get('/updates/', {"rows_per_page": 2, "after": body['next_after']})
+        body = res.json_body
+        self.assertEquals([u['title'] for u in body['updates']], [u'bodhi-2.0-1.fc17'])
+        self.assertEquals(body['next_after'], None)
+        # The updates are not counted when paginating by cursor, unless asked to.
+        self.assertEquals(body['total'], None)
+        self.assertEquals(body['pages'], None)
+        self.assertEquals(body['page'], None)
+
+    @mock.patch(**mock_valid_requirements)
+    def test_list_updates_after_with_count(self, *args):
+        """The updates should be counted with a cursor if count is true."""
+        self.app.post_json('/updates/', self.get_update('bodhi-2.0.0-2.fc17'))
+        after = self.app.get('/updates/', {"rows_per_page": 1}).json_body['next_after']
+
+        body = self.app.get('/updates/',
+                            {"rows_per_page": 1, "after": after, "count": True}).json_body
+
+        self.assertEquals([u['title'] for u in body['updates']], [u'bodhi-2.0-1.fc17'])
+        self.assertEquals(body['total'], 2)
+        self.assertEquals(body['pages'], 2)
+
+    def test_list_updates_without_count(self):
+        """The updates should not be counted if count is false."""
+        body = self.app.get('/updates/', {"count": False}).json_body
+
+        self.assertEquals(len(body['updates']), 1)
+        self.assertEquals(body['total'], None)
+        self.assertEquals(body['page'], 1)
+
+    def test_list_updates_after_same_date(self):
+        """Updates submitted at the same time should be told apart by their ids."""
+        for nvr in (u'bodhi-2.0.0-2.fc17', u'bodhi-2.0.0-3.fc17'):
+            update = self.create_update([nvr])
+            update.date_submitted = datetime(1984, 11, 2)
+        self.db.commit()
+
+        titles = []
+        res = self.app.get('/updates/', {"rows_per_page": 1})
+        while True:
+            titles.extend(u['title'] for u in res.json_body['updates'])
+            if not res.json_body['next_after']:
+                break
+            res = self.app.get('/updates/',
+                               {"rows_per_page": 1, "after": res.json_body['next_after']})
+
+        self.assertEquals(titles,
+                          [u'bodhi-2.0.0-3.fc17', u'bodhi-2.0.0-2.fc17', u'bodhi-2.0-1.fc17'])
+
+    def test_list_updates_html_after(self):
+        """The HTML pages should link to the next page by cursor."""
+        self.create_update([u'bodhi-2.0.0-2.fc17'])
+        self.db.commit()
+        after = self.app.get('/updates/', {"rows_per_page": 1}).json_body['next_after']
+
+        res = self.app.get('/updates/', {"rows_per_page": 1, "after": after},
+                           headers={'Accept': 'text/html'})
+
+        self.assertIn('bodhi-2.0-1.fc17', res)
+        self.assertNotIn('Page 1 of', res)
+
+    def test_list_updates_invalid_after(self):
+        """A cursor that was not made by the server should be refused."""
+        res = self.app.get('/updates/', {"after": "wat"}, status=400)
+
+        self.assertEquals(res.json_body['errors'][0]['name'], 'after')
+
+    def test_list_updates_after_for_other_keys(self):
+        """A cursor made for other sort keys should be refused."""
+        after = util.encode_cursor([1])
+
+        res = self.app.get('/updates/', {"after": after}, status=400)
+
+        self.assertEquals(res.json_body['errors'],
+                          [{'location': 'querystring', 'name': 'after',
+                            'description': 'Invalid cursor'}])
+
     def test_list_updates_by_approved_since(self):
         now = datetime.utcnow()
 
@@ -1648,6 +1745,70 @@ class TestUpdatesService(base.BaseTestCase):
         self.assertEquals(up['alias'], u'FEDORA-%s-a3bbe1a8f2' % YEAR)
         self.assertEquals(up['karma'], 1)
 
+    def test_list_updates_by_ids(self):
+        """Updates can be fetched by alias, title or build NVR, as a list."""
+        self.create_update([u'bodhi-3.0-1.fc17'])
+        self.create_update([u'python-nose-1.3.7-11.fc17'])
+        self.db.commit()
+        alias = Update.query.filter_by(title=u'bodhi-2.0-1.fc17').one().alias
+
+        res = self.app.get('/updates/', {'ids': '%s,bodhi-3.0-1.fc17 python-nose-1.3.7-11.fc17'
+                                                % alias})
+
+        self.assertEqual([u['title'] for u in res.json_body],
+                         [u'python-nose-1.3.7-11.fc17', u'bodhi-3.0-1.fc17', u'bodhi-2.0-1.fc17'])
+        self.assertEqual(res.json_body[-1]['alias'], alias)
+        self.assertEqual(res.json_body[-1]['karma'], 1)
+
+    def test_list_updates_by_ids_and_filters(self):
+        """The other parameters still filter the updates fetched by ids."""
+        res = self.app.get('/updates/', {'ids': 'bodhi-2.0-1.fc17', 'status': 'stable'})
+
+        self.assertEqual(res.json_body, [])
+
+    def test_list_updates_by_too_many_ids(self):
+        """At most 100 ids can be given."""
+        ids = ','.join('bodhi-2.0-{}.fc17'.format(i) for i in range(101))
+
+        res = self.app.get('/updates/', {'ids': ids}, status=400)
+
+        self.assertEqual(res.json_body['errors'][0]['name'], 'ids')
+        self.assertEqual(res.json_body['errors'][0]['description'], 'At most 100 ids can be given')
+
+    def test_list_updates_by_ids_html(self):
+        """The web page shows the updates fetched by ids, on one page."""
+        res = self.app.get('/updates/', {'ids': 'bodhi-2.0-1.fc17'},
+                           headers={'Accept': 'text/html'})
+
+        self.assertIn('bodhi-2.0-1.fc17', res)
+
+    def test_list_updates_fields(self):
+        """The updates can be restricted to some of their fields."""
+        res = self.app.get('/updates/', {'fields': 'alias,status,karma,builds'})
+
+        self.assertEqual(len(res.json_body['updates']), 1)
+        up = res.json_body['updates'][0]
+        self.assertEqual(sorted(up.keys()), ['alias', 'builds', 'karma', 'status'])
+        self.assertEqual(up['status'], u'pending')
+        self.assertEqual(up['karma'], 1)
+        self.assertEqual(up['builds'][0]['nvr'], u'bodhi-2.0-1.fc17')
+        self.assertEqual(res.json_body['total'], 1)
+
+    def test_list_updates_by_ids_with_fields(self):
+        """Updates fetched by ids can be restricted to some of their fields."""
+        res = self.app.get('/updates/',
+                           {'ids': 'bodhi-2.0-1.fc17', 'fields': ['title', 'submitter']})
+
+        self.assertEqual(res.json_body, [{'title': u'bodhi-2.0-1.fc17', 'submitter': u'guest'}])
+
+    def test_list_updates_unknown_fields(self):
+        """Only the fields of updates can be asked for."""
+        res = self.app.get('/updates/', {'fields': 'alias,password,secret'}, status=400)
+
+        self.assertEqual(res.json_body['errors'][0]['name'], 'fields')
+        self.assertEqual(res.json_body['errors'][0]['description'],
+                         'Unknown fields: password, secret')
+
     def test_list_updates_by_unexisting_package(self):
         res = self.app.get('/updates/', {"packages": "flash-player"})
         body = res.json_body
@@ -2222,7 +2383,7 @@ class TestUpdatesService(base.BaseTestCase):
         publish.assert_called_with(topic='update.request.testing', msg=ANY)
 
         # Add another release and package
-        Release._tag_cache = None
+        Release.registry.clear()
         release = Release(
             name=u'F18', long_name=u'Fedora 18',
             id_prefix=u'FEDORA', version=u'18',
@@ -3056,7 +3217,7 @@ class TestUpdatesService(base.BaseTestCase):
     def test_submitting_multi_release_updates(self, publish, *args):
         """ https://github.com/fedora-infra/bodhi/issues/219 """
         # Add another release and package
-        Release._tag_cache = None
+        Release.registry.clear()
         release = Release(
             name=u'F18', long_name=u'Fedora 18',
             id_prefix=u'FEDORA', version=u'18',
@@ -4390,3 +4551,222 @@ class TestUpdatesService(base.BaseTestCase):
 
         up = self.db.query(Update).filter_by(title=resp.json['title']).one()
         self.assertEquals(up.request, UpdateRequest.stable)
+
+
+class TestUpdatesQueryCounts(base.BaseTestCase):
+    """Test that the update endpoints make a bounded number of queries."""
+
+    def _create_updates(self, first, last):
+        """Create updates numbered from first to last, each commented by a different user."""
+        for i in range(first, last):
+            update = self.create_update([u'querycount{}-1.0-1.fc17'.format(i)])
+            update.comment(self.db, u'Comment {}'.format(i), karma=1, author=u'tester{}'.format(i))
+        self.db.commit()
+
+    def _count_queries(self, url, **kwargs):
+        """Return how many queries fetching url makes, once the release registry is loaded."""
+        Release.registry.snapshot(self.db)
+        with self.count_queries() as statements:
+            self.app.get(url, **kwargs)
+        return len(statements)
+
+    def test_list_json(self):
+        """The number of queries should not depend on how many updates are listed."""
+        self._create_updates(0, 1)
+        self.assertEqual(self._count_queries('/updates/', headers={'Accept': 'application/json'}),
+                         12)
+
+        self._create_updates(1, 6)
+        self.assertEqual(self._count_queries('/updates/', headers={'Accept': 'application/json'}),
+                         12)
+
+    @mock.patch('bodhi.server.util.STREAM_BATCH_SIZE', 2)
+    def test_list_json_batches(self):
+        """Large pages should be loaded in batches while the response is written."""
+        self._create_updates(0, 6)
+        query = self.db.query(Update).order_by(Update.date_submitted.desc(), Update.id.desc())
+        titles = [u.title for u in query]
+
+        Release.registry.snapshot(self.db)
+        with self.count_queries() as statements:
+            res = self.app.get('/updates/?rows_per_page=10',
+                               headers={'Accept': 'application/json'})
+
+        self.assertEqual(res.content_type, 'application/json')
+        self.assertEqual([u['title'] for u in res.json['updates']], titles)
+        self.assertIsNone(res.json['next_after'])
+        # The 7 updates are loaded in 4 batches.
+        batches = [s for s in statements if s.startswith('SELECT anon_1.updates_id')]
+        self.assertEqual(len(batches), 4)
+
+    def test_list_html(self):
+        """The number of queries should not depend on how many updates are listed."""
+        self._create_updates(0, 1)
+        self.assertEqual(self._count_queries('/updates/?chrome=0'), 12)
+
+        self._create_updates(1, 6)
+        self.assertEqual(self._count_queries('/updates/?chrome=0'), 12)
+
+    def test_list_rss(self):
+        """The feed only shows the updates and their builds, so it should need few queries."""
+        self._create_updates(0, 1)
+        self.assertEqual(self._count_queries('/rss/updates/'), 4)
+
+        self._create_updates(1, 6)
+        self.assertEqual(self._count_queries('/rss/updates/'), 4)
+
+    def test_list_fields(self):
+        """Relationships that the requested fields are not made of should not be loaded."""
+        self._create_updates(0, 6)
+        self.assertEqual(
+            self._count_queries('/updates/?fields=alias,status',
+                                headers={'Accept': 'application/json'}),
+            3)
+
+    def test_detail(self):
+        """The number of queries should not depend on how many comments the update has."""
+        headers = {'Accept': 'application/json'}
+        self.assertEqual(self._count_queries('/updates/bodhi-2.0-1.fc17', headers=headers), 12)
+
+        update = Update.query.filter_by(title=u'bodhi-2.0-1.fc17').one()
+        for i in range(5):
+            update.comment(self.db, u'Comment {}'.format(i), author=u'tester{}'.format(i))
+        self.db.commit()
+
+        self.assertEqual(self._count_queries('/updates/bodhi-2.0-1.fc17', headers=headers), 12)
+
+
+class TestUpdatesConditionalGet(base.BaseTestCase):
+    """Test the ETags and 304 responses of the update endpoints."""
+
+    def _get(self, url, etag=None, status=200, accept='application/json'):
+        """Get url, with an If-None-Match header if etag is given."""
+        headers = {'Accept': accept}
+        if etag is not None:
+            headers['If-None-Match'] = '"%s"' % etag
+        return self.app.get(url, headers=headers, status=status)
+
+    def test_detail_not_modified(self):
+        """A 304 should be returned, without loading the update, if it did not change."""
+        res = self._get('/updates/bodhi-2.0-1.fc17')
+        self.assertTrue(res.etag)
+        self.assertEqual(res.headers['Cache-Control'], 'private, max-age=0')
+        self.assertEqual(res.headers['Vary'], 'Accept, Cookie')
+        Release.registry.snapshot(self.db)
+
+        with self.count_queries() as statements:
+            not_modified = self._get('/updates/bodhi-2.0-1.fc17', etag=res.etag, status=304)
+
+        self.assertEqual(not_modified.etag, res.etag)
+        self.assertEqual(not_modified.body, '')
+        self.assertFalse([s for s in statements if 'FROM comments' in str(s)])
+        self.assertFalse([s for s in statements if str(s).startswith('SELECT updates.title')])
+
+    def test_detail_modified_by_comment(self):
+        """Commenting an update should change its ETag."""
+        etag = self._get('/updates/bodhi-2.0-1.fc17').etag
+        update = Update.query.one()
+        update.comment(self.db, u'Works for me', karma=1, author=u'tester')
+        self.db.commit()
+
+        res = self._get('/updates/bodhi-2.0-1.fc17', etag=etag)
+
+        self.assertNotEqual(res.etag, etag)
+        self.assertEqual(res.json_body['update']['comments'][-1]['text'], u'Works for me')
+
+    def test_detail_modified_by_build(self):
+        """Signing a build of an update should change its ETag."""
+        etag = self._get('/updates/bodhi-2.0-1.fc17').etag
+        RpmBuild.query.one().signed = True
+        self.db.commit()
+
+        res = self._get('/updates/bodhi-2.0-1.fc17', etag=etag)
+
+        self.assertTrue(res.json_body['update']['builds'][0]['signed'])
+
+    def test_detail_modified_by_release(self):
+        """Editing the release of an update should change its ETag."""
+        etag = self._get('/updates/bodhi-2.0-1.fc17').etag
+        Release.query.one().long_name = u'Fedora Seventeen'
+        self.db.commit()
+
+        res = self._get('/updates/bodhi-2.0-1.fc17', etag=etag)
+
+        self.assertEqual(res.json_body['update']['release']['long_name'], u'Fedora Seventeen')
+
+    def test_detail_html(self):
+        """Web pages should not be answered with a 304, since they embed per-session data."""
+        res = self._get('/updates/bodhi-2.0-1.fc17', accept='text/html')
+
+        self.assertIsNone(res.etag)
+
+    def test_list_not_modified(self):
+        """A 304 should be returned for lists of updates that did not change."""
+        res = self._get('/updates/?status=pending')
+
+        self._get('/updates/?status=pending', etag=res.etag, status=304)
+
+    def test_list_modified(self):
+        """The ETag of a list should change when its updates change, or stop matching."""
+        etag = self._get('/updates/?status=pending').etag
+        Update.query.one().notes = u'New notes'
+        self.db.commit()
+
+        res = self._get('/updates/?status=pending', etag=etag)
+        self.assertEqual(res.json_body['updates'][0]['notes'], u'New notes')
+
+        Update.query.one().status = UpdateStatus.testing
+        self.db.commit()
+
+        res = self._get('/updates/?status=pending', etag=res.etag)
+        self.assertEqual(res.json_body['updates'], [])
+
+    def test_list_modified_swap(self):
+        """The ETag should change when an update replaces another with the same version."""
+        other = self.create_update([u'bodhi-2.0.0-2.fc17'])
+        other.status = UpdateStatus.testing
+        self.db.commit()
+        etag = self._get('/updates/?status=pending').etag
+        update = Update.query.filter_by(title=u'bodhi-2.0-1.fc17').one()
+        table = Update.__table__
+        # Swap the statuses behind the ORM's back, so the versions stay the same.
+        self.db.execute(table.update().where(table.c.id == update.id).values(
+            status=UpdateStatus.testing))
+        self.db.execute(table.update().where(table.c.id == other.id).values(
+            status=UpdateStatus.pending, version=update.version))
+        self.db.commit()
+
+        res = self._get('/updates/?status=pending', etag=etag)
+
+        self.assertEqual([u['title'] for u in res.json_body['updates']], [u'bodhi-2.0.0-2.fc17'])
+
+    def test_list_cursor_not_counted(self):
+        """Pages after a cursor should get no ETag, unless they are counted."""
+        self.create_update([u'bodhi-2.0.0-2.fc17'])
+        self.db.commit()
+        after = self._get('/updates/?rows_per_page=1').json_body['next_after']
+
+        with mock.patch('bodhi.server.services.updates.conditional.check') as check:
+            res = self._get('/updates/?rows_per_page=1&after=%s' % after)
+        self.assertEqual(check.call_count, 0)
+        self.assertIsNone(res.json_body['total'])
+
+        res = self._get('/updates/?rows_per_page=1&after=%s&count=true' % after)
+        self.assertTrue(res.etag)
+        self.assertEqual(res.json_body['total'], 2)
+
+    def test_rss_not_modified(self):
+        """Feed readers polling the RSS feed should get a 304 when nothing changed."""
+        res = self.app.get('/rss/updates/')
+
+        self.app.get('/rss/updates/', headers={'If-None-Match': '"%s"' % res.etag}, status=304)
+
+    def test_etag_depends_on_user(self):
+        """Users do not share ETags, since responses may say whether they can edit updates."""
+        etag = self._get('/updates/bodhi-2.0-1.fc17').etag
+        anonymous = TestApp(main({}, session=self.db, **self.app_settings))
+
+        res = anonymous.get('/updates/bodhi-2.0-1.fc17', headers={'Accept': 'application/json'})
+
+        self.assertNotEqual(res.etag, etag)
+        self.assertEqual(res.headers['Cache-Control'], 'public, max-age=0')
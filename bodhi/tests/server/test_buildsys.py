@@ -22,6 +22,7 @@ import koji
 import mock
 
 from bodhi.server import buildsys
+from bodhi.server.exceptions import KojiUnavailable
 
 
 class TestBuildsystem(unittest.TestCase):
@@ -189,9 +190,572 @@ class TestSetupBuildsystem(unittest.TestCase):
         buildsys.setup_buildsystem({'buildsystem': 'dev'})
         self.assertTrue(buildsys._buildsystem is buildsys.DevBuildsys)
 
+    @mock.patch('bodhi.server.buildsys._buildsystem', None)
+    def test_simulator_buildsystem(self):
+        """Assert that sessions of the simulator buildsystem share their state."""
+        buildsys.setup_buildsystem({'buildsystem': 'simulator', 'koji_simulator.tags': ['f27'],
+                                    'koji_simulator.packages': 2})
+
+        first = buildsys._buildsystem()
+        second = buildsys._buildsystem()
+
+        self.assertFalse(first is second)
+        self.assertTrue(first.state is second.state)
+        self.assertEqual(len(first.listTagged('f27')), 6)
+
     @mock.patch('bodhi.server.buildsys._buildsystem', None)
     def test_nonsense_buildsystem(self):
         """Assert the buildsystem setup crashes with nonsense values"""
         self.assertTrue(buildsys._buildsystem is None)
         self.assertRaises(ValueError, buildsys.setup_buildsystem,
                           {'buildsystem': 'Something unsupported'})
+
+    @mock.patch('bodhi.server.buildsys._buildsystem', None)
+    @mock.patch('bodhi.server.buildsys._koji_cache', None)
+    @mock.patch('bodhi.server.buildsys.koji_login')
+    def test_koji_buildsystem_cache_disabled(self, mock_koji_login):
+        """Assert that sessions aren't wrapped when koji_cache.backend is none."""
+        buildsys.setup_buildsystem({'buildsystem': 'koji', 'koji_cache.backend': 'none'})
+
+        session = buildsys._buildsystem()
+
+        self.assertTrue(isinstance(session, buildsys.ResilientSession))
+        self.assertTrue(session._session is mock_koji_login.return_value)
+        self.assertTrue(buildsys.get_koji_cache() is None)
+
+    @mock.patch('bodhi.server.buildsys._buildsystem', None)
+    @mock.patch('bodhi.server.buildsys._koji_cache', None)
+    @mock.patch('bodhi.server.buildsys.koji_login')
+    def test_koji_buildsystem_cached(self, mock_koji_login):
+        """Assert that koji sessions are wrapped in the process-wide cache by default."""
+        buildsys.setup_buildsystem({'buildsystem': 'koji'})
+
+        session = buildsys._buildsystem()
+
+        self.assertTrue(isinstance(session, buildsys.CachedSession))
+        self.assertTrue(isinstance(session._session, buildsys.ResilientSession))
+        self.assertTrue(session._session._session is mock_koji_login.return_value)
+        self.assertTrue(session._cache is buildsys.get_koji_cache())
+
+
+class TestMemoryCacheBackend(unittest.TestCase):
+    """This class contains tests for the MemoryCacheBackend class."""
+    def test_clear(self):
+        """clear() should drop every entry."""
+        backend = buildsys.MemoryCacheBackend()
+        backend.set('a', 1)
+
+        backend.clear()
+
+        self.assertTrue(backend.get('a') is buildsys.NO_VALUE)
+
+    def test_lru_eviction(self):
+        """The least recently used entry should be evicted once max_size is exceeded."""
+        backend = buildsys.MemoryCacheBackend(max_size=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        # Using a makes b the least recently used entry.
+        self.assertEqual(backend.get('a'), 1)
+
+        backend.set('c', 3)
+
+        self.assertEqual(backend.get('a'), 1)
+        self.assertTrue(backend.get('b') is buildsys.NO_VALUE)
+        self.assertEqual(backend.get('c'), 3)
+
+
+class TestKojiCache(unittest.TestCase):
+    """This class contains tests for the KojiCache class."""
+    def setUp(self):
+        self.cache = buildsys.KojiCache(buildsys.MemoryCacheBackend(), tag_ttl=60)
+
+    def test_immutable_call_cached(self):
+        """Completed builds should be cached forever."""
+        build = {'nvr': 'bodhi-2.0-1.fc26', 'state': koji.BUILD_STATES['COMPLETE']}
+        getBuild = mock.MagicMock(return_value=build)
+
+        self.assertEqual(self.cache.call('getBuild', getBuild, 'bodhi-2.0-1.fc26'), build)
+        self.assertEqual(self.cache.call('getBuild', getBuild, 'bodhi-2.0-1.fc26'), build)
+
+        getBuild.assert_called_once_with('bodhi-2.0-1.fc26')
+        self.assertEqual(self.cache.stats(),
+                         {'getBuild': {'hits': 1, 'misses': 1, 'hit_rate': 0.5}})
+
+    def test_incomplete_build_not_cached(self):
+        """Builds that aren't complete yet may still change, so they should not be cached."""
+        getBuild = mock.MagicMock(return_value={'state': koji.BUILD_STATES['BUILDING']})
+
+        self.cache.call('getBuild', getBuild, 'bodhi-2.0-1.fc26')
+        self.cache.call('getBuild', getBuild, 'bodhi-2.0-1.fc26')
+
+        self.assertEqual(getBuild.call_count, 2)
+
+    def test_invalidate(self):
+        """invalidate() should drop the tag-dependent entries about the given tag."""
+        listTagged = mock.MagicMock(return_value=[])
+        listTags = mock.MagicMock(return_value=[])
+        self.cache.call('listTagged', listTagged, 'f26-updates', latest=True)
+        self.cache.call('listTags', listTags, 'bodhi-2.0-1.fc26')
+
+        self.cache.invalidate(tags=['f26-updates'])
+
+        self.cache.call('listTagged', listTagged, 'f26-updates', latest=True)
+        self.cache.call('listTags', listTags, 'bodhi-2.0-1.fc26')
+        self.assertEqual(listTagged.call_count, 2)
+        self.assertEqual(listTags.call_count, 1)
+
+        self.cache.invalidate(builds=['bodhi-2.0-1.fc26'])
+
+        self.cache.call('listTags', listTags, 'bodhi-2.0-1.fc26')
+        self.assertEqual(listTags.call_count, 2)
+
+    def test_tag_call_expires(self):
+        """Tag-dependent calls should be cached for tag_ttl seconds."""
+        getLatestBuilds = mock.MagicMock(return_value=[{'nvr': 'bodhi-2.0-1.fc26'}])
+
+        with mock.patch('bodhi.server.buildsys.time.time', return_value=1000):
+            self.cache.call('getLatestBuilds', getLatestBuilds, 'f26', package='bodhi')
+        with mock.patch('bodhi.server.buildsys.time.time', return_value=1059):
+            self.cache.call('getLatestBuilds', getLatestBuilds, 'f26', package='bodhi')
+        self.assertEqual(getLatestBuilds.call_count, 1)
+        with mock.patch('bodhi.server.buildsys.time.time', return_value=1061):
+            self.cache.call('getLatestBuilds', getLatestBuilds, 'f26', package='bodhi')
+        self.assertEqual(getLatestBuilds.call_count, 2)
+
+    def test_unhashable_arguments(self):
+        """Arguments such as lists of headers should be usable in keys."""
+        getRPMHeaders = mock.MagicMock(return_value={'name': 'bodhi'})
+
+        self.cache.call('getRPMHeaders', getRPMHeaders, 'bodhi-2.0-1.fc26.src', ['name'])
+        self.cache.call('getRPMHeaders', getRPMHeaders, 'bodhi-2.0-1.fc26.src', ['name'])
+
+        self.assertEqual(getRPMHeaders.call_count, 1)
+
+    def test_unicode_arguments(self):
+        """Arguments passed as str or as unicode should share their entries."""
+        listTagged = mock.MagicMock(return_value=[])
+
+        self.cache.call('listTagged', listTagged, 'f26-updates', latest=True)
+        self.cache.call('listTagged', listTagged, u'f26-updates', latest=True)
+        self.cache.invalidate(tags=[u'f26-updates'])
+        self.cache.call('listTagged', listTagged, 'f26-updates', latest=True)
+
+        self.assertEqual(listTagged.call_count, 2)
+
+
+class TestCachedSession(unittest.TestCase):
+    """This class contains tests for the CachedSession class."""
+    def setUp(self):
+        self.cache = buildsys.KojiCache(buildsys.MemoryCacheBackend())
+        self.koji = buildsys.DevBuildsys()
+        self.session = buildsys.CachedSession(self.koji, self.cache)
+
+    def test_multicall_bypasses_cache(self):
+        """Calls made while multicall is enabled must reach the session."""
+        self.session.multicall = True
+        self.session.getBuild('TurboGears-1.0.2.2-2.fc17')
+        self.session.getBuild('TurboGears-1.0.2.2-2.fc17')
+
+        self.assertTrue(self.koji.multicall)
+        self.assertEqual(len(self.session.multiCall()), 2)
+        self.assertEqual(self.cache.stats(), {})
+
+    def test_multicall_tagging_invalidates_after_multiCall(self):
+        """Tagging inside a multicall should invalidate once the multicall is sent."""
+        self.session.multicall = True
+        self.session.tagBuild('f26-updates', 'bodhi-2.0-1.fc26')
+
+        with mock.patch.object(self.cache, 'invalidate') as invalidate:
+            self.assertEqual(invalidate.call_count, 0)
+            self.session.multiCall()
+
+        invalidate.assert_called_once_with(['f26-updates'], ['bodhi-2.0-1.fc26'])
+
+    def test_passthrough(self):
+        """Other attributes should come from the session."""
+        self.assertEqual(self.session.getTaskInfo(1), self.koji.getTaskInfo(1))
+
+    def test_tag_calls_cached(self):
+        """Tag-dependent calls should be cached and invalidated by tagging."""
+        with mock.patch.object(self.koji, 'listTags', wraps=self.koji.listTags) as listTags:
+            self.session.listTags('bodhi-2.0-1.fc26')
+            self.session.listTags('bodhi-2.0-1.fc26')
+            self.assertEqual(listTags.call_count, 1)
+
+            self.session.moveBuild('f26-updates-testing', 'f26-updates', 'bodhi-2.0-1.fc26')
+            self.session.listTags('bodhi-2.0-1.fc26')
+
+        self.assertEqual(listTags.call_count, 2)
+        self.assertEqual(
+            buildsys.DevBuildsys.__moved__,
+            [('f26-updates-testing', 'f26-updates', 'bodhi-2.0-1.fc26')])
+
+    def tearDown(self):
+        buildsys.DevBuildsys.clear()
+
+
+class TestInvalidateCache(unittest.TestCase):
+    """This class contains tests for the invalidate_cache() function."""
+    @mock.patch('bodhi.server.buildsys._koji_cache', None)
+    def test_no_cache(self):
+        """invalidate_cache() should do nothing when caching is disabled."""
+        buildsys.invalidate_cache(tags=['f26'])
+
+    def test_with_cache(self):
+        """invalidate_cache() should invalidate the process-wide cache."""
+        cache = mock.MagicMock()
+
+        with mock.patch('bodhi.server.buildsys._koji_cache', cache):
+            buildsys.invalidate_cache(tags=['f26'], builds=['bodhi-2.0-1.fc26'])
+
+        cache.invalidate.assert_called_once_with(['f26'], ['bodhi-2.0-1.fc26'])
+
+
+class TestMakeKojiCache(unittest.TestCase):
+    """This class contains tests for the make_koji_cache() function."""
+    def test_default(self):
+        """The default should be an in-memory cache."""
+        cache = buildsys.make_koji_cache({})
+
+        self.assertTrue(isinstance(cache.backend, buildsys.MemoryCacheBackend))
+        self.assertEqual(cache.backend.max_size, 10000)
+        self.assertEqual(cache.tag_ttl, 300)
+
+    def test_dogpile(self):
+        """The dogpile backend should use the koji_cache.dogpile.* settings."""
+        cache = buildsys.make_koji_cache(
+            {'koji_cache.backend': 'dogpile', 'koji_cache.tag_ttl': '30',
+             'koji_cache.dogpile.backend': 'dogpile.cache.memory'})
+
+        self.assertTrue(isinstance(cache.backend, buildsys.DogpileCacheBackend))
+        self.assertEqual(cache.tag_ttl, 30)
+        cache.backend.set('a', 1)
+        self.assertEqual(cache.backend.get('a'), 1)
+
+    def test_unknown(self):
+        """Unknown backends should raise a ValueError."""
+        self.assertRaises(ValueError, buildsys.make_koji_cache, {'koji_cache.backend': 'wat'})
+
+
+class TestMulticallBatch(unittest.TestCase):
+    """This class contains tests for the MulticallBatch and MulticallFuture classes."""
+    def setUp(self):
+        self.koji = buildsys.DevBuildsys()
+
+    def tearDown(self):
+        buildsys.DevBuildsys.clear()
+
+    def test_chunks(self):
+        """Calls should be sent in multicalls of at most chunk_size calls."""
+        batch = buildsys.MulticallBatch(self.koji, chunk_size=2)
+
+        with mock.patch.object(self.koji, 'multiCall', wraps=self.koji.multiCall) as multiCall:
+            futures = [batch.listTags('TurboGears-1.0.2.2-2.fc17') for i in range(5)]
+            self.assertEqual(len(batch), 5)
+            self.assertEqual(batch.flush(), futures)
+
+        self.assertEqual(multiCall.call_count, 3)
+        self.assertEqual(len(batch), 0)
+        for future in futures:
+            self.assertTrue(future.done())
+            self.assertEqual(future.result(), self.koji.listTags('TurboGears-1.0.2.2-2.fc17'))
+
+    def test_empty_batch_is_true(self):
+        """An empty batch should be true, so that it is not mistaken for a missing session."""
+        batch = buildsys.MulticallBatch(self.koji)
+
+        self.assertEqual(len(batch), 0)
+        self.assertTrue(batch)
+
+    def test_context_manager(self):
+        """Leaving the with block should send the pending calls."""
+        with buildsys.MulticallBatch(self.koji) as batch:
+            future = batch.getTag('f17-updates')
+            self.assertFalse(future.done())
+
+        self.assertTrue(future.done())
+        self.assertEqual(future.result()['name'], 'f17-updates')
+
+    def test_fault_maps_to_its_future(self):
+        """A fault should only be raised by the future of the call that caused it."""
+        batch = buildsys.MulticallBatch(self.koji)
+        good = batch.getBuild('TurboGears-1.0.2.2-2.fc17')
+        bad = batch.getBuild('nope-1-1.fc17')
+        fault = {'faultCode': koji.GenericError.faultCode, 'faultString': 'No such build'}
+
+        with mock.patch.object(self.koji, 'multiCall',
+                               return_value=[[{'nvr': 'TurboGears-1.0.2.2-2.fc17'}], fault]):
+            self.assertEqual(good.result(), {'nvr': 'TurboGears-1.0.2.2-2.fc17'})
+
+        self.assertTrue(isinstance(bad.exception(), koji.GenericError))
+        self.assertEqual(str(bad.exception()), 'No such build')
+        self.assertRaises(koji.GenericError, bad.result)
+
+    def test_flush_threshold(self):
+        """Pending calls should be sent as soon as flush_threshold calls are queued."""
+        batch = buildsys.MulticallBatch(self.koji, flush_threshold=2)
+
+        first = batch.getTag('f17-updates')
+        self.assertFalse(first.done())
+        second = batch.getTag('f17-updates-testing')
+
+        self.assertTrue(first.done())
+        self.assertTrue(second.done())
+        self.assertEqual(len(batch), 0)
+
+    def test_missing_results(self):
+        """Calls that Koji returned no result for should get an exception."""
+        batch = buildsys.MulticallBatch(self.koji)
+        future = batch.getTag('f17-updates')
+
+        with mock.patch.object(self.koji, 'multiCall', return_value=None):
+            batch.flush()
+
+        self.assertTrue(isinstance(future.exception(), koji.GenericError))
+
+    def test_multiCall_failure(self):
+        """If the multicall itself fails, every unsent future should get the exception."""
+        batch = buildsys.MulticallBatch(self.koji, chunk_size=1)
+        futures = [batch.getTag('f17-updates'), batch.getTag('f17-updates-testing')]
+        error = IOError('Koji is down')
+
+        with mock.patch.object(self.koji, 'multiCall', side_effect=error):
+            self.assertRaises(IOError, batch.flush)
+
+        self.assertTrue(futures[0].exception() is error)
+        self.assertTrue(futures[1].exception() is error)
+        self.assertEqual(len(batch), 0)
+
+    def test_result_flushes(self):
+        """Asking for a result should send the pending calls."""
+        batch = buildsys.MulticallBatch(self.koji)
+        first = batch.getTag('f17-updates')
+        second = batch.getTag('f17-updates-testing')
+
+        self.assertEqual(second.result()['name'], 'f17-updates-testing')
+
+        self.assertTrue(first.done())
+        self.assertFalse(self.koji.multicall)
+
+    @mock.patch('bodhi.server.buildsys.get_session')
+    def test_session_defaults_to_get_session(self, get_session):
+        """Without a session, get_session() should be used."""
+        batch = buildsys.MulticallBatch()
+
+        self.assertTrue(batch.session is get_session.return_value)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """This test class contains tests for the RetryPolicy class."""
+    def test_delay(self):
+        """Delays should grow exponentially up to max_delay, scaled by the jitter."""
+        policy = buildsys.RetryPolicy(base_delay=1, max_delay=5, random=lambda: 0.5)
+
+        self.assertEqual([policy.delay(a) for a in range(1, 6)], [0.5, 1, 2, 2.5, 2.5])
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """This test class contains tests for the CircuitBreaker class."""
+    @mock.patch('bodhi.server.buildsys.time.time')
+    def test_open_and_reset(self, time):
+        """The breaker should open after threshold failures and half-open after the timeout."""
+        time.return_value = 1000
+        breaker = buildsys.CircuitBreaker(threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        breaker.check()
+
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, breaker.OPEN)
+        with self.assertRaises(KojiUnavailable) as exc:
+            breaker.check()
+        self.assertEqual(str(exc.exception), 'Koji is unavailable (2 consecutive calls failed). '
+                                             'Please try again in 60 seconds.')
+
+        time.return_value = 1060
+        self.assertEqual(breaker.state, breaker.HALF_OPEN)
+        breaker.check()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.OPEN)
+
+        time.return_value = 1120
+        breaker.record_success()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+
+
+class TestResilientSession(unittest.TestCase):
+    """This test class contains tests for the ResilientSession class."""
+    def setUp(self):
+        self.koji = mock.MagicMock()
+        self.koji.multicall = False
+        self.policy = buildsys.RetryPolicy(tries=3, base_delay=1, random=lambda: 1)
+        self.breaker = buildsys.CircuitBreaker(threshold=10)
+        self.stats = buildsys.CallStats()
+        self.session = buildsys.ResilientSession(self.koji, self.policy, self.breaker, self.stats)
+
+    @mock.patch('bodhi.server.buildsys.time.sleep')
+    def test_retry_reads(self, sleep):
+        """Transport errors of reads should be retried with backoff."""
+        self.koji.getBuild.side_effect = [IOError('reset'), IOError('reset'), {'id': 1}]
+
+        self.assertEqual(self.session.getBuild('bodhi-2.0-1.fc17'), {'id': 1})
+
+        self.assertEqual(sleep.mock_calls, [mock.call(1), mock.call(2)])
+        stats = self.stats.snapshot()['getBuild']
+        self.assertEqual((stats['calls'], stats['errors'], stats['retries']), (3, 2, 2))
+        self.assertEqual(self.breaker.state, self.breaker.CLOSED)
+
+    @mock.patch('bodhi.server.buildsys.time.sleep')
+    def test_give_up(self, sleep):
+        """The last error should be raised once the tries are exhausted."""
+        self.koji.listTagged.side_effect = IOError('reset')
+
+        self.assertRaises(IOError, self.session.listTagged, 'f17-updates')
+
+        self.assertEqual(self.koji.listTagged.call_count, 3)
+
+    def test_koji_retries_off_for_reads(self):
+        """koji's own retries should be turned off while reads are made, and restored after."""
+        opts = {'max_retries': 30, 'offline_retry': True}
+        self.koji.opts = dict(opts)
+        self.koji.getBuild.side_effect = lambda nvr: dict(self.koji.opts)
+
+        self.assertEqual(self.session.getBuild('bodhi-2.0-1.fc17'),
+                         {'max_retries': 0, 'offline_retry': False, 'anon_retry': False})
+
+        self.assertEqual(self.koji.opts, opts)
+
+    def test_koji_retries_kept_for_writes(self):
+        """koji's own retries should be kept for calls that change Koji's state."""
+        opts = {'max_retries': 30, 'offline_retry': True, 'anon_retry': True}
+        self.koji.opts = dict(opts)
+        self.koji.tagBuild.side_effect = lambda tag, nvr: dict(self.koji.opts)
+
+        self.assertEqual(self.session.tagBuild('f17-updates', 'bodhi-2.0-1.fc17'), opts)
+
+    @mock.patch('bodhi.server.buildsys.time.sleep')
+    @mock.patch('bodhi.server.buildsys.time.time')
+    def test_deadline(self, time, sleep):
+        """No retry should be attempted if it would end after the deadline."""
+        time.return_value = 0
+        self.policy.deadline = 1.5
+        self.koji.getTag.side_effect = IOError('reset')
+
+        self.assertRaises(IOError, self.session.getTag, 'f17')
+
+        self.assertEqual(self.koji.getTag.call_count, 2)
+
+    @mock.patch('bodhi.server.buildsys.time.sleep')
+    def test_writes_not_retried(self, sleep):
+        """Calls that change Koji should not be retried."""
+        self.koji.tagBuild.side_effect = IOError('reset')
+
+        self.assertRaises(IOError, self.session.tagBuild, 'f17', 'bodhi-2.0-1.fc17')
+
+        self.assertEqual(self.koji.tagBuild.call_count, 1)
+        self.assertEqual(sleep.call_count, 0)
+
+    def test_faults_not_retried(self):
+        """Faults raised by the hub should not be retried nor open the breaker."""
+        self.breaker.threshold = 1
+        self.koji.getBuild.side_effect = koji.GenericError('nope')
+
+        self.assertRaises(koji.GenericError, self.session.getBuild, 'bodhi-2.0-1.fc17')
+
+        self.assertEqual(self.koji.getBuild.call_count, 1)
+        self.assertEqual(self.breaker.state, self.breaker.CLOSED)
+        self.assertEqual(self.stats.snapshot()['getBuild']['errors'], 1)
+
+    def test_breaker_fails_fast(self):
+        """Calls should not reach Koji while the breaker is open."""
+        self.breaker.threshold = 1
+        self.policy.tries = 1
+        self.koji.getBuild.side_effect = IOError('reset')
+        self.assertRaises(IOError, self.session.getBuild, 'bodhi-2.0-1.fc17')
+
+        self.assertRaises(KojiUnavailable, self.session.getBuild, 'bodhi-2.0-1.fc17')
+
+        self.assertEqual(self.koji.getBuild.call_count, 1)
+
+    @mock.patch('bodhi.server.buildsys.time.sleep')
+    def test_multicall_replayed(self, sleep):
+        """A multicall of reads should be retried by replaying its calls."""
+        koji_session = buildsys.DevBuildsys()
+        session = buildsys.ResilientSession(koji_session, self.policy, self.breaker, self.stats)
+        multiCall = koji_session.multiCall
+        session.multicall = True
+        session.getTag('f17-updates')
+        calls = []
+
+        def multiCall_once(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                koji_session.multicall = False
+                raise IOError('reset')
+            return multiCall(*args, **kwargs)
+
+        with mock.patch.object(koji_session, 'multiCall', multiCall_once):
+            results = session.multiCall()
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(results[0][0]['name'], 'f17-updates')
+
+    def test_multicall_with_writes_not_retried(self):
+        """A multicall that changes Koji should not be retried."""
+        self.koji.multiCall.side_effect = IOError('reset')
+        self.koji.multicall = True
+        self.session.tagBuild('f17', 'bodhi-2.0-1.fc17')
+
+        self.assertRaises(IOError, self.session.multiCall)
+
+        self.assertEqual(self.koji.multiCall.call_count, 1)
+
+
+class TestGetCallStats(unittest.TestCase):
+    """This test class contains tests for the get_call_stats() function."""
+    @mock.patch('bodhi.server.buildsys._koji_call_stats', None)
+    def test_not_collected(self):
+        """An empty dictionary should be returned if stats aren't collected."""
+        self.assertEqual(buildsys.get_call_stats(), {})
+
+    @mock.patch('bodhi.server.buildsys._koji_call_stats', None)
+    @mock.patch('bodhi.server.buildsys._koji_breaker', None)
+    def test_stats(self):
+        """The stats of the sessions made by the factory should be returned."""
+        wrap = buildsys.make_resilient_session_factory({'koji_retry.tries': '2'})
+        session = wrap(buildsys.DevBuildsys())
+
+        session.getTag('f17-updates')
+
+        stats = buildsys.get_call_stats()
+        self.assertEqual(stats['getTag']['calls'], 1)
+        self.assertEqual(stats['getTag']['mean_time'], stats['getTag']['total_time'])
+
+
+class TestWaitForTasks(unittest.TestCase):
+    """This test class contains tests for the wait_for_tasks() function."""
+    @mock.patch('bodhi.server.buildsys.time.sleep')
+    def test_failed_task(self, sleep):
+        """Tasks that didn't close should be returned."""
+        session = mock.MagicMock()
+        session.taskFinished.side_effect = [False, True, True]
+        session.getTaskInfo.side_effect = [{'state': koji.TASK_STATES['CLOSED']},
+                                           {'state': koji.TASK_STATES['FAILED']}]
+
+        self.assertEqual(buildsys.wait_for_tasks([1, None, 2], session, sleep=5), [2])
+
+        sleep.assert_called_once_with(5)
+
+    @mock.patch('bodhi.server.buildsys.time.sleep')
+    @mock.patch('bodhi.server.buildsys.time.time')
+    def test_timeout(self, time, sleep):
+        """Tasks that don't finish before the timeout should be returned as failed."""
+        time.side_effect = lambda: sleep.call_count * 10
+        session = mock.MagicMock()
+        session.taskFinished.return_value = False
+
+        self.assertEqual(buildsys.wait_for_tasks([1, 2], session, sleep=10, timeout=30), [1, 2])
+
+        self.assertEqual(sleep.call_count, 3)
+        self.assertEqual(session.getTaskInfo.call_count, 0)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test suite contains tests for the bodhi.server.cache module."""
+import unittest
+
+from dogpile.cache import make_region
+import mock
+
+from bodhi.server import cache, models
+
+
+class TestCacheRegion(unittest.TestCase):
+    """This test class contains tests for the CacheRegion class."""
+    def setUp(self):
+        self.backend = make_region().configure('dogpile.cache.memory')
+        self.region = cache.CacheRegion('home', self.backend, 3600)
+
+    def test_cache_on_arguments(self):
+        """Results should be cached by arguments, and counted as hits and misses."""
+        calls = []
+
+        @self.region.cache_on_arguments()
+        def double(x):
+            calls.append(x)
+            return x * 2
+
+        self.assertEqual([double(1), double(1), double(2)], [2, 2, 4])
+
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(self.region.stats(),
+                         {'hits': 1, 'misses': 2, 'invalidations': 0, 'hit_rate': 1 / 3.0})
+
+    def test_get_or_create_multi(self):
+        """Only the missing keys should be passed to the creator."""
+        self.region.get_or_create('a', lambda: 'cached')
+        creator = mock.MagicMock(return_value=['created'])
+
+        self.assertEqual(self.region.get_or_create_multi(['a', 'b'], creator),
+                         ['cached', 'created'])
+
+        creator.assert_called_once_with('b')
+        self.assertEqual(self.region.stats()['hits'], 1)
+
+    def test_invalidate(self):
+        """Invalidating a region should not affect the other regions sharing the backend."""
+        other = cache.CacheRegion('candidates', self.backend, 3600)
+        self.region.get_or_create('key', lambda: 'old')
+        other.get_or_create('key', lambda: 'other')
+
+        self.region.invalidate()
+
+        self.assertEqual(self.region.get_or_create('key', lambda: 'new'), 'new')
+        self.assertEqual(other.get_or_create('key', lambda: 'new'), 'other')
+        self.assertEqual(self.region.stats()['invalidations'], 1)
+
+    def test_invalidate_shared(self):
+        """Invalidations should be seen by other processes sharing the backend."""
+        elsewhere = cache.CacheRegion('home', self.backend, 3600)
+        self.region.get_or_create('key', lambda: 'old')
+
+        elsewhere.invalidate()
+
+        self.assertEqual(self.region.get_or_create('key', lambda: 'new'), 'new')
+
+
+class TestConfigure(unittest.TestCase):
+    """This test class contains tests for the configure() and get_region() functions."""
+    def tearDown(self):
+        cache._regions.clear()
+
+    def test_expiration_times(self):
+        """Each region should default to dogpile.cache.expiration_time."""
+        cache.configure({'dogpile.cache.backend': 'dogpile.cache.memory',
+                         'dogpile.cache.expiration_time': '100',
+                         'dogpile.cache.home.expiration_time': 30})
+
+        self.assertEqual(cache.get_region('home').expiration_time, 30)
+        self.assertEqual(cache.get_region('critpath').expiration_time, 100)
+        self.assertTrue(cache.get_region('home').region is cache.get_region().region)
+        self.assertEqual(sorted(cache.stats()), sorted(cache.REGIONS))
+
+    @mock.patch('bodhi.server.cache.config', {'dogpile.cache.backend': 'dogpile.cache.memory'})
+    def test_lazy(self):
+        """The regions should be configured from Bodhi's config when first needed."""
+        self.assertEqual(cache.get_region('releases').expiration_time, 0)
+
+
+class TestInvalidationHooks(unittest.TestCase):
+    """This test class contains tests for the session event listeners."""
+    @mock.patch('bodhi.server.cache.invalidate')
+    def test_commit(self, invalidate):
+        """The regions of the flushed objects should be invalidated on commit."""
+        session = mock.MagicMock()
+        session.info = {}
+        session.new = [mock.MagicMock(__cache_regions__=('home',))]
+        session.dirty = [mock.MagicMock(__cache_regions__=('releases', 'home'))]
+        session.deleted = [object()]
+
+        cache.collect_invalidations(session, None)
+        cache.invalidate_after_commit(session)
+        cache.invalidate_after_commit(session)
+
+        invalidate.assert_called_once_with('home', 'releases')
+
+    @mock.patch('bodhi.server.cache.invalidate')
+    def test_rollback(self, invalidate):
+        """Nothing should be invalidated if the transaction is rolled back."""
+        session = mock.MagicMock()
+        session.info = {}
+        session.new = [mock.MagicMock(__cache_regions__=('home',))]
+        session.dirty = session.deleted = []
+
+        cache.collect_invalidations(session, None)
+        cache.discard_invalidations(session)
+        cache.invalidate_after_commit(session)
+
+        self.assertEqual(invalidate.call_count, 0)
+
+    @mock.patch('bodhi.server.cache.invalidate')
+    def test_attribute_regions(self, invalidate):
+        """Attribute regions should be invalidated by new objects and changes to the attributes."""
+        session = mock.MagicMock()
+        session.info = {}
+        update = models.Update()
+        session.new = session.deleted = []
+        session.dirty = [update]
+
+        update.notes = u'Other notes'
+        cache.collect_invalidations(session, None)
+        self.assertNotIn('stats', session.info['cache_invalidations'])
+
+        update.status = models.UpdateStatus.obsolete
+        cache.collect_invalidations(session, None)
+        self.assertIn('stats', session.info['cache_invalidations'])
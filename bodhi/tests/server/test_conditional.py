@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test suite contains tests for the bodhi.server.conditional module."""
+import unittest
+
+from pyramid.config import Configurator
+from pyramid.httpexceptions import HTTPNotModified
+from pyramid.request import Request
+import mock
+
+from bodhi.server import conditional
+
+
+def _request(headers=None, userid=None):
+    """Return a request with the given headers, made by the given user."""
+    config = Configurator()
+    config.testing_securitypolicy(userid=userid)
+    config.commit()
+    request = Request.blank('/', headers=headers or {})
+    request.registry = config.registry
+    return request
+
+
+class TestWantsHtml(unittest.TestCase):
+    """This test class contains tests for the wants_html() function."""
+    def test_browser(self):
+        """Browsers prefer HTML."""
+        request = _request(
+            {'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'})
+
+        self.assertTrue(conditional.wants_html(request))
+
+    def test_no_accept(self):
+        """Requests without an Accept header get JSON."""
+        self.assertFalse(conditional.wants_html(_request()))
+
+    def test_json(self):
+        """API clients ask for JSON."""
+        request = _request({'Accept': 'application/json'})
+
+        self.assertFalse(conditional.wants_html(request))
+
+
+class TestEtag(unittest.TestCase):
+    """This test class contains tests for the etag() function."""
+    def test_depends_on_version(self):
+        """Different versions have different ETags."""
+        request = _request()
+
+        self.assertEqual(conditional.etag(request, 1), conditional.etag(request, 1))
+        self.assertNotEqual(conditional.etag(request, 1), conditional.etag(request, 2))
+
+    def test_depends_on_accept_and_user(self):
+        """The ETag changes with the Accept header and with the user."""
+        etag = conditional.etag(_request(), 1)
+
+        self.assertNotEqual(conditional.etag(_request({'Accept': 'application/rss+xml'}), 1), etag)
+        self.assertNotEqual(conditional.etag(_request(userid=u'guest'), 1), etag)
+
+
+class TestCheck(unittest.TestCase):
+    """This test class contains tests for the check() function."""
+    @mock.patch.dict('bodhi.server.conditional.config', {'http_cache.max_age': 60})
+    def test_headers(self):
+        """The response gets an ETag and caching headers."""
+        request = _request()
+
+        conditional.check(request, 1)
+
+        self.assertEqual(request.response.etag, conditional.etag(request, 1))
+        self.assertEqual(request.response.headers['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(request.response.headers['Vary'], 'Accept, Cookie')
+
+    def test_private(self):
+        """Responses to authenticated users are private."""
+        request = _request(userid=u'guest')
+
+        conditional.check(request, 1)
+
+        self.assertTrue(request.response.headers['Cache-Control'].startswith('private,'))
+
+    def test_not_modified(self):
+        """A 304 is raised, with the ETag, if the client has the current version."""
+        request = _request({'If-None-Match': '"%s"' % conditional.etag(_request(), 1)})
+
+        with self.assertRaises(HTTPNotModified) as exc:
+            conditional.check(request, 1)
+
+        self.assertEqual(exc.exception.headers['ETag'], '"%s"' % conditional.etag(request, 1))
+        self.assertIn('Cache-Control', exc.exception.headers)
+
+    def test_modified(self):
+        """Nothing is raised if the client has another version."""
+        request = _request({'If-None-Match': '"%s"' % conditional.etag(_request(), 1)})
+
+        conditional.check(request, 2)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This module contains tests for the bodhi.server.export module."""
+from datetime import datetime
+
+from bodhi.server import export
+from bodhi.server.models import Comment, Release, Update, UpdateStatus
+from bodhi.tests.server import base
+
+
+class TestSerialize(base.BaseTestCase):
+    """This class contains tests for the serialize() function."""
+
+    def test_serialize(self):
+        """Assert that updates are exported with their builds, comments and karma."""
+        update = self.db.query(Update).one()
+
+        exported = export.serialize(update)
+
+        comments = exported.pop('comments')
+        self.assertEqual(
+            exported,
+            {'alias': update.alias, 'title': u'bodhi-2.0-1.fc17', 'release': u'F17',
+             'user': u'guest', 'type': u'bugfix', 'status': u'pending', 'request': u'testing',
+             'severity': u'unspecified', 'critpath': False, 'karma': 1, 'stable_karma': 3,
+             'unstable_karma': -3, 'date_submitted': '1984-11-02 00:00:00', 'date_modified': None,
+             'date_approved': None, 'date_pushed': None, 'date_stable': None,
+             'date_changed': update.date_changed.strftime('%Y-%m-%d %H:%M:%S'),
+             'builds': [{'nvr': u'bodhi-2.0-1.fc17', 'type': u'rpm', 'signed': False}]})
+        self.assertEqual(
+            [(c['id'], c['user'], c['karma'], c['karma_critpath'], c['text']) for c in comments],
+            [(1, u'guest', 1, 0, u'wow. amaze.'), (2, u'anonymous', 0, 0, u'srsly.  pretty good.')])
+        self.assertEqual(
+            [c['timestamp'] for c in comments],
+            [c.timestamp.strftime('%Y-%m-%d %H:%M:%S') for c in update.comments])
+
+
+class TestUpdates(base.BaseTestCase):
+    """This class contains tests for the updates() function."""
+
+    def setUp(self):
+        super(TestUpdates, self).setUp()
+        for i in range(3):
+            update = self.create_update([u'export{}-1.0-1.fc17'.format(i)])
+            update.date_submitted = datetime(2017, 1, 1)
+        self.db.flush()
+        for comment in self.db.query(Comment):
+            comment.timestamp = datetime(2017, 1, 1)
+        self.db.flush()
+        # Make every update unchanged since then, behind the back of _bump_update_versions().
+        self.db.execute(Update.__table__.update().values(date_changed=datetime(2017, 1, 1)))
+        self.db.expire_all()
+
+    def test_all(self):
+        """Assert that all the updates are exported, sorted by id, in batches."""
+        titles = [u.title for u in self.db.query(Update).order_by(Update.id)]
+
+        with self.count_queries() as statements:
+            exported = [u['title'] for u in export.updates(self.db, batch_size=2)]
+
+        self.assertEqual(exported, titles)
+        # The third batch finds out that there are no more updates.
+        batches = [s for s in statements if s.startswith('SELECT anon_1.updates_id')]
+        self.assertEqual(len(batches), 3)
+
+    def test_modified_since(self):
+        """Assert that only the updates that changed since the given date are exported."""
+        changes = {
+            u'export0-1.0-1.fc17': ('notes', u'New notes'),
+            u'export1-1.0-1.fc17': ('status', UpdateStatus.stable),
+            u'bodhi-2.0-1.fc17': ('status', UpdateStatus.obsolete)}
+        for title, (attribute, value) in changes.items():
+            setattr(Update.get(title, self.db), attribute, value)
+        self.db.flush()
+
+        exported = export.updates(self.db, modified_since=datetime(2017, 10, 1))
+
+        self.assertEqual(sorted(u['title'] for u in exported), sorted(changes))
+
+    def test_modified_since_comment(self):
+        """Assert that updates commented on since the given date are exported."""
+        update = Update.get(u'export2-1.0-1.fc17', self.db)
+        update.comment(self.db, u'Works for me', author=u'tester')
+        self.db.flush()
+
+        exported = export.updates(self.db, modified_since=datetime(2017, 10, 1))
+
+        self.assertEqual([u['title'] for u in exported], [u'export2-1.0-1.fc17'])
+
+    def test_releases(self):
+        """Assert that only the updates of the given releases are exported."""
+        release = Release.query.one()
+        update = Update.get(u'export0-1.0-1.fc17', self.db)
+        update.release = Release(
+            name=u'F18', long_name=u'Fedora 18', id_prefix=u'FEDORA', version=u'18',
+            dist_tag=u'f18', stable_tag=u'f18-updates', testing_tag=u'f18-updates-testing',
+            candidate_tag=u'f18-updates-candidate', pending_signing_tag=u'f18-updates-signing',
+            pending_testing_tag=u'f18-updates-testing-pending',
+            pending_stable_tag=u'f18-updates-pending', override_tag=u'f18-override',
+            branch=u'f18')
+        self.db.flush()
+
+        self.assertEqual(
+            [u['title'] for u in export.updates(self.db, releases=[update.release])],
+            [u'export0-1.0-1.fc17'])
+        self.assertEqual(len(list(export.updates(self.db, releases=[release]))), 3)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test suite contains tests for the bodhi.server.facts module."""
+import mock
+
+from bodhi.server import buildsys, facts, mail, models
+from bodhi.tests.server import base
+
+
+class TestUpdateFacts(base.BaseTestCase):
+    """This class contains tests for the UpdateFacts class."""
+    def test_build_info(self):
+        """build_info() should ask Koji only once per NVR."""
+        koji = mock.MagicMock()
+        koji.getBuild.return_value = {'id': 42}
+        f = facts.UpdateFacts(koji)
+
+        self.assertEqual(f.build_info('bodhi-2.0-1.fc17'), {'id': 42})
+        self.assertEqual(f.build_info('bodhi-2.0-1.fc17'), {'id': 42})
+
+        koji.getBuild.assert_called_once_with('bodhi-2.0-1.fc17')
+        self.assertEqual(f.stats['build_info'], {'hits': 1, 'misses': 1})
+
+    def test_changelog(self):
+        """changelog() should be memoized by NVR and timelimit."""
+        build = mock.MagicMock()
+        build.nvr = 'bodhi-2.0-1.fc17'
+        build.get_changelog.return_value = '* a change'
+        f = facts.UpdateFacts(mock.MagicMock())
+
+        self.assertEqual(f.changelog(build, 10), '* a change')
+        self.assertEqual(f.changelog(build, 10), '* a change')
+        f.changelog(build, 20)
+
+        self.assertEqual(build.get_changelog.mock_calls, [mock.call(10), mock.call(20)])
+        self.assertEqual(f.stats['changelog'], {'hits': 1, 'misses': 2})
+
+    def test_koji_defaults_to_get_session(self):
+        """If no session is given, one should be acquired lazily from buildsys."""
+        f = facts.UpdateFacts()
+
+        self.assertTrue(isinstance(f.koji, buildsys.DevBuildsys))
+        self.assertTrue(f.koji is f.koji)
+
+    def test_latest(self):
+        """latest() should call get_latest() only once per build."""
+        build = mock.MagicMock()
+        build.nvr = 'bodhi-2.0-1.fc17'
+        build.get_latest.return_value = 'bodhi-1.0-1.fc17'
+        f = facts.UpdateFacts(mock.MagicMock())
+
+        self.assertEqual(f.latest(build), 'bodhi-1.0-1.fc17')
+        self.assertEqual(f.latest(build), 'bodhi-1.0-1.fc17')
+
+        build.get_latest.assert_called_once_with()
+
+    def test_log_stats(self):
+        """log_stats() should log one line per fact with its counters."""
+        logger = mock.MagicMock()
+        f = facts.UpdateFacts(mock.MagicMock())
+        f.build_info('bodhi-2.0-1.fc17')
+        f.build_info('bodhi-2.0-1.fc17')
+
+        f.log_stats(logger)
+
+        logger.info.assert_called_once_with(
+            'Update facts: %s: %d fetched, %d deduplicated', 'build_info', 1, 1)
+
+    def test_references(self):
+        """references() should describe the update's bugs and CVEs."""
+        update = models.Update.query.one()
+        f = facts.UpdateFacts(mock.MagicMock())
+
+        references = f.references(update)
+
+        self.assertEqual(
+            references,
+            {'bugs': [{'bug_id': 12345, 'url': update.bugs[0].url, 'title': update.bugs[0].title,
+                       'parent': update.bugs[0].parent}],
+             'cves': [{'cve_id': update.cves[0].cve_id, 'url': update.cves[0].url}]})
+        self.assertTrue(f.references(update) is references)
+
+    @mock.patch('bodhi.server.facts.get_rpm_header', return_value={'name': 'bodhi'})
+    def test_rpm_header(self, get_rpm_header):
+        """rpm_header() should fetch each header only once."""
+        f = facts.UpdateFacts(mock.MagicMock())
+
+        self.assertEqual(f.rpm_header('bodhi-2.0-1.fc17'), {'name': 'bodhi'})
+        self.assertEqual(f.rpm_header('bodhi-2.0-1.fc17'), {'name': 'bodhi'})
+
+        get_rpm_header.assert_called_once_with('bodhi-2.0-1.fc17')
+        self.assertEqual(f.stats['rpm_header'], {'hits': 1, 'misses': 1})
+
+    def test_rpms_with_build_id(self):
+        """rpms() should not call getBuild() if the build id is known."""
+        koji = mock.MagicMock()
+        koji.listBuildRPMs.return_value = [{'name': 'bodhi'}]
+        f = facts.UpdateFacts(koji)
+
+        self.assertEqual(f.rpms('bodhi-2.0-1.fc17', build_id=42), [{'name': 'bodhi'}])
+        self.assertEqual(f.rpms('bodhi-2.0-1.fc17', build_id=42), [{'name': 'bodhi'}])
+
+        self.assertEqual(koji.getBuild.call_count, 0)
+        koji.listBuildRPMs.assert_called_once_with(42)
+
+    def test_rpms_without_build_id(self):
+        """rpms() should look the build id up, reusing build_info()'s cache."""
+        koji = mock.MagicMock()
+        koji.getBuild.return_value = {'id': 42}
+        f = facts.UpdateFacts(koji)
+        f.build_info('bodhi-2.0-1.fc17')
+
+        f.rpms('bodhi-2.0-1.fc17')
+
+        koji.getBuild.assert_called_once_with('bodhi-2.0-1.fc17')
+        koji.listBuildRPMs.assert_called_once_with(42)
+        self.assertEqual(f.stats['build_info'], {'hits': 1, 'misses': 1})
+
+
+class TestSharedFacts(base.BaseTestCase):
+    """Assert that the consumers of a push share the same facts."""
+    @mock.patch('bodhi.server.facts.get_rpm_header', wraps=facts.get_rpm_header)
+    def test_get_template_twice(self, get_rpm_header):
+        """Generating two notices for the same update should only fetch the headers once."""
+        update = models.Update.query.one()
+        f = facts.UpdateFacts()
+
+        first = mail.get_template(update, use_template='maillist_template', facts=f)
+        second = mail.get_template(update, facts=f)
+
+        self.assertEqual(first[0][0], second[0][0])
+        self.assertEqual(get_rpm_header.call_count, f.stats['rpm_header']['misses'])
+        self.assertEqual(f.stats['rpm_header']['hits'], f.stats['rpm_header']['misses'])
+        self.assertEqual(f.stats['references'], {'hits': 1, 'misses': 1})
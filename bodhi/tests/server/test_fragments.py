@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This module contains tests for bodhi.server.fragments."""
+import copy
+
+from webtest import TestApp
+import mock
+
+from bodhi.server import cache, fragments, main
+from bodhi.server.models import Update
+from bodhi.tests.server import base
+
+
+class TestFragments(base.BaseTestCase):
+    """Test the cached fragments of the update pages, starting from an empty cache."""
+
+    def setUp(self):
+        super(TestFragments, self).setUp()
+        # Apps configure the cache regions, so create it before the region is patched.
+        settings = copy.copy(self.app_settings)
+        settings.update({'authtkt.secret': 'whatever', 'authtkt.secure': True})
+        self.anonymous_app = TestApp(main({}, session=self.db, **settings))
+        region = cache.get_region('fragments')
+        patcher = mock.patch.object(region, 'expiration_time', 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        region.invalidate()
+
+    def _stats(self):
+        return cache.get_region('fragments').stats()
+
+    def _get_update(self, app=None):
+        # The owner of the update can edit it, so its builds are not cached for them.
+        app = app or self.anonymous_app
+        return app.get('/updates/bodhi-2.0-1.fc17', headers={'Accept': 'text/html'}, status=200)
+
+    def test_cached(self):
+        """The fragments of an update should only be rendered once."""
+        self._get_update()
+        stats = self._stats()
+
+        res = self._get_update()
+
+        self.assertEqual(self._stats()['misses'], stats['misses'])
+        self.assertEqual(self._stats()['hits'] - stats['hits'], 3)
+        self.assertIn('wow. amaze.', res)
+        self.assertIn('bodhi-2.0-1.fc17</a>', res)
+
+    def test_version(self):
+        """The fragments should be rendered again once the update changes."""
+        self._get_update()
+        update = self.db.query(Update).one()
+        update.comment(self.db, u'Such caching.', author=u'tester')
+        self.db.commit()
+
+        res = self._get_update()
+
+        self.assertIn('Such caching.', res)
+
+    def test_can_edit(self):
+        """Editors should see the links to the buildroot overrides of the builds."""
+        self._get_update()
+        stats = self._stats()
+
+        res = self._get_update(self.app)
+
+        self.assertIn('Edit the buildroot override for bodhi-2.0-1.fc17', res)
+        self.assertNotIn('Edit the buildroot override', self._get_update())
+        # The builds were rendered for the editor, and taken from the cache for the others.
+        self.assertEqual(self._stats()['misses'], stats['misses'])
+
+    def test_list(self):
+        """The rows of lists of updates should be cached."""
+        self.app.get('/updates/', headers={'Accept': 'text/html'}, status=200)
+        stats = self._stats()
+
+        res = self.app.get('/updates/', headers={'Accept': 'text/html'}, status=200)
+
+        self.assertEqual(self._stats()['misses'], stats['misses'])
+        self.assertEqual(self._stats()['hits'] - stats['hits'], 1)
+        self.assertIn('bodhi-2.0-1.fc17', res)
+
+    @mock.patch('bodhi.server.fragments.render_template', return_value=u'<td>row</td>')
+    def test_serialized_update(self, render_template):
+        """Serialized updates have no version, so their fragments should not be cached."""
+        request = mock.MagicMock()
+        update = self.db.query(Update).one().__json__()
+
+        fragments.render_fragment(request, update, 'update', display_user=False)
+        html = fragments.render_fragment(request, update, 'update', display_user=False)
+
+        self.assertEqual(html, u'<td>row</td>')
+        self.assertEqual(render_template.call_count, 2)
+        render_template.assert_called_with(
+            'fragments#update.html', {'update': update, 'display_user': False}, request=request)
+
+    def test_key(self):
+        """The key should depend on the version of the update, the URL and the arguments."""
+        request = mock.MagicMock(application_url='https://bodhi.example.com')
+        update = self.db.query(Update).one()
+
+        key = fragments.key(request, update, 'update', display_user=True, display_karma=False)
+
+        self.assertEqual(
+            key,
+            '%s:update:%d:%d:https://bodhi.example.com:display_karma=False,display_user=True' % (
+                fragments._VERSION, update.id, update.version))
+
+    @mock.patch('bodhi.server.notifications.publish')
+    def test_warm(self, publish):
+        """The fragments of an update should be rendered once a comment on it is saved."""
+        comment = {'update': 'bodhi-2.0-1.fc17', 'text': 'Such warmth.', 'karma': 0,
+                   'csrf_token': self.get_csrf_token()}
+        stats = self._stats()
+
+        self.app.post_json('/comments/', comment, status=200)
+
+        self.assertEqual(self._stats()['misses'] - stats['misses'], 3)
+        stats = self._stats()
+        res = self._get_update()
+        self.assertEqual(self._stats()['misses'], stats['misses'])
+        self.assertIn('Such warmth.', res)
+
+    def test_warm_error(self):
+        """Nothing should be rendered for requests that fail."""
+        comment = {'update': 'bodhi-2.0-1.fc17', 'text': 'Such warmth.', 'karma': 2,
+                   'csrf_token': self.get_csrf_token()}
+        stats = self._stats()
+
+        self.app.post_json('/comments/', comment, status=400)
+
+        self.assertEqual(self._stats()['misses'], stats['misses'])
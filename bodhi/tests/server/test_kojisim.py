@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test suite contains tests for the bodhi.server.kojisim module."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import koji
+import mock
+
+from bodhi.server import buildsys, kojisim
+
+
+class TestSimulatorState(unittest.TestCase):
+    """This test class contains tests for the SimulatorState class."""
+    def test_dump_and_load(self):
+        """A loaded dump should describe the same builds and tags."""
+        state = kojisim.SimulatorState()
+        state.add_build('bodhi-2.0-1.fc27', ['f27-updates', 'f27'], arches=['x86_64'])
+        state.add_tag('f28')
+
+        dump = state.dump()
+
+        self.assertEqual(
+            dump,
+            {'tags': ['f27', 'f27-updates', 'f28'],
+             'builds': [{'nvr': 'bodhi-2.0-1.fc27', 'tags': ['f27', 'f27-updates'],
+                         'arches': ['x86_64']}]})
+        self.assertEqual(kojisim.SimulatorState.load(dump).dump(), dump)
+
+    def test_generate(self):
+        """generate() should create the requested number of builds, deterministically."""
+        state = kojisim.SimulatorState.generate(['a', 'b'], packages=10, builds_per_package=2,
+                                                seed=42)
+
+        self.assertEqual(len(state.builds), 20)
+        self.assertEqual(sum(len(t) for t in state.tagged.values()), 20)
+        self.assertEqual(
+            kojisim.SimulatorState.generate(['a', 'b'], packages=10, builds_per_package=2,
+                                            seed=42).dump(),
+            state.dump())
+
+    def test_package_ids(self):
+        """The builds of a package should share its id."""
+        state = kojisim.SimulatorState.generate([], packages=2, builds_per_package=2)
+
+        ids = dict((b['nvr'], b['package_id']) for b in state.builds.values())
+
+        self.assertEqual(ids['package0-1.0-1'], ids['package0-1.1-1'])
+        self.assertNotEqual(ids['package0-1.0-1'], ids['package1-1.0-1'])
+
+    def test_retag(self):
+        """Tagging a build again should make it the most recently tagged build of the tag."""
+        state = kojisim.SimulatorState()
+        first = state.add_build('bodhi-1.0-1.fc27', ['f27'])
+        second = state.add_build('bodhi-2.0-1.fc27', ['f27'])
+
+        state.tag('f27', first)
+
+        self.assertEqual(list(state.tagged['f27']), [second['id'], first['id']])
+
+
+class TestSimulatedBuildsys(unittest.TestCase):
+    """This test class contains tests for the SimulatedBuildsys class."""
+    def setUp(self):
+        self.state = kojisim.SimulatorState()
+        self.state.add_build('bodhi-1.0-1.fc27', ['f27-updates'], arches=['noarch'])
+        self.state.add_build('bodhi-2.0-1.fc27', ['f27-updates-testing'], arches=['noarch'])
+        self.state.add_tag('f27-updates-candidate')
+        self.koji = kojisim.SimulatedBuildsys(self.state)
+
+    def test_getBuild(self):
+        """getBuild() should accept NVRs and ids, and return None for unknown builds."""
+        build = self.koji.getBuild('bodhi-2.0-1.fc27')
+
+        self.assertEqual(build['version'], '2.0')
+        self.assertEqual(build['state'], koji.BUILD_STATES['COMPLETE'])
+        self.assertEqual(self.koji.getBuild(build['id']), build)
+        self.assertEqual(self.koji.getBuild('nope-1-1'), None)
+        self.assertRaises(koji.GenericError, self.koji.getBuild, 'nope-1-1', strict=True)
+
+    def test_listBuildRPMs(self):
+        """listBuildRPMs() should list the source and binary RPMs of the build."""
+        rpms = self.koji.listBuildRPMs(self.koji.getBuild('bodhi-1.0-1.fc27')['id'])
+
+        self.assertEqual([(r['nvr'], r['arch']) for r in rpms],
+                         [('bodhi-1.0-1.fc27', 'src'), ('bodhi-1.0-1.fc27', 'noarch')])
+
+    def test_moveBuild(self):
+        """moveBuild() should change the tags of the build and return a task."""
+        task_id = self.koji.moveBuild('f27-updates-testing', 'f27-updates', 'bodhi-2.0-1.fc27')
+
+        self.assertEqual(self.koji.listTagged('f27-updates-testing'), [])
+        self.assertEqual([b['nvr'] for b in self.koji.listTagged('f27-updates')],
+                         ['bodhi-2.0-1.fc27', 'bodhi-1.0-1.fc27'])
+        self.assertEqual([b['nvr'] for b in self.koji.listTagged('f27-updates', latest=True)],
+                         ['bodhi-2.0-1.fc27'])
+        self.assertEqual([t['name'] for t in self.koji.listTags('bodhi-2.0-1.fc27')],
+                         ['f27-updates'])
+        self.assertTrue(self.koji.taskFinished(task_id))
+        self.assertEqual(self.koji.getTaskInfo(task_id)['state'], koji.TASK_STATES['CLOSED'])
+
+    def test_multicall(self):
+        """multiCall() should return one result or fault per queued call."""
+        self.koji.multicall = True
+        self.assertEqual(self.koji.getTag('f27-updates'), None)
+        self.koji.untagBuild('f27-updates', 'bodhi-2.0-1.fc27')
+
+        results = self.koji.multiCall()
+
+        self.assertEqual(results[0][0]['name'], 'f27-updates')
+        self.assertEqual(results[1]['faultCode'], koji.GenericError.faultCode)
+        self.assertFalse(self.koji.multicall)
+
+    def test_multicall_batch(self):
+        """The simulator should work with buildsys.MulticallBatch."""
+        with buildsys.MulticallBatch(self.koji) as batch:
+            build = batch.getBuild('bodhi-1.0-1.fc27')
+            latest = batch.getLatestBuilds('f27-updates-testing')
+
+        self.assertEqual(build.result()['nvr'], 'bodhi-1.0-1.fc27')
+        self.assertEqual([b['nvr'] for b in latest.result()], ['bodhi-2.0-1.fc27'])
+
+    def test_failure_rate(self):
+        """Calls should fail with a GenericError when failure_rate is 1."""
+        self.koji.failure_rate = 1
+
+        self.assertRaises(koji.GenericError, self.koji.getTag, 'f27-updates')
+
+    @mock.patch('bodhi.server.kojisim.time.sleep')
+    def test_latency(self, sleep):
+        """Each call and each multicall should sleep for the configured latency."""
+        self.koji.latency = 0.25
+        self.koji.getTag('f27-updates')
+        self.koji.multicall = True
+        self.koji.getTag('f27-updates')
+        self.koji.getTag('f27-updates-testing')
+        self.koji.multiCall()
+
+        self.assertEqual(sleep.mock_calls, [mock.call(0.25), mock.call(0.25)])
+
+    def test_tasks(self):
+        """Tag tasks should stay open for task_duration, and fail at task_failure_rate."""
+        self.koji.task_duration = 3600
+        self.koji.task_failure_rate = 1
+
+        task_id = self.koji.tagBuild('f27-updates-candidate', 'bodhi-2.0-1.fc27')
+
+        self.assertFalse(self.koji.taskFinished(task_id))
+        self.assertEqual(self.koji.getTaskInfo(task_id)['state'], koji.TASK_STATES['OPEN'])
+        self.state.tasks[task_id]['finish'] = 0
+        self.assertEqual(self.koji.getTaskInfo(task_id)['state'], koji.TASK_STATES['FAILED'])
+        self.assertEqual(self.koji.getTaskRequest(task_id),
+                         ['f27-updates-candidate', self.koji.getBuild('bodhi-2.0-1.fc27')['id'],
+                          False, None])
+
+    def test_untagBuild_strict(self):
+        """untagBuild() should raise if the build isn't tagged, unless strict is False."""
+        self.assertRaises(koji.GenericError, self.koji.untagBuild, 'f27-updates',
+                          'bodhi-2.0-1.fc27')
+        self.koji.untagBuild('f27-updates', 'bodhi-2.0-1.fc27', strict=False)
+
+
+class TestMakeSimulator(unittest.TestCase):
+    """This test class contains tests for the make_simulator() function."""
+    def test_dump(self):
+        """The state should be loaded from koji_simulator.dump if it is set."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'dump.json')
+            with open(path, 'w') as dump:
+                json.dump({'tags': ['f27'], 'builds': [{'nvr': 'bodhi-2.0-1.fc27',
+                                                        'tags': ['f27']}]}, dump)
+
+            factory = kojisim.make_simulator(
+                {'koji_simulator.dump': path, 'koji_simulator.failure_rate': 0.5})
+        finally:
+            shutil.rmtree(tmpdir)
+
+        session = factory()
+        self.assertEqual(session.failure_rate, 0.5)
+        self.assertTrue(session.state is factory.state)
+        self.assertEqual(session.state.dump(),
+                         {'tags': ['f27'], 'builds': [{'nvr': 'bodhi-2.0-1.fc27', 'tags': ['f27'],
+                                                       'arches': list(sorted(kojisim.ARCHES))}]})
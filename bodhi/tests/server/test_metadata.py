@@ -24,18 +24,91 @@ import glob
 import os
 import shutil
 import tempfile
+import unittest
 
 import createrepo_c
+import mock
 
 from bodhi.server.buildsys import (setup_buildsystem, teardown_buildsystem,
                                    DevBuildsys)
 from bodhi.server.config import config
 from bodhi.server.models import Release, Update, UpdateRequest, UpdateStatus
+from bodhi.server import metadata
 from bodhi.server.metadata import UpdateInfoMetadata
 from bodhi.server.util import mkmetadatadir
 from bodhi.tests.server import base
 
 
+class TestModifyrepo(unittest.TestCase):
+    """This class contains tests for the modifyrepo() function."""
+    def setUp(self):
+        """Create a compose with a few arches and a metadata file to inject."""
+        self.tempdir = tempfile.mkdtemp('bodhi')
+        self.arches = ['aarch64', 'i386', 'x86_64', 'source']
+        self.repodatas = []
+        for arch in self.arches:
+            tree = arch == 'source' and 'tree' or 'os'
+            repo = join(self.tempdir, 'compose', 'Everything', arch, tree)
+            mkmetadatadir(repo)
+            self.repodatas.append(join(repo, 'repodata'))
+        self.source = join(self.tempdir, 'updateinfo.xml')
+        with open(self.source, 'w') as source:
+            source.write(createrepo_c.UpdateInfo().xml_dump())
+
+    def tearDown(self):
+        """Remove the temporary compose."""
+        shutil.rmtree(self.tempdir)
+
+    def test_compresses_once(self):
+        """The source file should be compressed only once, no matter how many arches there are."""
+        with mock.patch('bodhi.server.metadata._compress_metadata',
+                        wraps=metadata._compress_metadata) as compress:
+            metadata.modifyrepo(createrepo_c.XZ, self.tempdir, 'updateinfo', 'xml', self.source)
+
+        self.assertEqual(compress.call_count, 1)
+
+    def test_inserted_into_every_arch(self):
+        """Every arch should receive the same compressed file and repomd.xml record."""
+        metadata.modifyrepo(createrepo_c.XZ, self.tempdir, 'updateinfo', 'xml', self.source)
+
+        checksums = set()
+        for repodata in self.repodatas:
+            updateinfos = glob.glob(join(repodata, '*-updateinfo.xml.xz'))
+            self.assertEqual(len(updateinfos), 1)
+            checksum = basename(updateinfos[0]).split('-', 1)[0]
+            self.assertEqual(sha256(open(updateinfos[0]).read()).hexdigest(), checksum)
+            records = [r for r in createrepo_c.Repomd(join(repodata, 'repomd.xml')).records
+                       if r.type == 'updateinfo']
+            self.assertEqual(len(records), 1)
+            self.assertEqual(records[0].checksum, checksum)
+            self.assertEqual(records[0].location_href,
+                             'repodata/%s' % basename(updateinfos[0]))
+            # The uncompressed copy must not be left behind.
+            self.assertFalse(exists(join(repodata, 'updateinfo.xml')))
+            checksums.add(checksum)
+        self.assertEqual(len(checksums), 1)
+        # The source file belongs to the caller, so it should not have been removed.
+        self.assertTrue(exists(self.source))
+
+    def test_no_arches(self):
+        """modifyrepo() should do nothing if the compose has no arches."""
+        for arch in self.arches:
+            shutil.rmtree(join(self.tempdir, 'compose', 'Everything', arch))
+
+        with mock.patch('bodhi.server.metadata.cr.RepomdRecord') as RepomdRecord:
+            metadata.modifyrepo(createrepo_c.XZ, self.tempdir, 'updateinfo', 'xml', self.source)
+
+        self.assertEqual(RepomdRecord.call_count, 0)
+
+    @mock.patch('bodhi.server.metadata._insert_record', side_effect=IOError('disk full'))
+    def test_worker_failure_propagates(self, _insert_record):
+        """A failure in one of the injection workers should be raised to the caller."""
+        with self.assertRaises(IOError):
+            metadata.modifyrepo(createrepo_c.XZ, self.tempdir, 'updateinfo', 'xml', self.source)
+
+        self.assertEqual(_insert_record.call_count, len(self.arches))
+
+
 class TestAddUpdate(base.BaseTestCase):
     """
     This class contains tests for the UpdateInfoMetadata.add_update() method.
@@ -14,7 +14,7 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """Test suite for bodhi.server.models"""
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from HTMLParser import HTMLParser
 import json
 import pickle
@@ -22,6 +22,7 @@ import time
 import unittest
 
 from pyramid.testing import DummyRequest
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import IntegrityError
 import cornice
 import mock
@@ -87,6 +88,36 @@ class ModelTest(BaseTestCase):
                 self.assertEqual(self.klass.get(getattr(self.obj, col), self.db), self.obj)
 
 
+def _reflected_json(obj, seen=None):
+    """Serialize obj by reflection, as BodhiBase._to_json() did before JSONSerializer."""
+    seen = seen or []
+    properties = list(model.class_mapper(type(obj)).iterate_properties)
+    exclude = getattr(obj, '__exclude_columns__', [])
+    rels = [p.key for p in properties if type(p) is model.RelationshipProperty]
+    d = dict((p.key, getattr(obj, p.key)) for p in properties
+             if p.key not in rels and p.key not in exclude and not p.key.startswith('_'))
+    for name in getattr(obj, '__include_extras__', []):
+        attribute = getattr(obj, name)
+        d[name] = attribute(None) if callable(attribute) else attribute
+    for attr in rels:
+        if attr in exclude or getattr(type(obj), attr).property.mapper.class_ in seen:
+            continue
+        relation = getattr(obj, attr)
+        if hasattr(relation, 'all'):
+            relation = relation.all()
+        items = relation if hasattr(relation, '__iter__') else [relation]
+        values = [item.id if type(item) in seen else
+                  _reflected_json(item, seen + [type(obj)]) if item else None
+                  for item in items]
+        d[attr] = values if hasattr(relation, '__iter__') else values[0]
+    for key, value in d.items():
+        if isinstance(value, datetime):
+            d[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, model.EnumSymbol):
+            d[key] = unicode(value)
+    return d
+
+
 class TestBodhiBase(BaseTestCase):
     """Test the BodhiBase class."""
 
@@ -153,6 +184,83 @@ class TestBodhiBase(BaseTestCase):
             {'release_id': 1, 'ci_url': b.ci_url, 'epoch': b.epoch, 'nvr': b.nvr,
              'signed': b.signed, 'type': unicode(b.type.value)})
 
+    def test__to_json_compiles_serializer_once(self):
+        """_to_json() should only reflect on a model class the first time it serializes it."""
+        b = model.Build.query.all()[0]
+        model.JSONSerializer._serializers.clear()
+
+        with mock.patch('bodhi.server.models.class_mapper', wraps=model.class_mapper) as mapper:
+            first = b._to_json(b)
+            second = b._to_json(b)
+
+        self.assertEqual(first, second)
+        self.assertEqual(mapper.call_count, len(model.JSONSerializer._serializers))
+
+    def test__to_json_field_serializers_bounded(self):
+        """Only the most recently used serializers restricted to fields should be kept."""
+        u = model.Update.query.one()
+        model.JSONSerializer._field_serializers.clear()
+
+        with mock.patch.object(model.JSONSerializer, 'max_field_serializers', 2):
+            u.__json__(fields=['title'])
+            u.__json__(fields=['karma'])
+            u.__json__(fields=['title'])
+            u.__json__(fields=['status'])
+
+            self.assertEqual(
+                [key[3] for key in model.JSONSerializer._field_serializers],
+                [frozenset(['title']), frozenset(['status'])])
+            with mock.patch('bodhi.server.models.class_mapper',
+                            wraps=model.class_mapper) as mapper:
+                j = u.__json__(fields=['title'])
+
+        self.assertEqual(j, {'title': u.title})
+        self.assertEqual(mapper.call_count, 0)
+
+    def test___json___fields(self):
+        """__json__() should only serialize the given fields."""
+        u = model.Update.query.one()
+
+        j = u.__json__(fields=frozenset(['title', 'release', 'karma']))
+
+        self.assertEqual(sorted(j.keys()), ['karma', 'release', 'title'])
+        self.assertEqual(j['release']['name'], u'F17')
+        self.assertEqual(j['karma'], u.karma)
+
+    def test_json_fields(self):
+        """json_fields() should include the columns, relationships and computed fields."""
+        fields = model.Update.json_fields()
+
+        for name in ('alias', 'builds', 'comments', 'karma', 'submitter', 'content_type'):
+            self.assertIn(name, fields)
+        self.assertNotIn('search_text', fields)
+
+    def test__to_json_max_depth(self):
+        """Relationships beyond __json_max_depth__ should be represented by their ids."""
+        c = model.Comment.query.all()[0]
+
+        with mock.patch.object(model.Comment, '__json_max_depth__', 1, create=True):
+            j = c._to_json(c)
+
+        self.assertEqual(j['user']['name'], c.user.name)
+        self.assertEqual(j['user']['groups'], [c.user.groups[0].id])
+        self.assertEqual(j['update']['builds'], [b.id for b in c.update.builds])
+
+    def test__to_json_update_unlimited_depth(self):
+        """Updates should serialize like the reflection did, however deep their relationships."""
+        u = model.Update.query.one()
+        c = u.comments[0]
+        self.db.add(model.BugKarma(karma=1, comment=c, bug=u.bugs[0]))
+        testcase = model.TestCase(name=u'Wat', package=u.builds[0].package)
+        self.db.add(model.TestCaseKarma(karma=-1, comment=c, testcase=testcase))
+        self.db.flush()
+
+        j = u._to_json(u)
+
+        self.assertEqual(j, _reflected_json(u))
+        self.assertEqual(j['bugs'][0]['feedback'][0]['comment']['user']['name'], c.user.name)
+        self.assertEqual(model.Comment._to_json(c), _reflected_json(c))
+
     def test_grid_columns(self):
         """Assert correct return value from the grid_columns() method."""
         self.assertEqual(model.Build.grid_columns(), ['nvr', 'release_id', 'signed',
@@ -181,6 +289,386 @@ class TestBodhiBase(BaseTestCase):
             model.Update.find_polymorphic_child("whatever")
 
 
+class TestLoaderOptions(BaseTestCase):
+    """Test the BodhiBase.loader_options() method."""
+
+    def test_nested_paths(self):
+        """Dotted paths should set how the relationships of related objects are loaded."""
+        profiles = {'p': {'builds': 'selectin', 'builds.package': 'joined', 'builds.update': 'none',
+                          'comments': 'none'}}
+        self.db.expunge_all()
+
+        with mock.patch.object(model.Update, '__loader_profiles__', profiles):
+            update = self.db.query(model.Update).options(*model.Update.loader_options('p')).one()
+
+        self.assertNotIn('comments', update.__dict__)
+        self.assertIn('builds', update.__dict__)
+        self.assertIn('package', update.builds[0].__dict__)
+        self.assertNotIn('update', update.builds[0].__dict__)
+
+    def test_fields(self):
+        """Relationships that the given fields are not made of should not be loaded."""
+        self.db.expunge_all()
+
+        options = model.Update.loader_options('list', fields=['alias', 'content_type'])
+        update = self.db.query(model.Update).options(*options).one()
+
+        self.assertIn('builds', update.__dict__)
+        for name in ('comments', 'bugs', 'user', 'release'):
+            self.assertNotIn(name, update.__dict__)
+
+    def test_unknown_profile(self):
+        """A KeyError should be raised for profiles the model does not have."""
+        with self.assertRaises(KeyError):
+            model.Update.loader_options('nope')
+
+    def test_profiles_apply(self):
+        """Every profile of the models should be usable in a query."""
+        for cls in (model.Update, model.User):
+            for profile in cls.__loader_profiles__:
+                self.assertTrue(self.db.query(cls).options(*cls.loader_options(profile)).all())
+
+    def test_profiles_apply_subqueryload(self):
+        """Profiles should also work where "selectin" relationships are loaded with subqueries."""
+        self.db.expunge_all()
+
+        with mock.patch.dict(model.BodhiBase._loaders, {'selectin': 'subqueryload'}):
+            update = self.db.query(model.Update).options(
+                *model.Update.loader_options('detail')).one()
+
+        self.assertIn('bugs', update.__dict__)
+        self.assertIn('comments', update.__dict__)
+
+    def test_get_with_profile(self):
+        """get() should apply the loader options of the given profile."""
+        self.db.expunge_all()
+
+        update = model.Update.get(u'bodhi-2.0-1.fc17', self.db, profile='feed')
+
+        self.assertNotIn('comments', update.__dict__)
+        self.assertIn('builds', update.__dict__)
+
+
+class TestUpdateSearch(BaseTestCase):
+    """Test the search text of updates, and the Update.search() method."""
+
+    def test_search_text(self):
+        """The search text should hold the searchable text of the update."""
+        update = model.Update.query.one()
+
+        self.assertEqual(update.search_text,
+                         u'bodhi-2.0-1.fc17\n%s\nUseful details!\nbodhi' % update.alias)
+
+    def test_notes_changed(self):
+        """The search text should follow the notes of the update."""
+        update = model.Update.query.one()
+
+        update.notes = u'Fixes the frobnicator'
+        self.db.flush()
+
+        self.assertIn(u'Fixes the frobnicator', update.search_text)
+        self.assertNotIn(u'Useful details!', update.search_text)
+
+    def test_bug_title_changed(self):
+        """The search text should follow the titles of the bugs of the update."""
+        update = model.Update.query.one()
+
+        update.bugs[0].title = u'Segfault in the frobnicator'
+        self.db.flush()
+
+        self.assertIn(u'Segfault in the frobnicator', update.search_text)
+
+    def test_unrelated_change(self):
+        """Changes to other attributes should not rebuild the search text."""
+        update = model.Update.query.one()
+        update.search_text = u'stale'
+        self.db.flush()
+
+        update.locked = True
+        self.db.flush()
+
+        self.assertEqual(update.search_text, u'stale')
+
+    def test_search(self):
+        """Updates should be matched by any part of their search text, case insensitively."""
+        for term in (u'Bodh', u'DETAILS', u'bodhi-2.0'):
+            query, rank = model.Update.search(self.db.query(model.Update), term)
+
+            self.assertEqual([u.title for u in query], [u'bodhi-2.0-1.fc17'])
+            self.assertIsNone(rank)
+
+        self.assertEqual(model.Update.search(self.db.query(model.Update), u'wat')[0].count(), 0)
+
+    def test_search_postgresql(self):
+        """On PostgreSQL, the full text search index should be used, and results ranked."""
+        query = self.db.query(model.Update.id)
+
+        with mock.patch.object(self.db.get_bind().dialect, 'name', 'postgresql'):
+            query, rank = model.Update.search(query, u'frobnicator crash')
+
+        sql = str(query.order_by(rank.desc()).statement.compile(dialect=postgresql.dialect()))
+        self.assertIn(u'to_tsvector(%(to_tsvector_1)s, updates.search_text) @@ '
+                      u'plainto_tsquery(%(plainto_tsquery_1)s, %(plainto_tsquery_2)s)', sql)
+        self.assertIn(u'updates.search_text ILIKE %(search_text_1)s', sql)
+        self.assertIn(u'ORDER BY ts_rank(', sql)
+
+
+class TestUpdateMetric(BaseTestCase):
+    """Test the UpdateMetric model, and how it is maintained."""
+
+    def metrics(self):
+        """Return the metrics as (release name, type, status, count) tuples, in order."""
+        return sorted((metric.release.name, metric.type.value, metric.status.value, metric.count)
+                      for metric in model.UpdateMetric.query)
+
+    def test_new_updates(self):
+        """New updates should be counted as pending on the day they are created."""
+        self.create_update([u'bodhi-2.0.1-1.fc17'])
+        self.create_update([u'bodhi-2.0.2-1.fc17'])
+        self.db.flush()
+
+        self.assertEqual(self.metrics(), [(u'F17', 'bugfix', 'pending', 3)])
+        self.assertEqual(model.UpdateMetric.query.first().date, datetime.utcnow().date())
+
+    def test_status_change(self):
+        """Updates should be counted in the statuses they enter."""
+        update = model.Update.query.one()
+
+        update.status = model.UpdateStatus.testing
+        self.db.flush()
+        update.status = model.UpdateStatus.stable
+        self.db.flush()
+        update.notes = u'Other notes'
+        self.db.flush()
+
+        self.assertEqual(self.metrics(), [(u'F17', 'bugfix', 'pending', 1),
+                                          (u'F17', 'bugfix', 'stable', 1),
+                                          (u'F17', 'bugfix', 'testing', 1)])
+
+    def test_increment(self):
+        """increment() should add to the existing count, or create it."""
+        release = model.Release.query.one()
+        today = datetime.utcnow().date()
+
+        model.UpdateMetric.increment(self.db, release, model.UpdateType.security,
+                                     model.UpdateStatus.stable, today, 2)
+        self.db.flush()
+        model.UpdateMetric.increment(self.db, release, model.UpdateType.security,
+                                     model.UpdateStatus.stable, today)
+        self.db.flush()
+
+        self.assertIn((u'F17', 'security', 'stable', 3), self.metrics())
+
+    def test_increment_postgresql(self):
+        """increment() should create or update the row in one statement on PostgreSQL."""
+        release = model.Release.query.one()
+        session = mock.MagicMock()
+        session.get_bind.return_value.dialect.name = 'postgresql'
+
+        model.UpdateMetric.increment(session, release, model.UpdateType.security,
+                                     model.UpdateStatus.stable, date(2017, 9, 1), 2)
+
+        self.assertEqual(session.add.call_count, 0)
+        statement = str(session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        self.assertIn(
+            'ON CONFLICT (date, release_id, status, type) DO UPDATE SET count = '
+            '(update_metrics.count + excluded.count)', statement)
+
+
+class TestUserActivity(BaseTestCase):
+    """Test the UserActivity model, and how it is maintained."""
+
+    def activity(self):
+        """Return the activity as (user name, comments, karma +, karma -) tuples, in order."""
+        return sorted((a.user.name, a.comments, a.karma_positive, a.karma_negative)
+                      for a in model.UserActivity.query)
+
+    def test_comments(self):
+        """New comments should be counted on the day they are written, with their karma."""
+        update = model.Update.query.one()
+
+        update.comment(self.db, u'Works', karma=1, author=u'tester')
+        update.comment(self.db, u'Broken', karma=-1, author=u'tester')
+        update.comment(self.db, u'Still broken', karma=-1, author=u'tester')
+        update.comment(self.db, u'Hmm', author=u'other')
+        self.db.flush()
+
+        self.assertEqual(self.activity(), [(u'anonymous', 1, 0, 0), (u'guest', 1, 1, 0),
+                                           (u'other', 1, 0, 0), (u'tester', 3, 1, -2)])
+        self.assertEqual(
+            set(a.date for a in model.UserActivity.query), set([datetime.utcnow().date()]))
+
+    def test_timestamp(self):
+        """Comments should be counted on the day of their timestamp."""
+        comment = model.Comment(text=u'Old news', timestamp=datetime(2017, 1, 2, 3, 4),
+                                user=model.User.query.filter_by(name=u'guest').one())
+        self.db.add(comment)
+        self.db.flush()
+
+        activity = model.UserActivity.query.filter_by(date=date(2017, 1, 2)).one()
+        self.assertEqual((activity.user.name, activity.comments), (u'guest', 1))
+
+    def test_increment(self):
+        """increment() should add to the existing counts, or create them."""
+        user = model.User.query.filter_by(name=u'guest').one()
+        today = datetime.utcnow().date()
+
+        model.UserActivity.increment(self.db, user, today, 2, 1, -1)
+        self.db.flush()
+
+        self.assertIn((u'guest', 3, 2, -1), self.activity())
+
+    def test_increment_postgresql(self):
+        """increment() should create or update the row in one statement on PostgreSQL."""
+        user = model.User.query.filter_by(name=u'guest').one()
+        session = mock.MagicMock()
+        session.get_bind.return_value.dialect.name = 'postgresql'
+
+        model.UserActivity.increment(session, user, date(2017, 9, 1), 2, 1, -1)
+
+        self.assertEqual(session.add.call_count, 0)
+        statement = str(session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        self.assertIn('ON CONFLICT (date, user_id) DO UPDATE SET', statement)
+        for name in ('comments', 'karma_positive', 'karma_negative'):
+            self.assertIn('%s = (user_activity.%s + excluded.%s)' % (name, name, name), statement)
+
+
+class TestUserUpdateCount(BaseTestCase):
+    """Test the UserUpdateCount model, and how it is maintained."""
+
+    def counts(self):
+        """Return the counts as (user name, status, count) tuples, in order."""
+        return sorted((c.user.name, c.status.value, c.count) for c in model.UserUpdateCount.query)
+
+    def test_new_updates(self):
+        """New updates should be counted as pending."""
+        self.create_update([u'bodhi-2.0.1-1.fc17'])
+        self.db.flush()
+
+        self.assertEqual(self.counts(), [(u'guest', 'pending', 2)])
+
+    def test_status_change(self):
+        """Updates should be moved from their old status to their new one."""
+        update = model.Update.query.one()
+
+        update.status = model.UpdateStatus.testing
+        self.db.flush()
+        update.status = model.UpdateStatus.stable
+        self.db.flush()
+        update.notes = u'Other notes'
+        self.db.flush()
+
+        self.assertEqual(self.counts(), [(u'guest', 'pending', 0), (u'guest', 'stable', 1),
+                                         (u'guest', 'testing', 0)])
+
+    def test_deleted_update(self):
+        """Deleted updates should not be counted anymore."""
+        update = self.create_update([u'bodhi-2.0.1-1.fc17'])
+        self.db.flush()
+
+        self.db.delete(update)
+        self.db.flush()
+
+        self.assertEqual(self.counts(), [(u'guest', 'pending', 1)])
+
+    def test_increment_postgresql(self):
+        """increment() should create or update the row in one statement on PostgreSQL."""
+        user = model.User.query.filter_by(name=u'guest').one()
+        session = mock.MagicMock()
+        session.get_bind.return_value.dialect.name = 'postgresql'
+
+        model.UserUpdateCount.increment(session, user, model.UpdateStatus.testing, -1)
+
+        self.assertEqual(session.add.call_count, 0)
+        statement = str(session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        self.assertIn(
+            'ON CONFLICT (status, user_id) DO UPDATE SET count = '
+            '(user_update_counts.count + excluded.count)', statement)
+
+
+class TestUpdateVersion(BaseTestCase):
+    """Test how the version of updates is maintained."""
+
+    def version(self):
+        """Return the version of the update, from the database."""
+        return self.db.query(model.Update.version).scalar()
+
+    def test_new_update(self):
+        """New updates should start at version 1."""
+        self.assertEqual(self.version(), 1)
+
+    def test_update_changes(self):
+        """Changing an update should increment its version, once per flush."""
+        update = model.Update.query.one()
+
+        update.notes = u'Other notes'
+        update.status = model.UpdateStatus.testing
+        self.db.flush()
+
+        self.assertEqual(self.version(), 2)
+
+    def test_related_changes(self):
+        """Changing the builds, comments or bugs of an update should increment its version."""
+        update = model.Update.query.one()
+
+        update.builds[0].signed = True
+        self.db.flush()
+        update.comment(self.db, u'Works for me', author=u'tester')
+        self.db.flush()
+        update.bugs[0].title = u'Other title'
+        self.db.flush()
+
+        self.assertEqual(self.version(), 4)
+
+    def test_no_changes(self):
+        """Setting attributes to their current values should not increment the version."""
+        update = model.Update.query.one()
+
+        update.notes = update.notes
+        self.db.flush()
+
+        self.assertEqual(self.version(), 1)
+
+    def test_date_changed(self):
+        """The date the update changed should be set along with its version."""
+        update = model.Update.query.one()
+        self.db.execute(model.Update.__table__.update().values(date_changed=datetime(2017, 1, 1)))
+        self.db.expire_all()
+
+        update.comment(self.db, u'Works for me', author=u'tester')
+        self.db.flush()
+
+        self.assertGreater(self.db.query(model.Update.date_changed).scalar(),
+                           datetime.utcnow() - timedelta(minutes=1))
+
+
+class TestJSONSerializer(BaseTestCase):
+    """Test the JSONSerializer class."""
+
+    def test_get_same_serializer(self):
+        """get() should return the same serializer for the same class and path."""
+        serializer = model.JSONSerializer.get(model.Build, [model.Update])
+
+        self.assertIs(model.JSONSerializer.get(model.Build, (model.Update,)), serializer)
+        self.assertIsNot(model.JSONSerializer.get(model.Build), serializer)
+
+    def test_fields(self):
+        """The serializer should list the fields it produces."""
+        serializer = model.JSONSerializer.get(model.RpmBuild, [model.Update])
+
+        self.assertEqual(sorted(serializer.columns),
+                         ['ci_url', 'epoch', 'nvr', 'release_id', 'signed', 'type'])
+        self.assertEqual(serializer.relationships, [])
+        self.assertEqual(serializer.converted, ['type'])
+
+    def test_seen_relationships_skipped(self):
+        """Relationships leading back to a class in seen should not be listed."""
+        serializer = model.JSONSerializer.get(model.Comment, [model.Update])
+
+        self.assertNotIn('update', serializer.relationships)
+        self.assertIn('update', model.JSONSerializer.get(model.Comment).relationships)
+
+
 class TestQueryProperty(BaseTestCase):
 
     def test_session(self):
@@ -366,6 +854,124 @@ class TestRelease(ModelTest):
         assert releases is model.Release.all_releases(self.db)
 
 
+class TestReleaseRegistry(BaseTestCase):
+    """Tests for the ReleaseRegistry class."""
+
+    def test_get(self):
+        """Releases can be looked up by name, tag and dist tag without touching the database."""
+        model.Release.registry.snapshot(self.db)
+        session = mock.MagicMock()
+
+        self.assertEqual(model.Release.registry.get(session, name=u'F17')['long_name'],
+                         u'Fedora 17')
+        self.assertEqual(model.Release.registry.get(session, tag=u'f17-updates')['name'], u'F17')
+        self.assertEqual(model.Release.registry.get(session, dist_tag=u'f17')['name'], u'F17')
+        self.assertIsNone(model.Release.registry.get(session, name=u'F18'))
+        self.assertIsNone(model.Release.registry.get(session, tag=u'f18-updates'))
+        self.assertEqual(session.query.call_count, 0)
+
+    def test_get_tags(self):
+        """get_tags() should map tag types to tags, and tags to releases."""
+        tag_types, tag_releases = model.Release.get_tags(self.db)
+
+        self.assertEqual(tag_types['candidate'], [u'f17-updates-candidate'])
+        self.assertEqual(tag_types['pending_stable'], [u'f17-updates-pending'])
+        self.assertEqual(tag_releases[u'f17-override'], u'F17')
+
+    def test_from_tags(self):
+        """from_tags() should return the release of the first tag."""
+        release = model.Release.from_tags([u'f17-updates-testing', u'f18'], self.db)
+
+        self.assertIs(release, model.Release.query.filter_by(name=u'F17').one())
+
+    def test_from_tags_unknown_tag(self):
+        """from_tags() should raise a KeyError for tags that do not belong to any release."""
+        self.assertRaises(KeyError, model.Release.from_tags, [u'f18'], self.db)
+
+    def test_edit_refreshes_snapshot(self):
+        """Editing a release should bump the version and refresh the snapshot immediately."""
+        snapshot = model.Release.registry.snapshot(self.db)
+        release = model.Release.query.filter_by(name=u'F17').one()
+
+        release.long_name = u'Fedora Seventeen'
+        self.db.flush()
+
+        new_snapshot = model.Release.registry.snapshot(self.db)
+        self.assertEqual(new_snapshot.version, snapshot.version + 1)
+        self.assertEqual(new_snapshot.by_name[u'F17']['long_name'], u'Fedora Seventeen')
+
+    def test_uncommitted_edit_not_cached(self):
+        """Snapshots of releases that are not committed should not be seen by other sessions."""
+        snapshot = model.Release.registry.snapshot(self.db)
+        release = model.Release.query.filter_by(name=u'F17').one()
+        release.long_name = u'Fedora Seventeen'
+        self.db.flush()
+        self.assertEqual(
+            model.Release.registry.snapshot(self.db).by_name[u'F17']['long_name'],
+            u'Fedora Seventeen')
+
+        self.db.rollback()
+
+        with mock.patch.dict(config, {'release_registry.check_interval': 3600}):
+            self.assertIs(model.Release.registry.snapshot(self.db), snapshot)
+        self.assertEqual(snapshot.by_name[u'F17']['long_name'], u'Fedora 17')
+
+    def test_commit_clears_snapshot(self):
+        """Committing a change to the releases should refresh the snapshot of the process."""
+        snapshot = model.Release.registry.snapshot(self.db)
+        model.Release.query.filter_by(name=u'F17').one().long_name = u'Fedora Seventeen'
+        self.db.commit()
+
+        with mock.patch.dict(config, {'release_registry.check_interval': 3600}):
+            new_snapshot = model.Release.registry.snapshot(self.db)
+
+        self.assertEqual(new_snapshot.version, snapshot.version + 1)
+        self.assertEqual(new_snapshot.by_name[u'F17']['long_name'], u'Fedora Seventeen')
+
+    def test_new_release(self):
+        """Creating a release should make it visible in the snapshot."""
+        model.Release.registry.snapshot(self.db)
+        release = model.Release(
+            name=u'F18', long_name=u'Fedora 18', id_prefix=u'FEDORA', version=u'18',
+            branch=u'f18', dist_tag=u'f18', stable_tag=u'f18-updates',
+            testing_tag=u'f18-updates-testing', candidate_tag=u'f18-updates-candidate',
+            pending_signing_tag=u'f18-updates-testing-signing',
+            pending_testing_tag=u'f18-updates-testing-pending',
+            pending_stable_tag=u'f18-updates-pending', override_tag=u'f18-override')
+        self.db.add(release)
+        self.db.flush()
+
+        self.assertIs(model.Release.from_tags([u'f18-override'], self.db), release)
+        self.assertEqual([r['name'] for r in model.Release.all_releases(self.db)['disabled']],
+                         [u'F18'])
+
+    def test_adding_builds_does_not_bump_version(self):
+        """Changes to the builds of a release are not part of the registry."""
+        version = model.ReleaseRegistryVersion.current(self.db)
+        release = model.Release.query.filter_by(name=u'F17').one()
+        package = model.RpmPackage.query.first()
+
+        self.db.add(model.RpmBuild(nvr=u'bodhi-3.0-1.fc17', package=package, release=release))
+        self.db.flush()
+
+        self.assertEqual(model.ReleaseRegistryVersion.current(self.db), version)
+
+    def test_change_from_another_process(self):
+        """The snapshot should be refreshed once another process bumps the version."""
+        snapshot = model.Release.registry.snapshot(self.db)
+        # Another process would not clear our registry, so bump the version behind its back.
+        self.db.query(model.ReleaseRegistryVersion).update(
+            {'version': model.ReleaseRegistryVersion.version + 1})
+
+        with mock.patch.dict(config, {'release_registry.check_interval': 3600}):
+            self.assertIs(model.Release.registry.snapshot(self.db), snapshot)
+        with mock.patch.dict(config, {'release_registry.check_interval': 0}):
+            new_snapshot = model.Release.registry.snapshot(self.db)
+
+        self.assertEqual(new_snapshot.version, snapshot.version + 1)
+        self.assertIsNot(new_snapshot, snapshot)
+
+
 class MockWiki(object):
     """ Mocked simplemediawiki.MediaWiki class. """
     def __init__(self, response):
@@ -1549,6 +2155,64 @@ class TestUpdate(ModelTest):
 
         self.assertEqual(self.obj._composite_karma, (2, -1))
 
+    def test_karma_aggregates_stored(self):
+        """Assert that the karma aggregates are stored on the update as comments are added."""
+        self.obj.comment(self.db, u"foo", -1, u'foo')
+        self.obj.comment(self.db, u"bar", 1, u'bar')
+        self.obj.comment(self.db, u"changed my mind", 1, u'foo')
+        self.db.expire(self.obj)
+
+        self.assertEqual(self.obj.karma_positive, 2)
+        self.assertEqual(self.obj.karma_negative, 0)
+        self.assertEqual(self.obj.karma_by_user, {u'bar': 1, u'foo': 1})
+        self.assertIsNone(self.obj.date_karma_reset)
+
+    def test_karma_aggregates_reset(self):
+        """Assert that a karma reset event clears the stored aggregates."""
+        self.obj.comment(self.db, u"foo", -1, u'foo')
+        self.obj.comment(self.db, u"New build", 0, u'bodhi')
+
+        self.assertEqual(self.obj._composite_karma, (0, 0))
+        self.assertEqual(self.obj.karma_by_user, {})
+        self.assertIsNotNone(self.obj.date_karma_reset)
+
+    def test_karma_does_not_read_comments(self):
+        """Assert that the karma does not depend on the comments once it is stored."""
+        self.obj.comment(self.db, u"foo", 1, u'foo')
+
+        with mock.patch.object(model.Update, 'comments_since_karma_reset',
+                               new_callable=mock.PropertyMock) as comments:
+            self.assertEqual(self.obj.karma, 1)
+
+        self.assertEqual(comments.call_count, 0)
+
+    def test_check_karma_aggregates(self):
+        """Assert that check_karma_aggregates() detects and fixes inconsistent aggregates."""
+        self.obj.comment(self.db, u"foo", 1, u'foo')
+        self.obj.comment(self.db, u"bar", -1, u'bar')
+        self.assertTrue(self.obj.check_karma_aggregates())
+
+        self.obj.karma_positive = 5
+        self.assertFalse(self.obj.check_karma_aggregates())
+        self.assertEqual(self.obj.karma_positive, 5)
+
+        self.assertFalse(self.obj.check_karma_aggregates(fix=True))
+        self.assertEqual(self.obj._composite_karma, (1, -1))
+        self.assertTrue(self.obj.check_karma_aggregates())
+
+    def test_check_karma_aggregates_date_karma_reset(self):
+        """Assert that check_karma_aggregates() repairs the date of the last karma reset."""
+        self.obj.comment(self.db, u"foo", 1, u'foo')
+        self.obj.comment(self.db, u"New build", 0, u'bodhi')
+        reset = self.obj.date_karma_reset
+        self.assertIsNotNone(reset)
+
+        self.obj.date_karma_reset = None
+        self.assertFalse(self.obj.check_karma_aggregates(fix=True))
+
+        self.assertEqual(self.obj.date_karma_reset, reset)
+        self.assertTrue(self.obj.check_karma_aggregates())
+
     def test__composite_karma_no_comments(self):
         """Assert _composite_karma with no comments is (0, 0)."""
         self.assertEqual(self.obj._composite_karma, (0, 0))
@@ -1983,7 +2647,7 @@ class TestUpdate(ModelTest):
 
         update.send_update_notice()
 
-        get_template.assert_called_with(update, u'fedora_errata_template')
+        get_template.assert_called_with(update, u'fedora_errata_template', facts=None)
 
     @mock.patch('bodhi.server.mail.get_template')
     def test_send_update_notice_message_template_el7(self, get_template):
@@ -2001,7 +2665,7 @@ class TestUpdate(ModelTest):
 
         update.send_update_notice()
 
-        get_template.assert_called_with(update, u'fedora_epel_legacy_errata_template')
+        get_template.assert_called_with(update, u'fedora_epel_legacy_errata_template', facts=None)
 
     @mock.patch('bodhi.server.mail.get_template')
     def test_send_update_notice_message_template_el8(self, get_template):
@@ -2019,7 +2683,7 @@ class TestUpdate(ModelTest):
 
         update.send_update_notice()
 
-        get_template.assert_called_with(update, u'fedora_epel_errata_template')
+        get_template.assert_called_with(update, u'fedora_epel_errata_template', facts=None)
 
     def test_check_requirements_empty(self):
         '''Empty requirements are OK'''
@@ -17,13 +17,17 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 import copy
+import json
 import re
 import StringIO
+import unittest
 
 from webtest import TestApp
+import mock
 import PIL.Image
 
-from bodhi.server import main
+from bodhi.server import main, renderers, util
+from bodhi.server.models import Update
 from bodhi.tests.server import base
 
 
@@ -59,3 +63,88 @@ class TestRenderers(base.BaseTestCase):
         jpegdata = StringIO.StringIO(resp.body)
         img = PIL.Image.open(jpegdata)
         self.assertEqual(img.size, (300, 80))
+
+
+class TestBuffer(unittest.TestCase):
+    """Test the _buffer() function."""
+
+    def test_buffer(self):
+        """Chunks should be joined until they are at least size bytes long."""
+        chunks = list(renderers._buffer(['a', 'bc', 'd', 'efgh', 'i'], size=3))
+
+        self.assertEqual(chunks, ['abc', 'defgh', 'i'])
+
+    def test_empty(self):
+        """Nothing should be yielded without chunks."""
+        self.assertEqual(list(renderers._buffer([])), [])
+
+
+class TestJSONStream(base.BaseTestCase):
+    """Test the json_stream renderer."""
+
+    def test_same_as_json(self):
+        """It should encode what the json renderer would, streams included."""
+        for i in range(3):
+            self.create_update([u'stream{}-1.0-1.fc17'.format(i)])
+        self.db.flush()
+        request = mock.MagicMock()
+        query = self.db.query(Update).order_by(Update.id)
+        value = {'updates': util.QueryStream(request, query, [Update.id], False, 10, batch_size=2),
+                 'page': 1, 'text': u'caf\xe9'}
+        render = renderers.json_stream(None)
+
+        body = ''.join(render(value, {'request': None}))
+
+        self.assertEqual(
+            json.loads(body),
+            json.loads(json.dumps({'updates': [u.__json__() for u in query],
+                                   'page': 1, 'text': u'caf\xe9'})))
+
+    def test_not_serializable(self):
+        """Objects without a __json__() method should raise a TypeError."""
+        render = renderers.json_stream(None)
+
+        self.assertRaises(TypeError, ''.join, render({'a': object()}, {'request': None}))
+
+
+class TestNDJSON(unittest.TestCase):
+    """Test the ndjson renderer."""
+
+    def test_render(self):
+        """Each item should be written on a line of its own."""
+        request = mock.MagicMock()
+        request.response.content_type = request.response.default_content_type
+        item = mock.MagicMock()
+        item.__json__ = mock.MagicMock(return_value={'b': 2})
+        render = renderers.ndjson(None)
+
+        body = ''.join(render(iter([{'a': 1}, item]), {'request': request}))
+
+        self.assertEqual(body, '{"a": 1}\n{"b": 2}\n')
+        item.__json__.assert_called_once_with(request)
+        self.assertEqual(request.response.content_type, 'application/x-ndjson')
+
+    def test_empty(self):
+        """Nothing should be written without items."""
+        render = renderers.ndjson(None)
+
+        self.assertEqual(''.join(render([], {'request': None})), '')
+
+
+class TestRSS(base.BaseTestCase):
+    """Test the rss renderer."""
+
+    def test_updates_order(self):
+        """The items of the feed should be in the same order as the updates."""
+        for i in range(3):
+            self.create_update([u'rss{}-1.0-1.fc17'.format(i)])
+        self.db.commit()
+
+        res = self.app.get('/rss/updates/?rows_per_page=2',
+                           headers={'Accept': 'application/atom+xml'})
+
+        updates = self.app.get('/updates/?rows_per_page=2',
+                               headers={'Accept': 'application/json'}).json['updates']
+        titles = re.findall(r'<item><title>([^<]*)</title>', res.body)
+        self.assertEqual(titles, [u['title'] for u in updates])
+        self.assertTrue(res.body.endswith('</channel></rss>'))
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""This test suite contains tests for the bodhi.server.stats module."""
+from datetime import datetime
+
+import mock
+
+from bodhi.server import cache, models, stats
+from bodhi.tests.server.base import BaseTestCase
+
+
+class StatsTestCase(BaseTestCase):
+    """Cache the counts for the duration of each test, starting from an empty cache."""
+    def setUp(self):
+        super(StatsTestCase, self).setUp()
+        region = cache.get_region('stats')
+        patcher = mock.patch.object(region, 'expiration_time', 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        region.invalidate()
+
+
+class TestUpdateCounts(StatsTestCase):
+    """This test class contains tests for the update_counts() function."""
+    def test_counts(self):
+        """The updates should be counted by release, status and type."""
+        update = self.create_update([u'bodhi-2.0.1-1.fc17'])
+        update.type = models.UpdateType.security
+        update.status = models.UpdateStatus.testing
+        self.create_update([u'bodhi-2.0.2-1.fc17'])
+        self.db.commit()
+
+        self.assertEqual(stats.update_counts(self.db),
+                         {u'F17': {'pending': {'bugfix': 2}, 'testing': {'security': 1}}})
+
+    def test_single_query(self):
+        """The counts should be fetched with one query, and then cached."""
+        with self.count_queries() as statements:
+            stats.update_counts(self.db)
+            stats.update_counts(self.db)
+
+        self.assertEqual(len(statements), 1)
+        self.assertIn('GROUP BY', statements[0])
+
+    def test_status_change(self):
+        """The counts should be refreshed when the status of an update changes."""
+        stats.update_counts(self.db)
+
+        models.Update.query.one().status = models.UpdateStatus.stable
+        self.db.commit()
+
+        self.assertEqual(stats.update_counts(self.db), {u'F17': {'stable': {'bugfix': 1}}})
+
+    def test_new_update(self):
+        """The counts should be refreshed when an update is created."""
+        stats.update_counts(self.db)
+
+        self.create_update([u'bodhi-2.0.1-1.fc17'])
+        self.db.commit()
+
+        self.assertEqual(stats.update_counts(self.db), {u'F17': {'pending': {'bugfix': 2}}})
+
+    def test_unrelated_change(self):
+        """The counts should stay cached when nothing they depend on changes."""
+        stats.update_counts(self.db)
+
+        models.Update.query.one().notes = u'Other details'
+        self.db.commit()
+
+        with self.count_queries() as statements:
+            stats.update_counts(self.db)
+        self.assertEqual(statements, [])
+
+
+class TestCountUpdates(StatsTestCase):
+    """This test class contains tests for the count_updates() function."""
+    def setUp(self):
+        super(TestCountUpdates, self).setUp()
+        update = self.create_update([u'bodhi-2.0.1-1.fc17'])
+        update.type = models.UpdateType.security
+        update.status = models.UpdateStatus.testing
+        self.create_update([u'bodhi-2.0.2-1.fc17']).status = models.UpdateStatus.testing
+        self.db.commit()
+
+    def test_all(self):
+        """All the updates of the release should be counted without a status or type."""
+        self.assertEqual(stats.count_updates(self.db, u'F17'), 3)
+
+    def test_status(self):
+        """Only the updates with the given status should be counted."""
+        self.assertEqual(stats.count_updates(self.db, u'F17', models.UpdateStatus.testing), 2)
+        self.assertEqual(stats.count_updates(self.db, u'F17', models.UpdateStatus.stable), 0)
+
+    def test_type(self):
+        """Only the updates of the given type should be counted."""
+        self.assertEqual(
+            stats.count_updates(self.db, u'F17', update_type=models.UpdateType.bugfix), 2)
+
+    def test_status_and_type(self):
+        """Only the updates with the given status and type should be counted."""
+        self.assertEqual(
+            stats.count_updates(self.db, u'F17', models.UpdateStatus.testing,
+                                models.UpdateType.bugfix), 1)
+
+    def test_unknown_release(self):
+        """Releases without updates should have no updates counted."""
+        self.assertEqual(stats.count_updates(self.db, u'F18'), 0)
+
+
+class TestTopTesters(BaseTestCase):
+    """This test class contains tests for the top_testers() function."""
+    def setUp(self):
+        super(TestTopTesters, self).setUp()
+        region = cache.get_region('activity')
+        patcher = mock.patch.object(region, 'expiration_time', 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        region.invalidate()
+
+    def test_top_testers(self):
+        """The users who wrote the most comments should come first."""
+        update = self.db.query(models.Update).one()
+        for author, count in ((u'tester', 3), (u'other', 2)):
+            for i in range(count):
+                update.comment(self.db, u'Comment {}'.format(i), author=author)
+        self.db.commit()
+
+        self.assertEqual(stats.top_testers(self.db, 7, blacklist=[u'anonymous']),
+                         [(u'tester', 3), (u'other', 2), (u'guest', 1)])
+        self.assertEqual(stats.top_testers(self.db, 7, blacklist=[u'anonymous'], limit=1),
+                         [(u'tester', 3)])
+
+    def test_window(self):
+        """Comments written before the window should not be counted."""
+        user = self.db.query(models.User).filter_by(name=u'guest').one()
+        self.db.add(models.Comment(text=u'Old news', timestamp=datetime(2017, 1, 2), user=user))
+        self.db.commit()
+
+        self.assertEqual(stats.top_testers(self.db, 7), [(u'anonymous', 1), (u'guest', 1)])
+
+    def test_cached_until_comment(self):
+        """The top testers should be cached until a comment is added."""
+        with self.count_queries() as statements:
+            stats.top_testers(self.db, 7)
+            stats.top_testers(self.db, 7)
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('FROM comments', statements[0])
+
+        update = self.db.query(models.Update).one()
+        update.comment(self.db, u'Works', author=u'tester')
+        self.db.commit()
+
+        self.assertIn((u'tester', 1), stats.top_testers(self.db, 7))
+
+    def test_cached_until_repeat_comment(self):
+        """Comments by users who already commented that day should invalidate the top testers."""
+        update = self.db.query(models.Update).one()
+        update.comment(self.db, u'Works', author=u'tester')
+        self.db.commit()
+        self.assertIn((u'tester', 1), stats.top_testers(self.db, 7))
+
+        update.comment(self.db, u'Still works', author=u'tester')
+        self.db.commit()
+
+        self.assertIn((u'tester', 2), stats.top_testers(self.db, 7))
+
+
+class TestUserActivity(BaseTestCase):
+    """This test class contains tests for the user_activity() function."""
+    def test_activity(self):
+        """The comments, karma and updates of the user should be counted."""
+        user = self.db.query(models.User).filter_by(name=u'guest').one()
+        self.db.add(models.Comment(text=u'Old news', timestamp=datetime(2017, 1, 2), karma=-1,
+                                   user=user))
+        self.create_update([u'bodhi-2.0.1-1.fc17']).status = models.UpdateStatus.testing
+        self.db.flush()
+
+        activity = stats.user_activity(self.db, user, 7)
+
+        self.assertEqual(
+            activity,
+            {'comments': 2, 'karma_positive': 1, 'karma_negative': -1, 'days': 7,
+             'comments_per_day': {datetime.utcnow().strftime('%Y-%m-%d'): 1},
+             'updates': {'pending': 1, 'testing': 1}})
+
+    def test_no_activity(self):
+        """Users who did nothing should have nothing counted."""
+        user = models.User(name=u'lurker')
+        self.db.add(user)
+        self.db.flush()
+
+        self.assertEqual(
+            stats.user_activity(self.db, user, 7),
+            {'comments': 0, 'karma_positive': 0, 'karma_negative': 0, 'days': 7,
+             'comments_per_day': {}, 'updates': {}})
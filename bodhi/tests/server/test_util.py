@@ -16,7 +16,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+import datetime
 import subprocess
+import threading
+import time
+import unittest
 
 import mock
 import pkgdb2client
@@ -158,6 +162,9 @@ class TestUtils(base.BaseTestCase):
 
     def setUp(self):
         setup_buildsystem({'buildsystem': 'dev'})
+        util.pagure_api_get.invalidate()
+        util.pdc_api_get.invalidate()
+        util._render_markdown.invalidate()
 
     def tearDown(self):
         teardown_buildsystem()
@@ -600,7 +607,7 @@ class TestUtils(base.BaseTestCase):
         ), html
 
     @mock.patch('bodhi.server.util.bleach.clean', return_value='cleaned text')
-    @mock.patch.object(util.bleach, '__version__', u'1.4.3')
+    @mock.patch.object(util, 'MARKDOWN_ATTRIBUTES', util._bleach_attributes(u'1.4.3'))
     def test_markup_with_bleach_1(self, clean):
         """Use mocking to ensure we correctly use the bleach 1 API."""
         text = '# this is a header\nthis is some **text**'
@@ -619,7 +626,7 @@ class TestUtils(base.BaseTestCase):
                                       attributes=["src", "href", "alt", "title", "class"])
 
     @mock.patch('bodhi.server.util.bleach.clean', return_value='cleaned text')
-    @mock.patch.object(util.bleach, '__version__', u'2.0')
+    @mock.patch.object(util, 'MARKDOWN_ATTRIBUTES', util._bleach_attributes(u'2.0'))
     def test_markup_with_bleach_2(self, clean):
         """Use mocking to ensure we correctly use the bleach 2 API."""
         text = '# this is a header\nthis is some **text**'
@@ -639,6 +646,60 @@ class TestUtils(base.BaseTestCase):
         clean.assert_called_once_with(expected_text, tags=expected_tags,
                                       attributes=expected_attributes)
 
+    @mock.patch('bodhi.server.util.markdown.markdown', wraps=util.markdown.markdown)
+    def test_markup_cached(self, markdown):
+        """The HTML rendered from the same text should be cached."""
+        text = u'this is some **text**'
+        hits = util._render_markdown.stats()['hits']
+
+        html = util.markup(None, text)
+
+        self.assertEqual(util.markup(None, text), html)
+        self.assertEqual(markdown.call_count, 1)
+        self.assertEqual(util._render_markdown.stats()['hits'] - hits, 1)
+        self.assertEqual(util.markup(None, u'other **text**'),
+                         '<div class="markdown"><p>other <strong>text</strong></p></div>')
+        self.assertEqual(markdown.call_count, 2)
+
+    @mock.patch('bodhi.server.util.markdown.markdown', wraps=util.markdown.markdown)
+    def test_markup_cached_by_version(self, markdown):
+        """The HTML cached by another version of the markdown rendering should not be reused."""
+        text = u'this is some **text**'
+        util.markup(None, text)
+
+        with mock.patch.object(util, '_MARKDOWN_CONFIG', (util.MARKDOWN_VERSION + 1,)):
+            util.markup(None, text)
+
+        self.assertEqual(markdown.call_count, 2)
+
+    @mock.patch('bodhi.server.util.markdown.markdown', wraps=util.markdown.markdown)
+    @mock.patch('bodhi.server.util.get_current_request')
+    def test_markup_cached_by_application_url(self, get_current_request, markdown):
+        """Mentions link to the URL Bodhi is served at, so it should be part of the cache key."""
+        text = u'thanks @guest'
+        get_current_request.return_value.route_url.side_effect = (
+            lambda route, name: '%s/users/%s' % (get_current_request.return_value.application_url,
+                                                 name))
+
+        with mock.patch('bodhi.server.ffmarkdown.pyramid.threadlocal.get_current_request',
+                        get_current_request):
+            get_current_request.return_value.application_url = 'https://bodhi.example.com'
+            first = util.markup(None, text)
+            get_current_request.return_value.application_url = 'https://bodhi.example.org'
+            second = util.markup(None, text)
+
+        self.assertIn('https://bodhi.example.com/users/guest', first)
+        self.assertIn('https://bodhi.example.org/users/guest', second)
+        self.assertEqual(markdown.call_count, 2)
+
+    def test_bleach_attributes(self):
+        """Bleach 1 whitelists attributes for every tag, bleach 2 for each tag."""
+        self.assertEqual(util._bleach_attributes(u'1.4.3'),
+                         ["src", "href", "alt", "title", "class"])
+        self.assertEqual(
+            util._bleach_attributes(u'2.1.4'),
+            {"img": ["src", "alt", "title"], "a": ["href", "alt", "title"], "div": ["class"]})
+
     def test_rpm_header(self):
         h = util.get_rpm_header('libseccomp')
         assert h['name'] == 'libseccomp', h
@@ -772,6 +833,294 @@ class TestUtils(base.BaseTestCase):
         self.assertIn('Too many result pages, aborting at', log_debug.call_args[0][0])
 
 
+class TestCursors(unittest.TestCase):
+    """Test the encode_cursor(), decode_cursor() and after_url() functions."""
+
+    def test_round_trip(self):
+        """Decoding a cursor should give back the values it was made from."""
+        values = [datetime.datetime(2017, 10, 3, 12, 30, 1, 42), 1234]
+
+        cursor = util.encode_cursor(values)
+
+        self.assertEqual(util.decode_cursor(cursor), values)
+        self.assertEqual(util.decode_cursor(unicode(cursor)), values)
+        self.assertNotIn('=', cursor)
+
+    def test_round_trip_none(self):
+        """Cursors should keep the NULL values of the rows they point after."""
+        self.assertEqual(util.decode_cursor(util.encode_cursor([None, 1234])), [None, 1234])
+
+    def test_decode_invalid(self):
+        """Decoding something that is not a cursor should raise a ValueError."""
+        for cursor in (u'wat', u'\u2603', util.encode_cursor([]), 'bnVsbA',
+                       util.encode_cursor([1.5]), util.encode_cursor(['yesterday'])):
+            self.assertRaises(ValueError, util.decode_cursor, cursor)
+
+    def test_after_url(self):
+        """after_url() should replace the page with the cursor."""
+        request = mock.MagicMock()
+        request.params = {'page': '2', 'packages': 'bodhi'}
+        request.path_url = 'http://localhost/updates/'
+
+        url = util.after_url({'request': request}, 'abc')
+
+        self.assertEqual(
+            sorted(url.split('?')[1].split('&')), ['after=abc', 'packages=bodhi'])
+
+    def test_page_url_drops_cursor(self):
+        """page_url() should drop the cursor, since it selects the page instead."""
+        request = mock.MagicMock()
+        request.params = {'after': 'abc'}
+        request.path_url = 'http://localhost/updates/'
+
+        self.assertEqual(util.page_url({'request': request}, 3), 'http://localhost/updates/?page=3')
+
+
+class TestQueryStream(base.BaseTestCase):
+    """Test the QueryStream class and the stream argument of paginate()."""
+
+    def setUp(self):
+        super(TestQueryStream, self).setUp()
+        for i in range(4):
+            self.create_update([u'stream{}-1.0-1.fc17'.format(i)])
+        self.db.flush()
+        self.request = mock.MagicMock()
+        self.request.db = self.db
+        self.keys = [Update.date_submitted, Update.id]
+        self.query = self.db.query(Update).order_by(Update.date_submitted.desc(), Update.id.desc())
+
+    def _finish(self):
+        """Call the finished callbacks registered on the request."""
+        for call in self.request.add_finished_callback.mock_calls:
+            call[1][0](self.request)
+
+    def test_batches(self):
+        """The results should be the same as the query's, loaded batch_size at a time."""
+        expected = [u.title for u in self.query]
+        stream = util.QueryStream(self.request, self.query, self.keys, True, 10, batch_size=2)
+
+        with self.count_queries() as statements:
+            titles = [u.title for u in stream]
+
+        self.assertEqual(titles, expected)
+        # There are 5 updates, so the third batch is the last one.
+        self.assertEqual(len(statements), 3)
+
+    def test_limit(self):
+        """No more than limit results should be loaded, even with an offset."""
+        expected = [u.title for u in self.query.offset(1).limit(2)]
+        stream = util.QueryStream(self.request, self.query.offset(1), self.keys, True, 2,
+                                  batch_size=1)
+
+        self.assertEqual([u.title for u in stream], expected)
+
+    def test_map(self):
+        """map() should return a new stream with the results transformed."""
+        stream = util.QueryStream(self.request, self.query, self.keys, True, 2)
+
+        titles = stream.map(lambda u: u.title)
+
+        self.assertEqual(list(titles), [u.title for u in self.query.limit(2)])
+        self.assertIsInstance(list(stream)[0], Update)
+
+    def test___json__(self):
+        """__json__() should return the results as a list."""
+        stream = util.QueryStream(self.request, self.query, self.keys, True, 2).map(
+            lambda u: u.title)
+
+        self.assertEqual(stream.__json__(self.request), [u.title for u in self.query.limit(2)])
+
+    def test_rollback_after_request(self):
+        """Once the request is finished, the transaction of the batches should be rolled back."""
+        stream = util.QueryStream(self.request, self.query, self.keys, True, 2)
+
+        with mock.patch.object(self.db, 'rollback') as rollback:
+            list(stream)
+            self.assertEqual(rollback.call_count, 0)
+
+            self._finish()
+            list(stream.map(lambda u: u.title))
+
+        self.assertEqual(rollback.call_count, 1)
+
+    def test_paginate_stream(self):
+        """paginate() should return a stream and the same cursor as without streaming."""
+        self.request.validated = {'rows_per_page': 2, 'page': 1, 'after': None, 'count': None}
+
+        streamed = util.paginate(self.request, self.db.query(Update), self.keys, Update.id,
+                                 stream=True)
+        loaded = util.paginate(self.request, self.db.query(Update), self.keys, Update.id)
+
+        self.assertIsInstance(streamed['items'], util.QueryStream)
+        self.assertEqual(list(streamed.pop('items')), loaded.pop('items'))
+        self.assertEqual(streamed, loaded)
+        self.assertIsNotNone(streamed['next_after'])
+
+    def test_paginate_null_dates(self):
+        """Updates without a submission date should come last, and be reached by cursor."""
+        updates = self.query.all()
+        for update in updates[1:3]:
+            update.date_submitted = None
+        self.db.flush()
+        nulls = sorted(updates[1:3], key=lambda u: u.id, reverse=True)
+        expected = [u.title for u in [updates[0]] + updates[3:] + nulls]
+
+        titles = []
+        after = None
+        while True:
+            self.request.validated = {'rows_per_page': 2, 'page': 1, 'after': after,
+                                      'count': False}
+            result = util.paginate(self.request, self.db.query(Update), self.keys, Update.id)
+            titles.extend(u.title for u in result['items'])
+            after = result['next_after'] and util.decode_cursor(result['next_after'])
+            if after is None:
+                break
+
+        self.assertEqual(titles, expected)
+        # Streams seek past NULL dates the same way.
+        stream = util.QueryStream(self.request, self.db.query(Update).order_by(
+            *util._order_by(self.keys, True, 'sqlite')), self.keys, True, None, batch_size=1)
+        self.assertEqual([u.title for u in stream], expected)
+
+    def test_order_by_postgresql(self):
+        """NULL dates should be sorted explicitly on PostgreSQL."""
+        clauses = util._order_by(self.keys, True, 'postgresql')
+
+        self.assertEqual([str(c) for c in clauses],
+                         ['updates.date_submitted DESC NULLS LAST', 'updates.id DESC'])
+        self.assertEqual([str(c) for c in util._order_by(self.keys, False, 'postgresql')],
+                         ['updates.date_submitted ASC NULLS FIRST', 'updates.id ASC'])
+
+    def test_paginate_stream_last_page(self):
+        """There should not be a cursor to the page after the last one."""
+        self.request.validated = {'rows_per_page': 5, 'page': 1, 'after': None, 'count': False}
+
+        result = util.paginate(self.request, self.db.query(Update), self.keys, Update.id,
+                               stream=True)
+
+        self.assertIsNone(result['next_after'])
+        self.assertEqual(len(list(result['items'])), 5)
+
+
+class TestMemoized(unittest.TestCase):
+    """Test the memoized decorator."""
+    def test_bare(self):
+        """Used bare, memoized should cache values forever."""
+        func = mock.MagicMock(side_effect=lambda x: x * 2, __name__='func', __doc__='doc')
+        memo = util.memoized(func)
+
+        self.assertEqual([memo(1), memo(1), memo(2)], [2, 2, 4])
+
+        self.assertEqual(func.mock_calls, [mock.call(1), mock.call(2)])
+        self.assertEqual(memo.stats(),
+                         {'hits': 1, 'misses': 2, 'evictions': 0, 'waits': 0, 'size': 2})
+
+    def test_max_size(self):
+        """The least recently used values should be evicted first."""
+        @util.memoized(max_size=2)
+        def double(x):
+            return x * 2
+
+        double(1)
+        double(2)
+        double(1)
+        double(3)
+
+        self.assertEqual(double._cache.keys(), [(1,), (3,)])
+        self.assertEqual(double.stats()['evictions'], 1)
+
+    @mock.patch('bodhi.server.util.time.time')
+    def test_ttl(self, time):
+        """Values should expire after ttl seconds, and ttl may be a callable."""
+        time.return_value = 100
+        func = mock.MagicMock(return_value='value', __name__='func')
+        memo = util.memoized(ttl=lambda: 10)(func)
+
+        memo('a')
+        time.return_value = 109
+        memo('a')
+        time.return_value = 110
+        memo('a')
+
+        self.assertEqual(func.call_count, 2)
+
+    def test_invalidate(self):
+        """invalidate() should drop one value, or all of them."""
+        func = mock.MagicMock(return_value='value', __name__='func')
+        memo = util.memoized(func)
+        memo('a')
+        memo('b')
+
+        memo.invalidate('a')
+        memo('a')
+        memo('b')
+        self.assertEqual(func.call_count, 3)
+
+        memo.invalidate()
+        memo('b')
+        self.assertEqual(func.call_count, 4)
+
+    def test_key(self):
+        """Values should be cached under the key derived from the arguments, if given."""
+        func = mock.MagicMock(side_effect=lambda text, suffix: text + suffix, __name__='func')
+        memo = util.memoized(func, key=lambda text, suffix: (len(text), suffix))
+
+        self.assertEqual(memo('a', '!'), 'a!')
+        self.assertEqual(memo('b', '!'), 'a!')
+        self.assertEqual(memo('b', '?'), 'b?')
+        self.assertEqual(func.call_count, 2)
+
+        memo.invalidate('c', '!')
+        self.assertEqual(memo('b', '!'), 'b!')
+        self.assertEqual(func.call_count, 3)
+
+    def test_errors_not_cached(self):
+        """Exceptions should be raised to the caller and not be cached."""
+        func = mock.MagicMock(side_effect=[ValueError('boom'), 'value'], __name__='func')
+        memo = util.memoized(func)
+
+        self.assertRaises(ValueError, memo, 'a')
+        self.assertEqual(memo('a'), 'value')
+
+    def test_stampede(self):
+        """Concurrent callers should wait for the value being computed instead of computing it."""
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        @util.memoized
+        def slow(x):
+            calls.append(x)
+            started.set()
+            release.wait()
+            return x
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(slow(1)))
+        first.start()
+        started.wait()
+        second = threading.Thread(target=lambda: results.append(slow(1)))
+        second.start()
+        while not slow.stats()['waits']:
+            time.sleep(0.01)
+        release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(results, [1, 1])
+        self.assertEqual(calls, [1])
+
+    def test_unhashable(self):
+        """Unhashable arguments should not be cached."""
+        func = mock.MagicMock(return_value='value', __name__='func')
+        memo = util.memoized(func)
+
+        memo(['a'])
+        memo(['a'])
+
+        self.assertEqual(func.call_count, 2)
+
+
 class TestCMDFunctions(base.BaseTestCase):
     @mock.patch('bodhi.server.log.debug')
     @mock.patch('bodhi.server.log.error')
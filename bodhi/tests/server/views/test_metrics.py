@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Red Hat, Inc.
+#
+# This file is part of Bodhi.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""Contains tests for the bodhi.server.views.metrics module."""
+import datetime
+
+import mock
+
+from bodhi.server import cache, models
+from bodhi.server.views import metrics
+from bodhi.tests.server import base
+
+
+UPDATE_TYPES = {'bugfix': 'Bug fixes', 'security': 'Security updates'}
+
+
+class TestComputeTicksAndData(base.BaseTestCase):
+    """Contains tests for the compute_ticks_and_data() function."""
+    def test_stable_counts(self):
+        """The stable updates of the releases should be counted by type, in version order."""
+        models.Update.query.one().status = models.UpdateStatus.stable
+        f18 = models.Release(
+            name=u'F18', long_name=u'Fedora 18', id_prefix=u'FEDORA', version=u'18',
+            dist_tag=u'f18', stable_tag=u'f18-updates', testing_tag=u'f18-updates-testing',
+            candidate_tag=u'f18-updates-candidate', pending_signing_tag=u'f18-updates-signing',
+            pending_testing_tag=u'f18-updates-testing-pending',
+            pending_stable_tag=u'f18-updates-pending', override_tag=u'f18-override',
+            branch=u'f18')
+        self.db.add(f18)
+        self.db.commit()
+
+        data, ticks = metrics.compute_ticks_and_data(
+            self.db, [f18, models.Release.query.filter_by(name=u'F17').one()], UPDATE_TYPES)
+
+        self.assertEqual(ticks, [[0, u'F17'], [1, u'F18']])
+        self.assertEqual(
+            sorted(data, key=lambda series: series['label']),
+            [{'data': [[0, 1], [1, 0]], 'label': 'Bug fixes'},
+             {'data': [[0, 0], [1, 0]], 'label': 'Security updates'}])
+
+
+class TestComputeHistory(base.BaseTestCase):
+    """Contains tests for the compute_history() function."""
+    def test_months(self):
+        """The updates pushed to stable should be counted by month and type."""
+        release = models.Release.query.one()
+        today = datetime.datetime.utcnow().date()
+        last_year = today.replace(year=today.year - 1, day=1)
+        for date, update_type, status, count in (
+                (today, models.UpdateType.bugfix, models.UpdateStatus.stable, 2),
+                (today.replace(day=1), models.UpdateType.bugfix, models.UpdateStatus.stable, 1),
+                (today, models.UpdateType.security, models.UpdateStatus.testing, 5),
+                (last_year, models.UpdateType.security, models.UpdateStatus.stable, 3)):
+            models.UpdateMetric.increment(self.db, release, update_type, status, date, count)
+            self.db.flush()
+
+        data, ticks = metrics.compute_history(self.db, UPDATE_TYPES, 2)
+
+        previous = (today.replace(day=1) - datetime.timedelta(days=1))
+        self.assertEqual(ticks, [[0, previous.strftime('%Y/%m')], [1, today.strftime('%Y/%m')]])
+        self.assertEqual(sorted(data, key=lambda series: series['label']),
+                         [{'data': [[0, 0], [1, 3]], 'label': 'Bug fixes'},
+                          {'data': [[0, 0], [1, 0]], 'label': 'Security updates'}])
+
+        data, ticks = metrics.compute_history(self.db, UPDATE_TYPES, 13)
+
+        self.assertEqual(ticks[0], [0, last_year.strftime('%Y/%m')])
+        self.assertIn({'data': [[0, 3]] + [[i, 0] for i in range(1, 13)],
+                       'label': 'Security updates'}, data)
+
+
+class TestMetrics(base.BaseTestCase):
+    """Contains tests for the metrics() view."""
+    def test_page(self):
+        """The page should graph the releases and their history."""
+        res = self.app.get('/metrics')
+
+        self.assertIn('$.plot("#placeholder_history"', res)
+        self.assertIn('Updates pushed to stable per month', res)
+
+    def test_cached(self):
+        """The data of the page should be cached until the counts change."""
+        region = cache.get_region('stats')
+        region.invalidate()
+
+        def metrics_queries(statements):
+            # The request also looks the user and the releases up.
+            return [s for s in statements if 'update_metrics' in s or 'GROUP BY' in s]
+
+        with mock.patch.object(region, 'expiration_time', 3600):
+            self.app.get('/metrics')
+            with self.count_queries() as statements:
+                self.app.get('/metrics')
+            self.assertEqual(metrics_queries(statements), [])
+
+            models.Update.query.one().status = models.UpdateStatus.stable
+            self.db.commit()
+            with self.count_queries() as statements:
+                self.app.get('/metrics')
+            self.assertEqual(len(metrics_queries(statements)), 2)
+
+
+class TestMetricsJSON(base.BaseTestCase):
+    """Contains tests for the metrics_json() view."""
+    def setUp(self):
+        super(TestMetricsJSON, self).setUp()
+        update = models.Update.query.one()
+        update.status = models.UpdateStatus.testing
+        self.db.commit()
+        self.today = datetime.datetime.utcnow().date()
+
+    def test_all(self):
+        """The current counts and their history should be returned."""
+        res = self.app.get('/metrics/json')
+
+        self.assertEqual(res.json_body['counts'], {'F17': {'testing': {'bugfix': 1}}})
+        self.assertEqual(
+            res.json_body['history'],
+            [{'release': 'F17', 'type': 'bugfix', 'status': 'pending',
+              'date': self.today.isoformat(), 'count': 1},
+             {'release': 'F17', 'type': 'bugfix', 'status': 'testing',
+              'date': self.today.isoformat(), 'count': 1}])
+
+    def test_releases(self):
+        """The metrics should be restricted to the given releases."""
+        res = self.app.get('/metrics/json', {'releases': 'F18'})
+
+        self.assertEqual(res.json_body, {'counts': {}, 'history': []})
+
+    def test_since(self):
+        """The history should be restricted to the days since the given date."""
+        tomorrow = self.today + datetime.timedelta(days=1)
+
+        res = self.app.get('/metrics/json', {'since': tomorrow.isoformat()})
+
+        self.assertEqual(res.json_body['history'], [])
+        self.assertEqual(res.json_body['counts'], {'F17': {'testing': {'bugfix': 1}}})
+
+    def test_invalid_since(self):
+        """A 400 should be returned if since is not a date."""
+        self.app.get('/metrics/json', {'since': 'yesterday'}, status=400)
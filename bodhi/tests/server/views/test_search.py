@@ -19,7 +19,9 @@
 """Contains tests for the bodhi.server.views.search module."""
 import unittest
 
-from bodhi.server import buildsys
+import mock
+
+from bodhi.server import buildsys, models
 from bodhi.server.views import search
 from bodhi.tests.server import base
 
@@ -54,3 +56,44 @@ class TestSearchPackages(base.BaseTestCase):
 
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp.json_body, [])
+
+
+class TestSearchUpdates(base.BaseTestCase):
+    """Contains tests for the search_updates() view."""
+    def test_match(self):
+        """Test with a term that matches the notes of an update."""
+        update = models.Update.query.one()
+
+        resp = self.app.get('/search/updates', {'term': 'useful'})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json_body,
+                         [{'id': update.alias, 'label': 'bodhi-2.0-1.fc17', 'value': update.alias}])
+
+    def test_bug_title(self):
+        """Test with a term that matches the title of a bug of an update."""
+        models.Bug.query.one().title = u'Crash on startup'
+        self.db.commit()
+
+        resp = self.app.get('/search/updates', {'term': 'crash on'})
+
+        self.assertEqual([r['label'] for r in resp.json_body], ['bodhi-2.0-1.fc17'])
+
+    def test_unmatched(self):
+        """Test with a term that doesn't match anything."""
+        resp = self.app.get('/search/updates', {'term': 'nethack'})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json_body, [])
+
+    @mock.patch('bodhi.server.views.search.MAX_RESULTS', 1)
+    def test_limit(self):
+        """At most MAX_RESULTS updates should be returned, the most recent first."""
+        update = models.Update.query.one()
+        self.create_update([u'bodhi-2.0.1-1.fc17'])
+        self.db.commit()
+
+        resp = self.app.get('/search/updates', {'term': 'bodhi'})
+
+        self.assertEqual([r['label'] for r in resp.json_body], ['bodhi-2.0.1-1.fc17'])
+        self.assertNotEqual(resp.json_body[0]['id'], update.alias)
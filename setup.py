@@ -161,9 +161,12 @@ setup(
     bodhi-approve-testing = bodhi.server.scripts.approve_testing:main
     bodhi-manage-releases = bodhi.server.scripts.manage_releases:main
     bodhi-check-policies = bodhi.server.scripts.check_policies:check
+    bodhi-check-karma = bodhi.server.scripts.check_karma:check
+    bodhi-export = bodhi.server.scripts.export:export
     [moksha.consumer]
     masher = bodhi.server.consumers.masher:Masher
     updates = bodhi.server.consumers.updates:UpdatesHandler
     signed = bodhi.server.consumers.signed:SignedHandler
+    kojicache = bodhi.server.consumers.kojicache:KojiCacheHandler
     """,
     paster_plugins=['pyramid'])
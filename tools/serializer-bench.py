@@ -0,0 +1,196 @@
+"""
+serializer-bench.py
+
+Compare the compiled JSON serializers of the models with the reflection based serialization Bodhi
+used before them.
+
+A database (SQLite by default, or any SQLAlchemy URL) is populated with a page of updates, each
+with builds, bugs and comments from several users, much like a page of /updates/. The page is then
+serialized repeatedly with both implementations, and the outputs are checked to be identical:
+
+    reflection  legacy_to_json(), a copy of the former BodhiBase._to_json()
+    compiled    BodhiBase._to_json(), backed by models.JSONSerializer
+
+The results are printed as JSON, so they can be pasted into a review and compared between
+branches:
+
+    python tools/serializer-bench.py --updates 20,100 --repeat 5
+"""
+from datetime import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm.properties import RelationshipProperty
+import click
+
+from bodhi.server import models, Session
+
+
+def legacy_to_json(obj, seen=None, request=None, anonymize=False):
+    """Serialize obj the way BodhiBase._to_json() did before it used JSONSerializer."""
+    if not seen:
+        seen = []
+    if not obj:
+        return
+
+    exclude = getattr(obj, '__exclude_columns__', [])
+    properties = list(class_mapper(type(obj)).iterate_properties)
+    rels = [p.key for p in properties if type(p) is RelationshipProperty]
+    attrs = [p.key for p in properties if p.key not in rels]
+    d = dict([(attr, getattr(obj, attr)) for attr in attrs
+              if attr not in exclude and not attr.startswith('_')])
+
+    extras = getattr(obj, '__include_extras__', [])
+    for name in extras:
+        attribute = getattr(obj, name)
+        if callable(attribute):
+            attribute = attribute(request)
+        d[name] = attribute
+
+    for attr in rels:
+        if attr in exclude:
+            continue
+        target = getattr(type(obj), attr).property.mapper.class_
+        if target in seen:
+            continue
+        d[attr] = legacy_expand(obj, getattr(obj, attr), seen, request)
+
+    for key, value in d.iteritems():
+        if isinstance(value, datetime):
+            d[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, models.EnumSymbol):
+            d[key] = unicode(value)
+
+    if anonymize:
+        for key1, key2 in getattr(obj, '__anonymity_map__', {}).items():
+            if getattr(obj, key2):
+                d[key1] = 'anonymous'
+
+    return d
+
+
+def legacy_expand(obj, relation, seen, req):
+    """Expand a relationship the way BodhiBase._expand() did before it used JSONSerializer."""
+    if hasattr(relation, 'all'):
+        relation = relation.all()
+    if hasattr(relation, '__iter__'):
+        return [legacy_expand(obj, item, seen, req) for item in relation]
+    if type(relation) not in seen:
+        return legacy_to_json(relation, seen + [type(obj)], req)
+    else:
+        return relation.id
+
+
+def populate(session, num_updates, builds_per_update, comments_per_update):
+    """Fill the database with a release and num_updates testing updates."""
+    release = models.Release(
+        name=u'F27', long_name=u'Fedora 27', id_prefix=u'FEDORA', version=u'27',
+        dist_tag=u'f27', stable_tag=u'f27-updates', testing_tag=u'f27-updates-testing',
+        candidate_tag=u'f27-updates-candidate', pending_signing_tag=u'f27-signing-pending',
+        pending_testing_tag=u'f27-updates-testing-pending',
+        pending_stable_tag=u'f27-updates-pending', override_tag=u'f27-override', branch=u'f27',
+        state=models.ReleaseState.current)
+    group = models.Group(name=u'packager')
+    users = [models.User(name=u'tester%d' % i, email=u'tester%d@example.com' % i,
+                         groups=[group]) for i in xrange(10)]
+    session.add_all([release, group] + users)
+    session.flush()
+
+    bug_id = 1000000
+    for i in xrange(num_updates):
+        builds = []
+        for j in xrange(builds_per_update):
+            name = u'package%d-%d' % (i, j)
+            package = models.RpmPackage(name=name)
+            builds.append(models.RpmBuild(nvr=u'%s-1.0.%d-1.fc27' % (name, i), release=release,
+                                          package=package))
+        bug_id += 1
+        update = models.Update(
+            title=u' '.join(b.nvr for b in builds), builds=builds, user=users[0],
+            bugs=[models.Bug(bug_id=bug_id, title=u'Bug number %d is bad' % bug_id)],
+            release=release, notes=u'Generated update number %d.' % i,
+            type=models.UpdateType.bugfix, status=models.UpdateStatus.testing,
+            alias=u'FEDORA-2017-%010x' % i, date_submitted=datetime(2017, 1, 1),
+            date_pushed=datetime(2017, 1, 2), stable_karma=3, unstable_karma=-3)
+        session.add(update)
+        for j in xrange(comments_per_update):
+            comment = models.Comment(text=u'Comment number %d.' % j, karma=j % 3 - 1,
+                                     timestamp=datetime(2017, 1, 3))
+            comment.user = users[j % len(users)]
+            update.comments.append(comment)
+    session.commit()
+
+
+def timed(func, repeat):
+    """Return the best time of repeat calls to func, and its last result."""
+    best = None
+    for i in xrange(repeat):
+        start = time.time()
+        result = func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(db_url, num_updates, builds_per_update, comments_per_update, repeat):
+    """Populate a fresh database and time both serializations of its updates."""
+    workdir = tempfile.mkdtemp(prefix='bodhi-serializer-bench-')
+    try:
+        if db_url is None:
+            db_url = 'sqlite:///%s' % os.path.join(workdir, 'bodhi.sqlite')
+        engine = create_engine(db_url)
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+        Session.configure(bind=engine)
+        session = Session()
+
+        populate(session, num_updates, builds_per_update, comments_per_update)
+        updates = session.query(models.Update).all()
+
+        reflection, expected = timed(lambda: [legacy_to_json(u) for u in updates], repeat)
+        # The first serialization compiles the serializers, so time it separately.
+        start = time.time()
+        [models.BodhiBase._to_json(u) for u in updates]
+        first = time.time() - start
+        compiled, actual = timed(lambda: [models.BodhiBase._to_json(u) for u in updates], repeat)
+
+        session.close()
+        Session.remove()
+        engine.dispose()
+
+        return {
+            'updates': num_updates, 'builds_per_update': builds_per_update,
+            'comments_per_update': comments_per_update, 'identical': actual == expected,
+            'reflection': reflection, 'compiled_first': first, 'compiled': compiled,
+            'speedup': reflection / compiled if compiled else None}
+    finally:
+        shutil.rmtree(workdir)
+
+
+@click.command()
+@click.option('--updates', default='20,100',
+              help='A comma separated list of the numbers of updates to benchmark.')
+@click.option('--builds-per-update', default=2, type=int)
+@click.option('--comments-per-update', default=10, type=int)
+@click.option('--repeat', default=5, type=int, help='How many times to serialize each page.')
+@click.option('--db-url', default=None,
+              help='An SQLAlchemy URL to benchmark against. Defaults to a temporary SQLite file.')
+@click.option('--output', type=click.File('w'), default='-',
+              help='Where to write the JSON results. Defaults to stdout.')
+def main(updates, builds_per_update, comments_per_update, repeat, db_url, output):
+    results = {'runs': []}
+    for num_updates in [int(n) for n in updates.split(',')]:
+        click.echo('Benchmarking %d updates...' % num_updates, err=True)
+        results['runs'].append(
+            run(db_url, num_updates, builds_per_update, comments_per_update, repeat))
+    json.dump(results, output, indent=2, sort_keys=True)
+    output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
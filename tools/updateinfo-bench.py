@@ -0,0 +1,236 @@
+"""
+updateinfo-bench.py
+
+Measure how long the masher takes to generate updateinfo.xml at a realistic scale.
+
+A database (SQLite by default, or any SQLAlchemy URL such as a PostgreSQL one) is populated with
+a given number of testing updates, each with a given number of builds, and a synthetic Koji
+answers the buildsystem calls with realistic RPM lists. Each phase of UpdateInfoMetadata is then
+timed separately:
+
+    fetch_updates      UpdateInfoMetadata._fetch_updates()
+    add_update         the sum of all UpdateInfoMetadata.add_update() calls
+    xml_dump           UpdateInfoMetadata.uinfo.xml_dump()
+    insert_updateinfo  UpdateInfoMetadata.insert_updateinfo() into a compose with the given arches
+
+The results are printed as JSON, so they can be pasted into a review and compared between
+branches:
+
+    python tools/updateinfo-bench.py --updates 1000,10000,50000 --output results.json
+"""
+from datetime import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+import click
+
+from bodhi.server import buildsys, models, Session
+from bodhi.server.metadata import UpdateInfoMetadata
+from bodhi.server.util import mkmetadatadir
+
+
+RPM_ARCHES = ('x86_64', 'i686', 'aarch64', 'armv7hl', 'ppc64le', 's390x')
+SUBPACKAGES = ('%s', '%s-libs', '%s-devel', '%s-debuginfo')
+
+
+class SyntheticKoji(object):
+    """
+    Answer the Koji calls made while generating updateinfo with generated, realistic data.
+
+    Every build is made of a source RPM, a noarch documentation subpackage and a handful of
+    subpackages for each of RPM_ARCHES.
+    """
+
+    def __init__(self, tag, nvrs):
+        self.tag = tag
+        self.builds = {}
+        self.calls = 0
+        for build_id, nvr in enumerate(nvrs, 1):
+            name, version, release = nvr.rsplit('-', 2)
+            self.builds[nvr] = {
+                'id': build_id, 'build_id': build_id, 'nvr': nvr, 'name': name,
+                'package_name': name, 'version': version, 'release': release, 'epoch': None,
+                'tag_name': tag}
+        self.by_id = dict((b['id'], b) for b in self.builds.values())
+
+    def listTagged(self, tag, latest=False):
+        self.calls += 1
+        if tag != self.tag:
+            return []
+        return self.builds.values()
+
+    def getBuild(self, nvr):
+        self.calls += 1
+        return self.builds[nvr]
+
+    def listBuildRPMs(self, build_id):
+        self.calls += 1
+        build = self.by_id[build_id]
+        rpms = []
+
+        def rpm(name, arch):
+            rpms.append({
+                'arch': arch, 'build_id': build_id, 'epoch': None, 'id': len(rpms) + 1,
+                'name': name, 'nvr': '%s-%s-%s' % (name, build['version'], build['release']),
+                'release': build['release'], 'size': 1048576, 'version': build['version']})
+
+        rpm(build['name'], 'src')
+        rpm('%s-doc' % build['name'], 'noarch')
+        for arch in RPM_ARCHES:
+            for subpackage in SUBPACKAGES:
+                rpm(subpackage % build['name'], arch)
+        return rpms
+
+
+def populate(session, num_updates, builds_per_update, bugs_per_update):
+    """
+    Fill the database with a release and num_updates testing updates.
+
+    Returns:
+        tuple: The Release, and a list of all the build NVRs that were created.
+    """
+    release = models.Release(
+        name=u'F27', long_name=u'Fedora 27', id_prefix=u'FEDORA', version=u'27',
+        dist_tag=u'f27', stable_tag=u'f27-updates', testing_tag=u'f27-updates-testing',
+        candidate_tag=u'f27-updates-candidate', pending_signing_tag=u'f27-signing-pending',
+        pending_testing_tag=u'f27-updates-testing-pending',
+        pending_stable_tag=u'f27-updates-pending', override_tag=u'f27-override', branch=u'f27',
+        state=models.ReleaseState.current)
+    user = models.User(name=u'bench')
+    session.add_all([release, user])
+    session.flush()
+
+    nvrs = []
+    bug_id = 1000000
+    for i in xrange(num_updates):
+        builds = []
+        for j in xrange(builds_per_update):
+            name = u'package%d-%d' % (i, j)
+            nvr = u'%s-1.0.%d-1.fc27' % (name, i)
+            package = models.RpmPackage(name=name)
+            builds.append(models.RpmBuild(nvr=nvr, release=release, package=package))
+            nvrs.append(nvr)
+        bugs = []
+        for j in xrange(bugs_per_update):
+            bug_id += 1
+            bugs.append(models.Bug(bug_id=bug_id, title=u'Bug number %d is bad' % bug_id))
+        update = models.Update(
+            title=u' '.join(b.nvr for b in builds), builds=builds, bugs=bugs, user=user,
+            release=release, notes=u'Generated update number %d.' % i,
+            type=models.UpdateType.bugfix, status=models.UpdateStatus.testing,
+            alias=u'FEDORA-2017-%010x' % i, date_submitted=datetime(2017, 1, 1),
+            date_pushed=datetime(2017, 1, 2), stable_karma=3, unstable_karma=-3)
+        session.add(update)
+        if i % 1000 == 999:
+            session.flush()
+    session.commit()
+    return release, nvrs
+
+
+def make_compose(path, arches):
+    """Create an empty compose with repodata for the given number of arches plus sources."""
+    for arch in list(RPM_ARCHES[:arches]) + ['source']:
+        tree = arch == 'source' and 'tree' or 'os'
+        mkmetadatadir(os.path.join(path, 'compose', 'Everything', arch, tree))
+
+
+class TimedUpdateInfoMetadata(UpdateInfoMetadata):
+    """Record how long _fetch_updates() and add_update() take."""
+
+    def __init__(self, *args, **kwargs):
+        self.timings = {'fetch_updates': 0.0, 'add_update': 0.0}
+        super(TimedUpdateInfoMetadata, self).__init__(*args, **kwargs)
+
+    def _fetch_updates(self):
+        start = time.time()
+        super(TimedUpdateInfoMetadata, self)._fetch_updates()
+        self.timings['fetch_updates'] += time.time() - start
+
+    def add_update(self, update):
+        start = time.time()
+        super(TimedUpdateInfoMetadata, self).add_update(update)
+        self.timings['add_update'] += time.time() - start
+
+
+def run(db_url, num_updates, builds_per_update, bugs_per_update, arches):
+    """Populate a fresh database and time each phase of updateinfo generation."""
+    workdir = tempfile.mkdtemp(prefix='bodhi-updateinfo-bench-')
+    try:
+        if db_url is None:
+            db_url = 'sqlite:///%s' % os.path.join(workdir, 'bodhi.sqlite')
+        engine = create_engine(db_url)
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+        Session.configure(bind=engine)
+        session = Session()
+
+        start = time.time()
+        release, nvrs = populate(session, num_updates, builds_per_update, bugs_per_update)
+        populate_time = time.time() - start
+
+        koji = SyntheticKoji(release.testing_tag, nvrs)
+        buildsys.setup_buildsystem({'buildsystem': 'dev'})
+        buildsys._buildsystem = lambda: koji
+
+        compose = os.path.join(workdir, 'compose')
+        make_compose(compose, arches)
+
+        md = TimedUpdateInfoMetadata(release, models.UpdateRequest.testing, session, workdir)
+        timings = md.timings
+
+        start = time.time()
+        md.uinfo.xml_dump()
+        timings['xml_dump'] = time.time() - start
+
+        start = time.time()
+        md.insert_updateinfo(compose)
+        timings['insert_updateinfo'] = time.time() - start
+
+        session.close()
+        Session.remove()
+        engine.dispose()
+
+        return {
+            'updates': num_updates, 'builds_per_update': builds_per_update,
+            'bugs_per_update': bugs_per_update, 'arches': arches + 1,
+            'koji_calls': koji.calls, 'populate': populate_time,
+            'timings': timings, 'total': sum(timings.values())}
+    finally:
+        buildsys.teardown_buildsystem()
+        shutil.rmtree(workdir)
+
+
+@click.command()
+@click.option('--updates', default='1000,10000,50000',
+              help='A comma separated list of the numbers of updates to benchmark.')
+@click.option('--builds-per-update', default=1, type=int)
+@click.option('--bugs-per-update', default=2, type=int)
+@click.option('--arches', default=len(RPM_ARCHES), type=click.IntRange(0, len(RPM_ARCHES)),
+              help='The number of binary arches in the compose (sources are always included).')
+@click.option('--db-url', default=None,
+              help='An SQLAlchemy URL to benchmark against. Defaults to a temporary SQLite file.')
+@click.option('--drop', is_flag=True,
+              help='Drop all the tables of a --db-url that is not SQLite before each run.')
+@click.option('--output', type=click.File('w'), default='-',
+              help='Where to write the JSON results. Defaults to stdout.')
+def main(updates, builds_per_update, bugs_per_update, arches, db_url, drop, output):
+    # Each run starts by dropping every table, so don't do that to a real database by accident.
+    if db_url is not None and not db_url.startswith('sqlite') and not drop:
+        raise click.BadParameter(
+            'every table of the database is dropped before each run, pass --drop to do so',
+            param_hint='--db-url')
+    results = {'runs': []}
+    for num_updates in [int(n) for n in updates.split(',')]:
+        click.echo('Benchmarking %d updates...' % num_updates, err=True)
+        results['runs'].append(
+            run(db_url, num_updates, builds_per_update, bugs_per_update, arches))
+    json.dump(results, output, indent=2, sort_keys=True)
+    output.write('\n')
+
+
+if __name__ == '__main__':
+    main()